@@ -1,14 +1,23 @@
+import asyncio
 import os
 import time
 from typing import Literal
+from langchain_core.runnables import RunnableLambda
 from langgraph.graph import StateGraph, END
 from app.agent.state import AgentState
-from app.agent.nodes.extract_tasks import task_generation_node
-from app.agent.nodes.analyze_dependencies import task_dependency_node
-from app.agent.nodes.schedule_tasks import task_scheduler_node
-from app.agent.nodes.allocate_team import task_allocation_node
-from app.agent.nodes.assess_risk import risk_assessment_node
-from app.agent.nodes.generate_insights import insight_generation_node
+from app.agent.nodes.extract_tasks import task_generation_node, atask_generation_node
+from app.agent.nodes.analyze_dependencies import task_dependency_node, atask_dependency_node
+from app.agent.nodes.schedule_tasks import task_scheduler_node, atask_scheduler_node
+from app.agent.nodes.allocate_team import task_allocation_node, atask_allocation_node
+from app.agent.nodes.assess_risk import risk_assessment_node, arisk_assessment_node
+from app.agent.nodes.generate_insights import insight_generation_node, ainsight_generation_node
+from app.services.task_queue import update_job_progress, close_job_progress, redis_conn
+from app.services.checkpoint import RedisCheckpointSaver
+from app.services.eta import eta_model
+from app.services.node_models import node_models
+from app.services.cassette import llm_cassettes
+from app.services.result_store import plan_result_store
+from app.core.config import settings
 from loguru import logger
 
 def router(state: AgentState) -> str:
@@ -33,15 +42,13 @@ def router(state: AgentState) -> str:
         logger.info("First iteration completed. Moving to insight generation.")
         return "insight_generator"
 
-def create_graph():
+def create_graph(checkpointer=None):
     """Create the agent graph with enhanced state tracking"""
     workflow = StateGraph(AgentState)
     
-    # 定义增强版节点包装器
-    def create_tracked_node(node_func, node_name: str, description: str):
-        def tracked_node(state: AgentState) -> dict:
-            job_id = state.get("job_id")
-            
+    # 定义增强版节点包装器（同时提供同步与异步实现）
+    def create_tracked_node(node_func, anode_func, node_name: str, description: str, llm_node: str):
+        def mark_started(state: AgentState) -> None:
             # 标记节点开始
             state["current_node"] = node_name
             if "node_progress" not in state:
@@ -51,61 +58,100 @@ def create_graph():
                 "status": "started",
                 "start_time": time.time(),
                 "description": description,
+                "model": node_models.describe(llm_node)["model"],  # 节点使用的模型，便于按模型分析耗时
                 "details": f"正在执行{description}..."
             }
+            logger.info(f"🎯 开始执行节点: {node_name} - {description}")
+        
+        def mark_completed(state: AgentState, result: dict) -> None:
+            # 标记节点完成
+            state["node_progress"][node_name].update({
+                "status": "completed",
+                "end_time": time.time(),
+                "details": f"✅ {description}已完成"
+            })
+            
+            # 添加到已完成节点列表
+            if "completed_nodes" not in state:
+                state["completed_nodes"] = []
+            if node_name not in state["completed_nodes"]:
+                state["completed_nodes"].append(node_name)
+            
+            # 更新整体状态
+            state.update(result)
+        
+        def record_duration(state: AgentState) -> None:
+            # 记录节点耗时，用于基于历史数据的进度和剩余时间估算
+            progress = state["node_progress"][node_name]
+            tasks = state.get("tasks")
+            task_count = len(tasks.tasks) if hasattr(tasks, "tasks") else None
+            eta_model.record(node_name, task_count, progress["end_time"] - progress["start_time"])
+        
+        def mark_failed(state: AgentState, e: Exception) -> None:
+            state["node_progress"][node_name].update({
+                "status": "failed",
+                "end_time": time.time(),
+                "details": f"❌ {description}执行失败: {str(e)}"
+            })
+            logger.error(f"❌ 节点执行失败: {node_name} - {e}")
+        
+        def tracked_node(state: AgentState) -> dict:
+            job_id = state.get("job_id")
+            mark_started(state)
             
             # 更新到Redis
             if job_id:
-                from app.services.task_queue import update_job_progress
                 update_job_progress(job_id, state)
             
-            logger.info(f"🎯 开始执行节点: {node_name} - {description}")
-            
             try:
                 # 执行实际节点
                 result = node_func(state)
+                mark_completed(state, result)
                 
-                # 标记节点完成
-                state["node_progress"][node_name].update({
-                    "status": "completed",
-                    "end_time": time.time(),
-                    "details": f"✅ {description}已完成"
-                })
+                # 再次更新到Redis
+                if job_id:
+                    record_duration(state)
+                    update_job_progress(job_id, state)
                 
-                # 添加到已完成节点列表
-                if "completed_nodes" not in state:
-                    state["completed_nodes"] = []
-                if node_name not in state["completed_nodes"]:
-                    state["completed_nodes"].append(node_name)
+                logger.info(f"✅ 节点完成: {node_name}")
+                return result
                 
-                # 更新整体状态
-                state.update(result)
+            except Exception as e:
+                mark_failed(state, e)
+                raise
+        
+        async def atracked_node(state: AgentState) -> dict:
+            job_id = state.get("job_id")
+            mark_started(state)
+            
+            # Redis写入为同步调用，放到线程中执行以免阻塞事件循环
+            if job_id:
+                await asyncio.to_thread(update_job_progress, job_id, state)
+            
+            try:
+                result = await anode_func(state)
+                mark_completed(state, result)
                 
-                # 再次更新到Redis
                 if job_id:
-                    update_job_progress(job_id, state)
+                    await asyncio.to_thread(record_duration, state)
+                    await asyncio.to_thread(update_job_progress, job_id, state)
                 
                 logger.info(f"✅ 节点完成: {node_name}")
                 return result
                 
             except Exception as e:
-                state["node_progress"][node_name].update({
-                    "status": "failed",
-                    "end_time": time.time(),
-                    "details": f"❌ {description}执行失败: {str(e)}"
-                })
-                logger.error(f"❌ 节点执行失败: {node_name} - {e}")
+                mark_failed(state, e)
                 raise
                 
-        return tracked_node
+        return RunnableLambda(tracked_node, afunc=atracked_node, name=node_name)
     
     # 添加增强版节点
-    workflow.add_node("task_generation", create_tracked_node(task_generation_node, "task_generation", "智能任务提取"))
-    workflow.add_node("analyze_dependencies", create_tracked_node(task_dependency_node, "analyze_dependencies", "依赖关系分析"))
-    workflow.add_node("schedule_tasks", create_tracked_node(task_scheduler_node, "schedule_tasks", "智能任务调度"))
-    workflow.add_node("allocate_team", create_tracked_node(task_allocation_node, "allocate_team", "团队智能分配"))
-    workflow.add_node("assess_risk", create_tracked_node(risk_assessment_node, "assess_risk", "风险评估分析"))
-    workflow.add_node("insight_generator", create_tracked_node(insight_generation_node, "generate_insights", "洞察生成优化"))
+    workflow.add_node("task_generation", create_tracked_node(task_generation_node, atask_generation_node, "task_generation", "智能任务提取", "task_generation"))
+    workflow.add_node("analyze_dependencies", create_tracked_node(task_dependency_node, atask_dependency_node, "analyze_dependencies", "依赖关系分析", "task_dependency"))
+    workflow.add_node("schedule_tasks", create_tracked_node(task_scheduler_node, atask_scheduler_node, "schedule_tasks", "智能任务调度", "task_scheduler"))
+    workflow.add_node("allocate_team", create_tracked_node(task_allocation_node, atask_allocation_node, "allocate_team", "团队智能分配", "task_allocator"))
+    workflow.add_node("assess_risk", create_tracked_node(risk_assessment_node, arisk_assessment_node, "assess_risk", "风险评估分析", "risk_assessor"))
+    workflow.add_node("insight_generator", create_tracked_node(insight_generation_node, ainsight_generation_node, "generate_insights", "洞察生成优化", "insight_generator"))
     
     # Define edges
     workflow.set_entry_point("task_generation")
@@ -117,45 +163,88 @@ def create_graph():
     workflow.add_edge("insight_generator", "schedule_tasks")
     
     # Compile the graph
-    graph = workflow.compile()
+    graph = workflow.compile(checkpointer=checkpointer)
     return graph
 
 # Create the graph
 agent_graph = create_graph()
 
-def run_agent_with_job_tracking(initial_state: dict):
-    """
-    包装器函数：获取RQ真实job_id并启动智能体
-    """
+# 带 Redis 检查点的图：以 job_id 作为 thread_id，支持任务失败或 worker 重启后续跑
+checkpointer = RedisCheckpointSaver(redis_conn, ttl=settings.CHECKPOINT_TTL_SECONDS) if settings.CHECKPOINT_ENABLED else None
+checkpointed_graph = create_graph(checkpointer=checkpointer) if checkpointer else None
+
+def _resolve_job_id(job_id: str = None) -> str:
+    """获取RQ真实job_id；不在RQ环境中运行时生成临时ID"""
+    if job_id:
+        logger.info(f"🚀 Starting agent with job ID: {job_id}")
+        return job_id
+    
     # 获取当前RQ job的真实ID
     from rq import get_current_job
     current_job = get_current_job()
     
     if current_job:
-        job_id = current_job.id
-        logger.info(f"🚀 Starting agent with RQ job ID: {job_id}")
-    else:
-        # 如果不在RQ环境中运行，生成临时ID
-        import uuid
-        job_id = str(uuid.uuid4())
-        logger.info(f"🚀 Starting agent with temp ID (not in RQ): {job_id}")
+        logger.info(f"🚀 Starting agent with RQ job ID: {current_job.id}")
+        return current_job.id
+    
+    # 如果不在RQ环境中运行，生成临时ID
+    import uuid
+    job_id = str(uuid.uuid4())
+    logger.info(f"🚀 Starting agent with temp ID (not in RQ): {job_id}")
+    return job_id
+
+def _save_cassette(job_id: str, tape) -> None:
+    """保存录制内容；失败只记录日志，不覆盖任务本身的结果或错误"""
+    try:
+        llm_cassettes.save(tape)
+    except Exception as e:
+        logger.error(f"❌ Failed to save LLM cassette for job {job_id}: {e}")
+
+def run_agent_with_job_tracking(initial_state: dict):
+    """
+    包装器函数：获取RQ真实job_id并启动智能体
+    """
+    job_id = _resolve_job_id()
+    cassette = llm_cassettes.begin(job_id)
     
     try:
-        return run_agent(initial_state, job_id)
+        final_state = run_agent(initial_state, job_id)
+        # 计划文档单独保存，RQ 只保存引用（未启用或保存失败时仍返回完整状态）
+        return plan_result_store.save(job_id, final_state) or final_state
     except Exception as e:
         logger.error(f"❌ Agent job {job_id} failed: {e}")
         raise
+    finally:
+        # 无论录制内容是否保存成功，都要关闭进度（发布结束事件）
+        try:
+            _save_cassette(job_id, llm_cassettes.end(cassette))
+        finally:
+            close_job_progress(job_id)
 
-def run_agent(initial_state: dict, job_id: str = None):
+async def arun_agent_with_job_tracking(initial_state: dict, job_id: str = None):
     """
-    主要智能体执行入口点
-    
-    Args:
-        initial_state: 初始状态字典
-        job_id: RQ任务ID，用于实时进度追踪
+    run_agent_with_job_tracking 的异步版本
+
+    在事件循环中运行时无法通过 get_current_job() 获取任务，
+    因此由调用方（如异步worker）显式传入 job_id。
     """
-    config = {"configurable": {"thread_id": "1"}}
+    job_id = _resolve_job_id(job_id)
+    # 录制/回放绑定在当前协程的上下文中，不能放到线程里执行
+    cassette = llm_cassettes.begin(job_id)
     
+    try:
+        final_state = await arun_agent(initial_state, job_id)
+        return await asyncio.to_thread(plan_result_store.save, job_id, final_state) or final_state
+    except Exception as e:
+        logger.error(f"❌ Agent job {job_id} failed: {e}")
+        raise
+    finally:
+        try:
+            await asyncio.to_thread(_save_cassette, job_id, llm_cassettes.end(cassette))
+        finally:
+            await asyncio.to_thread(close_job_progress, job_id)
+
+def _init_tracking(initial_state: dict, job_id: str = None) -> None:
     # 初始化追踪字段
     if job_id:
         initial_state.update({
@@ -168,28 +257,107 @@ def run_agent(initial_state: dict, job_id: str = None):
         })
     
     logger.info(f"🚀 开始智能体执行，任务ID: {job_id}")
-    
-    # 执行图形流，保存最终状态
-    final_state = None
-    for event in agent_graph.stream(initial_state, config, stream_mode="values"):
-        logger.info(f"📊 智能体状态更新: 当前节点={event.get('current_node', 'unknown')}")
-        final_state = event  # 保存最后一个事件作为最终状态
-    
-    # 确保有最终状态
-    if final_state is None:
-        final_state = initial_state
-    
+
+def _select_graph(job_id: str = None):
+    """
+    选择执行用的图和配置
+
+    有 job_id 且启用检查点时使用 checkpointed_graph，thread_id 即 job_id；
+    本地/测试运行（无 job_id）不访问 Redis。
+    """
+    if job_id and checkpointed_graph is not None:
+        return checkpointed_graph, {"configurable": {"thread_id": job_id}}
+    return agent_graph, {"configurable": {"thread_id": "1"}}
+
+def _resume_point(config: dict, snapshot) -> bool:
+    """检查点中是否存在未执行完的节点，存在则从该处续跑"""
+    if snapshot is not None and snapshot.next:
+        logger.info(f"♻️ 从检查点恢复任务 {config['configurable']['thread_id']}，下一个节点: {snapshot.next}")
+        return True
+    return False
+
+def _mark_completed(final_state: dict, job_id: str = None) -> None:
     # 标记任务完成
     if job_id:
-        from app.services.task_queue import update_job_progress
         # 更新完成状态
         final_state["overall_status"] = "completed"
         final_state["current_node"] = "completed"
         final_state["total_end_time"] = time.time()
+        final_state["llm_models"] = node_models.describe_all()
         if "total_start_time" in final_state:
             final_state["total_elapsed_time"] = final_state["total_end_time"] - final_state["total_start_time"]
-        update_job_progress(job_id, final_state)
+            eta_model.record_job(final_state["total_elapsed_time"], final_state.get("iteration_number") or 1)
+        update_job_progress(job_id, final_state, force=True)
         logger.info(f"✅ 智能体执行完成，任务ID: {job_id}")
+        
+        # 任务已完成，检查点不再需要
+        if checkpointer is not None:
+            checkpointer.delete_thread(job_id)
+
+def run_agent(initial_state: dict, job_id: str = None):
+    """
+    主要智能体执行入口点
+    
+    Args:
+        initial_state: 初始状态字典
+        job_id: RQ任务ID，用于实时进度追踪
+    """
+    graph, config = _select_graph(job_id)
+    
+    graph_input = initial_state
+    if graph.checkpointer is not None and checkpointer.has_pending_run(job_id):
+        if _resume_point(config, graph.get_state(config)):
+            graph_input = None  # 从检查点继续执行
+        else:
+            checkpointer.delete_thread(job_id)
+    if graph_input is not None:
+        _init_tracking(initial_state, job_id)
+    
+    # 执行图形流，保存最终状态
+    final_state = None
+    for event in graph.stream(graph_input, config, stream_mode="values"):
+        logger.info(f"📊 智能体状态更新: 当前节点={event.get('current_node', 'unknown')}")
+        final_state = event  # 保存最后一个事件作为最终状态
+    
+    # 确保有最终状态
+    if final_state is None:
+        final_state = initial_state if graph_input is not None else graph.get_state(config).values
+    
+    _mark_completed(final_state, job_id)
     
     # 返回最终状态
-    return final_state 
\ No newline at end of file
+    return final_state
+
+async def arun_agent(initial_state: dict, job_id: str = None):
+    """
+    异步智能体执行入口点
+
+    使用图的 astream 驱动各节点的异步实现（ainvoke），
+    使单个进程可以在同一事件循环中并发执行多个计划。
+
+    Args:
+        initial_state: 初始状态字典
+        job_id: RQ任务ID，用于实时进度追踪
+    """
+    graph, config = _select_graph(job_id)
+    
+    graph_input = initial_state
+    if graph.checkpointer is not None and await asyncio.to_thread(checkpointer.has_pending_run, job_id):
+        if _resume_point(config, await graph.aget_state(config)):
+            graph_input = None
+        else:
+            await checkpointer.adelete_thread(job_id)
+    if graph_input is not None:
+        _init_tracking(initial_state, job_id)
+    
+    final_state = None
+    async for event in graph.astream(graph_input, config, stream_mode="values"):
+        logger.info(f"📊 智能体状态更新: 当前节点={event.get('current_node', 'unknown')}")
+        final_state = event
+    
+    if final_state is None:
+        final_state = initial_state if graph_input is not None else (await graph.aget_state(config)).values
+    
+    await asyncio.to_thread(_mark_completed, final_state, job_id)
+    
+    return final_state
@@ -1,56 +1,153 @@
 from app.agent.state import AgentState
 from app.schemas.simple import SimpleTaskAllocationList
-from app.services.llm_service import llm
+from app.services.node_models import node_models
 from app.services.model_adapter import model_adapter
+from app.services.node_cache import node_cache
+from app.services.allocation_engine import allocation_engine, ALLOCATOR_MODES
+from app.schemas.plan import Schedule
+from app.core.config import settings
 from app.prompts.loader import get_prompt
 from loguru import logger
 
-def task_allocation_node(state: AgentState) -> dict:
+llm = node_models.llm("task_allocator")
+
+def _allocator_mode(state: AgentState) -> str:
+    """每个请求可选择分配引擎：local（技能匹配）、llm（AI）、hybrid（只把难以判断的任务交给AI）"""
+    mode = state.get("allocator") or settings.DEFAULT_ALLOCATOR
+    if mode not in ALLOCATOR_MODES:
+        logger.warning(f"Unknown allocator mode '{mode}', falling back to 'llm'")
+        return "llm"
+    return mode
+
+def _team_members(state: AgentState) -> list:
+    """兼容字典和对象两种团队格式"""
+    return state["team"]["team_members"] if isinstance(state["team"], dict) else state["team"].team_members
+
+def _prepare(state: AgentState, task_ids=None):
     """
-    任务分配节点
+    将完整的任务、调度和团队信息转换为简化格式，返回分配prompt和缓存键输入
     
-    采用适配器模式：
-    1. 将完整的任务、调度和团队信息转换为简化格式传递给AI
-    2. AI 使用简化的 schema 生成任务分配
-    3. 适配器将简化的任务分配转换为完整格式
-    4. 保持迭代状态的处理逻辑
+    task_ids 不为空时只把这些任务（hybrid 模式下难以判断的任务）交给AI
     """
-    logger.info("Executing task_allocation_node with adapter pattern...")
-    
-    # Step 1: 将完整数据转换为简化格式，供AI使用
     simple_tasks = model_adapter.get_simple_task_list_for_prompt(state["tasks"])
+    schedule = state["schedule"]
+    if task_ids is not None:
+        simple_tasks = [
+            simple_task for simple_task, task in zip(simple_tasks, state["tasks"].tasks)
+            if task.id in task_ids
+        ]
+        schedule = Schedule(schedule=[item for item in schedule.schedule if item.task_id in task_ids])
     
     # 将调度转换为简化格式
     reverse_mapping = model_adapter.create_reverse_id_mapping(state["id_mapping"])
-    simple_schedule = model_adapter.get_simple_schedule_for_prompt(state["schedule"], reverse_mapping)
+    simple_schedule = model_adapter.get_simple_schedule_for_prompt(schedule, reverse_mapping)
     
-    # Step 2: AI 使用简化的数据生成任务分配
     prompt = get_prompt(
         "task_allocator",
         tasks=simple_tasks,
         schedule=simple_schedule,
-        team=state["team"]["team_members"] if isinstance(state["team"], dict) else state["team"].team_members,  # 兼容字典和对象
+        team=_team_members(state),
         insights=state.get("insights"),
         task_allocations_iteration=state.get("task_allocations_iteration", [])
     )
-    
-    structure_llm = llm.with_structured_output(SimpleTaskAllocationList)
-    simple_allocations: SimpleTaskAllocationList = structure_llm.invoke(prompt)
-    
+    cache_inputs = {
+        "tasks": simple_tasks,
+        "schedule": simple_schedule,
+        "team": _team_members(state),
+        "insights": state.get("insights"),
+        "task_allocations_iteration": [
+            [(reverse_mapping.get(a.task.id), a.team_member.name) for a in allocations.task_allocations]
+            for allocations in state.get("task_allocations_iteration", [])
+        ],
+    }
+    return prompt, cache_inputs
+
+def _to_full_allocations(state: AgentState, simple_allocations: SimpleTaskAllocationList):
+    """通过适配器转换为完整的任务分配"""
     logger.info(f"AI generated {len(simple_allocations.task_allocations)} simple allocations")
     
-    # Step 3: 通过适配器转换为完整的任务分配（包含完整的Task和TeamMember对象）
     task_allocations = model_adapter.simple_to_full_task_allocations(
         simple_allocations,
         state["tasks"],
-        state["team"]["team_members"] if isinstance(state["team"], dict) else state["team"].team_members,
+        _team_members(state),
         state["id_mapping"]
     )
     
     logger.info(f"Adapter converted to {len(task_allocations.task_allocations)} full allocations")
-    
-    # Step 4: 保持迭代状态的处理逻辑
+    return task_allocations
+
+def _to_state_update(state: AgentState, simple_allocations: SimpleTaskAllocationList) -> dict:
+    """通过适配器转换为完整的任务分配，并维护迭代状态"""
+    return _append_iteration(state, _to_full_allocations(state, simple_allocations))
+
+def _local_allocate(state: AgentState, preferred=None):
+    """使用本地技能匹配引擎分配所有任务"""
+    return allocation_engine.allocate(state["tasks"], state["schedule"], _team_members(state), preferred)
+
+def _merge_state_update(state: AgentState, simple_allocations: SimpleTaskAllocationList) -> dict:
+    """hybrid 模式：AI 对难以判断任务的选择作为首选成员，重新做一次带时间区间约束的本地分配"""
+    preferred = {
+        allocation.task.id: allocation.team_member.name
+        for allocation in _to_full_allocations(state, simple_allocations).task_allocations
+    }
+    return _append_iteration(state, _local_allocate(state, preferred).allocations)
+
+def _append_iteration(state: AgentState, task_allocations) -> dict:
+    """保持迭代状态的处理逻辑"""
     new_allocations_iteration = state.get("task_allocations_iteration", []) + [task_allocations]
     
     logger.info("Allocated tasks to team members.")
-    return {"task_allocations": task_allocations, "task_allocations_iteration": new_allocations_iteration} 
\ No newline at end of file
+    return {"task_allocations": task_allocations, "task_allocations_iteration": new_allocations_iteration}
+
+def task_allocation_node(state: AgentState) -> dict:
+    """
+    任务分配节点
+    
+    采用适配器模式：
+    1. 将完整的任务、调度和团队信息转换为简化格式传递给AI
+    2. AI 使用简化的 schema 生成任务分配
+    3. 适配器将简化的任务分配转换为完整格式（包含完整的Task和TeamMember对象）
+    4. 保持迭代状态的处理逻辑
+    
+    allocator=local 时跳过AI，直接使用本地技能匹配引擎；
+    allocator=hybrid 时只有本地引擎难以判断的任务才交给AI
+    """
+    logger.info("Executing task_allocation_node with adapter pattern...")
+    
+    mode = _allocator_mode(state)
+    task_ids = None
+    if mode != "llm":
+        local_result = _local_allocate(state)
+        if mode == "local" or not local_result.ambiguous:
+            return _append_iteration(state, local_result.allocations)
+        task_ids = set(local_result.ambiguous)
+    
+    prompt, cache_inputs = _prepare(state, task_ids)
+    simple_allocations: SimpleTaskAllocationList = node_cache.invoke(
+        "task_allocator", cache_inputs, llm, SimpleTaskAllocationList, prompt
+    )
+    
+    if task_ids is not None:
+        return _merge_state_update(state, simple_allocations)
+    return _to_state_update(state, simple_allocations)
+
+async def atask_allocation_node(state: AgentState) -> dict:
+    """任务分配节点的异步版本，使用 ainvoke 调用AI"""
+    logger.info("Executing atask_allocation_node with adapter pattern...")
+    
+    mode = _allocator_mode(state)
+    task_ids = None
+    if mode != "llm":
+        local_result = _local_allocate(state)
+        if mode == "local" or not local_result.ambiguous:
+            return _append_iteration(state, local_result.allocations)
+        task_ids = set(local_result.ambiguous)
+    
+    prompt, cache_inputs = _prepare(state, task_ids)
+    simple_allocations: SimpleTaskAllocationList = await node_cache.ainvoke(
+        "task_allocator", cache_inputs, llm, SimpleTaskAllocationList, prompt
+    )
+    
+    if task_ids is not None:
+        return _merge_state_update(state, simple_allocations)
+    return _to_state_update(state, simple_allocations)
@@ -1,10 +1,31 @@
 from app.agent.state import AgentState
 from app.schemas.simple import SimpleDependencyList
-from app.services.llm_service import llm
+from app.services.node_models import node_models
 from app.services.model_adapter import model_adapter
+from app.services.node_cache import node_cache
 from app.prompts.loader import get_prompt
 from loguru import logger
 
+llm = node_models.llm("task_dependency")
+
+def _prepare(state: AgentState):
+    """将完整任务转换为简化格式，返回依赖分析的prompt和缓存键输入"""
+    simple_tasks = model_adapter.get_simple_task_list_for_prompt(state["tasks"])
+    return get_prompt("task_dependency", tasks=simple_tasks), {"tasks": simple_tasks}
+
+def _to_state_update(state: AgentState, simple_dependencies: SimpleDependencyList) -> dict:
+    """通过适配器将AI生成的简化依赖关系转换为完整格式（包含UUID）"""
+    logger.info(f"AI generated {len(simple_dependencies.dependencies)} simple dependencies")
+    
+    dependencies = model_adapter.simple_to_full_dependencies(
+        simple_dependencies, 
+        state["id_mapping"]
+    )
+    
+    logger.info(f"Adapter converted to {len(dependencies.dependencies)} dependencies with UUIDs")
+    
+    return {"dependencies": dependencies}
+
 def task_dependency_node(state: AgentState) -> dict:
     """
     依赖关系分析节点
@@ -16,22 +37,20 @@ def task_dependency_node(state: AgentState) -> dict:
     """
     logger.info("Executing task_dependency_node with adapter pattern...")
     
-    # Step 1: 将完整任务转换为简化格式，供AI使用
-    simple_tasks = model_adapter.get_simple_task_list_for_prompt(state["tasks"])
-    
-    # Step 2: AI 使用简化的任务信息分析依赖关系
-    prompt = get_prompt("task_dependency", tasks=simple_tasks)
-    structured_llm = llm.with_structured_output(SimpleDependencyList)
-    simple_dependencies: SimpleDependencyList = structured_llm.invoke(prompt)
+    prompt, cache_inputs = _prepare(state)
+    simple_dependencies: SimpleDependencyList = node_cache.invoke(
+        "task_dependency", cache_inputs, llm, SimpleDependencyList, prompt
+    )
     
-    logger.info(f"AI generated {len(simple_dependencies.dependencies)} simple dependencies")
+    return _to_state_update(state, simple_dependencies)
+
+async def atask_dependency_node(state: AgentState) -> dict:
+    """依赖关系分析节点的异步版本，使用 ainvoke 调用AI"""
+    logger.info("Executing atask_dependency_node with adapter pattern...")
     
-    # Step 3: 通过适配器转换为完整的依赖关系（包含UUID）
-    dependencies = model_adapter.simple_to_full_dependencies(
-        simple_dependencies, 
-        state["id_mapping"]
+    prompt, cache_inputs = _prepare(state)
+    simple_dependencies: SimpleDependencyList = await node_cache.ainvoke(
+        "task_dependency", cache_inputs, llm, SimpleDependencyList, prompt
     )
     
-    logger.info(f"Adapter converted to {len(dependencies.dependencies)} dependencies with UUIDs")
-    
-    return {"dependencies": dependencies} 
\ No newline at end of file
+    return _to_state_update(state, simple_dependencies)
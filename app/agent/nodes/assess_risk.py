@@ -1,50 +1,52 @@
+import re
+
 from app.agent.state import AgentState
 from app.schemas.simple import SimpleRiskList
-from app.services.llm_service import llm
+from app.services.node_models import node_models
 from app.services.model_adapter import model_adapter
+from app.services.node_cache import node_cache
 from app.prompts.loader import get_prompt
 from loguru import logger
 
-def risk_assessment_node(state: AgentState) -> dict:
+llm = node_models.llm("risk_assessor")
+
+_UUID_PATTERN = re.compile(r"[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}")
+
+def _prepare(state: AgentState):
     """
-    风险评估节点
+    生成风险评估prompt（Risk模型相对简单，任务分配和调度保持原样传入）
     
-    采用适配器模式（保持架构一致性）：
-    1. 将完整的任务分配和调度信息转换为简化格式传递给AI
-    2. AI 使用简化的 schema 生成风险评估
-    3. 适配器将简化的风险评估转换为完整格式
-    4. 保持迭代状态的处理逻辑
+    缓存键使用渲染后的完整 prompt（包含模板、任务名称和描述、成员简介、先前的风险评估），
+    其中每次运行都不同的任务UUID替换为稳定的简单ID
     """
-    logger.info("Executing risk_assessment_node with adapter pattern...")
-    
-    # Step 1: 准备简化格式的数据（为了架构一致性，虽然Risk模型本身不包含task_id）
-    # 由于任务分配和调度可能包含复杂的对象结构，我们可以将其传递给prompt的时候简化
-    
-    # Step 2: AI 使用简化的 schema 生成风险评估（Risk模型相对简单）
     prompt = get_prompt(
         "risk_assessor",
         task_allocations=state["task_allocations"],  # 保持原样，因为prompt需要完整信息
         schedule=state["schedule"],  # 保持原样，因为prompt需要完整信息
         risks_iteration=state.get("risks_iteration", [])
     )
-    
-    structure_llm = llm.with_structured_output(SimpleRiskList)
-    simple_risks: SimpleRiskList = structure_llm.invoke(prompt)
-    
+    simple_ids = {
+        str(uuid_val): simple_id
+        for uuid_val, simple_id in model_adapter.create_reverse_id_mapping(state.get("id_mapping") or {}).items()
+    }
+    stable_prompt = _UUID_PATTERN.sub(lambda m: simple_ids.get(m.group(0), m.group(0)), prompt)
+    return prompt, {"prompt": stable_prompt}
+
+def _to_state_update(state: AgentState, simple_risks: SimpleRiskList) -> dict:
+    """通过适配器转换为完整的风险评估，计算风险评分并维护迭代状态"""
     logger.info(f"AI generated {len(simple_risks.risks)} simple risks")
     
-    # Step 3: 通过适配器转换为完整的风险评估
     risks = model_adapter.simple_to_full_risks(simple_risks)
     
     logger.info(f"Adapter converted to {len(risks.risks)} full risks")
     
-    # Step 4: 保持原有的风险评分逻辑
+    # 保持原有的风险评分逻辑
     project_task_risk_scores = [int(risk.score) for risk in risks.risks]
     project_risk_score = sum(project_task_risk_scores)
     
     logger.info(f"Assessed project risk. Current Score: {project_risk_score}")
     
-    # Step 5: 保持迭代状态的处理逻辑
+    # 保持迭代状态的处理逻辑
     iteration = state.get("iteration_number", 0) + 1
     new_risk_scores = state.get("project_risk_score_iterations", []) + [project_risk_score]
     new_risks_iteration = state.get("risks_iteration", []) + [risks]
@@ -54,4 +56,34 @@ def risk_assessment_node(state: AgentState) -> dict:
         "iteration_number": iteration,
         "project_risk_score_iterations": new_risk_scores,
         "risks_iteration": new_risks_iteration
-    } 
\ No newline at end of file
+    }
+
+def risk_assessment_node(state: AgentState) -> dict:
+    """
+    风险评估节点
+    
+    采用适配器模式（保持架构一致性）：
+    1. 将完整的任务分配和调度信息转换为简化格式传递给AI
+    2. AI 使用简化的 schema 生成风险评估
+    3. 适配器将简化的风险评估转换为完整格式
+    4. 保持迭代状态的处理逻辑
+    """
+    logger.info("Executing risk_assessment_node with adapter pattern...")
+    
+    prompt, cache_inputs = _prepare(state)
+    simple_risks: SimpleRiskList = node_cache.invoke(
+        "risk_assessor", cache_inputs, llm, SimpleRiskList, prompt
+    )
+    
+    return _to_state_update(state, simple_risks)
+
+async def arisk_assessment_node(state: AgentState) -> dict:
+    """风险评估节点的异步版本，使用 ainvoke 调用AI"""
+    logger.info("Executing arisk_assessment_node with adapter pattern...")
+    
+    prompt, cache_inputs = _prepare(state)
+    simple_risks: SimpleRiskList = await node_cache.ainvoke(
+        "risk_assessor", cache_inputs, llm, SimpleRiskList, prompt
+    )
+    
+    return _to_state_update(state, simple_risks)
@@ -1,18 +1,33 @@
 from app.agent.state import AgentState
-from app.services.llm_service import llm
+from app.services.node_models import node_models
+from app.services.llm_gateway import llm_gateway
 from app.prompts.loader import get_prompt
 from loguru import logger
 
-def insight_generation_node(state: AgentState) -> dict:
-    """LangGraph node that generate insights from the schedule, task allocation, and risk associated."""
-    logger.info("Executing insight_generation_node...")
-    prompt = get_prompt(
+llm = node_models.llm("insight_generator")
+
+def _build_prompt(state: AgentState) -> str:
+    return get_prompt(
         "insight_generator",
         task_allocations=state["task_allocations"],
         schedule=state["schedule"],
         risks=state["risks"]
     )
+
+def insight_generation_node(state: AgentState) -> dict:
+    """LangGraph node that generate insights from the schedule, task allocation, and risk associated."""
+    logger.info("Executing insight_generation_node...")
+    prompt = _build_prompt(state)
+    
+    insights = llm_gateway.invoke("insight_generator", llm, prompt).content
+    logger.info("Generated new insights for improvement.")
+    return {"insights": insights}
+
+async def ainsight_generation_node(state: AgentState) -> dict:
+    """Async variant of insight_generation_node using `ainvoke`."""
+    logger.info("Executing ainsight_generation_node...")
+    prompt = _build_prompt(state)
     
-    insights = llm.invoke(prompt).content
+    insights = (await llm_gateway.ainvoke("insight_generator", llm, prompt)).content
     logger.info("Generated new insights for improvement.")
-    return {"insights": insights} 
\ No newline at end of file
+    return {"insights": insights}
@@ -1,29 +1,31 @@
 from app.agent.state import AgentState
 from app.schemas.simple import SimpleSchedule
-from app.services.llm_service import llm
+from app.services.node_models import node_models
 from app.services.model_adapter import model_adapter
+from app.services.node_cache import node_cache
+from app.services.scheduler_engine import scheduler_engine, SCHEDULER_MODES
+from app.core.config import settings
 from app.prompts.loader import get_prompt
 from loguru import logger
 
-def task_scheduler_node(state: AgentState) -> dict:
-    """
-    任务调度节点
-    
-    采用适配器模式：
-    1. 将完整的任务和依赖关系转换为简化格式传递给AI
-    2. AI 使用简化的 schema 生成调度
-    3. 适配器将简化的调度转换为完整格式
-    4. 保持迭代状态的处理逻辑
-    """
-    logger.info("Executing task_scheduler_node with adapter pattern...")
-    
-    # Step 1: 将完整数据转换为简化格式，供AI使用
+llm = node_models.llm("task_scheduler")
+
+def _scheduler_mode(state: AgentState) -> str:
+    """每个请求可选择调度引擎：local（关键路径）、llm（AI）、hybrid（AI结果不合法时回退到本地）"""
+    mode = state.get("scheduler") or settings.DEFAULT_SCHEDULER
+    if mode not in SCHEDULER_MODES:
+        logger.warning(f"Unknown scheduler mode '{mode}', falling back to 'llm'")
+        return "llm"
+    return mode
+
+def _prepare(state: AgentState):
+    """将完整的任务和依赖关系转换为简化格式，返回调度prompt和缓存键输入"""
     simple_tasks = model_adapter.get_simple_task_list_for_prompt(state["tasks"])
+    reverse_mapping = model_adapter.create_reverse_id_mapping(state.get("id_mapping") or {})
     
     # 处理依赖关系：将UUID转换为简化ID
     simple_dependencies = []
     if state["dependencies"]:
-        reverse_mapping = model_adapter.create_reverse_id_mapping(state["id_mapping"])
         for dep in state["dependencies"].dependencies:
             source_simple_id = reverse_mapping.get(dep.source)
             target_simple_id = reverse_mapping.get(dep.target)
@@ -33,7 +35,6 @@ def task_scheduler_node(state: AgentState) -> dict:
                     "target": target_simple_id
                 })
     
-    # Step 2: AI 使用简化的数据生成调度
     prompt = get_prompt(
         "task_scheduler",
         tasks=simple_tasks,
@@ -41,19 +42,81 @@ def task_scheduler_node(state: AgentState) -> dict:
         insights=state.get("insights"), 
         schedule_iteration=state.get("schedule_iteration", [])
     )
-    
-    schedule_llm = llm.with_structured_output(SimpleSchedule)
-    simple_schedule: SimpleSchedule = schedule_llm.invoke(prompt)
-    
+    cache_inputs = {
+        "tasks": simple_tasks,
+        "dependencies": simple_dependencies,
+        "insights": state.get("insights"),
+        "schedule_iteration": [
+            model_adapter.get_simple_schedule_for_prompt(schedule, reverse_mapping)
+            for schedule in state.get("schedule_iteration", [])
+        ],
+    }
+    return prompt, cache_inputs
+
+def _to_state_update(state: AgentState, simple_schedule: SimpleSchedule) -> dict:
+    """通过适配器转换为完整调度；hybrid 模式下校验依赖，不合法时改用本地调度"""
     logger.info(f"AI generated schedule for {len(simple_schedule.schedule)} tasks")
     
-    # Step 3: 通过适配器转换为完整的调度（包含UUID）
     schedule = model_adapter.simple_to_full_schedule(simple_schedule, state["id_mapping"])
     
     logger.info(f"Adapter converted to schedule with {len(schedule.schedule)} tasks with UUIDs")
     
-    # Step 4: 保持迭代状态的处理逻辑
+    if _scheduler_mode(state) == "hybrid":
+        violations = scheduler_engine.find_violations(schedule, state["tasks"], state["dependencies"])
+        if violations:
+            logger.warning(f"AI schedule has {len(violations)} violations, using critical path schedule: {violations[:3]}")
+            return _local_state_update(state)
+    
+    return _append_iteration(state, schedule)
+
+def _local_state_update(state: AgentState) -> dict:
+    """使用本地关键路径引擎生成调度"""
+    result = scheduler_engine.schedule(state["tasks"], state["dependencies"])
+    update = _append_iteration(state, result.schedule)
+    update["critical_path"] = result.critical_path
+    return update
+
+def _append_iteration(state: AgentState, schedule) -> dict:
+    """保持迭代状态的处理逻辑"""
     new_schedule_iteration = state.get("schedule_iteration", []) + [schedule]
     
     logger.info("Generated a new task schedule.")
-    return {"schedule": schedule, "schedule_iteration": new_schedule_iteration} 
\ No newline at end of file
+    return {"schedule": schedule, "schedule_iteration": new_schedule_iteration}
+
+def task_scheduler_node(state: AgentState) -> dict:
+    """
+    任务调度节点
+    
+    采用适配器模式：
+    1. 将完整的任务和依赖关系转换为简化格式传递给AI
+    2. AI 使用简化的 schema 生成调度
+    3. 适配器将简化的调度转换为完整格式
+    4. 保持迭代状态的处理逻辑
+    
+    scheduler=local 时跳过AI，直接使用本地关键路径引擎
+    """
+    logger.info("Executing task_scheduler_node with adapter pattern...")
+    
+    if _scheduler_mode(state) == "local":
+        return _local_state_update(state)
+    
+    prompt, cache_inputs = _prepare(state)
+    simple_schedule: SimpleSchedule = node_cache.invoke(
+        "task_scheduler", cache_inputs, llm, SimpleSchedule, prompt
+    )
+    
+    return _to_state_update(state, simple_schedule)
+
+async def atask_scheduler_node(state: AgentState) -> dict:
+    """任务调度节点的异步版本，使用 ainvoke 调用AI"""
+    logger.info("Executing atask_scheduler_node with adapter pattern...")
+    
+    if _scheduler_mode(state) == "local":
+        return _local_state_update(state)
+    
+    prompt, cache_inputs = _prepare(state)
+    simple_schedule: SimpleSchedule = await node_cache.ainvoke(
+        "task_scheduler", cache_inputs, llm, SimpleSchedule, prompt
+    )
+    
+    return _to_state_update(state, simple_schedule)
@@ -21,6 +21,9 @@ class AgentState(TypedDict):
     project_risk_score_iterations: List[int]
     # 适配器模式新增字段
     id_mapping: Optional[Dict[str, uuid.UUID]]  # 简单ID到UUID的映射，支持适配器模式
+    scheduler: Optional[str]  # 调度引擎：local（关键路径）| llm | hybrid
+    critical_path: Optional[List[uuid.UUID]]  # 本地调度计算出的关键路径任务ID
+    allocator: Optional[str]  # 分配引擎：local（技能匹配）| llm | hybrid
     
     # === 新增：实时进度追踪字段 ===
     job_id: Optional[str]  # RQ任务ID，用于更新进度
@@ -29,4 +32,5 @@ class AgentState(TypedDict):
     total_start_time: Optional[float]  # 整个流程开始时间
     completed_nodes: List[str]  # 已完成的节点列表
     node_progress: Dict[str, dict]  # 每个节点的详细进度信息
+    llm_models: Dict[str, dict]  # 各节点实际使用的模型配置（模型、温度、最大输出token数、结构化输出方式）
     overall_status: str  # 整体状态：starting, processing, iterating, completed, failed 
\ No newline at end of file
@@ -1,13 +1,25 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request
-from fastapi.responses import JSONResponse
-from app.api.routers import plan, health
+from app.api.routers import plan, health, metrics
 from app.core.logging import setup_logging
+from app.core.serialization import ORJSONResponse
+from app.services.progress_hub import progress_hub
+from app.services.job_reader import async_redis
 from loguru import logger
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    # 关闭共享的进度订阅连接和异步 Redis 连接池
+    await progress_hub.close()
+    await async_redis.aclose()
+
 app = FastAPI(
     title="Project Manager Assistant API",
     description="API for an AI agent that assists in project management.",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
 )
 
 # --- Middleware for Global Exception Handling ---
@@ -22,7 +34,7 @@ async def log_exceptions_middleware(request: Request, call_next):
         return response
     except Exception as e:
         logger.exception(f"An unhandled exception occurred during request to {request.url.path}")
-        return JSONResponse(
+        return ORJSONResponse(
             status_code=500,
             content={"message": "Internal Server Error"},
         )
@@ -33,6 +45,7 @@ setup_logging()
 # Include routers
 app.include_router(health.router, tags=["Health"])
 app.include_router(plan.router, prefix="/v1", tags=["Project Plan"])
+app.include_router(metrics.router, prefix="/v1", tags=["Metrics"])
 
 @app.get("/", tags=["Root"])
 async def read_root():
@@ -0,0 +1,50 @@
+from fastapi import APIRouter
+
+from app.services.node_cache import node_cache
+from app.services.llm_cache import llm_cache
+from app.services.rate_limiter import llm_rate_limiter
+from app.services.call_policy import llm_call_policy
+from app.services.endpoint_pool import endpoint_pool
+
+router = APIRouter()
+
+@router.get("/metrics/cache")
+def get_cache_metrics():
+    """
+    Returns hit/miss counters and hit ratio of the node result cache and of the
+    exact-match LLM response cache (split into in-process L1 and Redis L2 hits), per node.
+    """
+    return {"node_cache": node_cache.stats(), "llm_cache": llm_cache.stats()}
+
+
+@router.get("/metrics/rate-limit")
+def get_rate_limit_metrics():
+    """
+    Returns per-node LLM call counts and the time spent queueing for the shared
+    rate limiter (number of throttled calls, average and maximum wait in ms).
+    """
+    return {
+        "limits": {
+            "requests_per_minute": llm_rate_limiter.requests_per_minute,
+            "tokens_per_minute": llm_rate_limiter.tokens_per_minute,
+        },
+        "nodes": llm_rate_limiter.stats(),
+    }
+
+
+@router.get("/metrics/llm-calls")
+def get_llm_call_metrics():
+    """
+    Returns per-node LLM call outcome counters of the retry/timeout/hedging policy
+    (success, retries, timeouts, errors, failures, hedged, hedge_wins).
+    """
+    return {"nodes": llm_call_policy.stats()}
+
+
+@router.get("/metrics/endpoints")
+def get_endpoint_metrics():
+    """
+    Returns per-endpoint LLM call counts, error rate, average and smoothed latency,
+    and the circuit-breaker state last reported by a worker (closed, open, half_open).
+    """
+    return {"endpoints": endpoint_pool.stats()}
@@ -1,16 +1,25 @@
-from fastapi import APIRouter, Form, UploadFile, File, HTTPException
+from fastapi import APIRouter, Form, UploadFile, File, HTTPException, Header, Query
 from fastapi.responses import StreamingResponse
 from io import StringIO
 import pandas as pd
-import json
 import asyncio
 import time
-from typing import AsyncGenerator
+from typing import AsyncGenerator, Optional
 
-from app.services.task_queue import task_queue
+from app.services.task_queue import task_queue, resume_job
+from app.services.job_reader import job_reader, async_redis
+from app.services.progress import stream_id_key
+from app.services.result_store import plan_result_store, is_result_reference
+from app.services.plan_results import ITERATION_RESOURCES, iteration_resource, paginate_tasks, parse_fields, project, result_payload_cache
+from app.services.progress_hub import progress_hub, RESYNC_EVENT
+from app.services.eta import api_eta_model, ESTIMATE_FIELDS
 from app.agent.graph import run_agent_with_job_tracking
-from app.schemas.responses import JobResponse
+from app.schemas.responses import JobResponse, BatchStatusRequest
 from app.schemas.team import TeamMember, Team
+from app.services.scheduler_engine import SCHEDULER_MODES
+from app.services.allocation_engine import ALLOCATOR_MODES
+from app.core.config import settings
+from app.core.serialization import ORJSONResponse, RawJSONResponse, dumps, sse_message
 
 router = APIRouter()
 
@@ -19,18 +28,55 @@ async def get_plan_status(job_id: str):
     """
     Returns the status of a plan generation job.
     """
-    job = task_queue.fetch_job(job_id)
+    job = await job_reader.fetch(job_id)
     
     if job is None:
         raise HTTPException(status_code=404, detail="Job not found")
     
-    # 获取详细状态信息
+    await api_eta_model.arefresh(async_redis)
+    agent_state = await job_reader.agent_state(job_id) if job.is_started else None
+    capacity = await job_reader.started_count() if job.is_queued else 0
+    return ORJSONResponse(_status_info(job, agent_state, capacity))
+
+@router.post("/plans/status:batch")
+async def get_plan_statuses(request: BatchStatusRequest):
+    """
+    Returns the status of many plan generation jobs in one response.
+    
+    Job hashes, queue positions and the progress fields needed for the ETA are
+    read with pipelined Redis commands, so the number of round trips does not
+    grow with the number of jobs. Unknown job ids are listed under `not_found`.
+    """
+    job_ids = list(dict.fromkeys(request.job_ids))
+    if len(job_ids) > settings.STATUS_BATCH_MAX_JOBS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {settings.STATUS_BATCH_MAX_JOBS} job ids can be requested at once"
+        )
+    
+    jobs = await job_reader.fetch_many(job_ids)
+    await api_eta_model.arefresh(async_redis)
+    started = [job_id for job_id, job in jobs.items() if job is not None and job.is_started]
+    agent_states = await job_reader.agent_states(started, ESTIMATE_FIELDS)
+    capacity = await job_reader.started_count() if any(job is not None and job.is_queued for job in jobs.values()) else 0
+    
+    return ORJSONResponse({
+        "jobs": {
+            job_id: _status_info(job, agent_states.get(job_id), capacity)
+            for job_id, job in jobs.items() if job is not None
+        },
+        "not_found": [job_id for job_id, job in jobs.items() if job is None],
+    })
+
+def _status_info(job, agent_state: Optional[dict], capacity: int) -> dict:
+    """
+    任务状态信息：基于各节点历史耗时估算进度和剩余时间
+    
+    agent_state 为任务的进度信息（执行中的任务），capacity 为正在执行的任务数（排队中的任务）。
+    """
     status_info = {
         "job_id": job.id,
-        "status": "queued" if job.is_queued else 
-                 "started" if job.is_started else
-                 "finished" if job.is_finished else
-                 "failed" if job.is_failed else "unknown",
+        "status": _job_status(job),
         "created_at": job.created_at.isoformat() if job.created_at else None,
         "started_at": job.started_at.isoformat() if job.started_at else None,
         "ended_at": job.ended_at.isoformat() if job.ended_at else None,
@@ -38,111 +84,208 @@ async def get_plan_status(job_id: str):
         "progress": 0
     }
     
-    # 如果任务已开始，计算基于时间的进度估算
     if job.is_started and job.started_at:
-        elapsed_time = (time.time() - job.started_at.timestamp())
-        # 假设总任务时间为35秒（基于EXECUTION_PHASES）
-        estimated_total_time = 35
-        progress = min(int((elapsed_time / estimated_total_time) * 100), 95)
-        status_info["progress"] = progress
+        elapsed_time = time.time() - job.started_at.timestamp()
         status_info["elapsed_time"] = int(elapsed_time)
-        status_info["estimated_remaining"] = max(0, estimated_total_time - elapsed_time)
+        if agent_state:
+            estimate = api_eta_model.estimate(agent_state, now=time.time())
+        else:
+            total = api_eta_model.job_seconds()
+            estimate = {
+                "progress": min(int(elapsed_time / total * 100), 95) if total else 0,
+                "eta_seconds": int(max(total - elapsed_time, 0)),
+                "estimated_total_seconds": int(total),
+            }
+        status_info.update(estimate)
+        status_info["estimated_remaining"] = estimate["eta_seconds"]
+    elif job.is_queued:
+        # 队列非空时所有执行槽都在忙，正在执行的任务数即并发容量
+        status_info["queue_wait_seconds"] = api_eta_model.queue_wait_seconds(status_info["position"], capacity)
+        status_info["eta_seconds"] = status_info["queue_wait_seconds"] + int(api_eta_model.job_seconds())
     elif job.is_finished:
         status_info["progress"] = 100
+        status_info["eta_seconds"] = 0
     
     return status_info
 
+def _job_status(job) -> str:
+    return ("queued" if job.is_queued else
+            "started" if job.is_started else
+            "finished" if job.is_finished else
+            "failed" if job.is_failed else "unknown")
+
+def _fallback_status(job) -> dict:
+    """worker 尚未写入任何进度时的简单状态"""
+    if job.is_started and job.started_at:
+        elapsed_time = time.time() - job.started_at.timestamp()
+        return {
+            "progress": min(int((elapsed_time / api_eta_model.job_seconds()) * 100), 95),
+            "elapsed_time": int(elapsed_time),
+            "current_node": "unknown",
+            "current_node_display": "正在处理...",
+            "node_details": "正在处理中...",
+            "langgraph_flow": False  # 标记为简单模式
+        }
+    if job.is_finished:
+        return {
+            "progress": 100,
+            "current_node": "completed",
+            "current_node_display": "🎉 处理完成",
+            "langgraph_flow": False
+        }
+    if job.is_failed:
+        return {
+            "error": str(job.exc_info) if hasattr(job, 'exc_info') else "Unknown error",
+            "current_node": "failed",
+            "current_node_display": "❌ 处理失败",
+            "langgraph_flow": False
+        }
+    return {
+        "progress": 0,
+        "current_node": "queued",
+        "current_node_display": "等待处理",
+        "langgraph_flow": False,
+        "position": job.get_position() if job.is_queued else None
+    }
+
+async def _apply_event(current_status: dict, event: dict, job) -> None:
+    """把一个进度事件合并到当前状态"""
+    if event["type"] == "terminal":
+        current_status["status"] = event["status"]
+        if event["status"] == "failed":
+            # 重新读取任务以获取失败信息
+            current_status.update(_fallback_status(await job_reader.fetch(job.id) or job))
+        else:
+            current_status.setdefault("progress", 100)
+    else:
+        current_status["status"] = "started"
+        current_status.update(event["data"])
+
 @router.get("/plans/{job_id}/stream")
-async def stream_plan_progress(job_id: str):
+async def stream_plan_progress(
+    job_id: str,
+    last_event_id: Optional[str] = Header(None, alias="Last-Event-ID"),
+    last_event_id_param: Optional[str] = Query(None, alias="last_event_id")
+):
     """
     SSE端点：实时推送任务进度更新
-    直接使用task_queue.py中计算的真实进度数据
+    
+    所有客户端共享 API 进程内的一个 Redis 订阅（progress_hub），之后只在 worker 发布进度事件时推送；
+    结束事件在 worker 保存结果之后才会发布。每条事件带有事件流ID（`id:`），
+    重连时通过 `Last-Event-ID` 请求头（或 `last_event_id` 查询参数）只补发错过的事件，
+    否则先发送一次当前快照。长时间没有事件时发送心跳注释，并重新检查一次任务状态作为兜底。
     """
-    async def event_generator() -> AsyncGenerator[str, None]:
+    resume_from = last_event_id or last_event_id_param
+    
+    async def event_generator() -> AsyncGenerator[bytes, None]:
         """生成SSE事件流 - 直接使用真实的LangGraph状态"""
-        last_status = None
         connection_start = time.time()
         
+        def stamp(status: dict) -> dict:
+            if status.get("status") == "started" and status.get("node_progress"):
+                # 按当前时间刷新进度和剩余时间（事件中的进度按当前节点完成一半计算）
+                status.update(api_eta_model.estimate(status, now=time.time()))
+            status["timestamp"] = time.time()
+            status["connection_duration"] = time.time() - connection_start
+            return status
+        
         try:
-            while True:
-                job = task_queue.fetch_job(job_id)
-                
-                if job is None:
-                    yield f"event: error\ndata: {json.dumps({'error': 'Job not found'})}\n\n"
-                    break
+            job = await job_reader.fetch(job_id)
+            if job is None:
+                yield sse_message("error", {'error': 'Job not found'})
+                return
+            await api_eta_model.arefresh(async_redis)
+            
+            # 先订阅再读取事件流，两者之间发布的事件也会进入队列（按流ID去重）
+            async with progress_hub.watch(job_id) as events:
+                current_status = {"job_id": job.id, "status": _job_status(job)}
+                history = await job_reader.events(job_id)
+                last_sent = None
                 
-                # === 直接使用task_queue.py中已计算的真实进度 ===
-                current_status = {
-                    "job_id": job.id,
-                    "status": "queued" if job.is_queued else 
-                             "started" if job.is_started else
-                             "finished" if job.is_finished else
-                             "failed" if job.is_failed else "unknown",
-                    "timestamp": time.time(),
-                    "connection_duration": time.time() - connection_start
-                }
-                
-                # 获取task_queue.py中计算的完整agent_state
-                if hasattr(job, 'meta') and job.meta and 'agent_state' in job.meta:
-                    # 直接使用已经计算好的真实状态数据
-                    agent_state = job.meta['agent_state']
-                    current_status.update(agent_state)
-                    
-                    # 确保langgraph_flow标记存在（前端用来判断显示模式）
-                    if 'langgraph_flow' not in current_status:
-                        current_status['langgraph_flow'] = True
+                replayable = (
+                    resume_from is not None and history
+                    and stream_id_key(history[0][0]) <= stream_id_key(resume_from)
+                )
+                if replayable:
+                    # 重放完整事件流重建状态，只发送客户端错过的事件
+                    for event_id, event in history:
+                        await _apply_event(current_status, event, job)
+                        if stream_id_key(event_id) > stream_id_key(resume_from):
+                            name = "complete" if event["type"] == "terminal" else "progress"
+                            yield sse_message(name, stamp(current_status), event_id)
+                            if name == "complete":
+                                return
+                    last_sent = history[-1][0]
+                    if current_status["status"] in ("finished", "failed"):
+                        yield sse_message("complete", stamp(current_status), last_sent)
+                        return
                 else:
-                    # 只有在完全无数据时才回退到简单模式
-                    if job.is_started and job.started_at:
-                        elapsed_time = time.time() - job.started_at.timestamp()
-                        current_status.update({
-                            "progress": min(int((elapsed_time / 35) * 100), 95),
-                            "elapsed_time": int(elapsed_time),
-                            "current_node": "unknown",
-                            "current_node_display": "正在处理...",
-                            "node_details": "正在处理中...",
-                            "langgraph_flow": False  # 标记为简单模式
-                        })
-                    elif job.is_finished:
-                        current_status.update({
-                            "progress": 100,
-                            "current_node": "completed",
-                            "current_node_display": "🎉 处理完成",
-                            "langgraph_flow": False
-                        })
-                    elif job.is_failed:
-                        current_status.update({
-                            "error": str(job.exc_info) if hasattr(job, 'exc_info') else "Unknown error",
-                            "current_node": "failed",
-                            "current_node_display": "❌ 处理失败",
-                            "langgraph_flow": False
-                        })
+                    # 首次连接（或事件已被裁剪）：发送当前快照
+                    agent_state = await job_reader.agent_state(job_id)
+                    if agent_state:
+                        current_status.update(agent_state)
                     else:
-                        current_status.update({
-                            "progress": 0,
-                            "current_node": "queued",
-                            "current_node_display": "等待处理",
-                            "langgraph_flow": False,
-                            "position": job.get_position() if job.is_queued else None
-                        })
-                
-                # 只在状态变化时发送更新
-                if current_status != last_status:
-                    yield f"event: progress\ndata: {json.dumps(current_status)}\n\n"
-                    last_status = current_status.copy()
-                
-                # 任务完成或失败时结束流
-                if job.is_finished or job.is_failed:
-                    yield f"event: complete\ndata: {json.dumps(current_status)}\n\n"
-                    break
+                        current_status.update(_fallback_status(job))
+                    terminal = next((event for _, event in history if event["type"] == "terminal"), None)
+                    if terminal is not None:
+                        await _apply_event(current_status, terminal, job)
+                    last_sent = history[-1][0] if history else None
+                    
+                    # 任务完成或失败时结束流
+                    if current_status["status"] in ("finished", "failed"):
+                        yield sse_message("complete", stamp(current_status), last_sent)
+                        return
+                    yield sse_message("progress", stamp(current_status), last_sent)
                 
-                # 每500ms检查一次状态
-                await asyncio.sleep(0.5)
+                while True:
+                    try:
+                        event = await asyncio.wait_for(events.get(), settings.SSE_KEEPALIVE_SECONDS)
+                    except asyncio.TimeoutError:
+                        await api_eta_model.arefresh(async_redis)
+                        job = await job_reader.fetch(job_id) or job
+                        if job.is_finished or job.is_failed:
+                            await _apply_event(current_status, {"type": "terminal", "status": _job_status(job)}, job)
+                            yield sse_message("complete", stamp(current_status))
+                            return
+                        yield b": keepalive\n\n"
+                        continue
+                    
+                    # 长连接中统计缓存会过期：估算前用异步连接刷新（未过期时不读取 Redis）
+                    await api_eta_model.arefresh(async_redis)
+                    if event["type"] == RESYNC_EVENT["type"]:
+                        # 分发队列溢出丢弃了增量事件：用进度快照重建状态，从事件流补齐之后的结束事件
+                        history = await job_reader.events(job_id)
+                        agent_state = await job_reader.agent_state(job_id)
+                        if agent_state:
+                            current_status["status"] = "started"
+                            current_status.update(agent_state)
+                        missed = [
+                            missed_event for event_id, missed_event in history
+                            if last_sent is None or stream_id_key(event_id) > stream_id_key(last_sent)
+                        ]
+                        last_sent = history[-1][0] if history else last_sent
+                        terminal = next((e for e in missed if e["type"] == "terminal"), None)
+                        if terminal is not None:
+                            await _apply_event(current_status, terminal, job)
+                            yield sse_message("complete", stamp(current_status), last_sent)
+                            return
+                        yield sse_message("progress", stamp(current_status), last_sent)
+                        continue
+                    
+                    if last_sent is not None and stream_id_key(event["id"]) <= stream_id_key(last_sent):
+                        continue
+                    last_sent = event["id"]
+                    
+                    await _apply_event(current_status, event, job)
+                    if event["type"] == "terminal":
+                        yield sse_message("complete", stamp(current_status), event["id"])
+                        return
+                    yield sse_message("progress", stamp(current_status), event["id"])
                 
         except asyncio.CancelledError:
-            yield f"event: disconnect\ndata: {json.dumps({'message': 'Connection closed'})}\n\n"
+            yield sse_message("disconnect", {'message': 'Connection closed'})
         except Exception as e:
-            yield f"event: error\ndata: {json.dumps({'error': f'Stream error: {str(e)}'})}\n\n"
+            yield sse_message("error", {'error': f'Stream error: {str(e)}'})
     
     return StreamingResponse(
         event_generator(),
@@ -151,7 +294,7 @@ async def stream_plan_progress(job_id: str):
             "Cache-Control": "no-cache",
             "Connection": "keep-alive",
             "Access-Control-Allow-Origin": "*",
-            "Access-Control-Allow-Headers": "Cache-Control",
+            "Access-Control-Allow-Headers": "Cache-Control, Last-Event-ID",
             "Access-Control-Allow-Methods": "GET"
         }
     )
@@ -160,11 +303,25 @@ async def stream_plan_progress(job_id: str):
 @router.post("/plans", response_model=JobResponse)
 async def create_plan(
     project_description: str = Form(...),
-    team_file: UploadFile = File(...)
+    team_file: UploadFile = File(...),
+    scheduler: str = Form(None),
+    allocator: str = Form(None)
 ):
     """
     Creates a new project plan based on the provided project description and team file.
+    
+    `scheduler` selects the scheduling engine: `local` (critical path, no LLM call),
+    `llm`, or `hybrid` (LLM schedule, replaced by the local one if it violates dependencies).
+    `allocator` selects the allocation engine: `local` (skill matching, no LLM call),
+    `llm`, or `hybrid` (local allocation, only ambiguous tasks are sent to the LLM).
     """
+    scheduler = scheduler or settings.DEFAULT_SCHEDULER
+    if scheduler not in SCHEDULER_MODES:
+        raise HTTPException(status_code=400, detail=f"scheduler must be one of: {list(SCHEDULER_MODES)}")
+    allocator = allocator or settings.DEFAULT_ALLOCATOR
+    if allocator not in ALLOCATOR_MODES:
+        raise HTTPException(status_code=400, detail=f"allocator must be one of: {list(ALLOCATOR_MODES)}")
+    
     try:
         # 读取并解析团队CSV文件
         content = await team_file.read()
@@ -205,11 +362,13 @@ async def create_plan(
             "task_allocations_iteration": [],
             "risks_iteration": [],
             "project_risk_score_iterations": [],
-            "id_mapping": {}
+            "id_mapping": {},
+            "scheduler": scheduler,
+            "allocator": allocator
         }
         
-        # 提交到队列
-        job = task_queue.enqueue(run_agent_with_job_tracking, initial_state)
+        # 提交到队列（RQ 的入队只有同步实现，放到线程中执行以免阻塞事件循环）
+        job = await asyncio.to_thread(task_queue.enqueue, run_agent_with_job_tracking, initial_state)
         
         return JobResponse(
             job_id=job.id,
@@ -219,12 +378,39 @@ async def create_plan(
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.get("/plans/{job_id}")
-async def get_plan(job_id: str):
+@router.post("/plans/{job_id}/resume", response_model=JobResponse)
+async def resume_plan(job_id: str):
     """
-    Returns the result of a completed plan generation job.
+    Re-queues a failed or orphaned plan job. The worker resumes it from the
+    last completed node using the job's LangGraph checkpoint.
     """
-    job = task_queue.fetch_job(job_id)
+    job = await job_reader.fetch(job_id)
+    
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    resumed = await asyncio.to_thread(resume_job, job_id)
+    if resumed is None:
+        raise HTTPException(
+            status_code=409,
+            detail=f"Job cannot be resumed. Current status: {job.get_status()}"
+        )
+    
+    return JobResponse(job_id=resumed.id, status="queued")
+
+async def _finished_result(job_id: str) -> dict:
+    """
+    读取已完成任务的结果，任务不存在、未完成或没有结果时抛出对应的HTTP错误
+    
+    优先读取结果存储中的计划文档（与任务状态并发读取），没有文档时（旧任务或未启用）
+    回退到 RQ 保存的返回值。
+    """
+    job, result = await asyncio.gather(
+        job_reader.fetch(job_id),
+        plan_result_store.aload(async_redis, job_id),
+    )
+    if result is not None:
+        return result
     
     if job is None:
         raise HTTPException(status_code=404, detail="Job not found")
@@ -235,7 +421,76 @@ async def get_plan(job_id: str):
             detail=f"Job is not completed yet. Current status: {'queued' if job.is_queued else 'started' if job.is_started else 'failed' if job.is_failed else 'unknown'}"
         )
     
-    if job.result is None:
+    job = await job_reader.fetch(job_id, with_result=True) or job
+    if job.result is None or is_result_reference(job.result):
         raise HTTPException(status_code=500, detail="Job completed but no result available")
     
-    return job.result 
\ No newline at end of file
+    return job.result
+
+@router.get("/plans/{job_id}")
+async def get_plan(job_id: str, fields: Optional[str] = Query(None)):
+    """
+    Returns the result of a completed plan generation job.
+    
+    `fields` is a comma-separated list of top-level result fields
+    (e.g. `tasks,insights,project_risk_score_iterations`); only those are
+    encoded and returned. Without it the full final agent state is returned.
+    """
+    try:
+        selected = parse_fields(fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    # 已完成计划的结果不再变化，编码后的响应字节缓存在进程内
+    key = ("plan", job_id, tuple(selected) if selected else None)
+    payload = result_payload_cache.get(key)
+    if payload is None:
+        payload = dumps(project(await _finished_result(job_id), selected))
+        result_payload_cache.set(key, payload)
+    return RawJSONResponse(payload)
+
+@router.get("/plans/{job_id}/iterations/{iteration}/{resource}")
+async def get_plan_iteration(job_id: str, iteration: int, resource: str):
+    """
+    Returns the schedule, allocations or risks of one optimization iteration.
+    
+    `resource` is `schedule`, `allocations` or `risks`; `iteration` is
+    zero-based and negative values count from the end (`-1` is the final plan).
+    """
+    if resource not in ITERATION_RESOURCES:
+        raise HTTPException(status_code=404, detail=f"resource must be one of: {list(ITERATION_RESOURCES)}")
+    
+    key = ("iteration", job_id, iteration, resource)
+    payload = result_payload_cache.get(key)
+    if payload is None:
+        result = await _finished_result(job_id)
+        try:
+            payload = dumps(iteration_resource(result, iteration, resource))
+        except IndexError as e:
+            raise HTTPException(status_code=404, detail=str(e))
+        result_payload_cache.set(key, payload)
+    return RawJSONResponse(payload)
+
+@router.get("/plans/{job_id}/tasks")
+async def get_plan_tasks(
+    job_id: str,
+    cursor: Optional[str] = Query(None),
+    limit: int = Query(50, ge=1, le=500)
+):
+    """
+    Returns the plan's tasks one page at a time.
+    
+    Pass the returned `next_cursor` as `cursor` to fetch the following page;
+    `next_cursor` is null on the last page.
+    """
+    key = ("tasks", job_id, cursor, limit)
+    payload = result_payload_cache.get(key)
+    if payload is None:
+        result = await _finished_result(job_id)
+        try:
+            tasks, next_cursor, total = paginate_tasks(result, cursor, limit)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        payload = dumps({"tasks": tasks, "next_cursor": next_cursor, "total": total})
+        result_payload_cache.set(key, payload)
+    return RawJSONResponse(payload)
@@ -1,3 +1,5 @@
+from typing import Any, Dict, List, Optional
+
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 class Settings(BaseSettings):
@@ -20,6 +22,102 @@ class Settings(BaseSettings):
     REDIS_HOST: str = "localhost"
     REDIS_PORT: int = 6379
 
+    # LangGraph 检查点（以 job_id 为 thread_id 保存在 Redis，用于失败任务续跑）
+    CHECKPOINT_ENABLED: bool = True
+    CHECKPOINT_TTL_SECONDS: int = 86400
+
+    # 计划结果文档（规范化 + 压缩后保存在 pma:result:{job_id}，RQ 返回值只保留引用）
+    RESULT_STORE_ENABLED: bool = True
+    RESULT_TTL_SECONDS: int = 604800
+    RESULT_COMPRESSION: str = "gzip"  # gzip | none
+    RESULT_COMPRESSION_LEVEL: int = 6
+
+    # 节点结果缓存（相同输入的节点直接复用AI结果）
+    NODE_CACHE_ENABLED: bool = True
+    NODE_CACHE_TTL_SECONDS: int = 86400
+    NODE_CACHE_MAX_ENTRIES: int = 10000
+
+    # LLM 响应缓存（模型+温度+规范化消息+schema 精确匹配；L1 进程内，L2 Redis）
+    LLM_CACHE_ENABLED: bool = True
+    LLM_CACHE_TTL_SECONDS: int = 86400
+    LLM_CACHE_MAX_ENTRIES: int = 10000
+    LLM_CACHE_L1_SIZE: int = 256
+    LLM_CACHE_L1_TTL_SECONDS: float = 300.0
+
+    # 相同LLM请求合并：进程内默认开启；跨 worker 合并通过 Redis 锁 + 响应缓存共享结果（需开启 LLM 缓存）
+    LLM_SINGLE_FLIGHT_ENABLED: bool = True
+    LLM_SINGLE_FLIGHT_DISTRIBUTED: bool = False
+    LLM_SINGLE_FLIGHT_LOCK_SECONDS: float = 120.0  # 锁的过期时间，也是其他 worker 等待结果的最长时间
+
+    # LLM 分布式限流（所有 worker 共享的令牌桶，按服务商账号限额配置）
+    LLM_RATE_LIMIT_ENABLED: bool = True
+    LLM_RATE_LIMIT_RPM: int = 500
+    LLM_RATE_LIMIT_TPM: int = 200000
+    LLM_RATE_LIMIT_OUTPUT_TOKENS: int = 1024  # 估算 token 时每次请求预留的输出 token 数
+
+    # LLM 调用策略：整体截止时间、单次请求超时（HTTP 传输层）、重试与退避、对冲请求（按历史耗时分位数触发，None 表示关闭；仅 async worker）
+    LLM_CALL_DEADLINE_SECONDS: float = 120.0
+    LLM_CALL_ATTEMPT_TIMEOUT_SECONDS: float = 60.0
+    LLM_CALL_MAX_RETRIES: int = 2
+    LLM_CALL_BACKOFF_SECONDS: float = 1.0
+    LLM_CALL_BACKOFF_MAX_SECONDS: float = 10.0
+    LLM_HEDGE_QUANTILE: Optional[float] = None
+    # 按节点覆盖上述策略，例如 {"risk_assessor": {"attempt_timeout": 20, "hedge_quantile": 90}}
+    LLM_NODE_POLICIES: Dict[str, Dict[str, Any]] = {}
+
+    # LLM 端点池：多个 OpenAI 兼容端点/部署，按加权最小延迟路由，连续失败的端点熔断一段时间
+    # 例如 [{"name": "east", "provider": "Azure", "base_url": "...", "api_key": "...", "model": "gpt-4o-mini", "weight": 2}]
+    # 为空时只使用 MODEL_PROVIDER 对应的单个端点
+    LLM_ENDPOINTS: List[Dict[str, Any]] = []
+    LLM_ENDPOINT_FAILURE_THRESHOLD: int = 5
+    LLM_ENDPOINT_COOLDOWN_SECONDS: float = 30.0
+    LLM_ENDPOINT_EWMA_ALPHA: float = 0.3  # 平滑延迟中最新一次请求的权重
+
+    # 按节点配置模型：model（Azure 为部署名称）、temperature、max_tokens、structured_output_method
+    # 例如 {"risk_assessor": {"model": "gpt-4o-mini", "max_tokens": 1500}, "task_generation": {"model": "gpt-4o"}}
+    LLM_NODE_MODELS: Dict[str, Dict[str, Any]] = {}
+    LLM_MAX_OUTPUT_TOKENS: Optional[int] = None  # 所有节点默认的最大输出 token 数，None 表示不限制
+
+    # LLM 录制/回放：off | record（每个任务写入 {LLM_CASSETTE_DIR}/{job_id}.jsonl.gz）| replay（从 LLM_CASSETTE_FILE 回放）
+    LLM_CASSETTE_MODE: str = "off"
+    LLM_CASSETTE_DIR: str = "cassettes"
+    LLM_CASSETTE_FILE: Optional[str] = None
+    LLM_CASSETTE_LATENCY: float = 1.0  # 回放时按原始耗时的倍数等待，0 表示不等待
+
+    # 默认调度引擎：local（本地关键路径）| llm | hybrid（AI调度不合法时回退到本地）
+    DEFAULT_SCHEDULER: str = "llm"
+
+    # 默认分配引擎：local（本地技能匹配）| llm | hybrid（仅把难以判断的任务交给AI）
+    DEFAULT_ALLOCATOR: str = "llm"
+    ALLOCATION_AMBIGUITY_MARGIN: float = 0.05
+
+    # 进度发布：节点内细节更新的防抖窗口（秒）和进度哈希的过期时间
+    PROGRESS_DEBOUNCE_SECONDS: float = 0.5
+    PROGRESS_TTL_SECONDS: int = 86400
+    PROGRESS_STREAM_MAXLEN: int = 1000  # 每个任务事件流保留的最大事件数（断线重连补发用）
+    # 进度/剩余时间估算：每个节点保留的历史耗时样本数，以及进程内统计缓存的刷新间隔
+    ETA_WINDOW_SIZE: int = 200
+    ETA_REFRESH_SECONDS: float = 30.0
+    SSE_KEEPALIVE_SECONDS: float = 15.0  # SSE 无事件时的心跳间隔，同时兜底检查一次任务状态
+    # API 进程的异步 Redis 连接池：连接数上限，以及连接用尽时等待空闲连接的最长时间（秒）
+    API_REDIS_MAX_CONNECTIONS: int = 100
+    API_REDIS_POOL_TIMEOUT_SECONDS: float = 5.0
+    STATUS_BATCH_MAX_JOBS: int = 5000  # POST /v1/plans/status:batch 单次最多查询的任务数
+    # 已完成计划的响应字节缓存（API 进程内）：缓存总字节数上限和条目过期时间（秒），上限为 0 时不缓存
+    RESULT_PAYLOAD_CACHE_MAX_BYTES: int = 67108864
+    RESULT_PAYLOAD_CACHE_TTL_SECONDS: float = 300.0
+
+    # LLM HTTP 连接池：每个提供方共享一个客户端，连接保持 keep-alive
+    LLM_MAX_CONNECTIONS: int = 100
+    LLM_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    LLM_KEEPALIVE_EXPIRY_SECONDS: float = 60.0
+    LLM_TIMEOUT_SECONDS: float = 120.0
+    LLM_PREWARM_CONNECTIONS: int = 4  # async worker 启动时预先建立的连接数（0 表示不预热）
+
+    # Worker
+    WORKER_MODE: str = "rq"  # rq: 每个进程一个任务; async: 单进程事件循环并发执行
+    WORKER_CONCURRENCY: int = 20  # async 模式下同时执行的最大任务数
+
 settings = Settings()
 
 def get_settings() -> Settings:
@@ -0,0 +1,51 @@
+"""
+JSON 序列化
+API 响应和 SSE 事件统一用 orjson 编码：直接输出 UTF-8 字节，UUID、datetime、date、枚举由 orjson
+原生处理，Pydantic 对象在 default 回调中 model_dump 后继续编码，不需要先经过 jsonable_encoder
+逐层转换。其余类型（set、Decimal 等）交给 jsonable_encoder 兜底。
+"""
+from typing import Any, Optional
+
+import orjson
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+JSON_OPTIONS = orjson.OPT_NON_STR_KEYS
+
+
+def _default(value: Any) -> Any:
+    """orjson 不支持的类型"""
+    if isinstance(value, BaseModel):
+        return value.model_dump()
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    return jsonable_encoder(value)
+
+
+def dumps(value: Any) -> bytes:
+    """编码为 JSON（UTF-8 字节）"""
+    return orjson.dumps(value, default=_default, option=JSON_OPTIONS)
+
+
+loads = orjson.loads
+
+
+class ORJSONResponse(JSONResponse):
+    """用 orjson 编码的 JSON 响应（API 的默认响应类）"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+class RawJSONResponse(JSONResponse):
+    """内容已经是编码好的 JSON 字节（例如缓存的结果），原样返回"""
+
+    def render(self, content: bytes) -> bytes:
+        return content
+
+
+def sse_message(event: str, data: Any, event_id: Optional[str] = None) -> bytes:
+    """格式化一条SSE消息，带流ID时客户端重连会通过 Last-Event-ID 回传"""
+    prefix = f"id: {event_id}\n" if event_id else ""
+    return f"{prefix}event: {event}\ndata: ".encode() + dumps(data) + b"\n\n"
@@ -1,9 +1,15 @@
 """
 API 响应模型定义
 """
-from pydantic import BaseModel
+from typing import List
+
+from pydantic import BaseModel, Field
 
 class JobResponse(BaseModel):
     """作业响应模型"""
     job_id: str
-    status: str 
\ No newline at end of file
+    status: str 
+
+class BatchStatusRequest(BaseModel):
+    """批量查询任务状态的请求"""
+    job_ids: List[str] = Field(min_length=1, description="Job ids to look up")
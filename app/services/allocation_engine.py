@@ -0,0 +1,218 @@
+"""
+本地任务分配引擎
+用 TF-IDF 对团队成员 profile 与任务描述做技能匹配打分，按调度时间贪心分配，
+并为每个成员维护有序的时间区间表，保证"每个团队成员一次只能处理一个任务"。
+直接生成 TaskAllocationList，不需要任何 LLM 调用；无法明确判断的任务标记为 ambiguous。
+"""
+import math
+import re
+import uuid
+from bisect import bisect_left
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import date
+from typing import Dict, List, Optional, Tuple
+
+from loguru import logger
+
+from app.core.config import settings
+from app.schemas.plan import Schedule, TaskAllocationList, TaskList
+from app.schemas.team import TaskAllocation, TeamMember
+
+ALLOCATOR_MODES = ("local", "llm", "hybrid")
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9][a-z0-9+#]*|[\u4e00-\u9fff]+")
+_STOP_WORDS = {"a", "an", "and", "the", "of", "to", "in", "for", "with", "on", "or", "is", "are"}
+
+
+def tokenize(text: str) -> List[str]:
+    """英文按单词切分；中文没有分词器，使用字符二元组（单字时保留单字）"""
+    tokens = []
+    for token in _TOKEN_PATTERN.findall((text or "").lower()):
+        if "\u4e00" <= token[0] <= "\u9fff":
+            if len(token) == 1:
+                tokens.append(token)
+            else:
+                tokens.extend(token[i:i + 2] for i in range(len(token) - 1))
+        elif token not in _STOP_WORDS:
+            tokens.append(token)
+    return tokens
+
+
+class _MemberCalendar:
+    """
+    单个成员已占用的时间区间（闭区间）
+
+    starts/ends 按开始日期有序且互不重叠，供二分查找；所有人都没空时强制分配的区间
+    与已有区间重叠，单独保存在 conflicts 中，逐个检查（数量很少）。
+    """
+
+    def __init__(self):
+        self.starts: List[int] = []
+        self.ends: List[int] = []
+        self.conflicts: List[Tuple[int, int]] = []
+        self.busy_days = 0
+
+    def is_free(self, start: int, end: int) -> bool:
+        i = bisect_left(self.starts, start)
+        if i > 0 and self.ends[i - 1] >= start:
+            return False
+        if i < len(self.starts) and self.starts[i] <= end:
+            return False
+        return all(end < busy_start or busy_end < start for busy_start, busy_end in self.conflicts)
+
+    def reserve(self, start: int, end: int) -> bool:
+        """占用区间，返回该区间原本是否空闲（False 表示与已有任务冲突）"""
+        free = self.is_free(start, end)
+        if free:
+            i = bisect_left(self.starts, start)
+            self.starts.insert(i, start)
+            self.ends.insert(i, end)
+        else:
+            self.conflicts.append((start, end))
+        self.busy_days += end - start + 1
+        return free
+
+
+@dataclass
+class AllocationResult:
+    """本地分配结果"""
+    allocations: TaskAllocationList
+    ambiguous: List[uuid.UUID] = field(default_factory=list)
+    # 所有成员在该时段都已被占用、只能重叠分配的任务
+    conflicts: List[uuid.UUID] = field(default_factory=list)
+    scores: Dict[uuid.UUID, Dict[str, float]] = field(default_factory=dict)
+
+
+class SkillAllocator:
+    """
+    技能感知的贪心分配器
+
+    - 按调度开始日期依次分配任务，未调度的任务放在最后且不占用时间区间
+    - 候选成员按技能得分排序，与最高分相差不超过 margin 的成员中选择工作量最少的空闲成员
+    - 以下情况标记为 ambiguous：没有任何技能匹配、最高分与次高分接近、所有匹配成员在该时段都已被占用
+    - preferred 可为指定任务预先指定成员（例如 LLM 的判断），该成员空闲时优先采用
+    """
+
+    def __init__(self, margin: float = 0.05):
+        self.margin = margin
+
+    @staticmethod
+    def _vectorize(counts: Counter, idf: Dict[str, float]) -> Dict[str, float]:
+        vector = {term: tf * idf[term] for term, tf in counts.items() if term in idf}
+        norm = math.sqrt(sum(v * v for v in vector.values()))
+        return {term: v / norm for term, v in vector.items()} if norm else {}
+
+    def score(self, tasks: TaskList, team: List[TeamMember]) -> Dict[uuid.UUID, Dict[str, float]]:
+        """计算每个任务与每个成员 profile 的 TF-IDF 余弦相似度"""
+        profile_counts = [Counter(tokenize(member.profile)) for member in team]
+        document_frequency = Counter(term for counts in profile_counts for term in counts)
+        total = len(team)
+        idf = {term: math.log((1 + total) / (1 + df)) + 1 for term, df in document_frequency.items()}
+        profile_vectors = [self._vectorize(counts, idf) for counts in profile_counts]
+
+        scores = {}
+        for task in tasks.tasks:
+            task_vector = self._vectorize(
+                Counter(tokenize(f"{task.task_name} {task.task_description}")), idf
+            )
+            scores[task.id] = {
+                member.name: sum(weight * profile_vector.get(term, 0.0) for term, weight in task_vector.items())
+                for member, profile_vector in zip(team, profile_vectors)
+            }
+        return scores
+
+    @staticmethod
+    def _windows(schedule: Optional[Schedule]) -> Dict[uuid.UUID, Tuple[int, int]]:
+        windows = {}
+        for item in (schedule.schedule if schedule else []):
+            try:
+                start = date.fromisoformat(item.start_date).toordinal()
+                end = date.fromisoformat(item.end_date).toordinal()
+            except ValueError:
+                logger.warning(f"Invalid dates for task {item.task_id}, allocating without time window")
+                continue
+            windows[item.task_id] = (start, max(start, end))
+        return windows
+
+    def allocate(
+        self,
+        tasks: TaskList,
+        schedule: Optional[Schedule],
+        team: List[TeamMember],
+        preferred: Optional[Dict[uuid.UUID, str]] = None,
+    ) -> AllocationResult:
+        """
+        为所有任务分配成员
+
+        Args:
+            tasks: 完整任务列表
+            schedule: 完整调度（用于确定每个任务占用的时间区间）
+            team: 团队成员列表
+            preferred: 任务ID到成员名称的预先指定（可选）
+        """
+        if not team:
+            return AllocationResult(allocations=TaskAllocationList(task_allocations=[]))
+
+        preferred = preferred or {}
+        members = {member.name: member for member in team}
+        scores = self.score(tasks, team)
+        windows = self._windows(schedule)
+        calendars = {member.name: _MemberCalendar() for member in team}
+
+        ordered = sorted(
+            tasks.tasks,
+            key=lambda task: (task.id not in windows, windows.get(task.id, (0, 0))[0]),
+        )
+
+        allocations = []
+        ambiguous = []
+        conflicts = []
+        for task in ordered:
+            window = windows.get(task.id)
+
+            def is_free(name: str) -> bool:
+                return window is None or calendars[name].is_free(*window)
+
+            chosen = preferred.get(task.id)
+            if chosen not in members or not is_free(chosen):
+                chosen, unclear = self._choose(scores[task.id], calendars, is_free)
+                if unclear:
+                    ambiguous.append(task.id)
+
+            if window is not None:
+                if not calendars[chosen].reserve(*window):
+                    conflicts.append(task.id)
+                    logger.warning(f"Local allocator double-booked {chosen} for task {task.task_name}: every member is busy on days {window}")
+            else:
+                calendars[chosen].busy_days += task.estimated_day or 0
+            allocations.append(TaskAllocation(task=task, team_member=members[chosen]))
+
+        logger.info(f"Local allocator assigned {len(allocations)} tasks, {len(ambiguous)} ambiguous, {len(conflicts)} conflicting")
+        return AllocationResult(
+            allocations=TaskAllocationList(task_allocations=allocations),
+            ambiguous=ambiguous,
+            conflicts=conflicts,
+            scores=scores,
+        )
+
+    def _choose(self, task_scores: Dict[str, float], calendars: Dict[str, _MemberCalendar], is_free) -> Tuple[str, bool]:
+        """返回 (成员名称, 是否难以判断)"""
+        ranked = sorted(task_scores.items(), key=lambda item: item[1], reverse=True)
+        best_score = ranked[0][1]
+        free = [(name, score) for name, score in ranked if is_free(name)]
+
+        if not free:
+            # 所有人在该时段都有任务：交给技能最匹配的人，由后续迭代/LLM处理冲突
+            return ranked[0][0], True
+
+        top_score = free[0][1]
+        contenders = [name for name, score in free if top_score - score <= self.margin]
+        chosen = min(contenders, key=lambda name: calendars[name].busy_days)
+
+        unclear = best_score <= 0 or top_score < best_score - self.margin or len(contenders) > 1
+        return chosen, unclear
+
+
+# 全局分配引擎实例
+allocation_engine = SkillAllocator(margin=settings.ALLOCATION_AMBIGUITY_MARGIN)
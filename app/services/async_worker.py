@@ -0,0 +1,243 @@
+"""
+异步事件循环 worker
+
+与默认的 fork 模式 RQ Worker 不同，AsyncWorker 在单个进程的同一个 asyncio
+事件循环中并发执行多个计划任务：任务仍从同一个 Redis 队列中获取，执行前后的记录
+（started/finished/failed、重试、成功/失败回调、依赖任务入队）都交给 RQ Worker 的
+公开方法处理，行为与 rq 模式一致，因此 API 与进度追踪无需任何改动。
+计划生成几乎全部时间都在等待 LLM 的网络响应，一个进程即可重叠大量请求。
+
+依赖 RQ 2.x 的 Execution（每次执行的记录），pyproject 中限定 rq>=2.0,<3。
+"""
+import asyncio
+import signal
+import sys
+import threading
+import traceback
+from typing import Dict, Optional, Set, Tuple
+
+from loguru import logger
+from rq import Queue, Retry, Worker
+from rq.exceptions import DequeueTimeout
+from rq.executions import Execution
+from rq.job import Job, JobStatus
+from rq.timeouts import JobTimeoutException, TimerDeathPenalty
+from rq.utils import import_attribute, now
+
+from app.core.config import settings
+from app.services.llm_service import llm_registry
+from app.services.progress import publish_terminal_event
+
+# 同步任务函数 -> 对应的异步实现
+ASYNC_JOB_HANDLERS: Dict[str, str] = {
+    "app.agent.graph.run_agent_with_job_tracking": "app.agent.graph.arun_agent_with_job_tracking",
+}
+
+
+class AsyncWorker(Worker):
+    """
+    在一个事件循环中多路复用多个任务的 RQ worker
+
+    - 通过信号量限制同时执行的任务数（concurrency）
+    - 已注册异步实现的任务（见 ASYNC_JOB_HANDLERS）直接在事件循环中 await
+    - 其他任务回退到线程中执行，保证队列中任何任务都能被处理
+    - RQ 的记录方法通过 worker.execution 读取当前执行，多个任务共享同一个 worker，
+      所以这些调用在 _bookkeeping 锁内串行执行，并在调用前换入对应任务的 Execution
+    - 成功/失败回调在线程中执行，用 TimerDeathPenalty 限时（信号只能在主线程使用）
+    """
+
+    death_penalty_class = TimerDeathPenalty
+
+    def __init__(self, queues, concurrency: int = 20, poll_timeout: int = 5, **kwargs):
+        super().__init__(queues, **kwargs)
+        self.concurrency = concurrency
+        self.poll_timeout = poll_timeout
+        self._running: Dict[str, Tuple[Job, Execution]] = {}
+        self._stop_requested = False
+        self._bookkeeping = threading.Lock()
+
+    def work_async(self) -> None:
+        """启动 worker 并阻塞直到收到停止信号且所有任务完成"""
+        asyncio.run(self._work_loop())
+
+    def request_stop_async(self, *args) -> None:
+        """停止获取新任务，等待正在执行的任务完成后退出"""
+        if not self._stop_requested:
+            logger.info(f"AsyncWorker {self.name}: warm shutdown requested, waiting for {len(self._running)} jobs")
+        self._stop_requested = True
+
+    async def _work_loop(self) -> None:
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, self.request_stop_async)
+            except (NotImplementedError, RuntimeError):
+                pass
+
+        self.register_birth()
+        logger.info(f"AsyncWorker {self.name} started with concurrency={self.concurrency}")
+
+        # 在事件循环中预先建立 LLM 连接，第一批任务无需等待 TLS 握手
+        if settings.LLM_PREWARM_CONNECTIONS > 0:
+            await llm_registry.awarm_up(min(settings.LLM_PREWARM_CONNECTIONS, self.concurrency))
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+        tasks: Set[asyncio.Task] = set()
+        heartbeat_task = asyncio.create_task(self._heartbeat_loop())
+
+        try:
+            while not self._stop_requested:
+                await semaphore.acquire()
+                dequeued = await asyncio.to_thread(self._dequeue)
+                if dequeued is None:
+                    semaphore.release()
+                    continue
+
+                job, queue = dequeued
+                task = asyncio.create_task(self._run_job(job, queue))
+                tasks.add(task)
+
+                def _on_done(t: asyncio.Task) -> None:
+                    tasks.discard(t)
+                    semaphore.release()
+
+                task.add_done_callback(_on_done)
+
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+        finally:
+            heartbeat_task.cancel()
+            self.register_death()
+            logger.info(f"AsyncWorker {self.name} stopped")
+
+    def _dequeue(self) -> Optional[Tuple[Job, Queue]]:
+        """阻塞式获取下一个任务（在线程中执行，带超时以便响应停止信号）"""
+        try:
+            return Queue.dequeue_any(
+                self.queues,
+                self.poll_timeout,
+                connection=self.connection,
+                job_class=self.job_class,
+                serializer=self.serializer,
+            )
+        except DequeueTimeout:
+            return None
+
+    async def _heartbeat_loop(self) -> None:
+        """定期续期 worker 与执行中任务的心跳，避免被当作孤儿任务清理"""
+        while True:
+            await asyncio.sleep(self.job_monitoring_interval)
+            try:
+                await asyncio.to_thread(self._send_heartbeats)
+            except Exception as e:
+                logger.warning(f"AsyncWorker heartbeat failed: {e}")
+
+    def _send_heartbeats(self) -> None:
+        with self.connection.pipeline() as pipeline:
+            self.heartbeat(self.job_monitoring_interval + 60, pipeline=pipeline)
+            for job, execution in list(self._running.values()):
+                ttl = self.job_monitoring_interval + 60
+                execution.heartbeat(job.started_job_registry, ttl, pipeline=pipeline)
+                job.heartbeat(now(), ttl, pipeline=pipeline, xx=True)
+            pipeline.execute()
+
+    def _prepare(self, job: Job, queue: Queue) -> Execution:
+        """创建执行记录并把任务移入 StartedJobRegistry（同 Worker.execute_job + perform_job 的准备步骤）"""
+        with self._bookkeeping:
+            execution = self.prepare_execution(job)
+            self.prepare_job_execution(job, remove_from_intermediate_queue=True)
+            self.execution = None
+        job.started_at = now()
+        return execution
+
+    def _handle_success(self, job: Job, queue: Queue, execution: Execution, return_value) -> None:
+        """与 Worker.perform_job 相同：返回 Retry 时重试，否则执行成功回调并保存结果"""
+        job.ended_at = now()
+        # 与 Worker.perform_job 相同，结果通过 job._result 交给 handle_job_success 保存
+        job._result = return_value
+        if isinstance(return_value, Retry):
+            with self._bookkeeping:
+                self.execution = execution
+                self.handle_job_retry(job, queue, return_value, queue.started_job_registry, execution)
+            return
+
+        job._status = JobStatus.FINISHED
+        job.execute_success_callback(self.death_penalty_class, return_value)
+        with self._bookkeeping:
+            self.execution = execution
+            self.handle_job_success(job, queue, queue.started_job_registry)
+        job.send_webhooks(JobStatus.FINISHED)
+        publish_terminal_event(self.connection, job.id, JobStatus.FINISHED.value)
+
+    def _handle_failure(self, job: Job, queue: Queue, execution: Optional[Execution], exc_info) -> None:
+        """
+        与 Worker.perform_job 相同：执行失败回调和异常处理器，再由 handle_job_failure
+        按 Retry 配置重新入队或标记失败并让依赖任务入队；确实失败时才发布结束事件
+        """
+        job.ended_at = now()
+        job._status = JobStatus.FAILED
+        exc_string = "".join(traceback.format_exception(*exc_info))
+        try:
+            job.execute_failure_callback(self.death_penalty_class, *exc_info)
+        except Exception:
+            exc_info = sys.exc_info()
+            exc_string = "".join(traceback.format_exception(*exc_info))
+
+        with self._bookkeeping:
+            self.execution = execution
+            self.handle_exception(job, *exc_info)
+            self.handle_job_failure(job, queue, started_job_registry=queue.started_job_registry, exc_string=exc_string)
+        if job.get_status(refresh=False) == JobStatus.FAILED:
+            publish_terminal_event(self.connection, job.id, JobStatus.FAILED.value)
+
+    async def _execute(self, job: Job):
+        handler_path = ASYNC_JOB_HANDLERS.get(job.func_name)
+        if handler_path:
+            handler = import_attribute(handler_path)
+            return await handler(*job.args, job_id=job.id, **job.kwargs)
+
+        # 没有异步实现的任务在线程中执行
+        return await asyncio.to_thread(job.func, *job.args, **job.kwargs)
+
+    async def _run_job(self, job: Job, queue: Queue) -> None:
+        try:
+            execution = await asyncio.to_thread(self._prepare, job, queue)
+        except Exception:
+            # 没能进入 StartedJobRegistry：直接按失败处理，避免任务停留在中间队列
+            logger.exception(f"AsyncWorker {self.name}: failed to start job {job.id}")
+            await self._fail(job, queue, None, sys.exc_info())
+            return
+
+        self._running[job.id] = (job, execution)
+        logger.info(f"AsyncWorker {self.name}: started job {job.id} ({len(self._running)} running)")
+
+        timeout = job.timeout or Queue.DEFAULT_TIMEOUT
+        try:
+            try:
+                if timeout > 0:
+                    return_value = await asyncio.wait_for(self._execute(job), timeout)
+                else:
+                    return_value = await self._execute(job)
+            except asyncio.TimeoutError:
+                # 与 fork 模式的 death penalty 抛出相同的异常
+                raise JobTimeoutException(f"Task exceeded maximum timeout value ({timeout} seconds)")
+        except Exception:
+            logger.error(f"AsyncWorker {self.name}: job {job.id} failed")
+            await self._fail(job, queue, execution, sys.exc_info())
+        else:
+            try:
+                await asyncio.to_thread(self._handle_success, job, queue, execution, return_value)
+                logger.info(f"AsyncWorker {self.name}: job {job.id} OK")
+            except Exception:
+                # 保存结果失败（例如 Redis 短暂不可用）时按失败处理，保证任务有结束状态
+                logger.exception(f"AsyncWorker {self.name}: failed to save the result of job {job.id}")
+                await self._fail(job, queue, execution, sys.exc_info())
+        finally:
+            self._running.pop(job.id, None)
+
+    async def _fail(self, job: Job, queue: Queue, execution: Optional[Execution], exc_info) -> None:
+        try:
+            await asyncio.to_thread(self._handle_failure, job, queue, execution, exc_info)
+        except Exception:
+            # 记录失败本身也失败时停止续期心跳，任务由 StartedJobRegistry 的清理移入失败列表
+            logger.exception(f"AsyncWorker {self.name}: failed to record the failure of job {job.id}")
@@ -0,0 +1,281 @@
+"""
+LLM 调用策略（超时、重试、对冲请求）
+图中每一次 LLM 调用都按所属节点的策略执行：
+
+- deadline：整个调用（含所有重试）的最长时间
+- attempt_timeout：单次请求的超时时间，超时视为可重试的错误
+- max_retries / backoff：可重试错误（超时、连接错误、429、5xx、结构化输出解析失败）按带抖动的指数退避重试
+- hedge_quantile：单次请求耗时超过该节点历史耗时的分位数后，再发出一个相同的请求，取先返回的结果
+
+同步调用在当前线程中执行，单次请求超时由调用方传给 HTTP 客户端（传输层超时），请求结束后才会重试，
+不会留下仍在进行中的请求；同步请求无法取消，因此只有异步调用（arun）发出对冲请求。
+
+各节点成功请求的耗时写入 Redis 滚动窗口（所有 worker 共享，用于计算对冲等待时间），
+调用结果按节点计数（成功、重试、超时、失败、对冲、对冲胜出）。
+"""
+import asyncio
+import random
+import time
+from collections import Counter
+from dataclasses import dataclass, fields
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import httpx
+import openai
+from langchain_core.exceptions import OutputParserException
+from loguru import logger
+from pydantic import ValidationError
+from redis import Redis
+
+from app.core.config import settings
+from app.services.eta import percentile
+from app.services.task_queue import redis_conn
+
+RETRYABLE_ERRORS = (
+    TimeoutError,
+    openai.APITimeoutError,
+    openai.APIConnectionError,
+    openai.RateLimitError,
+    openai.InternalServerError,
+    httpx.TransportError,
+    OutputParserException,
+    ValidationError,
+)
+
+# 计为超时的错误（其余可重试错误计为 errors）
+TIMEOUT_ERRORS = (TimeoutError, openai.APITimeoutError, httpx.TimeoutException)
+
+
+@dataclass(frozen=True)
+class CallPolicy:
+    """单个节点的调用策略"""
+    deadline: float = 120.0
+    attempt_timeout: float = 60.0
+    max_retries: int = 2
+    backoff: float = 1.0
+    backoff_max: float = 10.0
+    hedge_quantile: Optional[float] = None
+    hedge_min_samples: int = 20
+
+    def __post_init__(self):
+        if self.deadline <= 0 or self.attempt_timeout <= 0:
+            raise ValueError("deadline and attempt_timeout must be positive")
+        if self.max_retries < 0:
+            raise ValueError("max_retries must not be negative")
+        if self.hedge_quantile is not None and not 0 < self.hedge_quantile < 100:
+            raise ValueError("hedge_quantile must be between 0 and 100")
+
+    def backoff_seconds(self, attempt: int) -> float:
+        """第 attempt 次重试前的等待时间（full jitter）"""
+        return random.uniform(0, min(self.backoff_max, self.backoff * 2 ** attempt))
+
+
+def build_policies(default: Dict[str, Any], overrides: Dict[str, Dict[str, Any]]) -> Tuple[CallPolicy, Dict[str, CallPolicy]]:
+    """根据配置构建默认策略和各节点策略，未知字段或非法取值在启动时直接报错"""
+    known = {field.name for field in fields(CallPolicy)}
+    for node_name, override in overrides.items():
+        unknown = set(override) - known
+        if unknown:
+            raise ValueError(f"Unknown call policy fields for {node_name}: {sorted(unknown)}")
+    base = CallPolicy(**default)
+    return base, {node_name: CallPolicy(**{**default, **override}) for node_name, override in overrides.items()}
+
+
+class LLMCallPolicy:
+    """按节点策略执行 LLM 调用，并记录耗时和结果计数"""
+
+    def __init__(
+        self,
+        connection: Redis,
+        default: CallPolicy,
+        overrides: Optional[Dict[str, CallPolicy]] = None,
+        window: int = 200,
+        refresh_interval: float = 30.0,
+        prefix: str = "pma:llm_policy",
+    ):
+        self.connection = connection
+        self.default = default
+        self.overrides = overrides or {}
+        self.window = window
+        self.refresh_interval = refresh_interval
+        self.prefix = prefix
+        self.stats_key = f"{prefix}:stats"
+        self._latencies: Dict[str, Tuple[float, List[float]]] = {}
+
+    def policy(self, node_name: str) -> CallPolicy:
+        return self.overrides.get(node_name, self.default)
+
+    def _latency_key(self, node_name: str) -> str:
+        return f"{self.prefix}:latency:{node_name}"
+
+    def hedge_delay(self, node_name: str, policy: CallPolicy) -> Optional[float]:
+        """对冲请求的等待时间：历史耗时样本不足时不对冲"""
+        if policy.hedge_quantile is None:
+            return None
+        loaded_at, samples = self._latencies.get(node_name, (0.0, []))
+        if time.monotonic() - loaded_at >= self.refresh_interval:
+            try:
+                samples = [float(value) for value in self.connection.lrange(self._latency_key(node_name), 0, -1)]
+            except Exception as e:
+                logger.warning(f"Failed to load LLM latencies for {node_name}: {e}")
+            self._latencies[node_name] = (time.monotonic(), samples)
+        if len(samples) < policy.hedge_min_samples:
+            return None
+        return percentile(samples, policy.hedge_quantile)
+
+    def _record(self, node_name: str, outcomes: Counter, latency: Optional[float]) -> None:
+        try:
+            with self.connection.pipeline(transaction=False) as pipe:
+                for outcome, count in outcomes.items():
+                    pipe.hincrby(self.stats_key, f"{node_name}:{outcome}", count)
+                if latency is not None:
+                    pipe.lpush(self._latency_key(node_name), round(latency, 3))
+                    pipe.ltrim(self._latency_key(node_name), 0, self.window - 1)
+                pipe.execute()
+        except Exception as e:
+            logger.warning(f"Failed to record LLM call outcome for {node_name}: {e}")
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """按节点返回调用结果计数"""
+        raw = self.connection.hgetall(self.stats_key)
+        stats: Dict[str, Dict[str, int]] = {}
+        for field, count in raw.items():
+            field = field.decode() if isinstance(field, bytes) else field
+            node_name, _, outcome = field.rpartition(":")
+            stats.setdefault(node_name, {})[outcome] = int(count)
+        return stats
+
+    def run(self, node_name: str, call: Callable[[float], Any], prepare: Optional[Callable[[], Any]] = None) -> Any:
+        """
+        按策略执行同步调用（不发出对冲请求）
+
+        Args:
+            node_name: 节点名称（选择策略、统计）
+            call: 发出一次请求，参数为本次请求的超时时间（秒），调用方必须把它交给 HTTP 客户端
+            prepare: 每次请求前执行（例如获取限流令牌），不计入单次请求超时
+        """
+        policy = self.policy(node_name)
+        outcomes: Counter = Counter()
+        deadline_at = time.monotonic() + policy.deadline
+        for attempt in range(policy.max_retries + 1):
+            if prepare is not None:
+                prepare()
+            remaining = deadline_at - time.monotonic()
+            started = time.monotonic()
+            try:
+                if remaining <= 0:
+                    raise TimeoutError(f"LLM call for {node_name} exceeded deadline of {policy.deadline}s")
+                result = call(min(policy.attempt_timeout, remaining))
+            except RETRYABLE_ERRORS as e:
+                outcomes["timeouts" if isinstance(e, TIMEOUT_ERRORS) else "errors"] += 1
+                pause = policy.backoff_seconds(attempt)
+                if attempt == policy.max_retries or time.monotonic() + pause >= deadline_at:
+                    outcomes["failures"] += 1
+                    self._record(node_name, outcomes, None)
+                    raise
+                outcomes["retries"] += 1
+                logger.warning(f"🔁 LLM调用失败，{pause:.1f}s后重试({attempt + 1}/{policy.max_retries}): {node_name}: {e!r}")
+                time.sleep(pause)
+                continue
+            except Exception:
+                outcomes["failures"] += 1
+                self._record(node_name, outcomes, None)
+                raise
+            outcomes["success"] += 1
+            self._record(node_name, outcomes, time.monotonic() - started)
+            return result
+
+    async def arun(
+        self,
+        node_name: str,
+        call: Callable[[], Awaitable[Any]],
+        prepare: Optional[Callable[[], Awaitable[Any]]] = None,
+    ) -> Any:
+        """run 的异步版本，超时或对冲失败的请求会被取消"""
+        policy = self.policy(node_name)
+        outcomes: Counter = Counter()
+        deadline_at = time.monotonic() + policy.deadline
+        for attempt in range(policy.max_retries + 1):
+            if prepare is not None:
+                await prepare()
+            remaining = deadline_at - time.monotonic()
+            started = time.monotonic()
+            try:
+                if remaining <= 0:
+                    raise TimeoutError(f"LLM call for {node_name} exceeded deadline of {policy.deadline}s")
+                hedge_delay = await asyncio.to_thread(self.hedge_delay, node_name, policy)
+                result = await self._aattempt(call, min(policy.attempt_timeout, remaining), hedge_delay, outcomes, prepare)
+            except RETRYABLE_ERRORS as e:
+                outcomes["timeouts" if isinstance(e, TIMEOUT_ERRORS) else "errors"] += 1
+                pause = policy.backoff_seconds(attempt)
+                if attempt == policy.max_retries or time.monotonic() + pause >= deadline_at:
+                    outcomes["failures"] += 1
+                    await asyncio.to_thread(self._record, node_name, outcomes, None)
+                    raise
+                outcomes["retries"] += 1
+                logger.warning(f"🔁 LLM调用失败，{pause:.1f}s后重试({attempt + 1}/{policy.max_retries}): {node_name}: {e!r}")
+                await asyncio.sleep(pause)
+                continue
+            except Exception:
+                outcomes["failures"] += 1
+                await asyncio.to_thread(self._record, node_name, outcomes, None)
+                raise
+            outcomes["success"] += 1
+            await asyncio.to_thread(self._record, node_name, outcomes, time.monotonic() - started)
+            return result
+
+    async def _aattempt(self, call, timeout: float, hedge_delay: Optional[float], outcomes: Counter, prepare) -> Any:
+        async def hedged_call():
+            if prepare is not None:
+                await prepare()
+            return await call()
+
+        start = time.monotonic()
+        pending = {asyncio.ensure_future(call())}
+        hedge = None
+        try:
+            if hedge_delay is not None and hedge_delay < timeout:
+                done, _ = await asyncio.wait(pending, timeout=hedge_delay)
+                if not done:
+                    outcomes["hedged"] += 1
+                    hedge = asyncio.ensure_future(hedged_call())
+                    pending.add(hedge)
+
+            first_error = None
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, timeout=max(timeout - (time.monotonic() - start), 0), return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    break
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            outcomes["hedge_wins"] += 1
+                        return task.result()
+                    first_error = first_error or task.exception()
+            if first_error is not None:
+                raise first_error
+            raise TimeoutError(f"LLM request timed out after {timeout:.1f}s")
+        finally:
+            for task in pending:
+                task.cancel()
+
+
+def _load_policy() -> LLMCallPolicy:
+    default, overrides = build_policies(
+        {
+            "deadline": settings.LLM_CALL_DEADLINE_SECONDS,
+            "attempt_timeout": settings.LLM_CALL_ATTEMPT_TIMEOUT_SECONDS,
+            "max_retries": settings.LLM_CALL_MAX_RETRIES,
+            "backoff": settings.LLM_CALL_BACKOFF_SECONDS,
+            "backoff_max": settings.LLM_CALL_BACKOFF_MAX_SECONDS,
+            "hedge_quantile": settings.LLM_HEDGE_QUANTILE,
+        },
+        settings.LLM_NODE_POLICIES,
+    )
+    return LLMCallPolicy(redis_conn, default, overrides)
+
+
+# 全局LLM调用策略（配置错误时在导入阶段即启动失败）
+llm_call_policy = _load_policy()
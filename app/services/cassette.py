@@ -0,0 +1,189 @@
+"""
+LLM 录制/回放（cassette）
+录制模式下记录一个任务中每一次真正请求模型的 LLM 调用（节点、该节点的第几次调用、请求哈希、耗时、响应），
+任务结束时写入 {LLM_CASSETTE_DIR}/{job_id}.jsonl.gz；回放模式下从 LLM_CASSETTE_FILE 读取，
+按原始耗时 × LLM_CASSETTE_LATENCY 等待后返回录制的响应（0 表示不等待），不请求模型，
+用于离线、可重复地分析图执行、模型适配和任务队列本身的开销。
+
+回放时优先按请求哈希匹配，找不到时按节点内的调用顺序匹配（prompt 中包含时间等变化内容时也能回放）；
+该节点的录制条目都已用完时抛出 CassetteMissError，而不是悄悄请求真实模型。
+录制和回放时 llm_gateway 与节点缓存都不使用缓存，回放结果不会被缓存命中替代。
+任务通过 begin()/end() 绑定到当前上下文（contextvars），异步 worker 中并发的任务互不干扰。
+"""
+import asyncio
+import contextvars
+import gzip
+import json
+import os
+import threading
+import time
+import uuid
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+from loguru import logger
+
+from app.core.config import settings
+from app.services.llm_cache import LLMResponseCache
+
+CASSETTE_MODES = ("off", "record", "replay")
+CASSETTE_VERSION = 1
+
+
+class CassetteMissError(LookupError):
+    """回放模式下找不到对应的录制响应"""
+
+
+def _short_key(key: Optional[str]) -> Optional[str]:
+    # 请求哈希只保存摘要部分，去掉缓存键前缀
+    return key.rsplit(":", 1)[-1] if key else None
+
+
+class Tape:
+    """一个任务的录制内容（录制时追加，回放时按匹配规则取出）"""
+
+    def __init__(self, job_id: str, entries: Optional[List[Dict[str, Any]]] = None, replaying: bool = False):
+        self.job_id = job_id
+        self.entries: List[Dict[str, Any]] = entries or []
+        self.replaying = replaying
+        self._used = [False] * len(self.entries)
+        self._calls: Counter = Counter()
+        self._lock = threading.Lock()
+
+    def record(self, node: str, key: Optional[str], result: Any, schema: Any, latency: float) -> None:
+        response = LLMResponseCache.encode(result, schema)
+        if response is None:
+            return
+        with self._lock:
+            seq = self._calls[node]
+            self._calls[node] += 1
+            self.entries.append({
+                "node": node,
+                "seq": seq,
+                "key": _short_key(key),
+                "latency": round(latency, 4),
+                "response": response,
+            })
+
+    def take(self, node: str, key: Optional[str]) -> Dict[str, Any]:
+        """
+        取出与请求匹配的录制条目：先按请求哈希，再按节点内的调用序号，最后取该节点最早未使用的条目
+
+        该节点的录制条目都已用完时抛出 CassetteMissError
+        """
+        short = _short_key(key)
+        with self._lock:
+            seq = self._calls[node]
+            self._calls[node] += 1
+            candidates = [
+                index for index, entry in enumerate(self.entries)
+                if not self._used[index] and entry["node"] == node
+            ]
+            match = next((index for index in candidates if short and self.entries[index]["key"] == short), None)
+            if match is None:
+                match = next((index for index in candidates if self.entries[index]["seq"] == seq), None)
+            if match is None and candidates:
+                # 同一序号的条目已被按哈希匹配的其他调用取走时，取该节点最早未使用的条目
+                match = candidates[0]
+            if match is None:
+                raise CassetteMissError(f"No recorded LLM response for {node} call #{seq} in cassette {self.job_id}")
+            self._used[match] = True
+            return self.entries[match]
+
+    def dump(self, path: str) -> None:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        header = {"version": CASSETTE_VERSION, "job_id": self.job_id, "recorded_at": time.time(), "calls": len(self.entries)}
+        with gzip.open(path, "wt", encoding="utf-8") as f:
+            for line in [header, *self.entries]:
+                f.write(json.dumps(line, ensure_ascii=False, separators=(",", ":")) + "\n")
+
+    @classmethod
+    def load(cls, path: str) -> "Tape":
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            lines = [json.loads(line) for line in f if line.strip()]
+        if not lines or lines[0].get("version") != CASSETTE_VERSION:
+            raise ValueError(f"Unsupported cassette file: {path}")
+        return cls(lines[0]["job_id"], lines[1:], replaying=True)
+
+
+class LLMCassettes:
+    """
+    录制/回放开关
+
+    begin(job_id) 返回的 token 交给 end() 结束，录制模式下再用 save() 写入文件。
+    """
+
+    def __init__(self, mode: str = "off", directory: str = "cassettes", replay_file: Optional[str] = None, latency_scale: float = 1.0):
+        if mode not in CASSETTE_MODES:
+            raise ValueError(f"LLM_CASSETTE_MODE must be one of {CASSETTE_MODES}, got {mode}")
+        if mode == "replay" and not replay_file:
+            raise ValueError("LLM_CASSETTE_FILE is required when LLM_CASSETTE_MODE=replay")
+        if latency_scale < 0:
+            raise ValueError("LLM_CASSETTE_LATENCY must not be negative")
+        self.mode = mode
+        self.directory = directory
+        self.replay_file = replay_file
+        self.latency_scale = latency_scale
+        self._replay_tape: Optional[Tape] = None
+        self._current: contextvars.ContextVar[Optional[Tape]] = contextvars.ContextVar("llm_cassette", default=None)
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode != "off"
+
+    def current(self) -> Optional[Tape]:
+        return self._current.get()
+
+    def path_for(self, job_id: str) -> str:
+        return os.path.join(self.directory, f"{job_id}.jsonl.gz")
+
+    def begin(self, job_id: Optional[str]) -> Optional[contextvars.Token]:
+        if not self.enabled:
+            return None
+        job_id = job_id or f"local-{uuid.uuid4().hex[:8]}"
+        if self.mode == "replay":
+            if self._replay_tape is None:
+                self._replay_tape = Tape.load(self.replay_file)
+            # 每个任务从头回放同一份录制内容（条目只读共享，匹配状态各自独立）
+            tape = Tape(self._replay_tape.job_id, self._replay_tape.entries, replaying=True)
+        else:
+            tape = Tape(job_id)
+        logger.info(f"📼 LLM cassette {self.mode}: {self.replay_file if tape.replaying else self.path_for(job_id)}")
+        return self._current.set(tape)
+
+    def end(self, token: Optional[contextvars.Token]) -> Optional[Tape]:
+        """解除当前任务的绑定，返回录制内容（需在 begin() 所在的上下文中调用）"""
+        if token is None:
+            return None
+        tape = self._current.get()
+        self._current.reset(token)
+        return tape
+
+    def save(self, tape: Optional[Tape]) -> None:
+        """录制模式下把任务的录制内容写入文件"""
+        if tape is None or tape.replaying:
+            return
+        path = self.path_for(tape.job_id)
+        tape.dump(path)
+        logger.info(f"📼 已录制 {len(tape.entries)} 次LLM调用: {path}")
+
+    def replay(self, tape: Tape, node: str, key: Optional[str], schema: Any) -> Any:
+        entry = tape.take(node, key)
+        if self.latency_scale:
+            time.sleep(entry["latency"] * self.latency_scale)
+        return LLMResponseCache.decode(entry["response"], schema)
+
+    async def areplay(self, tape: Tape, node: str, key: Optional[str], schema: Any) -> Any:
+        entry = tape.take(node, key)
+        if self.latency_scale:
+            await asyncio.sleep(entry["latency"] * self.latency_scale)
+        return LLMResponseCache.decode(entry["response"], schema)
+
+
+# 全局LLM录制/回放
+llm_cassettes = LLMCassettes(
+    mode=settings.LLM_CASSETTE_MODE,
+    directory=settings.LLM_CASSETTE_DIR,
+    replay_file=settings.LLM_CASSETTE_FILE,
+    latency_scale=settings.LLM_CASSETTE_LATENCY,
+)
@@ -0,0 +1,327 @@
+"""
+基于 Redis 的 LangGraph 检查点存储
+
+以 RQ 任务ID作为 thread_id 保存每个节点执行后的图状态，
+worker 在节点之间崩溃或重启后，同一任务重新入队即可从最后完成的节点继续执行，
+不必从 task_generation 开始重新支付全部 LLM 调用。
+"""
+import asyncio
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+)
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+from redis import Redis
+
+# delete_thread 单条 DEL 命令最多包含的键数
+DELETE_BATCH_SIZE = 500
+
+# 状态中出现的业务模型，需显式允许反序列化
+_ALLOWED_MODULES = [
+    ("app.schemas.team", "Team"),
+    ("app.schemas.team", "TeamMember"),
+    ("app.schemas.team", "TaskAllocation"),
+    ("app.schemas.task", "Task"),
+    ("app.schemas.task", "Dependency"),
+    ("app.schemas.task", "TaskSchedule"),
+    ("app.schemas.task", "Risk"),
+    ("app.schemas.plan", "TaskList"),
+    ("app.schemas.plan", "DependencyList"),
+    ("app.schemas.plan", "Schedule"),
+    ("app.schemas.plan", "TaskAllocationList"),
+    ("app.schemas.plan", "RiskList"),
+]
+
+
+def _create_serde() -> JsonPlusSerializer:
+    try:
+        return JsonPlusSerializer(allowed_msgpack_modules=_ALLOWED_MODULES)
+    except TypeError:
+        # 旧版本 langgraph 不支持白名单参数
+        return JsonPlusSerializer()
+
+
+def _encode(typed: Tuple[str, bytes]) -> bytes:
+    type_, data = typed
+    return type_.encode() + b"|" + data
+
+
+def _decode(raw: bytes) -> Tuple[str, bytes]:
+    type_, _, data = raw.partition(b"|")
+    return type_.decode(), data
+
+
+class RedisCheckpointSaver(BaseCheckpointSaver):
+    """
+    LangGraph 检查点存储的 Redis 实现
+
+    键结构（均带 TTL，避免废弃任务的检查点永久占用内存）：
+    - {prefix}:{thread}:{ns}:ids            有序集合，按字典序保存 checkpoint_id
+    - {prefix}:{thread}:{ns}:cp:{id}        哈希，保存 checkpoint / metadata / parent
+    - {prefix}:{thread}:{ns}:blobs          哈希，field 为 "channel|version"
+    - {prefix}:{thread}:{ns}:writes:{id}    哈希，field 为 "task_id|idx"
+    - {prefix}:{thread}:namespaces          集合，记录 thread 下的所有 namespace
+
+    delete_thread 根据 namespaces 和 ids 推导出 thread 的全部键后直接删除。
+    """
+
+    def __init__(self, connection: Redis, ttl: int = 86400, prefix: str = "pma:checkpoint"):
+        super().__init__(serde=_create_serde())
+        self.connection = connection
+        self.ttl = ttl
+        self.prefix = prefix
+
+    # === 键 ===
+    def _ns_key(self, thread_id: str, checkpoint_ns: str) -> str:
+        return f"{self.prefix}:{thread_id}:{checkpoint_ns}"
+
+    def _namespaces_key(self, thread_id: str) -> str:
+        return f"{self.prefix}:{thread_id}:namespaces"
+
+    # === 读取 ===
+    def _load_tuple(self, thread_id: str, checkpoint_ns: str, checkpoint_id: str) -> Optional[CheckpointTuple]:
+        base = self._ns_key(thread_id, checkpoint_ns)
+        with self.connection.pipeline(transaction=False) as pipe:
+            pipe.hgetall(f"{base}:cp:{checkpoint_id}")
+            pipe.hgetall(f"{base}:writes:{checkpoint_id}")
+            saved, writes = pipe.execute()
+        if not saved:
+            return None
+
+        checkpoint: Checkpoint = self.serde.loads_typed(_decode(saved[b"checkpoint"]))
+        versions = checkpoint["channel_versions"]
+        channel_values: Dict[str, Any] = {}
+        if versions:
+            fields = [f"{channel}|{version}" for channel, version in versions.items()]
+            blobs = self.connection.hmget(f"{base}:blobs", fields)
+            for channel, blob in zip(versions.keys(), blobs):
+                if blob is None:
+                    continue
+                typed = _decode(blob)
+                if typed[0] != "empty":
+                    channel_values[channel] = self.serde.loads_typed(typed)
+
+        pending_writes = []
+        for field in sorted(writes, key=lambda f: tuple(f.decode().rsplit("|", 1))):
+            task_id, channel, value, _task_path = self.serde.loads_typed(_decode(writes[field]))
+            pending_writes.append((task_id, channel, value))
+
+        parent_id = saved.get(b"parent", b"").decode()
+        return CheckpointTuple(
+            config={
+                "configurable": {
+                    "thread_id": thread_id,
+                    "checkpoint_ns": checkpoint_ns,
+                    "checkpoint_id": checkpoint_id,
+                }
+            },
+            checkpoint={**checkpoint, "channel_values": channel_values},
+            metadata=self.serde.loads_typed(_decode(saved[b"metadata"])),
+            pending_writes=pending_writes,
+            parent_config=(
+                {
+                    "configurable": {
+                        "thread_id": thread_id,
+                        "checkpoint_ns": checkpoint_ns,
+                        "checkpoint_id": parent_id,
+                    }
+                }
+                if parent_id
+                else None
+            ),
+        )
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        thread_id: str = config["configurable"]["thread_id"]
+        checkpoint_ns: str = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = get_checkpoint_id(config)
+        if not checkpoint_id:
+            latest = self.connection.zrevrangebylex(
+                f"{self._ns_key(thread_id, checkpoint_ns)}:ids", "+", "-", start=0, num=1
+            )
+            if not latest:
+                return None
+            checkpoint_id = latest[0].decode()
+        return self._load_tuple(thread_id, checkpoint_ns, checkpoint_id)
+
+    def list(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[CheckpointTuple]:
+        if config is None:
+            # 全局遍历在本项目中没有使用场景，避免扫描整个 Redis
+            return
+        thread_id = config["configurable"]["thread_id"]
+        config_ns = config["configurable"].get("checkpoint_ns")
+        config_checkpoint_id = get_checkpoint_id(config)
+        before_id = get_checkpoint_id(before) if before else None
+
+        namespaces = (
+            [config_ns]
+            if config_ns is not None
+            else [ns.decode() for ns in self.connection.smembers(self._namespaces_key(thread_id))]
+        )
+        for checkpoint_ns in namespaces:
+            ids = self.connection.zrevrangebylex(f"{self._ns_key(thread_id, checkpoint_ns)}:ids", "+", "-")
+            for raw_id in ids:
+                checkpoint_id = raw_id.decode()
+                if config_checkpoint_id and checkpoint_id != config_checkpoint_id:
+                    continue
+                if before_id and checkpoint_id >= before_id:
+                    continue
+                checkpoint_tuple = self._load_tuple(thread_id, checkpoint_ns, checkpoint_id)
+                if checkpoint_tuple is None:
+                    continue
+                if filter and not all(
+                    checkpoint_tuple.metadata.get(k) == v for k, v in filter.items()
+                ):
+                    continue
+                if limit is not None:
+                    if limit <= 0:
+                        return
+                    limit -= 1
+                yield checkpoint_tuple
+
+    # === 写入 ===
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        base = self._ns_key(thread_id, checkpoint_ns)
+
+        c = checkpoint.copy()
+        values: Dict[str, Any] = c.pop("channel_values")
+        blobs = {
+            f"{k}|{v}": _encode(self.serde.dumps_typed(values[k]) if k in values else ("empty", b""))
+            for k, v in new_versions.items()
+        }
+
+        with self.connection.pipeline(transaction=False) as pipe:
+            if blobs:
+                pipe.hset(f"{base}:blobs", mapping=blobs)
+                pipe.expire(f"{base}:blobs", self.ttl)
+            pipe.hset(
+                f"{base}:cp:{checkpoint['id']}",
+                mapping={
+                    "checkpoint": _encode(self.serde.dumps_typed(c)),
+                    "metadata": _encode(self.serde.dumps_typed(get_checkpoint_metadata(config, metadata))),
+                    "parent": config["configurable"].get("checkpoint_id") or "",
+                },
+            )
+            pipe.expire(f"{base}:cp:{checkpoint['id']}", self.ttl)
+            pipe.zadd(f"{base}:ids", {checkpoint["id"]: 0})
+            pipe.expire(f"{base}:ids", self.ttl)
+            pipe.sadd(self._namespaces_key(thread_id), checkpoint_ns)
+            pipe.expire(self._namespaces_key(thread_id), self.ttl)
+            pipe.execute()
+
+        return {
+            "configurable": {
+                "thread_id": thread_id,
+                "checkpoint_ns": checkpoint_ns,
+                "checkpoint_id": checkpoint["id"],
+            }
+        }
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+        key = f"{self._ns_key(thread_id, checkpoint_ns)}:writes:{checkpoint_id}"
+
+        with self.connection.pipeline(transaction=False) as pipe:
+            for idx, (channel, value) in enumerate(writes):
+                write_idx = WRITES_IDX_MAP.get(channel, idx)
+                field = f"{task_id}|{write_idx}"
+                payload = _encode(self.serde.dumps_typed((task_id, channel, value, task_path)))
+                if write_idx >= 0:
+                    # 常规写入只记录一次，与内存实现保持一致
+                    pipe.hsetnx(key, field, payload)
+                else:
+                    pipe.hset(key, field, payload)
+            pipe.expire(key, self.ttl)
+            pipe.execute()
+
+    def _thread_keys(self, thread_id: str) -> List[str]:
+        """
+        thread 的全部键：由 namespaces 集合和各 namespace 的 ids 有序集合推导，
+        不需要 SCAN 整个键空间（写入记录总是对应一个已保存的 checkpoint_id）
+        """
+        namespaces_key = self._namespaces_key(thread_id)
+        namespaces = [ns.decode() for ns in self.connection.smembers(namespaces_key)]
+        with self.connection.pipeline(transaction=False) as pipe:
+            for checkpoint_ns in namespaces:
+                pipe.zrange(f"{self._ns_key(thread_id, checkpoint_ns)}:ids", 0, -1)
+            id_lists = pipe.execute()
+
+        keys = [namespaces_key]
+        for checkpoint_ns, ids in zip(namespaces, id_lists):
+            base = self._ns_key(thread_id, checkpoint_ns)
+            keys += [f"{base}:ids", f"{base}:blobs"]
+            for raw_id in ids:
+                checkpoint_id = raw_id.decode()
+                keys += [f"{base}:cp:{checkpoint_id}", f"{base}:writes:{checkpoint_id}"]
+        return keys
+
+    def delete_thread(self, thread_id: str) -> None:
+        keys = self._thread_keys(thread_id)
+        for start in range(0, len(keys), DELETE_BATCH_SIZE):
+            self.connection.delete(*keys[start:start + DELETE_BATCH_SIZE])
+
+    def has_pending_run(self, thread_id: str) -> bool:
+        """thread 是否存在可恢复的检查点"""
+        return bool(self.connection.exists(self._namespaces_key(thread_id)))
+
+    # === 异步接口：复用同步实现，放到线程中执行 ===
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(self, config, *, filter=None, before=None, limit=None):
+        items = await asyncio.to_thread(
+            lambda: list(self.list(config, filter=filter, before=before, limit=limit))
+        )
+        for item in items:
+            yield item
+
+    async def aput(self, config, checkpoint, metadata, new_versions) -> RunnableConfig:
+        return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(self, config, writes, task_id, task_path: str = "") -> None:
+        await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await asyncio.to_thread(self.delete_thread, thread_id)
+
+    def get_next_version(self, current: Optional[str], channel: None) -> str:
+        # 定长补零的字符串版本，保证字典序与数值序一致
+        if current is None:
+            current_v = 0
+        elif isinstance(current, int):
+            current_v = current
+        else:
+            current_v = int(current.split(".")[0])
+        return f"{current_v + 1:032}"
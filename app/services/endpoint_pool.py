@@ -0,0 +1,230 @@
+"""
+LLM 端点池
+可以配置多个 OpenAI 兼容端点（OpenAI、Azure 部署或其他兼容服务），每次请求按
+"加权最小延迟" 选择端点：得分 = 平滑延迟(EWMA) × (进行中的请求数 + 1) / 权重，得分最低者优先，
+尚无延迟数据的端点优先被探测，连续失败次数更少的端点优先。
+
+熔断：端点连续失败 failure_threshold 次后被剔除 cooldown 秒，之后进入半开状态，
+只放行一个探测请求，成功则恢复，失败则再次剔除。所有端点都被剔除时选择最早恢复的端点，
+请求不会因为没有可用端点而直接失败。熔断状态保存在各 worker 进程内；
+每个端点的调用次数、错误次数和延迟写入 Redis，供 API 汇总展示。
+"""
+import threading
+import time
+from dataclasses import dataclass, fields
+from typing import Any, Dict, List, Optional, Tuple
+
+from loguru import logger
+from redis import Redis
+
+from app.core.config import settings
+from app.services.task_queue import redis_conn
+
+PROVIDERS = ("OpenAI", "Azure")
+
+
+@dataclass(frozen=True)
+class Endpoint:
+    """一个 OpenAI 兼容端点"""
+    name: str
+    provider: str = "OpenAI"
+    base_url: str = ""
+    api_key: str = ""
+    api_version: Optional[str] = None  # 仅 Azure
+    model: Optional[str] = None  # 端点默认模型（Azure 为部署名称），为空时使用全局配置
+    weight: float = 1.0
+
+    def __post_init__(self):
+        if self.provider not in PROVIDERS:
+            raise ValueError(f"Unsupported model provider: {self.provider}")
+        if self.weight <= 0:
+            raise ValueError(f"Endpoint {self.name} weight must be positive")
+
+
+def legacy_endpoint(config, provider: str) -> Endpoint:
+    """根据 MODEL_PROVIDER 相关的单端点配置构建端点（端点名称即提供方名称）"""
+    if provider == 'Azure':
+        return Endpoint(
+            name="Azure",
+            provider="Azure",
+            base_url=config.AZURE_OPENAI_ENDPOINT,
+            api_key=config.AZURE_OPENAI_API_KEY,
+            api_version=config.OPENAI_API_VERSION,
+            model=config.AZURE_OPENAI_DEPLOYMENT_NAME,
+        )
+    if provider == 'OpenAI':
+        return Endpoint(name="OpenAI", base_url=config.OPENAI_API_BASE, api_key=config.OPENAI_API_KEY, model=config.OPENAI_MODEL)
+    raise ValueError(f"Unsupported model provider: {provider}")
+
+
+def configured_endpoints(config) -> List[Endpoint]:
+    """LLM_ENDPOINTS 中配置的端点；未配置时使用单端点配置"""
+    if not config.LLM_ENDPOINTS:
+        return [legacy_endpoint(config, config.MODEL_PROVIDER)]
+    known = {field.name for field in fields(Endpoint)}
+    endpoints = []
+    for index, options in enumerate(config.LLM_ENDPOINTS):
+        unknown = set(options) - known
+        if unknown:
+            raise ValueError(f"Unknown fields in LLM_ENDPOINTS[{index}]: {sorted(unknown)}")
+        endpoints.append(Endpoint(**{"name": f"endpoint-{index}", **options}))
+    names = [endpoint.name for endpoint in endpoints]
+    if len(set(names)) != len(names):
+        raise ValueError(f"Duplicate endpoint names in LLM_ENDPOINTS: {names}")
+    return endpoints
+
+
+class _EndpointState:
+    """单个端点在本进程内的路由状态"""
+
+    def __init__(self, endpoint: Endpoint):
+        self.endpoint = endpoint
+        self.latency: Optional[float] = None
+        self.in_flight = 0
+        self.consecutive_failures = 0
+        self.open_until = 0.0
+        self.probing = False
+
+    def circuit(self, now: float) -> str:
+        if self.open_until == 0.0:
+            return "closed"
+        return "open" if now < self.open_until else "half_open"
+
+    def available(self, now: float) -> bool:
+        circuit = self.circuit(now)
+        return circuit == "closed" or (circuit == "half_open" and not self.probing)
+
+    def score(self) -> Tuple[int, float]:
+        # 最近失败过的端点排在后面，重试会优先换到其他端点
+        return self.consecutive_failures, (self.latency or 0.0) * (self.in_flight + 1) / self.endpoint.weight
+
+
+class EndpointPool:
+    """加权最小延迟路由 + 熔断"""
+
+    def __init__(
+        self,
+        endpoints: List[Endpoint],
+        connection: Optional[Redis] = None,
+        failure_threshold: int = 5,
+        cooldown: float = 30.0,
+        alpha: float = 0.3,
+        prefix: str = "pma:llm_endpoints",
+    ):
+        if not endpoints:
+            raise ValueError("EndpointPool needs at least one endpoint")
+        self.connection = connection
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.alpha = alpha
+        self.stats_key = f"{prefix}:stats"
+        self._states: Dict[str, _EndpointState] = {endpoint.name: _EndpointState(endpoint) for endpoint in endpoints}
+        self._lock = threading.Lock()
+
+    @property
+    def endpoints(self) -> List[Endpoint]:
+        return [state.endpoint for state in self._states.values()]
+
+    def choose(self) -> str:
+        """选择一个端点并计入进行中的请求，调用方必须随后调用 record()"""
+        with self._lock:
+            now = time.monotonic()
+            candidates = [state for state in self._states.values() if state.available(now)]
+            probes = [state for state in candidates if state.circuit(now) == "half_open"]
+            if probes:
+                # 冷却结束后的下一个请求作为探测请求
+                state = probes[0]
+                state.probing = True
+            elif candidates:
+                state = min(candidates, key=lambda candidate: candidate.score())
+            else:
+                state = min(self._states.values(), key=lambda candidate: candidate.open_until)
+            state.in_flight += 1
+            return state.endpoint.name
+
+    def release(self, name: str) -> None:
+        """放弃一次已选择的请求（例如对冲中被取消的请求），不计入延迟和错误"""
+        with self._lock:
+            state = self._states[name]
+            state.in_flight = max(state.in_flight - 1, 0)
+            state.probing = False
+
+    def record(self, name: str, latency: float, ok: bool) -> None:
+        """记录一次请求结果，更新平滑延迟和熔断状态"""
+        with self._lock:
+            state = self._states[name]
+            state.in_flight = max(state.in_flight - 1, 0)
+            was_probing, state.probing = state.probing, False
+            if ok:
+                state.latency = latency if state.latency is None else self.alpha * latency + (1 - self.alpha) * state.latency
+                state.consecutive_failures = 0
+                state.open_until = 0.0
+            else:
+                state.consecutive_failures += 1
+                if was_probing or state.consecutive_failures >= self.failure_threshold:
+                    state.open_until = time.monotonic() + self.cooldown
+                    logger.warning(f"⛔ LLM端点熔断 {self.cooldown:.0f}s: {name} (连续失败 {state.consecutive_failures} 次)")
+            circuit = state.circuit(time.monotonic())
+            smoothed = state.latency
+
+        if self.connection is None:
+            return
+        try:
+            with self.connection.pipeline(transaction=False) as pipe:
+                pipe.hincrby(self.stats_key, f"{name}:calls", 1)
+                if ok:
+                    pipe.hincrby(self.stats_key, f"{name}:latency_ms", int(latency * 1000))
+                else:
+                    pipe.hincrby(self.stats_key, f"{name}:errors", 1)
+                pipe.hset(self.stats_key, mapping={
+                    f"{name}:circuit": circuit,
+                    f"{name}:ewma_ms": int((smoothed or 0) * 1000),
+                })
+                pipe.execute()
+        except Exception as e:
+            logger.warning(f"Failed to record LLM endpoint stats for {name}: {e}")
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """本进程内各端点的路由状态"""
+        now = time.monotonic()
+        with self._lock:
+            return {
+                name: {
+                    "circuit": state.circuit(now),
+                    "in_flight": state.in_flight,
+                    "ewma_ms": int((state.latency or 0) * 1000),
+                    "consecutive_failures": state.consecutive_failures,
+                }
+                for name, state in self._states.items()
+            }
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """各端点的调用次数、错误率、平均延迟（所有 worker 汇总）和最近一次上报的熔断状态"""
+        raw = self.connection.hgetall(self.stats_key) if self.connection is not None else {}
+        stats: Dict[str, Dict[str, Any]] = {
+            endpoint.name: {"calls": 0, "errors": 0, "latency_ms": 0, "ewma_ms": 0, "circuit": "closed"}
+            for endpoint in self.endpoints
+        }
+        for field, value in raw.items():
+            field = field.decode() if isinstance(field, bytes) else field
+            value = value.decode() if isinstance(value, bytes) else value
+            name, _, kind = field.rpartition(":")
+            stats.setdefault(name, {"calls": 0, "errors": 0, "latency_ms": 0, "ewma_ms": 0, "circuit": "closed"})
+            stats[name][kind] = value if kind == "circuit" else int(value)
+        for endpoint_stats in stats.values():
+            calls = endpoint_stats["calls"]
+            successes = calls - endpoint_stats["errors"]
+            latency_ms = endpoint_stats.pop("latency_ms")
+            endpoint_stats["error_rate"] = round(endpoint_stats["errors"] / calls, 4) if calls else 0.0
+            endpoint_stats["avg_latency_ms"] = round(latency_ms / successes, 1) if successes else 0.0
+        return stats
+
+
+# 全局LLM端点池
+endpoint_pool = EndpointPool(
+    configured_endpoints(settings),
+    connection=redis_conn,
+    failure_threshold=settings.LLM_ENDPOINT_FAILURE_THRESHOLD,
+    cooldown=settings.LLM_ENDPOINT_COOLDOWN_SECONDS,
+    alpha=settings.LLM_ENDPOINT_EWMA_ALPHA,
+)
@@ -0,0 +1,273 @@
+"""
+基于历史数据的进度与剩余时间估算服务
+worker 每完成一个节点，按 (节点名称, 任务数量分桶) 记录本次耗时到 Redis 列表（滚动窗口），
+每完成一个任务记录总耗时和迭代轮数。估算时取历史耗时的分位数作为每个节点的预期时长：
+
+- 进度按预期时长加权，而不是每个节点等权
+- 剩余时间 = 当前节点剩余时长 + 后续节点预期时长（含预期的优化迭代轮数）
+- 排队等待时间根据队列位置、并发容量和历史任务总耗时估算
+"""
+import math
+import time
+from bisect import bisect_left
+from typing import Any, Dict, List, Optional, Tuple
+
+from loguru import logger
+from redis import Redis
+
+from app.core.config import settings
+from app.services.task_queue import redis_conn
+
+# 第一轮执行的节点，以及每次优化迭代重新执行的节点（与 graph.py 中的边一致）
+FIRST_PASS = ["task_generation", "analyze_dependencies", "schedule_tasks", "allocate_team", "assess_risk"]
+LOOP_PASS = ["generate_insights", "schedule_tasks", "allocate_team", "assess_risk"]
+ALL_NODES = list(dict.fromkeys(FIRST_PASS + LOOP_PASS))
+
+# 任务数量分桶边界：<=10, <=25, <=50, <=100, >100
+TASK_COUNT_BOUNDARIES = (10, 25, 50, 100)
+
+# estimate() 用到的进度字段（批量查询状态时只从进度哈希中读取这些字段）
+ESTIMATE_FIELDS = (
+    "overall_status", "current_node", "node_progress", "iteration_number",
+    "max_iteration", "task_count", "total_elapsed_time",
+)
+
+# 没有历史数据时的默认值（与原先假设的约35秒总耗时一致）
+DEFAULT_NODE_SECONDS = 7.0
+
+
+def task_count_bucket(task_count: Optional[int]) -> str:
+    """任务数量分桶，未知数量返回 all"""
+    if task_count is None:
+        return "all"
+    index = bisect_left(TASK_COUNT_BOUNDARIES, task_count)
+    if index < len(TASK_COUNT_BOUNDARIES):
+        return f"le{TASK_COUNT_BOUNDARIES[index]}"
+    return f"gt{TASK_COUNT_BOUNDARIES[-1]}"
+
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    """最近秩法分位数，q 取 0-100"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(math.ceil(q / 100 * len(ordered)), 1)
+    return ordered[rank - 1]
+
+
+class EtaModel:
+    """
+    节点耗时统计与估算
+
+    统计数据按 refresh_interval 秒在进程内缓存，一次 pipeline 读取全部列表；
+    Redis 不可用时使用默认值，估算不会抛出异常。
+    sync_refresh=False 时估算从不读取 Redis，只使用 arefresh() 用异步连接刷新的统计（API 进程）。
+    """
+
+    def __init__(
+        self,
+        connection: Optional[Redis],
+        window: int = 200,
+        refresh_interval: float = 30.0,
+        quantile: float = 50.0,
+        prefix: str = "pma:eta",
+        sync_refresh: bool = True,
+    ):
+        self.connection = connection
+        self.sync_refresh = sync_refresh
+        self.window = window
+        self.refresh_interval = refresh_interval
+        self.quantile = quantile
+        self.prefix = prefix
+        self.jobs_key = f"{prefix}:jobs"
+        self.iterations_key = f"{prefix}:iterations"
+        self._stats: Dict[str, List[float]] = {}
+        self._loaded_at = 0.0
+
+    def _node_key(self, node_name: str, bucket: str) -> str:
+        return f"{self.prefix}:node:{node_name}:{bucket}"
+
+    def _buckets(self) -> List[str]:
+        return ["all"] + [task_count_bucket(boundary) for boundary in TASK_COUNT_BOUNDARIES] + [task_count_bucket(TASK_COUNT_BOUNDARIES[-1] + 1)]
+
+    def record(self, node_name: str, task_count: Optional[int], seconds: float) -> None:
+        """记录一次节点耗时（同时计入对应分桶和 all 分桶）"""
+        try:
+            pipe = self.connection.pipeline(transaction=False)
+            for bucket in {task_count_bucket(task_count), "all"}:
+                key = self._node_key(node_name, bucket)
+                pipe.lpush(key, round(seconds, 3))
+                pipe.ltrim(key, 0, self.window - 1)
+            pipe.execute()
+        except Exception as e:
+            logger.warning(f"Failed to record duration for node {node_name}: {e}")
+
+    def record_job(self, seconds: float, iterations: int) -> None:
+        """记录一次完整任务的总耗时和迭代轮数"""
+        try:
+            pipe = self.connection.pipeline(transaction=False)
+            pipe.lpush(self.jobs_key, round(seconds, 3))
+            pipe.ltrim(self.jobs_key, 0, self.window - 1)
+            pipe.lpush(self.iterations_key, iterations)
+            pipe.ltrim(self.iterations_key, 0, self.window - 1)
+            pipe.execute()
+        except Exception as e:
+            logger.warning(f"Failed to record job duration: {e}")
+
+    def _stale(self) -> bool:
+        return time.monotonic() - self._loaded_at >= self.refresh_interval
+
+    def _stat_keys(self) -> List[str]:
+        keys = [self._node_key(node, bucket) for node in ALL_NODES for bucket in self._buckets()]
+        return keys + [self.jobs_key, self.iterations_key]
+
+    def _load(self) -> Dict[str, List[float]]:
+        if not self.sync_refresh or not self._stale():
+            return self._stats
+        keys = self._stat_keys()
+        try:
+            pipe = self.connection.pipeline(transaction=False)
+            for key in keys:
+                pipe.lrange(key, 0, -1)
+            results = pipe.execute()
+            self._stats = {key: [float(value) for value in values] for key, values in zip(keys, results)}
+        except Exception as e:
+            logger.warning(f"Failed to load ETA statistics: {e}")
+        self._loaded_at = time.monotonic()
+        return self._stats
+
+    async def arefresh(self, connection) -> None:
+        """
+        用异步连接（redis.asyncio.Redis）刷新过期的统计缓存
+
+        API 进程在每次估算前调用（未过期时不读取 Redis），估算本身只使用进程内缓存的统计。
+        """
+        if not self._stale():
+            return
+        keys = self._stat_keys()
+        try:
+            pipe = connection.pipeline(transaction=False)
+            for key in keys:
+                pipe.lrange(key, 0, -1)
+            results = await pipe.execute()
+            self._stats = {key: [float(value) for value in values] for key, values in zip(keys, results)}
+        except Exception as e:
+            logger.warning(f"Failed to load ETA statistics: {e}")
+        self._loaded_at = time.monotonic()
+
+    def node_seconds(self, node_name: str, task_count: Optional[int] = None, quantile: Optional[float] = None) -> float:
+        """节点的预期耗时：优先使用同一任务数量分桶的分位数，没有数据时依次回退到 all 分桶和默认值"""
+        stats = self._load()
+        quantile = self.quantile if quantile is None else quantile
+        for bucket in (task_count_bucket(task_count), "all"):
+            value = percentile(stats.get(self._node_key(node_name, bucket), []), quantile)
+            if value is not None:
+                return value
+        return DEFAULT_NODE_SECONDS
+
+    def job_seconds(self) -> float:
+        """完整任务的预期总耗时"""
+        value = percentile(self._load().get(self.jobs_key, []), self.quantile)
+        if value is not None:
+            return value
+        return sum(self.node_seconds(node) for node in FIRST_PASS)
+
+    def expected_iterations(self) -> float:
+        iterations = self._load().get(self.iterations_key, [])
+        return sum(iterations) / len(iterations) if iterations else 1.0
+
+    def _position(self, info: Dict[str, Any]) -> Tuple[int, Optional[str]]:
+        """返回 (已完成的节点执行次数, 正在执行的节点)"""
+        node_progress = info.get("node_progress") or {}
+        iteration = info.get("iteration_number") or 0
+        current = info.get("current_node")
+        running = current if (node_progress.get(current) or {}).get("status") == "started" else None
+
+        if iteration == 0:
+            done = sum(1 for node in FIRST_PASS if (node_progress.get(node) or {}).get("status") == "completed")
+            return done, running
+
+        done = len(FIRST_PASS) + (iteration - 1) * len(LOOP_PASS)
+        loop_start = (node_progress.get("generate_insights") or {}).get("start_time")
+        assess_end = (node_progress.get("assess_risk") or {}).get("end_time") or 0
+        if loop_start and loop_start > assess_end:
+            # 当前处于一次优化迭代中
+            done += sum(
+                1 for node in LOOP_PASS
+                if (node_progress.get(node) or {}).get("status") == "completed"
+                and (node_progress.get(node) or {}).get("start_time", 0) >= loop_start
+            )
+        return done, running
+
+    def estimate(self, info: Dict[str, Any], now: Optional[float] = None) -> Dict[str, Any]:
+        """
+        根据进度信息估算加权进度和剩余时间
+
+        Args:
+            info: build_progress_info 生成的进度信息（需要 node_progress、iteration_number 等字段）
+            now: 当前时间戳；为空时当前节点按完成一半计算（结果只取决于状态，便于去重写入）
+
+        Returns:
+            {"progress": 百分比, "eta_seconds": 剩余秒数, "estimated_total_seconds": 预期总秒数}
+        """
+        if info.get("overall_status") == "completed":
+            elapsed = info.get("total_elapsed_time") or 0
+            return {"progress": 100, "eta_seconds": 0, "estimated_total_seconds": elapsed}
+
+        task_count = info.get("task_count")
+        max_iteration = max(info.get("max_iteration") or 1, 1)
+        extra_loops = min(max(round(self.expected_iterations()) - 1, 0), max_iteration - 1)
+
+        done_count, running = self._position(info)
+        runs = FIRST_PASS + LOOP_PASS * extra_loops
+        while len(runs) < done_count + (1 if running else 0):
+            runs += LOOP_PASS
+
+        durations = [self.node_seconds(node, task_count) for node in runs]
+        done_seconds = sum(durations[:done_count])
+        remaining = sum(durations[done_count:])
+
+        if running:
+            expected = durations[done_count]
+            start_time = (info.get("node_progress") or {}).get(running, {}).get("start_time")
+            if now is not None and start_time:
+                partial = min(max(now - start_time, 0), expected * 0.95)
+            else:
+                partial = expected * 0.5
+            done_seconds += partial
+            remaining -= partial
+
+        total = done_seconds + remaining
+        progress = int(done_seconds / total * 100) if total > 0 else 0
+        return {
+            "progress": min(progress, 99),
+            "eta_seconds": int(math.ceil(max(remaining, 0))),
+            "estimated_total_seconds": int(math.ceil(total)),
+        }
+
+    def queue_wait_seconds(self, position: Optional[int], capacity: int) -> int:
+        """
+        排队等待时间估算
+
+        队列中前面有 position 个任务，capacity 个执行槽都在忙；
+        正在执行的任务平均已完成一半，因此第一批按半个任务耗时计算。
+        """
+        position = position or 0
+        capacity = max(capacity, 1)
+        return int(math.ceil((position // capacity + 0.5) * self.job_seconds()))
+
+
+# 全局估算模型实例
+eta_model = EtaModel(
+    redis_conn,
+    window=settings.ETA_WINDOW_SIZE,
+    refresh_interval=settings.ETA_REFRESH_SECONDS,
+)
+
+# API 进程的估算实例：没有同步连接，统计只由 arefresh() 刷新，事件循环中的估算不会阻塞读取 Redis
+api_eta_model = EtaModel(
+    None,
+    window=settings.ETA_WINDOW_SIZE,
+    refresh_interval=settings.ETA_REFRESH_SECONDS,
+    sync_refresh=False,
+)
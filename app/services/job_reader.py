@@ -0,0 +1,217 @@
+"""
+API 进程的异步任务读取
+FastAPI 处理函数运行在事件循环上，同步的 redis_conn / task_queue.fetch_job 每次往返都会阻塞整个循环
+（SSE 长连接中尤其明显）。这里用 redis.asyncio 的阻塞式连接池（连接数达到 API_REDIS_MAX_CONNECTIONS
+时等待空闲连接，而不是报错）直接读取 RQ 的任务哈希 rq:job:{id} 和结果流 rq:results:{id}，
+只取 API 需要的字段（不读取序列化的函数参数），一次 pipeline 往返得到任务状态：
+
+- 排队中的任务再用 LPOS 查询队列位置
+- 失败的任务（或需要结果时）读取最新一条执行结果，得到返回值 / 异常信息
+
+键名、时间格式和结果解码沿用 RQ 自身的定义，与 worker 写入的数据保持一致。
+"""
+import json
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from loguru import logger
+from redis.asyncio import BlockingConnectionPool, Redis
+from rq import Queue
+from rq.job import Job, JobStatus
+from rq.registry import StartedJobRegistry
+from rq.results import Result
+from rq.utils import str_to_date
+
+from app.core.config import settings
+from app.services.progress import aread_events, aread_progress, progress_key
+
+# 任务哈希中 API 用到的字段
+JOB_FIELDS = ("status", "origin", "created_at", "started_at", "ended_at")
+
+
+def _text(value) -> Optional[str]:
+    return value.decode() if isinstance(value, bytes) else value
+
+
+def _date(value) -> Optional[datetime]:
+    return str_to_date(value) if value else None
+
+
+@dataclass
+class JobView:
+    """
+    RQ 任务的只读快照
+
+    提供路由中用到的 Job 属性（is_queued、started_at、get_position()、result 等），
+    可以直接替代 Job 对象；状态变化后需要重新 fetch，而不是 refresh()。
+    """
+    id: str
+    status: str
+    origin: Optional[str] = None
+    created_at: Optional[datetime] = None
+    started_at: Optional[datetime] = None
+    ended_at: Optional[datetime] = None
+    position: Optional[int] = None
+    latest_result: Optional[Result] = None
+
+    @property
+    def is_queued(self) -> bool:
+        return self.status == JobStatus.QUEUED
+
+    @property
+    def is_started(self) -> bool:
+        return self.status == JobStatus.STARTED
+
+    @property
+    def is_finished(self) -> bool:
+        return self.status == JobStatus.FINISHED
+
+    @property
+    def is_failed(self) -> bool:
+        return self.status == JobStatus.FAILED
+
+    def get_position(self) -> Optional[int]:
+        return self.position
+
+    def get_status(self) -> str:
+        return self.status
+
+    @property
+    def result(self) -> Any:
+        """最新一次成功执行的返回值（fetch 时需 with_result=True）"""
+        if self.latest_result is not None and self.latest_result.type == Result.Type.SUCCESSFUL:
+            return self.latest_result.return_value
+        return None
+
+    @property
+    def exc_info(self) -> Optional[str]:
+        if self.latest_result is not None and self.latest_result.type == Result.Type.FAILED:
+            return self.latest_result.exc_string
+        return None
+
+
+class AsyncJobReader:
+    """通过异步 Redis 连接读取 RQ 任务状态、进度哈希和事件流"""
+
+    def __init__(self, connection: Redis, queue_name: str = "default"):
+        self.connection = connection
+        self.queue_name = queue_name
+
+    async def fetch(self, job_id: str, with_result: bool = False) -> Optional[JobView]:
+        """
+        读取任务快照，任务不存在时返回None
+
+        with_result=True 时在同一次往返中读取最新执行结果（返回值可能很大，只在需要结果时读取）。
+        """
+        pipe = self.connection.pipeline(transaction=False)
+        pipe.hmget(Job.key_for(job_id), JOB_FIELDS)
+        if with_result:
+            pipe.xrevrange(Result.get_key(job_id), "+", "-", count=1)
+        replies = await pipe.execute()
+
+        job = self._view(job_id, replies[0])
+        if job is None:
+            return None
+
+        entries = replies[1] if with_result else None
+        if job.is_failed and not with_result:
+            entries = await self.connection.xrevrange(Result.get_key(job_id), "+", "-", count=1)
+        if entries:
+            result_id, payload = entries[0]
+            job.latest_result = Result.restore(job_id, _text(result_id), payload, connection=None)
+
+        if job.is_queued and job.origin:
+            job.position = await self.connection.lpos(self._queue_key(job.origin), job_id)
+        return job
+
+    async def fetch_many(self, job_ids: List[str]) -> Dict[str, Optional[JobView]]:
+        """
+        批量读取任务快照（不含执行结果），不存在的任务对应None
+
+        所有任务哈希在一次 pipeline 中读取，排队中任务的队列位置在第二次 pipeline 中读取，
+        往返次数与任务数量无关。
+        """
+        if not job_ids:
+            return {}
+        pipe = self.connection.pipeline(transaction=False)
+        for job_id in job_ids:
+            pipe.hmget(Job.key_for(job_id), JOB_FIELDS)
+        jobs = {job_id: self._view(job_id, values) for job_id, values in zip(job_ids, await pipe.execute())}
+
+        queued = [job for job in jobs.values() if job is not None and job.is_queued and job.origin]
+        if queued:
+            pipe = self.connection.pipeline(transaction=False)
+            for job in queued:
+                pipe.lpos(self._queue_key(job.origin), job.id)
+            for job, position in zip(queued, await pipe.execute()):
+                job.position = position
+        return jobs
+
+    @staticmethod
+    def _view(job_id: str, values) -> Optional[JobView]:
+        fields = dict(zip(JOB_FIELDS, values))
+        if fields["status"] is None and fields["created_at"] is None:
+            return None
+        return JobView(
+            id=job_id,
+            status=_text(fields["status"]) or JobStatus.CREATED.value,
+            origin=_text(fields["origin"]),
+            created_at=_date(fields["created_at"]),
+            started_at=_date(fields["started_at"]),
+            ended_at=_date(fields["ended_at"]),
+        )
+
+    @staticmethod
+    def _queue_key(origin: str) -> str:
+        return f"{Queue.redis_queue_namespace_prefix}{origin}"
+
+    async def started_count(self) -> int:
+        """正在执行的任务数（StartedJobRegistry 的大小，不做过期清理）"""
+        return await self.connection.zcard(StartedJobRegistry.key_template.format(self.queue_name))
+
+    async def agent_state(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """get_job_agent_state 的异步版本：读取任务的进度哈希"""
+        try:
+            return await aread_progress(self.connection, job_id)
+        except Exception as e:
+            logger.warning(f"Failed to get job agent state: {e}")
+            return None
+
+    async def agent_states(self, job_ids: List[str], fields: Tuple[str, ...]) -> Dict[str, Optional[Dict[str, Any]]]:
+        """
+        在一次 pipeline 中读取多个任务进度哈希的指定字段
+
+        只返回存在的字段；进度哈希不存在（或读取失败）的任务对应None。
+        """
+        if not job_ids:
+            return {}
+        try:
+            pipe = self.connection.pipeline(transaction=False)
+            for job_id in job_ids:
+                pipe.hmget(progress_key(job_id), fields)
+            replies = await pipe.execute()
+        except Exception as e:
+            logger.warning(f"Failed to get job agent states: {e}")
+            return {job_id: None for job_id in job_ids}
+        states = {}
+        for job_id, values in zip(job_ids, replies):
+            state = {field: json.loads(value) for field, value in zip(fields, values) if value is not None}
+            states[job_id] = state or None
+        return states
+
+    async def events(self, job_id: str) -> List[Tuple[str, Dict[str, Any]]]:
+        """读取任务事件流中保留的全部事件"""
+        return await aread_events(self.connection, job_id)
+
+
+# API 进程共享的异步 Redis 连接池（应用关闭时由 lifespan 关闭）
+async_redis = Redis.from_pool(BlockingConnectionPool(
+    host=settings.REDIS_HOST,
+    port=settings.REDIS_PORT,
+    max_connections=settings.API_REDIS_MAX_CONNECTIONS,
+    timeout=settings.API_REDIS_POOL_TIMEOUT_SECONDS,
+))
+
+# 全局异步任务读取
+job_reader = AsyncJobReader(async_redis)
@@ -0,0 +1,275 @@
+"""
+LLM 响应缓存服务（精确匹配）
+以 模型 + 温度 + 规范化后的消息 + 输出 schema 计算内容哈希，缓存 LLM 的原始响应：
+
+- L1：进程内 LRU（带 TTL），命中时不产生任何网络请求
+- L2：Redis，每个条目带 TTL，有序集合按最近访问时间淘汰超过 max_entries 的条目
+- 按节点统计 L1/L2 命中和未命中次数；L1 命中的计数在进程内累积，随下一次 Redis 访问一起写入
+
+与 node_cache 的区别：node_cache 以节点的语义输入为键，本缓存以最终发送给模型的消息为键，
+覆盖所有 LLM 调用（包括任务生成和洞察生成这类非结构化输出的调用）。
+"""
+import hashlib
+import json
+import threading
+import time
+from collections import Counter, OrderedDict
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+
+from langchain_core.messages import AIMessage, BaseMessage
+from loguru import logger
+from pydantic import BaseModel
+from redis import Redis
+
+from app.core.config import settings
+from app.services.task_queue import redis_conn
+
+# L1 命中计数最长累积时间（秒），超过后即使没有 Redis 访问也写入一次
+STATS_FLUSH_INTERVAL = 10.0
+
+
+def _normalize_text(text: str) -> str:
+    """统一换行符，去掉首尾空白和行尾空白"""
+    lines = text.replace("\r\n", "\n").strip().split("\n")
+    return "\n".join(line.rstrip() for line in lines)
+
+
+def normalize_messages(prompt: Any) -> List[Dict[str, str]]:
+    """把字符串、消息列表或 PromptValue 转换为 [{"role", "content"}]"""
+    if hasattr(prompt, "to_messages"):
+        prompt = prompt.to_messages()
+    if isinstance(prompt, str):
+        return [{"role": "human", "content": _normalize_text(prompt)}]
+    messages = []
+    for message in prompt:
+        if isinstance(message, BaseMessage):
+            content = message.content if isinstance(message.content, str) else json.dumps(message.content, sort_keys=True)
+            messages.append({"role": message.type, "content": _normalize_text(content)})
+        else:
+            role, content = message
+            messages.append({"role": role, "content": _normalize_text(content)})
+    return messages
+
+
+@lru_cache(maxsize=None)
+def _schema_fingerprint(schema: Any) -> Optional[str]:
+    """schema 名称 + JSON Schema 摘要，schema 字段变化时缓存自动失效；非 pydantic 模型返回 None"""
+    if schema is None:
+        return ""
+    if not (isinstance(schema, type) and issubclass(schema, BaseModel)):
+        return None
+    body = json.dumps(schema.model_json_schema(), sort_keys=True)
+    return f"{schema.__name__}:{hashlib.sha256(body.encode('utf-8')).hexdigest()[:16]}"
+
+
+class _LocalLRU:
+    """线程安全的进程内 LRU，条目在 ttl 秒后过期"""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: str) -> None:
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class LLMResponseCache:
+    """两级精确匹配 LLM 响应缓存"""
+
+    def __init__(
+        self,
+        connection: Redis,
+        ttl: int,
+        max_entries: int,
+        l1_size: int = 256,
+        l1_ttl: float = 300.0,
+        enabled: bool = True,
+        prefix: str = "pma:llm_cache",
+    ):
+        self.connection = connection
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.enabled = enabled
+        self.prefix = prefix
+        self.index_key = f"{prefix}:index"
+        self.stats_key = f"{prefix}:stats"
+        self.local = _LocalLRU(l1_size, l1_ttl)
+        self._pending_stats: Counter = Counter()
+        self._stats_lock = threading.Lock()
+        self._last_flush = time.monotonic()
+
+    def request_key(self, llm: Any, prompt: Any, schema: Any = None) -> Optional[str]:
+        """
+        请求的内容哈希（不受缓存开关影响，也用于合并相同的请求）
+
+        无法确定模型名称或 schema 时（例如测试中的 mock）返回 None，表示不使用缓存
+        """
+        model = getattr(llm, "model_name", None) or getattr(llm, "deployment_name", None)
+        temperature = getattr(llm, "temperature", None)
+        if not isinstance(model, str) or not (temperature is None or isinstance(temperature, (int, float))):
+            return None
+        fingerprint = _schema_fingerprint(schema)
+        if fingerprint is None:
+            return None
+
+        request = {
+            "model": model,
+            "temperature": temperature,
+            "schema": fingerprint,
+            "messages": normalize_messages(prompt),
+        }
+        # 限制了输出长度的请求结果可能被截断，单独缓存（未设置时键保持不变）
+        max_tokens = getattr(llm, "max_tokens", None)
+        if isinstance(max_tokens, int):
+            request["max_tokens"] = max_tokens
+        payload = json.dumps(request, sort_keys=True, ensure_ascii=False)
+        return f"{self.prefix}:{hashlib.sha256(payload.encode('utf-8')).hexdigest()}"
+
+    @staticmethod
+    def encode(result: Any, schema: Any = None) -> Optional[str]:
+        if schema is not None:
+            return result.model_dump_json() if result is not None else None
+        return json.dumps({"content": result.content}, ensure_ascii=False)
+
+    @staticmethod
+    def decode(raw: str, schema: Any = None) -> Any:
+        if schema is not None:
+            return schema.model_validate_json(raw)
+        return AIMessage(content=json.loads(raw)["content"])
+
+    def _take_pending_stats(self) -> Counter:
+        with self._stats_lock:
+            pending, self._pending_stats = self._pending_stats, Counter()
+            self._last_flush = time.monotonic()
+            return pending
+
+    def _count_local_hit(self, node_name: str) -> None:
+        with self._stats_lock:
+            self._pending_stats[f"{node_name}:l1_hits"] += 1
+            due = time.monotonic() - self._last_flush >= STATS_FLUSH_INTERVAL
+        if due:
+            self.flush_stats()
+
+    def flush_stats(self) -> None:
+        """把进程内累积的 L1 命中计数写入 Redis"""
+        pending = self._take_pending_stats()
+        if not pending:
+            return
+        try:
+            with self.connection.pipeline(transaction=False) as pipe:
+                for field, count in pending.items():
+                    pipe.hincrby(self.stats_key, field, count)
+                pipe.execute()
+        except Exception as e:
+            logger.warning(f"LLM cache unavailable, dropping stats: {e}")
+
+    def get(self, node_name: str, key: str, schema: Any = None) -> Any:
+        """查找缓存，未命中时返回 None"""
+        raw = self.local.get(key)
+        if raw is not None:
+            self._count_local_hit(node_name)
+            logger.info(f"⚡ LLM缓存命中(L1): {node_name}")
+            return self.decode(raw, schema)
+
+        try:
+            raw = self.connection.get(key)
+            pending = self._take_pending_stats()
+            with self.connection.pipeline(transaction=False) as pipe:
+                if raw is not None:
+                    pipe.zadd(self.index_key, {key: time.time()})
+                pipe.hincrby(self.stats_key, f"{node_name}:{'l2_hits' if raw is not None else 'misses'}", 1)
+                for field, count in pending.items():
+                    pipe.hincrby(self.stats_key, field, count)
+                pipe.execute()
+        except Exception as e:
+            logger.warning(f"LLM cache unavailable, skipping lookup: {e}")
+            return None
+
+        if raw is None:
+            return None
+        raw = raw.decode("utf-8") if isinstance(raw, bytes) else raw
+        self.local.set(key, raw)
+        logger.info(f"⚡ LLM缓存命中(L2): {node_name}")
+        return self.decode(raw, schema)
+
+    def peek(self, key: str, schema: Any = None) -> Any:
+        """只读取 Redis 中的条目，不更新访问时间和统计（等待其他 worker 的结果时轮询使用）"""
+        try:
+            raw = self.connection.get(key)
+        except Exception:
+            return None
+        return self.decode(raw.decode("utf-8") if isinstance(raw, bytes) else raw, schema) if raw is not None else None
+
+    def set(self, key: str, result: Any, schema: Any = None) -> None:
+        raw = self.encode(result, schema)
+        if raw is None:
+            return
+        self.local.set(key, raw)
+        try:
+            with self.connection.pipeline(transaction=False) as pipe:
+                pipe.set(key, raw, ex=self.ttl)
+                pipe.zadd(self.index_key, {key: time.time()})
+                pipe.zcard(self.index_key)
+                size = pipe.execute()[-1]
+
+            # 超出容量时淘汰最久未访问的条目
+            overflow = size - self.max_entries
+            if overflow > 0:
+                evicted = [member for member, _ in self.connection.zpopmin(self.index_key, overflow)]
+                if evicted:
+                    self.connection.delete(*evicted)
+        except Exception as e:
+            logger.warning(f"LLM cache unavailable, skipping store: {e}")
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """按节点返回 L1/L2 命中、未命中次数和命中率"""
+        raw = self.connection.hgetall(self.stats_key)
+        stats: Dict[str, Dict[str, Any]] = {}
+        for field, count in raw.items():
+            field = field.decode() if isinstance(field, bytes) else field
+            node_name, _, kind = field.rpartition(":")
+            stats.setdefault(node_name, {"l1_hits": 0, "l2_hits": 0, "misses": 0})[kind] = int(count)
+        for node_stats in stats.values():
+            hits = node_stats["l1_hits"] + node_stats["l2_hits"]
+            total = hits + node_stats["misses"]
+            node_stats["hit_ratio"] = round(hits / total, 4) if total else 0.0
+        return stats
+
+
+# 全局LLM响应缓存实例
+llm_cache = LLMResponseCache(
+    redis_conn,
+    ttl=settings.LLM_CACHE_TTL_SECONDS,
+    max_entries=settings.LLM_CACHE_MAX_ENTRIES,
+    l1_size=settings.LLM_CACHE_L1_SIZE,
+    l1_ttl=settings.LLM_CACHE_L1_TTL_SECONDS,
+    enabled=settings.LLM_CACHE_ENABLED,
+)
@@ -0,0 +1,268 @@
+"""
+LLM 调用网关
+图中所有节点的 LLM 调用都经过这里（结构化输出和普通文本输出），
+在真正请求模型之前依次经过各项调用策略：
+
+1. 精确匹配响应缓存（llm_cache，L1 进程内 + L2 Redis）；节点缓存已负责的调用传入 cache=False 跳过
+2. 相同请求合并（single_flight）：进程内并发的相同请求只调用一次模型；
+   开启跨 worker 合并时，其他 worker 的相同请求等待 leader 把结果写入缓存
+3. 分布式限流（rate_limiter）：真正请求模型之前获取 RPM/TPM 令牌，不足时排队等待
+4. 调用策略（call_policy）：按节点的超时、带抖动退避的重试和对冲请求（仅异步调用）执行每一次请求
+5. 端点路由（endpoint_pool）：每一次请求（含重试和对冲）按加权最小延迟选择端点，并记录结果用于熔断
+
+开启录制/回放（cassette）时不经过缓存和请求合并（节点缓存也跳过）：录制模式只录制真正请求模型的调用（仍经过限流、
+调用策略和端点路由），回放模式直接返回录制内容，不请求模型。
+"""
+import asyncio
+import time
+import uuid
+from typing import Any, Optional
+
+from langchain_core.exceptions import OutputParserException
+from langchain_core.runnables import Runnable
+from loguru import logger
+from pydantic import ValidationError
+
+from app.core.config import settings
+from app.services.call_policy import LLMCallPolicy, llm_call_policy
+from app.services.cassette import LLMCassettes, Tape, llm_cassettes
+from app.services.endpoint_pool import EndpointPool, endpoint_pool
+from app.services.llm_cache import LLMResponseCache, llm_cache
+from app.services.llm_service import LLMClientRegistry, llm_registry
+from app.services.node_models import NodeModels, node_models
+from app.services.rate_limiter import TokenBucketRateLimiter, llm_rate_limiter
+from app.services.single_flight import RedisFlightLock, SingleFlight
+from app.services.task_queue import redis_conn
+
+
+# 端点正常返回但内容无法解析为 schema，不算端点故障
+MODEL_OUTPUT_ERRORS = (OutputParserException, ValidationError)
+
+
+def _copy(result: Any) -> Any:
+    """共享的结果复制一份再交给调用方，避免不同任务修改同一个对象"""
+    return result.model_copy(deep=True) if hasattr(result, "model_copy") else result
+
+
+class LLMGateway:
+    """
+    LLM 调用入口
+
+    invoke(node_name, llm, prompt, schema) 中 node_name 用于统计，
+    schema 为空时返回模型的原始消息（AIMessage），否则返回 schema 实例；
+    cache=False 时不查找也不写入响应缓存（调用方自己缓存结果）。
+    """
+
+    def __init__(
+        self,
+        registry: LLMClientRegistry,
+        cache: LLMResponseCache,
+        flight: Optional[SingleFlight] = None,
+        flight_lock: Optional[RedisFlightLock] = None,
+        limiter: Optional[TokenBucketRateLimiter] = None,
+        policy: Optional[LLMCallPolicy] = None,
+        pool: Optional[EndpointPool] = None,
+        models: Optional[NodeModels] = None,
+        cassettes: Optional[LLMCassettes] = None,
+    ):
+        self.registry = registry
+        self.cache = cache
+        self.flight = flight
+        self.flight_lock = flight_lock
+        self.limiter = limiter
+        self.policy = policy
+        self.pool = pool
+        self.models = models
+        self.cassettes = cassettes
+
+    def _runnable(self, node_name: str, llm: Any, schema: Any):
+        if schema is None:
+            return llm
+        method = self.models.method(node_name) if self.models is not None else None
+        return self.registry.structured(llm, schema, method)
+
+    def _route(self, llm: Any):
+        """选择本次请求的端点，返回 (端点上的模型实例, 端点名称)；不经过端点池时端点名称为 None"""
+        if self.pool is None:
+            return llm, None
+        endpoint = self.pool.choose()
+        routed = self.registry.route(llm, endpoint)
+        if routed is None:
+            # 不是注册表创建的模型实例（例如测试替身），直接使用
+            self.pool.release(endpoint)
+            return llm, None
+        return routed, endpoint
+
+    def _send(self, node_name: str, llm: Any, prompt: Any, schema: Any, timeout: Optional[float] = None) -> Any:
+        """发出一次同步请求；timeout 作为请求参数交给 OpenAI 客户端，由 HTTP 传输层在超时后中断请求"""
+        target, endpoint = self._route(llm)
+        runnable = self._runnable(node_name, target, schema)
+        # 只有 LangChain runnable 会把 invoke 的关键字参数传给模型客户端（测试替身不接收 timeout）
+        options = {"timeout": timeout} if timeout is not None and isinstance(runnable, Runnable) else {}
+        if endpoint is None:
+            return runnable.invoke(prompt, **options)
+        started = time.monotonic()
+        try:
+            result = runnable.invoke(prompt, **options)
+        except Exception as e:
+            self.pool.record(endpoint, time.monotonic() - started, ok=isinstance(e, MODEL_OUTPUT_ERRORS))
+            raise
+        self.pool.record(endpoint, time.monotonic() - started, ok=True)
+        return result
+
+    async def _asend(self, node_name: str, llm: Any, prompt: Any, schema: Any) -> Any:
+        target, endpoint = self._route(llm)
+        if endpoint is None:
+            return await self._runnable(node_name, target, schema).ainvoke(prompt)
+        started = time.monotonic()
+        try:
+            result = await self._runnable(node_name, target, schema).ainvoke(prompt)
+        except asyncio.CancelledError:
+            # 对冲请求中落败被取消的请求不计入端点统计
+            self.pool.release(endpoint)
+            raise
+        except Exception as e:
+            await asyncio.to_thread(self.pool.record, endpoint, time.monotonic() - started, isinstance(e, MODEL_OUTPUT_ERRORS))
+            raise
+        await asyncio.to_thread(self.pool.record, endpoint, time.monotonic() - started, True)
+        return result
+
+    def _call(self, node_name: str, llm: Any, prompt: Any, schema: Any) -> Any:
+        """按节点策略请求模型，每次请求（含重试和对冲）前先获取限流令牌并选择端点"""
+        prepare = None
+        if self.limiter is not None:
+            tokens = self.limiter.estimate_tokens(prompt)
+            prepare = lambda: self.limiter.acquire(node_name, tokens)
+        if self.policy is None:
+            if prepare is not None:
+                prepare()
+            return self._send(node_name, llm, prompt, schema)
+        return self.policy.run(node_name, lambda timeout: self._send(node_name, llm, prompt, schema, timeout), prepare)
+
+    async def _acall(self, node_name: str, llm: Any, prompt: Any, schema: Any) -> Any:
+        prepare = None
+        if self.limiter is not None:
+            tokens = self.limiter.estimate_tokens(prompt)
+            prepare = lambda: self.limiter.aacquire(node_name, tokens)
+        if self.policy is None:
+            if prepare is not None:
+                await prepare()
+            return await self._asend(node_name, llm, prompt, schema)
+        return await self.policy.arun(node_name, lambda: self._asend(node_name, llm, prompt, schema), prepare)
+
+    def tape(self) -> Optional[Tape]:
+        """当前任务的录制/回放内容，未开启录制/回放或不在任务中时为 None"""
+        return self.cassettes.current() if self.cassettes is not None else None
+
+    def invoke(self, node_name: str, llm: Any, prompt: Any, schema: Optional[Any] = None, cache: bool = True) -> Any:
+        tape = self.tape()
+        if tape is None:
+            return self._invoke(node_name, llm, prompt, schema, cache)
+        # 录制/回放时不经过响应缓存和请求合并：只录制真正请求模型的调用及其耗时，回放时也不会被缓存结果替代
+        key = self.cache.request_key(llm, prompt, schema)
+        if tape.replaying:
+            return self.cassettes.replay(tape, node_name, key, schema)
+        started = time.monotonic()
+        result = self._call(node_name, llm, prompt, schema)
+        tape.record(node_name, key, result, schema, time.monotonic() - started)
+        return result
+
+    def _invoke(self, node_name: str, llm: Any, prompt: Any, schema: Optional[Any] = None, cache: bool = True) -> Any:
+        key = self.cache.request_key(llm, prompt, schema)
+        cache_key = key if cache and self.cache.enabled else None
+        if cache_key is not None:
+            cached = self.cache.get(node_name, cache_key, schema)
+            if cached is not None:
+                return cached
+
+        if key is None or self.flight is None:
+            return self._fetch(node_name, llm, prompt, schema, cache_key)
+
+        result, shared = self.flight.do(key, lambda: self._fetch(node_name, llm, prompt, schema, cache_key))
+        if shared:
+            logger.info(f"🔗 合并相同的LLM请求: {node_name}")
+            return _copy(result)
+        return result
+
+    def _fetch(self, node_name: str, llm: Any, prompt: Any, schema: Any, cache_key: Optional[str]) -> Any:
+        token = None
+        if cache_key is not None and self.flight_lock is not None:
+            token = uuid.uuid4().hex
+            if not self.flight_lock.acquire(cache_key, token):
+                token = None
+                result = self.flight_lock.wait(cache_key, lambda: self.cache.peek(cache_key, schema))
+                if result is not None:
+                    logger.info(f"🔗 复用其他worker的LLM结果: {node_name}")
+                    return result
+        try:
+            result = self._call(node_name, llm, prompt, schema)
+            if cache_key is not None:
+                self.cache.set(cache_key, result, schema)
+            return result
+        finally:
+            if token is not None:
+                self.flight_lock.release(cache_key, token)
+
+    async def ainvoke(self, node_name: str, llm: Any, prompt: Any, schema: Optional[Any] = None, cache: bool = True) -> Any:
+        tape = self.tape()
+        if tape is None:
+            return await self._ainvoke(node_name, llm, prompt, schema, cache)
+        key = self.cache.request_key(llm, prompt, schema)
+        if tape.replaying:
+            return await self.cassettes.areplay(tape, node_name, key, schema)
+        started = time.monotonic()
+        result = await self._acall(node_name, llm, prompt, schema)
+        tape.record(node_name, key, result, schema, time.monotonic() - started)
+        return result
+
+    async def _ainvoke(self, node_name: str, llm: Any, prompt: Any, schema: Optional[Any] = None, cache: bool = True) -> Any:
+        key = self.cache.request_key(llm, prompt, schema)
+        cache_key = key if cache and self.cache.enabled else None
+        if cache_key is not None:
+            cached = await asyncio.to_thread(self.cache.get, node_name, cache_key, schema)
+            if cached is not None:
+                return cached
+
+        if key is None or self.flight is None:
+            return await self._afetch(node_name, llm, prompt, schema, cache_key)
+
+        result, shared = await self.flight.ado(key, lambda: self._afetch(node_name, llm, prompt, schema, cache_key))
+        if shared:
+            logger.info(f"🔗 合并相同的LLM请求: {node_name}")
+            return _copy(result)
+        return result
+
+    async def _afetch(self, node_name: str, llm: Any, prompt: Any, schema: Any, cache_key: Optional[str]) -> Any:
+        token = None
+        if cache_key is not None and self.flight_lock is not None:
+            token = uuid.uuid4().hex
+            if not await asyncio.to_thread(self.flight_lock.acquire, cache_key, token):
+                token = None
+                result = await self.flight_lock.await_result(cache_key, lambda: self.cache.peek(cache_key, schema))
+                if result is not None:
+                    logger.info(f"🔗 复用其他worker的LLM结果: {node_name}")
+                    return result
+        try:
+            result = await self._acall(node_name, llm, prompt, schema)
+            if cache_key is not None:
+                await asyncio.to_thread(self.cache.set, cache_key, result, schema)
+            return result
+        finally:
+            if token is not None:
+                await asyncio.to_thread(self.flight_lock.release, cache_key, token)
+
+
+# 全局LLM调用网关
+llm_gateway = LLMGateway(
+    llm_registry,
+    llm_cache,
+    flight=SingleFlight() if settings.LLM_SINGLE_FLIGHT_ENABLED else None,
+    flight_lock=RedisFlightLock(
+        redis_conn, ttl=settings.LLM_SINGLE_FLIGHT_LOCK_SECONDS
+    ) if settings.LLM_SINGLE_FLIGHT_DISTRIBUTED else None,
+    limiter=llm_rate_limiter,
+    policy=llm_call_policy,
+    pool=endpoint_pool,
+    models=node_models,
+    cassettes=llm_cassettes if llm_cassettes.enabled else None,
+)
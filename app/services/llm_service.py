@@ -1,24 +1,196 @@
+"""
+LLM 客户端注册表
+每个 (端点, 模型, 温度, 最大输出 token 数) 只创建一个聊天模型实例，同一端点的实例共享一对带连接池的
+httpx 客户端（同步/异步），连接保持 keep-alive，避免每次节点调用都重新建立 TLS 连接；
+with_structured_output 生成的结构化输出 runnable 按 schema 缓存复用。
+端点来自 LLM_ENDPOINTS（见 endpoint_pool），未配置时只有 MODEL_PROVIDER 对应的单个端点。
+"""
+import asyncio
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
 from langchain_openai import AzureChatOpenAI, ChatOpenAI
+from loguru import logger
+
 from app.core.config import settings
+from app.services.endpoint_pool import Endpoint, configured_endpoints, legacy_endpoint
 
-def get_llm():
-    """Factory function to get the configured LLM instance."""
-    if settings.MODEL_PROVIDER == 'Azure':
-        return AzureChatOpenAI(
-            api_key=settings.AZURE_OPEN_AI_API_KEY,
-            azure_endpoint=settings.AZURE_OPENAI_ENDPOINT,
-            api_version=settings.OPENAI_API_VERSION,
-            azure_deployment=settings.AZURE_OPENAI_DEPLOYMENT_NAME,
+
+class LLMClientRegistry:
+    """
+    聊天模型与 HTTP 连接池的注册表
+
+    - get() 按 (endpoint, model, temperature, max_tokens) 返回共享的聊天模型实例
+    - route() 返回同一模型配置在另一个端点上的实例，供端点池路由使用
+    - structured() 按 (模型实例, schema, method) 返回共享的结构化输出 runnable
+    - warm_up() / awarm_up() 在 worker 启动时预先创建客户端并建立连接
+    """
+
+    def __init__(self, config=settings, endpoints: Optional[List[Endpoint]] = None):
+        self.config = config
+        self.endpoints: Dict[str, Endpoint] = {
+            endpoint.name: endpoint for endpoint in (endpoints or configured_endpoints(config))
+        }
+        self.default_endpoint = next(iter(self.endpoints))
+        self._lock = threading.Lock()
+        self._models: Dict[Tuple[str, str, Optional[float], Optional[int]], Any] = {}
+        # id(模型实例) -> (get() 的 model 参数, temperature, max_tokens)，用于把请求路由到其他端点
+        self._specs: Dict[int, Tuple[Optional[str], Optional[float], Optional[int]]] = {}
+        self._http_clients: Dict[str, Tuple[httpx.Client, httpx.AsyncClient]] = {}
+        # (id(模型实例), schema, method) -> (模型实例, runnable)；保留实例引用，保证 id 不会被复用
+        self._structured: Dict[Tuple[int, Any, Optional[str]], Tuple[Any, Any]] = {}
+
+    def _limits(self) -> httpx.Limits:
+        return httpx.Limits(
+            max_connections=self.config.LLM_MAX_CONNECTIONS,
+            max_keepalive_connections=self.config.LLM_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=self.config.LLM_KEEPALIVE_EXPIRY_SECONDS,
         )
-    elif settings.MODEL_PROVIDER == 'OpenAI':
+
+    def _endpoint(self, endpoint: Optional[str], provider: Optional[str]) -> Endpoint:
+        if endpoint is not None:
+            return self.endpoints[endpoint]
+        if provider is None:
+            return self.endpoints[self.default_endpoint]
+        for candidate in self.endpoints.values():
+            if candidate.provider == provider:
+                return candidate
+        candidate = legacy_endpoint(self.config, provider)
+        with self._lock:
+            return self.endpoints.setdefault(candidate.name, candidate)
+
+    def http_clients(self, endpoint: str) -> Tuple[httpx.Client, httpx.AsyncClient]:
+        """返回端点共享的 (同步, 异步) httpx 客户端"""
+        with self._lock:
+            clients = self._http_clients.get(endpoint)
+            if clients is None:
+                timeout = httpx.Timeout(self.config.LLM_TIMEOUT_SECONDS)
+                clients = (
+                    httpx.Client(limits=self._limits(), timeout=timeout),
+                    httpx.AsyncClient(limits=self._limits(), timeout=timeout),
+                )
+                self._http_clients[endpoint] = clients
+            return clients
+
+    def _create(self, endpoint: Endpoint, model: str, temperature: Optional[float], max_tokens: Optional[int] = None):
+        http_client, http_async_client = self.http_clients(endpoint.name)
+        extra = {} if temperature is None else {"temperature": temperature}
+        if max_tokens is not None:
+            extra["max_tokens"] = max_tokens
+        if endpoint.provider == 'Azure':
+            return AzureChatOpenAI(
+                api_key=endpoint.api_key,
+                azure_endpoint=endpoint.base_url,
+                api_version=endpoint.api_version or self.config.OPENAI_API_VERSION,
+                azure_deployment=model,
+                http_client=http_client,
+                http_async_client=http_async_client,
+                max_retries=0,  # 重试由 llm_gateway 的调用策略统一处理
+                **extra,
+            )
         return ChatOpenAI(
-            model="gpt-4o-mini",
-            api_key=settings.OPENAI_API_KEY,
-            base_url=settings.OPENAI_API_BASE,
-            organization=None  # Explicitly set to None to avoid potential conflicts
+            model=model,
+            api_key=endpoint.api_key,
+            base_url=endpoint.base_url,
+            organization=None,  # Explicitly set to None to avoid potential conflicts
+            http_client=http_client,
+            http_async_client=http_async_client,
+            max_retries=0,  # 重试由 llm_gateway 的调用策略统一处理
+            **extra,
         )
-    else:
-        raise ValueError(f"Unsupported model provider: {settings.MODEL_PROVIDER}")
+
+    def get(
+        self,
+        model: Optional[str] = None,
+        temperature: Optional[float] = None,
+        provider: Optional[str] = None,
+        endpoint: Optional[str] = None,
+        max_tokens: Optional[int] = None,
+    ):
+        """
+        获取共享的聊天模型实例
+
+        Args:
+            model: 模型名称（Azure 为部署名称），默认使用端点配置的模型
+            temperature: 采样温度，None 表示使用模型默认值
+            provider: OpenAI | Azure，选择该提供方的第一个端点
+            endpoint: 端点名称，默认使用第一个端点
+            max_tokens: 最大输出 token 数，None 表示不限制
+        """
+        target = self._endpoint(endpoint, provider)
+        resolved = model or target.model
+        if resolved is None:
+            resolved = self.config.AZURE_OPENAI_DEPLOYMENT_NAME if target.provider == 'Azure' else self.config.OPENAI_MODEL
+        key = (target.name, resolved, temperature, max_tokens)
+        llm = self._models.get(key)
+        if llm is None:
+            llm = self._create(target, resolved, temperature, max_tokens)
+            with self._lock:
+                llm = self._models.setdefault(key, llm)
+                self._specs[id(llm)] = (model, temperature, max_tokens)
+        return llm
+
+    def route(self, llm: Any, endpoint: str) -> Optional[Any]:
+        """同一模型配置在指定端点上的实例；llm 不是由注册表创建时返回 None"""
+        spec = self._specs.get(id(llm))
+        if spec is None:
+            return None
+        model, temperature, max_tokens = spec
+        return self.get(model, temperature, endpoint=endpoint, max_tokens=max_tokens)
+
+    def structured(self, llm: Any, schema: Any, method: Optional[str] = None):
+        """返回 llm.with_structured_output(schema)，同一模型实例、schema 和输出方式只构建一次"""
+        key = (id(llm), schema, method)
+        with self._lock:
+            entry = self._structured.get(key)
+            if entry is None:
+                runnable = llm.with_structured_output(schema) if method is None else llm.with_structured_output(schema, method=method)
+                entry = self._structured[key] = (llm, runnable)
+            return entry[1]
+
+    def warm_up(self, connect: bool = False) -> None:
+        """
+        预先创建各端点的默认模型和连接池
+
+        connect=True 时额外发起一次请求建立 TCP/TLS 连接并放入连接池。
+        fork 模式的 worker 不应在父进程中建立连接（子进程共享同一个套接字会导致连接状态错乱），
+        此时只创建对象，子进程继承后自行建立连接。
+        """
+        for name, endpoint in list(self.endpoints.items()):
+            self.get(endpoint=name)
+            if not connect:
+                continue
+            http_client, _ = self.http_clients(name)
+            try:
+                http_client.head(endpoint.base_url)
+            except httpx.HTTPError as e:
+                logger.warning(f"Failed to pre-warm LLM connection for {name}: {e}")
+
+    async def awarm_up(self, connections: Optional[int] = None) -> None:
+        """在事件循环中为每个端点预先建立若干个异步连接（并发发起，避免复用同一条连接）"""
+        connections = connections or self.config.LLM_PREWARM_CONNECTIONS
+        for name, endpoint in list(self.endpoints.items()):
+            self.get(endpoint=name)
+            _, http_async_client = self.http_clients(name)
+            results = await asyncio.gather(
+                *(http_async_client.head(endpoint.base_url) for _ in range(connections)),
+                return_exceptions=True,
+            )
+            failures = [result for result in results if isinstance(result, Exception)]
+            if failures:
+                logger.warning(f"Failed to pre-warm {len(failures)}/{connections} LLM connections for {name}: {failures[0]}")
+            else:
+                logger.info(f"Pre-warmed {connections} LLM connections for {name}")
+
+
+# 全局LLM客户端注册表
+llm_registry = LLMClientRegistry()
+
+
+def get_llm():
+    """Factory function to get the configured LLM instance."""
+    return llm_registry.get()
 
 # Global LLM instance
-llm = get_llm() 
\ No newline at end of file
+llm = get_llm()
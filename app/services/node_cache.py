@@ -0,0 +1,169 @@
+"""
+节点结果缓存服务
+以节点的简化输入（经 model_adapter 转换后的任务/依赖/团队/洞察）加上模型名称和温度
+计算内容哈希，将 AI 生成的简化结果缓存在 Redis 中。
+
+缓存的是简化模型（SimpleXxx）而非完整模型：简化结果只包含 'task-1' 这类稳定ID，
+命中后仍由适配器结合当前任务的 id_mapping 转换为带 UUID 的完整结果。
+
+节点缓存负责的调用不再经过网关的精确匹配响应缓存（llm_cache），同一个结果只查找和写入一次；
+节点缓存未启用或无法计算缓存键时，仍由网关的响应缓存处理。
+录制/回放 LLM 调用（cassette）时跳过节点缓存，每次调用都由网关录制或回放。
+"""
+import asyncio
+import hashlib
+import json
+import time
+from typing import Any, Dict, Optional, Type, TypeVar
+
+from loguru import logger
+from pydantic import BaseModel
+from redis import Redis
+
+from app.core.config import settings
+from app.services.llm_gateway import llm_gateway
+from app.services.task_queue import redis_conn
+
+T = TypeVar("T", bound=BaseModel)
+
+
+def _canonical(value: Any) -> Any:
+    """转换为可稳定序列化的结构"""
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json")
+    return value
+
+
+class NodeResultCache:
+    """
+    基于 Redis 的节点结果缓存
+
+    - 每个条目带 TTL
+    - 有序集合按最近访问时间记录所有条目，超过 max_entries 时淘汰最久未使用的条目
+    - 按节点统计命中/未命中次数
+    """
+
+    def __init__(
+        self,
+        connection: Redis,
+        ttl: int,
+        max_entries: int,
+        enabled: bool = True,
+        prefix: str = "pma:node_cache",
+    ):
+        self.connection = connection
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.enabled = enabled
+        self.prefix = prefix
+        self.index_key = f"{prefix}:index"
+        self.stats_key = f"{prefix}:stats"
+
+    def make_key(self, node_name: str, inputs: Dict[str, Any], llm: Any) -> Optional[str]:
+        """
+        根据节点输入和模型参数计算缓存键
+
+        无法确定模型名称时（例如测试中的 mock）返回 None，表示不使用缓存
+        """
+        if not self.enabled:
+            return None
+        model = getattr(llm, "model_name", None) or getattr(llm, "deployment_name", None)
+        temperature = getattr(llm, "temperature", None)
+        if not isinstance(model, str) or not (temperature is None or isinstance(temperature, (int, float))):
+            return None
+
+        request = {"node": node_name, "model": model, "temperature": temperature, "inputs": inputs}
+        max_tokens = getattr(llm, "max_tokens", None)
+        if isinstance(max_tokens, int):
+            request["max_tokens"] = max_tokens
+        payload = json.dumps(
+            request,
+            sort_keys=True,
+            ensure_ascii=False,
+            default=_canonical,
+        )
+        digest = hashlib.sha256(payload.encode("utf-8")).hexdigest()
+        return f"{self.prefix}:{node_name}:{digest}"
+
+    def get(self, node_name: str, key: str, schema: Type[T]) -> Optional[T]:
+        try:
+            raw = self.connection.get(key)
+            with self.connection.pipeline(transaction=False) as pipe:
+                if raw is not None:
+                    pipe.zadd(self.index_key, {key: time.time()})
+                pipe.hincrby(self.stats_key, f"{node_name}:{'hits' if raw is not None else 'misses'}", 1)
+                pipe.execute()
+        except Exception as e:
+            logger.warning(f"Node cache unavailable, skipping lookup: {e}")
+            return None
+
+        if raw is None:
+            return None
+        logger.info(f"⚡ 节点缓存命中: {node_name}")
+        return schema.model_validate_json(raw)
+
+    def set(self, key: str, value: BaseModel) -> None:
+        try:
+            with self.connection.pipeline(transaction=False) as pipe:
+                pipe.set(key, value.model_dump_json(), ex=self.ttl)
+                pipe.zadd(self.index_key, {key: time.time()})
+                pipe.zcard(self.index_key)
+                size = pipe.execute()[-1]
+
+            # 超出容量时淘汰最久未访问的条目
+            overflow = size - self.max_entries
+            if overflow > 0:
+                evicted = [member for member, _ in self.connection.zpopmin(self.index_key, overflow)]
+                if evicted:
+                    self.connection.delete(*evicted)
+        except Exception as e:
+            logger.warning(f"Node cache unavailable, skipping store: {e}")
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """按节点返回命中/未命中次数和命中率"""
+        raw = self.connection.hgetall(self.stats_key)
+        stats: Dict[str, Dict[str, Any]] = {}
+        for field, count in raw.items():
+            node_name, _, kind = field.decode().rpartition(":")
+            stats.setdefault(node_name, {"hits": 0, "misses": 0})[kind] = int(count)
+        for node_stats in stats.values():
+            total = node_stats["hits"] + node_stats["misses"]
+            node_stats["hit_ratio"] = round(node_stats["hits"] / total, 4) if total else 0.0
+        return stats
+
+    def invoke(self, node_name: str, inputs: Dict[str, Any], llm: Any, schema: Type[T], prompt: Any) -> T:
+        """带缓存的结构化LLM调用（录制/回放 LLM 调用时不使用缓存）"""
+        key = self.make_key(node_name, inputs, llm) if llm_gateway.tape() is None else None
+        if key is not None:
+            cached = self.get(node_name, key, schema)
+            if cached is not None:
+                return cached
+
+        result = llm_gateway.invoke(node_name, llm, prompt, schema, cache=key is None)
+
+        if key is not None:
+            self.set(key, result)
+        return result
+
+    async def ainvoke(self, node_name: str, inputs: Dict[str, Any], llm: Any, schema: Type[T], prompt: Any) -> T:
+        """带缓存的结构化LLM调用（异步版本）"""
+        key = self.make_key(node_name, inputs, llm) if llm_gateway.tape() is None else None
+        if key is not None:
+            cached = await asyncio.to_thread(self.get, node_name, key, schema)
+            if cached is not None:
+                return cached
+
+        result = await llm_gateway.ainvoke(node_name, llm, prompt, schema, cache=key is None)
+
+        if key is not None:
+            await asyncio.to_thread(self.set, key, result)
+        return result
+
+
+# 全局节点缓存实例
+node_cache = NodeResultCache(
+    redis_conn,
+    ttl=settings.NODE_CACHE_TTL_SECONDS,
+    max_entries=settings.NODE_CACHE_MAX_ENTRIES,
+    enabled=settings.NODE_CACHE_ENABLED,
+)
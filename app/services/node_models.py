@@ -0,0 +1,111 @@
+"""
+节点模型配置
+每个调用 LLM 的节点可以单独配置模型、温度、最大输出 token 数和结构化输出方式，
+例如风险评估、洞察生成使用便宜快速的模型，任务提取使用更强的模型。
+
+配置（LLM_NODE_MODELS）在导入时校验，未知节点、未知字段或非法取值直接报错，worker 无法带着错误配置启动；
+各节点实际使用的配置写入任务结果（llm_models）和节点进度，便于按模型分析耗时。
+"""
+from dataclasses import asdict, dataclass, fields, replace
+from typing import Any, Dict, Optional
+
+from loguru import logger
+
+from app.core.config import settings
+from app.services.llm_service import LLMClientRegistry, llm_registry
+
+# 调用 LLM 的节点（与 llm_gateway / LLM_NODE_POLICIES 使用的节点名称一致）
+NODE_NAMES = (
+    "task_generation",
+    "task_dependency",
+    "task_scheduler",
+    "task_allocator",
+    "risk_assessor",
+    "insight_generator",
+)
+
+STRUCTURED_OUTPUT_METHODS = ("function_calling", "json_mode", "json_schema")
+
+# 代码内置的节点默认值，LLM_NODE_MODELS 中的配置会覆盖这些值
+DEFAULT_NODE_MODELS: Dict[str, Dict[str, Any]] = {
+    "task_generation": {"temperature": 0.1},
+}
+
+
+@dataclass(frozen=True)
+class NodeModelConfig:
+    """单个节点的模型配置，None 表示使用端点/模型的默认值"""
+    model: Optional[str] = None  # Azure 为部署名称
+    temperature: Optional[float] = None
+    max_tokens: Optional[int] = None
+    structured_output_method: Optional[str] = None  # function_calling | json_mode | json_schema
+
+    def __post_init__(self):
+        if self.temperature is not None and not 0 <= self.temperature <= 2:
+            raise ValueError(f"temperature must be between 0 and 2, got {self.temperature}")
+        if self.max_tokens is not None and self.max_tokens <= 0:
+            raise ValueError(f"max_tokens must be positive, got {self.max_tokens}")
+        if self.structured_output_method not in (None, *STRUCTURED_OUTPUT_METHODS):
+            raise ValueError(
+                f"structured_output_method must be one of {STRUCTURED_OUTPUT_METHODS}, got {self.structured_output_method}"
+            )
+
+
+def build_node_models(default: Dict[str, Any], overrides: Dict[str, Dict[str, Any]]) -> Dict[str, NodeModelConfig]:
+    """按 默认值 → 节点内置默认值 → 节点配置 的顺序合并，返回每个节点的配置"""
+    known = {field.name for field in fields(NodeModelConfig)}
+    unknown_nodes = set(overrides) - set(NODE_NAMES)
+    if unknown_nodes:
+        raise ValueError(f"Unknown nodes in LLM_NODE_MODELS: {sorted(unknown_nodes)} (expected {NODE_NAMES})")
+    base = NodeModelConfig(**default)
+    configs = {}
+    for node in NODE_NAMES:
+        options = {**DEFAULT_NODE_MODELS.get(node, {}), **overrides.get(node, {})}
+        unknown = set(options) - known
+        if unknown:
+            raise ValueError(f"Unknown fields in LLM_NODE_MODELS[{node}]: {sorted(unknown)}")
+        try:
+            configs[node] = replace(base, **options)
+        except ValueError as e:
+            raise ValueError(f"Invalid LLM_NODE_MODELS[{node}]: {e}") from e
+    return configs
+
+
+class NodeModels:
+    """按节点返回共享的聊天模型实例和结构化输出方式"""
+
+    def __init__(self, registry: LLMClientRegistry, configs: Dict[str, NodeModelConfig]):
+        self.registry = registry
+        self.configs = configs
+
+    def config(self, node: str) -> NodeModelConfig:
+        return self.configs.get(node) or NodeModelConfig()
+
+    def llm(self, node: str):
+        config = self.config(node)
+        return self.registry.get(config.model, config.temperature, max_tokens=config.max_tokens)
+
+    def method(self, node: str) -> Optional[str]:
+        return self.config(node).structured_output_method
+
+    def describe(self, node: str) -> Dict[str, Any]:
+        """节点实际使用的配置（模型名称解析为端点上的真实模型/部署名称）"""
+        llm = self.llm(node)
+        described = asdict(self.config(node))
+        described["model"] = getattr(llm, "model_name", None) or getattr(llm, "deployment_name", None)
+        return described
+
+    def describe_all(self) -> Dict[str, Dict[str, Any]]:
+        return {node: self.describe(node) for node in self.configs}
+
+
+def _load_node_models() -> NodeModels:
+    configs = build_node_models({"max_tokens": settings.LLM_MAX_OUTPUT_TOKENS}, settings.LLM_NODE_MODELS)
+    models = NodeModels(llm_registry, configs)
+    for node, described in models.describe_all().items():
+        logger.debug(f"LLM node model {node}: {described}")
+    return models
+
+
+# 全局节点模型配置
+node_models = _load_node_models()
@@ -0,0 +1,184 @@
+"""
+计划结果的投影与分页
+完整结果是最终的 AgentState，包含每一轮的排期、分配（每条分配内嵌完整的任务和成员）和风险，
+前端标签页和 API 客户端通常只需要其中一部分。这里提供：
+
+- 字段投影：只返回指定的顶层字段（?fields=tasks,insights）
+- 迭代子资源：某一轮的排期 / 分配 / 风险（支持负数下标，-1 表示最后一轮）
+- 任务列表的游标分页：游标为上一页最后一个任务的ID，结果不变时翻页结果稳定
+
+只对选中的部分做 JSON 编码，未选中的字段不会被编码；从结果存储读取的结果本身已是 JSON 兼容类型，
+直接返回，不再转换。已完成计划的结果不会再变化，API 把编码好的响应字节缓存在
+进程内（PayloadCache），重复请求不再读取 Redis 和重新编码。
+"""
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+from app.core.config import settings
+from app.core.serialization import dumps, loads
+from app.services.result_store import StoredPlanResult
+
+# 可以投影的顶层字段
+RESULT_FIELDS = (
+    "project_description", "team", "tasks", "dependencies", "schedule", "task_allocations", "risks",
+    "iteration_number", "max_iteration", "insights", "schedule_iteration", "task_allocations_iteration",
+    "risks_iteration", "project_risk_score_iterations", "id_mapping", "scheduler", "critical_path",
+    "allocator", "job_id", "current_node", "node_start_time", "total_start_time", "completed_nodes",
+    "node_progress", "llm_models", "overall_status", "total_elapsed_time",
+)
+
+# 迭代子资源名称 -> (每轮结果的字段, 条目列表字段)
+ITERATION_RESOURCES = {
+    "schedule": ("schedule_iteration", "schedule"),
+    "allocations": ("task_allocations_iteration", "task_allocations"),
+    "risks": ("risks_iteration", "risks"),
+}
+
+
+def _get(value: Any, name: str, default: Any = None) -> Any:
+    """同时支持 dict 和 Pydantic 对象的字段读取"""
+    if isinstance(value, dict):
+        return value.get(name, default)
+    return getattr(value, name, default)
+
+
+def _encode(result: Dict[str, Any], value: Any) -> Any:
+    # RQ 返回值中的 Pydantic 对象经 orjson 往返转换，比 jsonable_encoder 逐层转换快一个数量级
+    return value if isinstance(result, StoredPlanResult) else loads(dumps(value))
+
+
+def parse_fields(fields: Optional[str]) -> Optional[List[str]]:
+    """
+    解析逗号分隔的字段列表，为空时返回None（返回完整结果）
+
+    Raises:
+        ValueError: 包含未知字段
+    """
+    if not fields:
+        return None
+    names = list(dict.fromkeys(name.strip() for name in fields.split(",") if name.strip()))
+    unknown = [name for name in names if name not in RESULT_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown result fields: {unknown}. Available fields: {list(RESULT_FIELDS)}")
+    return names or None
+
+
+def project(result: Dict[str, Any], fields: Optional[List[str]]) -> Dict[str, Any]:
+    """只编码并返回选中的顶层字段（fields 为None时返回完整结果）"""
+    if fields is None:
+        return _encode(result, dict(result))
+    return {name: _encode(result, result.get(name)) for name in fields}
+
+
+def iteration_resource(result: Dict[str, Any], number: int, resource: str) -> Dict[str, Any]:
+    """
+    返回某一轮的排期 / 分配 / 风险
+
+    Raises:
+        KeyError: 未知的子资源
+        IndexError: 该轮不存在
+    """
+    if resource not in ITERATION_RESOURCES:
+        raise KeyError(resource)
+    field, items_field = ITERATION_RESOURCES[resource]
+    iterations = result.get(field) or []
+    if not -len(iterations) <= number < len(iterations):
+        raise IndexError(f"Iteration {number} not found, the plan has {len(iterations)} iterations")
+    index = number % len(iterations)
+    response = {
+        "iteration": index,
+        "iterations": len(iterations),
+        items_field: _encode(result, _get(iterations[index], items_field) or []),
+    }
+    if resource == "risks":
+        scores = result.get("project_risk_score_iterations") or []
+        response["project_risk_score"] = scores[index] if index < len(scores) else None
+    return response
+
+
+def _tasks(result: Dict[str, Any]) -> List[Any]:
+    tasks = result.get("tasks")
+    return list(_get(tasks, "tasks") or []) if tasks is not None else []
+
+
+def _task_id(task: Any) -> str:
+    return str(_get(task, "id"))
+
+
+def paginate_tasks(result: Dict[str, Any], cursor: Optional[str], limit: int) -> Tuple[List[Any], Optional[str], int]:
+    """
+    游标分页读取任务列表
+
+    Returns:
+        (本页任务, 下一页游标（没有更多时为None）, 任务总数)
+
+    Raises:
+        ValueError: 游标不是本计划中的任务ID
+    """
+    tasks = _tasks(result)
+    start = 0
+    if cursor:
+        ids = [_task_id(task) for task in tasks]
+        if cursor not in ids:
+            raise ValueError(f"Invalid cursor: {cursor}")
+        start = ids.index(cursor) + 1
+    page = tasks[start:start + limit]
+    has_more = start + limit < len(tasks)
+    next_cursor = _task_id(page[-1]) if page and has_more else None
+    return _encode(result, page), next_cursor, len(tasks)
+
+
+class PayloadCache:
+    """
+    已完成计划的响应字节缓存（进程内 LRU）
+
+    按缓存字节总数而不是条目数限制容量，条目在 ttl 秒后过期（结果文档在 Redis 中过期后，
+    缓存最多再多返回 ttl 秒）。只在 API 的事件循环中访问，不需要加锁。
+    """
+
+    def __init__(self, max_bytes: int, ttl: float):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.size = 0
+        self._data: "OrderedDict[Hashable, Tuple[float, bytes]]" = OrderedDict()
+
+    def get(self, key: Hashable) -> Optional[bytes]:
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        expires_at, payload = entry
+        if expires_at < time.monotonic():
+            self._discard(key)
+            return None
+        self._data.move_to_end(key)
+        return payload
+
+    def set(self, key: Hashable, payload: bytes) -> None:
+        if len(payload) > self.max_bytes:
+            return
+        self._discard(key)
+        self._data[key] = (time.monotonic() + self.ttl, payload)
+        self.size += len(payload)
+        while self.size > self.max_bytes:
+            _, (_, evicted) = self._data.popitem(last=False)
+            self.size -= len(evicted)
+
+    def _discard(self, key: Hashable) -> None:
+        entry = self._data.pop(key, None)
+        if entry is not None:
+            self.size -= len(entry[1])
+
+    def clear(self) -> None:
+        self._data.clear()
+        self.size = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+# 全局计划结果响应缓存
+result_payload_cache = PayloadCache(
+    max_bytes=settings.RESULT_PAYLOAD_CACHE_MAX_BYTES,
+    ttl=settings.RESULT_PAYLOAD_CACHE_TTL_SECONDS,
+)
@@ -0,0 +1,308 @@
+"""
+任务进度发布服务
+每个任务一个 ProgressPublisher，把 AgentState 中的进度信息写入独立的 Redis 哈希
+pma:progress:{job_id}（每个字段单独 JSON 编码），替代原先每次 Job.fetch + save_meta
+重写整个 job.meta 的做法：
+
+- 节点切换、状态变化等结构性更新立即写入
+- 仅节点内部细节（details 等）变化的更新在防抖窗口内合并，随下一次写入一起落盘
+- 只写入与上次相比发生变化的字段
+- 每次写入同时作为一个事件追加到任务的事件流 pma:progress:{job_id}:log（有长度上限），
+  并携带流ID PUBLISH 到任务频道：API 进程据此向 SSE 客户端推送，断线重连的客户端
+  按 Last-Event-ID 从事件流中补发错过的事件。HSET、XADD、PUBLISH 由一个 Lua 脚本
+  在一次往返中原子完成
+- 任务结束事件由 worker 在 RQ 保存结果之后发布（见 publish_terminal_event）
+"""
+import json
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from loguru import logger
+from redis import Redis
+
+from app.core.config import settings
+
+PROGRESS_KEY_PREFIX = "pma:progress"
+
+# 定义所有LangGraph节点（必须与实际执行顺序一致）
+ALL_NODES = [
+    "task_generation",     # 任务生成
+    "analyze_dependencies", # 依赖分析
+    "schedule_tasks",      # 任务调度
+    "allocate_team",       # 团队分配
+    "assess_risk",         # 风险评估
+    "generate_insights"    # 洞察生成
+]
+
+NODE_DISPLAY_MAP = {
+    "task_generation": "🧠 智能任务提取",
+    "analyze_dependencies": "🔗 依赖关系分析",
+    "schedule_tasks": "📅 智能任务调度",
+    "allocate_team": "👥 团队智能分配",
+    "assess_risk": "⚠️ 风险评估分析",
+    "generate_insights": "✨ 方案优化洞察"
+}
+
+# 这些字段变化时立即写入，不参与防抖
+STRUCTURAL_FIELDS = ("current_node", "completed_nodes", "overall_status", "iteration_number")
+
+# 每次都会变化的字段，只随其他字段的变化一起写入
+VOLATILE_FIELDS = ("last_updated", "total_elapsed_time")
+
+
+def progress_key(job_id: str) -> str:
+    return f"{PROGRESS_KEY_PREFIX}:{job_id}"
+
+
+def progress_channel(job_id: str) -> str:
+    return f"{PROGRESS_KEY_PREFIX}:{job_id}:events"
+
+
+def event_log_key(job_id: str) -> str:
+    return f"{PROGRESS_KEY_PREFIX}:{job_id}:log"
+
+
+# KEYS[1]: 进度哈希  KEYS[2]: 事件流
+# ARGV[1]: 频道  ARGV[2]: 事件流长度上限  ARGV[3]: TTL  ARGV[4]: 事件JSON  ARGV[5..]: 哈希字段/值
+APPEND_EVENT_SCRIPT = """
+if #ARGV > 4 then
+    redis.call('HSET', KEYS[1], unpack(ARGV, 5))
+    redis.call('EXPIRE', KEYS[1], ARGV[3])
+end
+local id = redis.call('XADD', KEYS[2], 'MAXLEN', '~', ARGV[2], '*', 'event', ARGV[4])
+redis.call('EXPIRE', KEYS[2], ARGV[3])
+redis.call('PUBLISH', ARGV[1], '{"id":"' .. id .. '","event":' .. ARGV[4] .. '}')
+return id
+"""
+
+
+def append_event(
+    connection: Redis,
+    job_id: str,
+    event: Dict[str, Any],
+    fields: Optional[Dict[str, str]] = None,
+    maxlen: Optional[int] = None,
+    ttl: Optional[int] = None,
+    pipeline=None,
+):
+    """
+    写入进度字段（可选）、追加事件到事件流并发布到任务频道
+
+    Returns:
+        事件的流ID（在 pipeline 中执行时返回 pipeline）
+    """
+    script = connection.register_script(APPEND_EVENT_SCRIPT)
+    args = [
+        progress_channel(job_id),
+        maxlen or settings.PROGRESS_STREAM_MAXLEN,
+        ttl or settings.PROGRESS_TTL_SECONDS, json.dumps(event, ensure_ascii=False),
+    ]
+    for field, value in (fields or {}).items():
+        args.extend((field, value))
+    result = script(keys=[progress_key(job_id), event_log_key(job_id)], args=args, client=pipeline or connection)
+    return result.decode() if isinstance(result, bytes) else result
+
+
+def publish_terminal_event(connection: Redis, job_id: str, status: str, pipeline=None) -> None:
+    """
+    发布任务结束事件（finished / failed）
+
+    必须在任务结果/失败信息写入 Redis 之后（或同一个事务 pipeline 中）调用，
+    保证客户端收到结束事件时总能读到结果。
+    """
+    append_event(connection, job_id, {"type": "terminal", "status": status}, pipeline=pipeline)
+
+
+def stream_id_key(event_id: str) -> Tuple[int, int]:
+    """流ID（毫秒-序号）转为可比较的元组"""
+    ms, _, seq = event_id.partition("-")
+    return int(ms), int(seq or 0)
+
+
+def _decode_events(entries) -> List[Tuple[str, Dict[str, Any]]]:
+    events = []
+    for event_id, entry in entries:
+        event_id = event_id.decode() if isinstance(event_id, bytes) else event_id
+        raw = entry.get(b"event", entry.get("event"))
+        events.append((event_id, json.loads(raw)))
+    return events
+
+
+def read_events(connection: Redis, job_id: str) -> List[Tuple[str, Dict[str, Any]]]:
+    """读取任务事件流中保留的全部事件，返回 [(流ID, 事件)]"""
+    return _decode_events(connection.xrange(event_log_key(job_id)))
+
+
+async def aread_events(connection, job_id: str) -> List[Tuple[str, Dict[str, Any]]]:
+    """read_events 的异步版本（connection 为 redis.asyncio.Redis）"""
+    return _decode_events(await connection.xrange(event_log_key(job_id)))
+
+
+def build_progress_info(agent_state: Dict[str, Any], estimator=None) -> Dict[str, Any]:
+    """
+    根据 AgentState 计算真实进度和用户友好的显示信息
+
+    提供 estimator（如 eta.EtaModel）时，进度按各节点的历史耗时加权，否则每个节点等权。
+    """
+    completed_nodes = agent_state.get("completed_nodes", [])
+    current_node = agent_state.get("current_node")
+
+    # 计算进度百分比
+    if agent_state.get("overall_status") == "completed":
+        progress = 100
+    elif not completed_nodes and not current_node:
+        progress = 0
+    else:
+        # 基于完成的节点数量计算进度
+        completed_count = len([node for node in completed_nodes if node in ALL_NODES])
+
+        # 如果当前节点正在执行且不在已完成列表中，给它50%的权重
+        if current_node and current_node in ALL_NODES and current_node not in completed_nodes:
+            current_node_progress = 0.5  # 正在执行的节点算50%完成
+        else:
+            current_node_progress = 0
+
+        # 计算总进度 = (已完成节点数 + 当前节点进度) / 总节点数 * 100
+        total_progress = (completed_count + current_node_progress) / len(ALL_NODES)
+        progress = min(int(total_progress * 100), 95)  # 最多95%，100%留给真正完成
+
+    current_node_display = NODE_DISPLAY_MAP.get(current_node, current_node) if current_node else "处理中"
+
+    tasks = agent_state.get("tasks")
+    task_count = len(tasks.tasks) if hasattr(tasks, "tasks") else None
+
+    # 提取关键的状态信息（避免存储过多数据）
+    info = {
+        "current_node": current_node,
+        "current_node_display": current_node_display,
+        "node_start_time": agent_state.get("node_start_time"),
+        "total_start_time": agent_state.get("total_start_time"),
+        "completed_nodes": completed_nodes,
+        "node_progress": agent_state.get("node_progress", {}),
+        "overall_status": agent_state.get("overall_status", "unknown"),
+        "iteration_number": agent_state.get("iteration_number", 1),
+        "last_updated": time.time(),
+
+        # 真实进度信息
+        "progress": progress,  # 真实进度百分比
+        "total_nodes": len(ALL_NODES),  # 总节点数
+        "completed_count": len(completed_nodes),  # 已完成节点数
+        "langgraph_flow": True,  # 标记这是真实的LangGraph流程
+
+        # 计算执行时间
+        "total_elapsed_time": int(time.time() - agent_state.get("total_start_time", time.time())) if agent_state.get("total_start_time") else 0,
+
+        # 节点详细信息
+        "node_details": f"正在执行: {current_node_display}" if current_node else "准备中...",
+
+        # 迭代信息（如果有多轮迭代）
+        "iteration_info": f"第 {agent_state.get('iteration_number', 1)} 轮迭代" if agent_state.get("iteration_number", 1) > 1 else "",
+
+        # 剩余时间估算所需的输入规模
+        "task_count": task_count,
+        "max_iteration": agent_state.get("max_iteration", 1),
+    }
+
+    if estimator is not None:
+        info["progress"] = estimator.estimate(info)["progress"]
+    return info
+
+
+class ProgressPublisher:
+    """
+    单个任务的进度发布器
+
+    保存上次写入的字段编码，只写入变化的字段；debounce 秒内的非结构性更新先暂存，
+    在下一次结构性更新、窗口过后的更新或 flush() 时合并写入。每次写入即一个进度事件。
+    """
+
+    def __init__(
+        self,
+        job_id: str,
+        connection: Redis,
+        debounce: float = 0.5,
+        ttl: int = 86400,
+        maxlen: int = 1000,
+        estimator=None,
+    ):
+        self.job_id = job_id
+        self.estimator = estimator
+        self.connection = connection
+        self.debounce = debounce
+        self.ttl = ttl
+        self.maxlen = maxlen
+        self._written: Dict[str, str] = {}
+        self._pending: Optional[Dict[str, str]] = None
+        self._last_write = 0.0
+
+    def _changed_fields(self, info: Dict[str, Any]) -> Dict[str, str]:
+        encoded = {field: json.dumps(value, ensure_ascii=False) for field, value in info.items()}
+        changed = {
+            field: value for field, value in encoded.items()
+            if field not in VOLATILE_FIELDS and self._written.get(field) != value
+        }
+        if changed:
+            changed.update({field: encoded[field] for field in VOLATILE_FIELDS if field in encoded})
+        return changed
+
+    def publish(self, agent_state: Dict[str, Any], force: bool = False) -> bool:
+        """
+        发布一次进度更新
+
+        Args:
+            agent_state: AgentState字典
+            force: 忽略防抖窗口立即写入（例如任务完成时）
+
+        Returns:
+            更新是否成功（被合并暂存也视为成功）
+        """
+        changed = self._changed_fields(build_progress_info(agent_state, self.estimator))
+        if not changed:
+            return True
+
+        structural = any(field in changed for field in STRUCTURAL_FIELDS)
+        if not (force or structural) and time.monotonic() - self._last_write < self.debounce:
+            self._pending = changed
+            return True
+
+        return self._write(changed)
+
+    def flush(self) -> bool:
+        """写入防抖窗口内暂存的更新"""
+        if self._pending:
+            return self._write({})
+        return True
+
+    def _write(self, changed: Dict[str, str]) -> bool:
+        # 暂存的更新是基于更早的状态计算的，本次变化的字段优先
+        fields = {**(self._pending or {}), **changed}
+        self._pending = None
+        event = {"type": "progress", "data": {field: json.loads(value) for field, value in fields.items()}}
+        try:
+            append_event(self.connection, self.job_id, event, fields, maxlen=self.maxlen, ttl=self.ttl)
+        except Exception as e:
+            logger.warning(f"Failed to publish progress for job {self.job_id}: {e}")
+            return False
+
+        self._written.update(fields)
+        self._last_write = time.monotonic()
+        return True
+
+
+def _decode_progress(raw) -> Optional[Dict[str, Any]]:
+    if not raw:
+        return None
+    return {
+        (field.decode() if isinstance(field, bytes) else field): json.loads(value)
+        for field, value in raw.items()
+    }
+
+
+def read_progress(connection: Redis, job_id: str) -> Optional[Dict[str, Any]]:
+    """读取任务的进度哈希，不存在时返回None"""
+    return _decode_progress(connection.hgetall(progress_key(job_id)))
+
+
+async def aread_progress(connection, job_id: str) -> Optional[Dict[str, Any]]:
+    """read_progress 的异步版本（connection 为 redis.asyncio.Redis）"""
+    return _decode_progress(await connection.hgetall(progress_key(job_id)))
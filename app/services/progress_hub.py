@@ -0,0 +1,139 @@
+"""
+进度事件分发中心（API 进程内）
+整个 API 进程只使用一个 Redis pub/sub 连接：某个任务有第一个 SSE 客户端时订阅该任务的
+进度频道，最后一个客户端断开时取消订阅。一个后台读取任务接收消息，分发到每个客户端
+各自的队列中，Redis 负载只与进度事件数量相关，与观看人数无关。
+"""
+import asyncio
+import json
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Optional, Set
+
+from loguru import logger
+from redis.asyncio import Redis
+
+from app.core.config import settings
+from app.services.progress import progress_channel
+
+# 客户端队列溢出后放入的标记：队列中的事件已被丢弃，客户端需要从事件流重新同步
+RESYNC_EVENT = {"type": "resync"}
+
+
+class ProgressHub:
+    """
+    共享订阅 + 按客户端队列分发
+
+    每个客户端队列有上限。进度事件只包含变化的字段，丢弃其中任何一条都会让客户端状态过期，
+    所以消费过慢导致队列已满时清空该队列，只放入 RESYNC_EVENT，由客户端重新读取进度快照和事件流。
+    """
+
+    def __init__(self, connection_factory, queue_size: int = 100):
+        self._connection_factory = connection_factory
+        self.queue_size = queue_size
+        self._connection: Optional[Redis] = None
+        self._pubsub = None
+        self._reader: Optional[asyncio.Task] = None
+        self._watchers: Dict[str, Set[asyncio.Queue]] = {}
+        self._channels: Dict[str, str] = {}
+        self._lock = asyncio.Lock()
+
+    @asynccontextmanager
+    async def watch(self, job_id: str) -> AsyncIterator[asyncio.Queue]:
+        """
+        订阅任务的进度事件
+
+        进入上下文时已完成订阅，调用方此后再读取快照，不会漏掉两者之间发布的事件。
+        队列中的元素为 {"id": 流ID, "type": "progress", "data": {...}}
+        或 {"id": 流ID, "type": "terminal", "status": ...}；
+        队列溢出时为 RESYNC_EVENT（之前排队的事件已被丢弃）。
+        """
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        await self._add(job_id, queue)
+        try:
+            yield queue
+        finally:
+            await self._remove(job_id, queue)
+
+    def watcher_count(self, job_id: Optional[str] = None) -> int:
+        if job_id is not None:
+            return len(self._watchers.get(job_id, ()))
+        return sum(len(queues) for queues in self._watchers.values())
+
+    async def _add(self, job_id: str, queue: asyncio.Queue) -> None:
+        async with self._lock:
+            if self._pubsub is None:
+                self._connection = self._connection_factory()
+                self._pubsub = self._connection.pubsub(ignore_subscribe_messages=True)
+            queues = self._watchers.setdefault(job_id, set())
+            if not queues:
+                channel = progress_channel(job_id)
+                await self._pubsub.subscribe(channel)
+                self._channels[channel] = job_id
+            queues.add(queue)
+            if self._reader is None or self._reader.done():
+                self._reader = asyncio.create_task(self._read_loop())
+
+    async def _remove(self, job_id: str, queue: asyncio.Queue) -> None:
+        async with self._lock:
+            queues = self._watchers.get(job_id)
+            if queues is None:
+                return
+            queues.discard(queue)
+            if not queues:
+                del self._watchers[job_id]
+                channel = progress_channel(job_id)
+                self._channels.pop(channel, None)
+                try:
+                    await self._pubsub.unsubscribe(channel)
+                except Exception as e:
+                    logger.warning(f"Failed to unsubscribe progress channel for job {job_id}: {e}")
+
+    def _dispatch(self, channel: str, message: dict) -> None:
+        job_id = self._channels.get(channel)
+        for queue in list(self._watchers.get(job_id, ())):
+            if queue.full():
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(RESYNC_EVENT)
+                logger.warning(f"Progress watcher of job {job_id} fell behind, asking it to resync")
+                continue
+            queue.put_nowait(message)
+
+    async def _read_loop(self) -> None:
+        while self._watchers:
+            try:
+                message = await self._pubsub.get_message(timeout=1.0)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Progress subscriber error: {e}")
+                await asyncio.sleep(1.0)
+                continue
+            if message is None or message.get("type") != "message":
+                continue
+            channel = message["channel"]
+            if isinstance(channel, bytes):
+                channel = channel.decode()
+            try:
+                payload = json.loads(message["data"])
+                self._dispatch(channel, {"id": payload["id"], **payload["event"]})
+            except (ValueError, TypeError, KeyError) as e:
+                logger.warning(f"Invalid progress event on {channel}: {e}")
+
+    async def close(self) -> None:
+        """关闭订阅连接（应用关闭时调用）"""
+        if self._reader is not None:
+            self._reader.cancel()
+            self._reader = None
+        if self._pubsub is not None:
+            await self._pubsub.aclose()
+            self._pubsub = None
+        if self._connection is not None:
+            await self._connection.aclose()
+            self._connection = None
+        self._watchers.clear()
+        self._channels.clear()
+
+
+# 全局进度分发中心（API 进程内共享一个订阅连接）
+progress_hub = ProgressHub(lambda: Redis(host=settings.REDIS_HOST, port=settings.REDIS_PORT))
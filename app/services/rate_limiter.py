@@ -0,0 +1,175 @@
+"""
+分布式 LLM 限流（令牌桶）
+所有 worker 共享 Redis 中的两个令牌桶：每分钟请求数（RPM）和每分钟 token 数（TPM）。
+每次真正请求模型之前先获取令牌，令牌不足时按脚本返回的等待时间排队重试，而不是直接失败，
+使整体吞吐稳定在服务商的限额附近，避免 429、重试和延迟抖动。
+
+- 令牌计算和扣减由一个 Lua 脚本原子完成，统一使用 Redis 服务器时间，不依赖各 worker 的时钟
+- 请求的 token 数按消息字符数估算（加上预期输出长度），只用于限流
+- 按节点统计调用次数、排队次数、累计/最长等待时间（成功获取令牌时随同一次脚本调用写入）
+- Redis 不可用时放行（fail open），限流不会导致任务失败
+"""
+import asyncio
+import math
+import random
+import time
+from typing import Any, Dict, Optional
+
+from loguru import logger
+from redis import Redis
+
+from app.core.config import settings
+from app.services.llm_cache import normalize_messages
+from app.services.task_queue import redis_conn
+
+# KEYS[1]: RPM 桶  KEYS[2]: TPM 桶  KEYS[3]: 统计哈希
+# ARGV[1]: RPM  ARGV[2]: TPM  ARGV[3]: 本次 token 数  ARGV[4]: 节点名称  ARGV[5]: 已等待毫秒数
+# 返回 0 表示已获取令牌，否则返回还需等待的毫秒数（不扣减令牌）
+ACQUIRE_SCRIPT = """
+local rpm = tonumber(ARGV[1])
+local tpm = tonumber(ARGV[2])
+local tokens = tonumber(ARGV[3])
+local time = redis.call('TIME')
+local now = tonumber(time[1]) * 1000 + math.floor(tonumber(time[2]) / 1000)
+
+local function level(key, capacity)
+    local state = redis.call('HMGET', key, 'tokens', 'ts')
+    local current = tonumber(state[1]) or capacity
+    local ts = tonumber(state[2]) or now
+    return math.min(capacity, current + math.max(now - ts, 0) * capacity / 60000)
+end
+
+local requests = level(KEYS[1], rpm)
+local budget = level(KEYS[2], tpm)
+local wait = 0
+if requests < 1 then
+    wait = math.max(wait, (1 - requests) * 60000 / rpm)
+end
+if budget < tokens then
+    wait = math.max(wait, (tokens - budget) * 60000 / tpm)
+end
+if wait > 0 then
+    return math.ceil(wait)
+end
+
+redis.call('HSET', KEYS[1], 'tokens', tostring(requests - 1), 'ts', tostring(now))
+redis.call('HSET', KEYS[2], 'tokens', tostring(budget - tokens), 'ts', tostring(now))
+redis.call('PEXPIRE', KEYS[1], 120000)
+redis.call('PEXPIRE', KEYS[2], 120000)
+
+local waited = tonumber(ARGV[5])
+redis.call('HINCRBY', KEYS[3], ARGV[4] .. ':calls', 1)
+if waited > 0 then
+    redis.call('HINCRBY', KEYS[3], ARGV[4] .. ':throttled', 1)
+    redis.call('HINCRBY', KEYS[3], ARGV[4] .. ':wait_ms', waited)
+    local max_key = ARGV[4] .. ':max_wait_ms'
+    if waited > (tonumber(redis.call('HGET', KEYS[3], max_key)) or 0) then
+        redis.call('HSET', KEYS[3], max_key, waited)
+    end
+end
+return 0
+"""
+
+
+class TokenBucketRateLimiter:
+    """
+    Redis 令牌桶限流器（RPM + TPM）
+
+    acquire() / aacquire() 会一直排队直到获取令牌，返回实际等待的秒数。
+    """
+
+    def __init__(
+        self,
+        connection: Redis,
+        requests_per_minute: int,
+        tokens_per_minute: int,
+        output_tokens: int = 1024,
+        chars_per_token: float = 3.0,
+        max_sleep: float = 5.0,
+        enabled: bool = True,
+        prefix: str = "pma:ratelimit",
+    ):
+        self.connection = connection
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.output_tokens = output_tokens
+        self.chars_per_token = chars_per_token
+        self.max_sleep = max_sleep
+        self.enabled = enabled
+        self.keys = [f"{prefix}:rpm", f"{prefix}:tpm", f"{prefix}:stats"]
+        self.stats_key = self.keys[2]
+
+    def estimate_tokens(self, prompt: Any, output_tokens: Optional[int] = None) -> int:
+        """按字符数估算输入 token（中文约每 1-2 个字符一个 token，英文约 4 个），加上预期输出 token"""
+        chars = sum(len(message["content"]) for message in normalize_messages(prompt))
+        output = self.output_tokens if output_tokens is None else output_tokens
+        # 单次请求超过桶容量时按容量计算，否则永远无法获取
+        return min(int(math.ceil(chars / self.chars_per_token)) + output, self.tokens_per_minute)
+
+    def _try(self, node_name: str, tokens: int, waited: float) -> int:
+        """尝试获取一次令牌，返回还需等待的毫秒数（0 表示成功）"""
+        try:
+            script = self.connection.register_script(ACQUIRE_SCRIPT)
+            return int(script(
+                keys=self.keys,
+                args=[self.requests_per_minute, self.tokens_per_minute, tokens, node_name, int(waited * 1000)],
+            ))
+        except Exception as e:
+            logger.warning(f"Rate limiter unavailable, allowing request: {e}")
+            return 0
+
+    def _sleep_seconds(self, wait_ms: int) -> float:
+        # 加少量随机抖动，避免大量等待者在同一时刻一起重试
+        return min(wait_ms / 1000, self.max_sleep) * random.uniform(1.0, 1.2)
+
+    def acquire(self, node_name: str, tokens: int) -> float:
+        if not self.enabled:
+            return 0.0
+        start = time.monotonic()
+        while True:
+            wait_ms = self._try(node_name, tokens, time.monotonic() - start)
+            if wait_ms <= 0:
+                break
+            time.sleep(self._sleep_seconds(wait_ms))
+        waited = time.monotonic() - start
+        if waited > 0.5:
+            logger.info(f"⏳ LLM限流排队 {waited:.2f}s: {node_name}")
+        return waited
+
+    async def aacquire(self, node_name: str, tokens: int) -> float:
+        """acquire 的异步版本，排队期间不阻塞事件循环"""
+        if not self.enabled:
+            return 0.0
+        start = time.monotonic()
+        while True:
+            wait_ms = await asyncio.to_thread(self._try, node_name, tokens, time.monotonic() - start)
+            if wait_ms <= 0:
+                break
+            await asyncio.sleep(self._sleep_seconds(wait_ms))
+        waited = time.monotonic() - start
+        if waited > 0.5:
+            logger.info(f"⏳ LLM限流排队 {waited:.2f}s: {node_name}")
+        return waited
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """按节点返回调用次数、排队次数、平均/最长等待时间（毫秒）"""
+        raw = self.connection.hgetall(self.stats_key)
+        stats: Dict[str, Dict[str, Any]] = {}
+        for field, value in raw.items():
+            field = field.decode() if isinstance(field, bytes) else field
+            node_name, _, kind = field.rpartition(":")
+            stats.setdefault(node_name, {"calls": 0, "throttled": 0, "wait_ms": 0, "max_wait_ms": 0})[kind] = int(value)
+        for node_stats in stats.values():
+            calls = node_stats["calls"]
+            node_stats["avg_wait_ms"] = round(node_stats["wait_ms"] / calls, 1) if calls else 0.0
+        return stats
+
+
+# 全局LLM限流器（所有 worker 共享同一组令牌桶）
+llm_rate_limiter = TokenBucketRateLimiter(
+    redis_conn,
+    requests_per_minute=settings.LLM_RATE_LIMIT_RPM,
+    tokens_per_minute=settings.LLM_RATE_LIMIT_TPM,
+    output_tokens=settings.LLM_RATE_LIMIT_OUTPUT_TOKENS,
+    enabled=settings.LLM_RATE_LIMIT_ENABLED,
+)
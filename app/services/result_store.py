@@ -0,0 +1,220 @@
+"""
+计划结果存储
+RQ 默认把 run_agent 的返回值（最终 AgentState）pickle 后保存：每一轮的分配都内嵌完整的任务和成员副本，
+还带着 node_progress、job_id、计时等只在执行过程中有用的字段。worker 改为把规范化后的计划文档
+压缩后写入独立的键 pma:result:{job_id}（带 TTL），RQ 的返回值只保留一个很小的引用：
+
+- 任务和团队成员各只保存一份，每轮分配只记录任务ID和成员下标
+- 每轮的排期、分配、风险放在 iterations 列表中，最终的 schedule / task_allocations / risks
+  就是最后一轮，读取时还原，不重复保存
+- 丢弃执行过程中的追踪字段
+- JSON 编码后用 gzip 压缩（RESULT_COMPRESSION=none 时不压缩，读取时按内容自动识别）
+
+API 读取时还原为与原先相同结构的结果字典，客户端无需改动。
+"""
+import gzip
+import json
+from typing import Any, Dict, List, Optional
+
+from fastapi.encoders import jsonable_encoder
+from loguru import logger
+from pydantic import BaseModel
+from redis import Redis
+
+from app.core.config import settings
+from app.services.task_queue import redis_conn
+
+RESULT_DOCUMENT_VERSION = 1
+COMPRESSIONS = ("gzip", "none")
+GZIP_MAGIC = b"\x1f\x8b"
+
+# 只在执行过程中有用的追踪字段，不写入结果文档
+TRANSIENT_FIELDS = (
+    "job_id", "current_node", "node_start_time", "total_start_time", "total_end_time",
+    "completed_nodes", "node_progress", "overall_status",
+)
+
+# 最终结果就是最后一轮，读取时从 iterations 还原
+FINAL_FIELDS = ("schedule", "task_allocations", "risks")
+
+# 每轮结果的状态字段 -> 条目列表字段
+ITERATION_FIELDS = {
+    "schedule_iteration": "schedule",
+    "task_allocations_iteration": "task_allocations",
+    "risks_iteration": "risks",
+}
+
+
+def _json(value: Any) -> Any:
+    """转换为 JSON 兼容类型（Pydantic 对象用 model_dump，比逐层 jsonable_encoder 快得多）"""
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json")
+    if isinstance(value, dict):
+        return {str(key): _json(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_json(item) for item in value]
+    return jsonable_encoder(value)
+
+
+def _items(value: Any, name: str) -> List[Any]:
+    """读取已转换为 JSON 兼容类型的 {name: [...]} 结构中的条目列表"""
+    return (value or {}).get(name) or []
+
+
+def normalize(state: Dict[str, Any]) -> Dict[str, Any]:
+    """把最终 AgentState 转换为规范化的计划文档（JSON 兼容）"""
+    document = {
+        name: _json(value) for name, value in state.items()
+        if name not in TRANSIENT_FIELDS and name not in FINAL_FIELDS and name not in ITERATION_FIELDS
+    }
+    document["version"] = RESULT_DOCUMENT_VERSION
+
+    tasks = {task["id"]: task for task in _items(document.get("tasks"), "tasks")}
+    members = _items(document.get("team"), "team_members")
+    member_index = {(member["name"], member["profile"]): index for index, member in enumerate(members)}
+
+    iterations = []
+    rounds = max((len(state.get(field) or []) for field in ITERATION_FIELDS), default=0)
+    for number in range(rounds):
+        iteration = {}
+        for field, items_field in ITERATION_FIELDS.items():
+            values = state.get(field) or []
+            if number >= len(values):
+                continue
+            items = _items(_json(values[number]), items_field)
+            if field == "task_allocations_iteration":
+                items = [_allocation_ref(item, tasks, member_index) for item in items]
+            iteration[items_field] = items
+        iterations.append(iteration)
+    document["iterations"] = iterations
+    return document
+
+
+def _allocation_ref(allocation: Dict[str, Any], tasks: Dict[str, Any], member_index: Dict[tuple, int]) -> Dict[str, Any]:
+    """分配中的任务和成员与文档中保存的一致时只记录引用，否则原样保存"""
+    task, member = allocation["task"], allocation["team_member"]
+    ref = {}
+    if tasks.get(task["id"]) == task:
+        ref["task_id"] = task["id"]
+    else:
+        ref["task"] = task
+    index = member_index.get((member["name"], member["profile"]))
+    if index is not None:
+        ref["member"] = index
+    else:
+        ref["team_member"] = member
+    return ref
+
+
+class StoredPlanResult(dict):
+    """从结果存储还原的结果：值已经是 JSON 兼容类型，编码响应时不需要再经过 jsonable_encoder"""
+
+
+def denormalize(document: Dict[str, Any]) -> StoredPlanResult:
+    """把计划文档还原为与最终 AgentState 相同结构的结果字典（任务和成员对象被各轮共享，不复制）"""
+    result = StoredPlanResult((name, value) for name, value in document.items() if name not in ("version", "iterations"))
+    tasks = {task["id"]: task for task in _items(result.get("tasks"), "tasks")}
+    members = _items(result.get("team"), "team_members")
+
+    for field, items_field in ITERATION_FIELDS.items():
+        result[field] = []
+    for iteration in document.get("iterations", []):
+        for field, items_field in ITERATION_FIELDS.items():
+            if items_field not in iteration:
+                continue
+            items = iteration[items_field]
+            if field == "task_allocations_iteration":
+                items = [
+                    {
+                        "task": allocation["task"] if "task" in allocation else tasks[allocation["task_id"]],
+                        "team_member": allocation["team_member"] if "team_member" in allocation else members[allocation["member"]],
+                    }
+                    for allocation in items
+                ]
+            result[field].append({items_field: items})
+
+    for final, field in zip(FINAL_FIELDS, ITERATION_FIELDS):
+        result[final] = result[field][-1] if result[field] else None
+    return result
+
+
+def is_result_reference(value: Any) -> bool:
+    """RQ 返回值是否为 PlanResultStore.save() 返回的引用（文档已过期时只剩引用）"""
+    return isinstance(value, dict) and "result_key" in value and "tasks" not in value
+
+
+class PlanResultStore:
+    """
+    计划结果文档的读写
+
+    worker 用同步连接保存，API 用异步连接读取（aload）。
+    """
+
+    def __init__(
+        self,
+        connection: Redis,
+        ttl: int,
+        compression: str = "gzip",
+        level: int = 6,
+        enabled: bool = True,
+        prefix: str = "pma:result",
+    ):
+        if compression not in COMPRESSIONS:
+            raise ValueError(f"RESULT_COMPRESSION must be one of {COMPRESSIONS}, got {compression}")
+        self.connection = connection
+        self.ttl = ttl
+        self.compression = compression
+        self.level = level
+        self.enabled = enabled
+        self.prefix = prefix
+
+    def key(self, job_id: str) -> str:
+        return f"{self.prefix}:{job_id}"
+
+    def encode(self, state: Dict[str, Any]) -> bytes:
+        raw = json.dumps(normalize(state), ensure_ascii=False, separators=(",", ":")).encode()
+        if self.compression == "gzip":
+            return gzip.compress(raw, compresslevel=self.level, mtime=0)
+        return raw
+
+    @staticmethod
+    def decode(payload: bytes) -> StoredPlanResult:
+        if payload[:2] == GZIP_MAGIC:
+            payload = gzip.decompress(payload)
+        return denormalize(json.loads(payload))
+
+    def save(self, job_id: str, state: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        保存任务的计划文档
+
+        Returns:
+            代替完整状态作为 RQ 返回值的引用；未启用或保存失败时返回None（调用方返回完整状态）
+        """
+        if not self.enabled or not job_id:
+            return None
+        try:
+            payload = self.encode(state)
+            self.connection.set(self.key(job_id), payload, ex=self.ttl)
+        except Exception as e:
+            logger.warning(f"Failed to store plan result for job {job_id}: {e}")
+            return None
+        return {"job_id": job_id, "result_key": self.key(job_id), "size": len(payload)}
+
+    def load(self, job_id: str) -> Optional[Dict[str, Any]]:
+        payload = self.connection.get(self.key(job_id))
+        return self.decode(payload) if payload else None
+
+    async def aload(self, connection, job_id: str) -> Optional[Dict[str, Any]]:
+        """load 的异步版本（connection 为 redis.asyncio.Redis）"""
+        payload = await connection.get(self.key(job_id))
+        return self.decode(payload) if payload else None
+
+
+# 全局计划结果存储
+plan_result_store = PlanResultStore(
+    redis_conn,
+    ttl=settings.RESULT_TTL_SECONDS,
+    compression=settings.RESULT_COMPRESSION,
+    level=settings.RESULT_COMPRESSION_LEVEL,
+    enabled=settings.RESULT_STORE_ENABLED,
+)
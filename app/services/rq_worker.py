@@ -0,0 +1,22 @@
+"""
+fork 模式的 RQ worker
+
+在 RQ 保存任务结果（或失败信息）之后发布任务结束事件，
+订阅进度频道的 API 进程收到结束事件时，结果一定已经可以读取。
+"""
+from rq import Worker
+from rq.job import JobStatus
+
+from app.services.progress import publish_terminal_event
+
+
+class ProgressWorker(Worker):
+    """任务成功/失败处理完成后，在任务的进度频道上发布结束事件"""
+
+    def handle_job_success(self, job, queue, started_job_registry):
+        super().handle_job_success(job, queue, started_job_registry)
+        publish_terminal_event(self.connection, job.id, JobStatus.FINISHED.value)
+
+    def handle_job_failure(self, job, queue, started_job_registry=None, exc_string=''):
+        super().handle_job_failure(job, queue, started_job_registry=started_job_registry, exc_string=exc_string)
+        publish_terminal_event(self.connection, job.id, JobStatus.FAILED.value)
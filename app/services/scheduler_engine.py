@@ -0,0 +1,197 @@
+"""
+本地关键路径调度引擎
+基于依赖关系图（networkx）计算每个任务的最早/最晚开始时间、时差和关键路径，
+直接生成与 AI 调度相同的 Schedule/TaskSchedule 结构，不需要任何 LLM 调用。
+"""
+import uuid
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from typing import Dict, List, Optional
+
+import networkx as nx
+from loguru import logger
+
+from app.schemas.plan import DependencyList, Schedule, TaskList
+from app.schemas.task import TaskSchedule
+
+SCHEDULER_MODES = ("local", "llm", "hybrid")
+
+
+@dataclass
+class TaskTiming:
+    """单个任务的关键路径计算结果（单位：天，相对项目开始日）"""
+    earliest_start: int
+    earliest_finish: int
+    latest_start: int
+    latest_finish: int
+
+    @property
+    def slack(self) -> int:
+        return self.latest_start - self.earliest_start
+
+    @property
+    def is_critical(self) -> bool:
+        return self.slack == 0
+
+
+@dataclass
+class CriticalPathResult:
+    """关键路径调度结果"""
+    schedule: Schedule
+    timings: Dict[uuid.UUID, TaskTiming] = field(default_factory=dict)
+    critical_path: List[uuid.UUID] = field(default_factory=list)
+    project_duration: int = 0
+
+
+class CriticalPathScheduler:
+    """
+    关键路径法（CPM）调度器
+
+    - 任务工期取 estimated_day（至少1天），依赖关系为完成-开始（FS）
+    - 依赖中引用未知任务的边会被忽略，形成环的边会被移除并记录警告
+    - 日期均为日历日，结束日期包含当天
+    """
+
+    @staticmethod
+    def _duration(estimated_day: int) -> int:
+        return max(int(estimated_day or 0), 1)
+
+    def build_graph(self, tasks: TaskList, dependencies: Optional[DependencyList]) -> nx.DiGraph:
+        graph = nx.DiGraph()
+        for task in tasks.tasks:
+            graph.add_node(task.id, duration=self._duration(task.estimated_day))
+
+        for dep in (dependencies.dependencies if dependencies else []):
+            if dep.source in graph and dep.target in graph and dep.source != dep.target:
+                graph.add_edge(dep.source, dep.target)
+            else:
+                logger.warning(f"Ignoring invalid dependency: {dep.source} -> {dep.target}")
+
+        # 移除环中的边，保证可以拓扑排序
+        while True:
+            try:
+                cycle = nx.find_cycle(graph)
+            except nx.NetworkXNoCycle:
+                break
+            source, target = cycle[-1][:2]
+            logger.warning(f"Dependency cycle detected, dropping edge {source} -> {target}")
+            graph.remove_edge(source, target)
+
+        return graph
+
+    def schedule(
+        self,
+        tasks: TaskList,
+        dependencies: Optional[DependencyList],
+        start_date: Optional[date] = None,
+    ) -> CriticalPathResult:
+        """
+        计算关键路径并生成调度
+
+        Args:
+            tasks: 完整任务列表
+            dependencies: 完整依赖关系列表（可为空）
+            start_date: 项目开始日期，默认为今天
+        """
+        start_date = start_date or date.today()
+        graph = self.build_graph(tasks, dependencies)
+        order = list(nx.topological_sort(graph))
+
+        # 正向计算最早开始/完成
+        earliest_start: Dict[uuid.UUID, int] = {}
+        earliest_finish: Dict[uuid.UUID, int] = {}
+        for node in order:
+            es = max((earliest_finish[p] for p in graph.predecessors(node)), default=0)
+            earliest_start[node] = es
+            earliest_finish[node] = es + graph.nodes[node]["duration"]
+
+        project_duration = max(earliest_finish.values(), default=0)
+
+        # 反向计算最晚开始/完成
+        latest_start: Dict[uuid.UUID, int] = {}
+        latest_finish: Dict[uuid.UUID, int] = {}
+        for node in reversed(order):
+            lf = min((latest_start[s] for s in graph.successors(node)), default=project_duration)
+            latest_finish[node] = lf
+            latest_start[node] = lf - graph.nodes[node]["duration"]
+
+        timings = {
+            node: TaskTiming(earliest_start[node], earliest_finish[node], latest_start[node], latest_finish[node])
+            for node in order
+        }
+
+        # 关键路径：沿零时差任务，从起点走到项目终点
+        critical_path: List[uuid.UUID] = []
+        current = next(
+            (n for n in order if timings[n].is_critical and timings[n].earliest_start == 0),
+            None,
+        )
+        while current is not None:
+            critical_path.append(current)
+            current = next(
+                (
+                    s for s in graph.successors(current)
+                    if timings[s].is_critical and timings[s].earliest_start == timings[current].earliest_finish
+                ),
+                None,
+            )
+
+        names = {task.id: task.task_name for task in tasks.tasks}
+        schedule = Schedule(schedule=[
+            TaskSchedule(
+                task_id=node,
+                start_date=(start_date + timedelta(days=earliest_start[node])).isoformat(),
+                end_date=(start_date + timedelta(days=earliest_finish[node] - 1)).isoformat(),
+                gantt_chart_format=(
+                    f"{names[node]}: {(start_date + timedelta(days=earliest_start[node])).isoformat()}, "
+                    f"{graph.nodes[node]['duration']}d"
+                ),
+            )
+            for node in order
+        ])
+
+        logger.info(
+            f"Critical path scheduled {len(order)} tasks in {project_duration} days, "
+            f"{len(critical_path)} critical tasks"
+        )
+        return CriticalPathResult(
+            schedule=schedule,
+            timings=timings,
+            critical_path=critical_path,
+            project_duration=project_duration,
+        )
+
+    @staticmethod
+    def find_violations(
+        schedule: Schedule,
+        tasks: TaskList,
+        dependencies: Optional[DependencyList],
+    ) -> List[str]:
+        """
+        检查调度是否完整且遵守所有依赖关系
+
+        Returns:
+            违规描述列表，为空表示调度有效
+        """
+        violations: List[str] = []
+        by_task = {}
+        for item in schedule.schedule:
+            try:
+                by_task[item.task_id] = (date.fromisoformat(item.start_date), date.fromisoformat(item.end_date))
+            except ValueError:
+                violations.append(f"Invalid dates for task {item.task_id}: {item.start_date} - {item.end_date}")
+
+        for task in tasks.tasks:
+            if task.id not in by_task:
+                violations.append(f"Task {task.id} is not scheduled")
+
+        for dep in (dependencies.dependencies if dependencies else []):
+            if dep.source in by_task and dep.target in by_task:
+                if by_task[dep.target][0] <= by_task[dep.source][1]:
+                    violations.append(f"Task {dep.target} starts before dependency {dep.source} finishes")
+
+        return violations
+
+
+# 全局调度引擎实例
+scheduler_engine = CriticalPathScheduler()
@@ -0,0 +1,136 @@
+"""
+相同请求合并（single-flight）
+同一时刻多个任务发出完全相同的 LLM 请求时，只有第一个（leader）真正调用模型，
+其他请求（follower）等待并共享同一个结果：
+
+- 进程内：线程之间通过 concurrent.futures.Future 共享，协程之间共享同一个 asyncio.Task
+- 跨进程（可选）：leader 在 Redis 中持有 SET NX 锁，其他 worker 的相同请求轮询 LLM 响应缓存，
+  等到 leader 写入结果后直接读取；锁被释放（leader 失败）或等待超时后自行调用模型
+"""
+import asyncio
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from loguru import logger
+from redis import Redis
+
+
+class SingleFlight:
+    """进程内的请求合并，结果和异常都会传递给所有等待者"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[str, Future] = {}
+        self._acalls: Dict[str, asyncio.Task] = {}
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        """
+        执行 fn，相同 key 的并发调用只执行一次
+
+        Returns:
+            (结果, 是否为共享的结果)
+        """
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+
+        if not leader:
+            return future.result(), True
+
+        try:
+            future.set_result(fn())
+        except BaseException as e:
+            future.set_exception(e)
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+        return future.result(), False
+
+    async def ado(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """
+        do 的异步版本（同一个事件循环内的协程之间合并）
+
+        共享的调用在独立的 Task 中执行，某个等待者被取消不会影响其他等待者。
+        """
+        task = self._acalls.get(key)
+        shared = task is not None
+        if not shared:
+            task = self._acalls[key] = asyncio.ensure_future(fn())
+
+            def _forget(done: asyncio.Task) -> None:
+                if self._acalls.get(key) is done:
+                    del self._acalls[key]
+
+            task.add_done_callback(_forget)
+        return await asyncio.shield(task), shared
+
+    def in_flight(self) -> int:
+        return len(self._calls) + len(self._acalls)
+
+
+class RedisFlightLock:
+    """跨 worker 的 leader 锁（SET NX PX），锁的值为持有者标识，只有持有者可以释放"""
+
+    RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+    def __init__(self, connection: Redis, ttl: float, poll_interval: float = 0.2, prefix: str = "pma:llm_flight"):
+        self.connection = connection
+        self.ttl = ttl
+        self.poll_interval = poll_interval
+        self.prefix = prefix
+
+    def _key(self, key: str) -> str:
+        return f"{self.prefix}:{key.rsplit(':', 1)[-1]}"
+
+    def acquire(self, key: str, token: str) -> bool:
+        """成为 leader 返回 True；Redis 不可用时也返回 True（退化为各自调用）"""
+        try:
+            return bool(self.connection.set(self._key(key), token, nx=True, px=int(self.ttl * 1000)))
+        except Exception as e:
+            logger.warning(f"Flight lock unavailable, calling model directly: {e}")
+            return True
+
+    def release(self, key: str, token: str) -> None:
+        try:
+            self.connection.register_script(self.RELEASE_SCRIPT)(keys=[self._key(key)], args=[token])
+        except Exception as e:
+            logger.warning(f"Failed to release flight lock: {e}")
+
+    def held(self, key: str) -> bool:
+        try:
+            return bool(self.connection.exists(self._key(key)))
+        except Exception:
+            return False
+
+    def wait(self, key: str, peek: Callable[[], Any]) -> Optional[Any]:
+        """等待其他 worker 的 leader 写入结果；锁释放或超时仍没有结果时返回 None"""
+        deadline = time.monotonic() + self.ttl
+        while time.monotonic() < deadline:
+            result = peek()
+            if result is not None:
+                return result
+            if not self.held(key):
+                return peek()
+            time.sleep(self.poll_interval)
+        return None
+
+    async def await_result(self, key: str, peek: Callable[[], Any]) -> Optional[Any]:
+        """wait 的异步版本，Redis 访问放到线程中执行"""
+        deadline = time.monotonic() + self.ttl
+        while time.monotonic() < deadline:
+            result = await asyncio.to_thread(peek)
+            if result is not None:
+                return result
+            if not await asyncio.to_thread(self.held, key):
+                return await asyncio.to_thread(peek)
+            await asyncio.sleep(self.poll_interval)
+        return None
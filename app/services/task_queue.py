@@ -2,118 +2,63 @@ from redis import Redis
 from rq import Queue
 from rq.job import Job
 from typing import Optional, Dict, Any
+import threading
 import time
-import json
 
 from app.core.config import settings
+from app.services.progress import ProgressPublisher, read_progress
 
 # Global Redis connection and RQ Queue
 redis_conn = Redis(host=settings.REDIS_HOST, port=settings.REDIS_PORT)
 task_queue = Queue(connection=redis_conn)
 
-def update_job_progress(job_id: str, agent_state: Dict[str, Any]) -> bool:
+_publishers: Dict[str, ProgressPublisher] = {}
+_publishers_lock = threading.Lock()
+
+def get_progress_publisher(job_id: str) -> ProgressPublisher:
+    """获取任务的进度发布器（每个任务在本进程内只创建一个）"""
+    # eta 模块依赖本模块的 redis_conn，在函数内导入避免循环导入
+    from app.services.eta import eta_model
+    
+    with _publishers_lock:
+        publisher = _publishers.get(job_id)
+        if publisher is None:
+            publisher = ProgressPublisher(
+                job_id,
+                redis_conn,
+                debounce=settings.PROGRESS_DEBOUNCE_SECONDS,
+                ttl=settings.PROGRESS_TTL_SECONDS,
+                maxlen=settings.PROGRESS_STREAM_MAXLEN,
+                estimator=eta_model,
+            )
+            _publishers[job_id] = publisher
+        return publisher
+
+def update_job_progress(job_id: str, agent_state: Dict[str, Any], force: bool = False) -> bool:
     """
-    更新任务的实时进度信息到job.meta
+    更新任务的实时进度信息到进度哈希 pma:progress:{job_id}
     
     Args:
         job_id: 任务ID
         agent_state: AgentState字典，包含真实的执行状态
+        force: 忽略防抖窗口立即写入
         
     Returns:
         更新是否成功
     """
     try:
-        job = Job.fetch(job_id, connection=redis_conn)
-        
-        if job is None:
-            return False
-        
-        # === 计算真实的进度百分比 ===
-        completed_nodes = agent_state.get("completed_nodes", [])
-        current_node = agent_state.get("current_node")
-        
-        # 定义所有LangGraph节点（必须与实际执行顺序一致）
-        all_nodes = [
-            "task_generation",     # 任务生成
-            "analyze_dependencies", # 依赖分析  
-            "schedule_tasks",      # 任务调度
-            "allocate_team",       # 团队分配
-            "assess_risk",         # 风险评估
-            "generate_insights"    # 洞察生成
-        ]
-        
-        # 计算进度百分比
-        if agent_state.get("overall_status") == "completed":
-            progress = 100
-        elif not completed_nodes and not current_node:
-            progress = 0
-        else:
-            # 基于完成的节点数量计算进度
-            completed_count = len([node for node in completed_nodes if node in all_nodes])
-            
-            # 如果当前节点正在执行且不在已完成列表中，给它50%的权重
-            if current_node and current_node in all_nodes and current_node not in completed_nodes:
-                current_node_progress = 0.5  # 正在执行的节点算50%完成
-            else:
-                current_node_progress = 0
-                
-            # 计算总进度 = (已完成节点数 + 当前节点进度) / 总节点数 * 100
-            total_progress = (completed_count + current_node_progress) / len(all_nodes)
-            progress = min(int(total_progress * 100), 95)  # 最多95%，100%留给真正完成
-        
-        # === 生成用户友好的显示信息 ===
-        node_display_map = {
-            "task_generation": "🧠 智能任务提取",
-            "analyze_dependencies": "🔗 依赖关系分析", 
-            "schedule_tasks": "📅 智能任务调度",
-            "allocate_team": "👥 团队智能分配",
-            "assess_risk": "⚠️ 风险评估分析",
-            "generate_insights": "✨ 方案优化洞察"
-        }
-        
-        current_node_display = node_display_map.get(current_node, current_node) if current_node else "处理中"
-        
-        # 提取关键的状态信息（避免存储过多数据）
-        progress_info = {
-            "current_node": current_node,
-            "current_node_display": current_node_display,
-            "node_start_time": agent_state.get("node_start_time"),
-            "total_start_time": agent_state.get("total_start_time"),
-            "completed_nodes": completed_nodes,
-            "node_progress": agent_state.get("node_progress", {}),
-            "overall_status": agent_state.get("overall_status", "unknown"),
-            "iteration_number": agent_state.get("iteration_number", 1),
-            "last_updated": time.time(),
-            
-            # === 新增：真实进度信息 ===
-            "progress": progress,  # 真实进度百分比
-            "total_nodes": len(all_nodes),  # 总节点数
-            "completed_count": len(completed_nodes),  # 已完成节点数
-            "langgraph_flow": True,  # 标记这是真实的LangGraph流程
-            
-            # 计算执行时间
-            "total_elapsed_time": int(time.time() - agent_state.get("total_start_time", time.time())) if agent_state.get("total_start_time") else 0,
-            
-            # 节点详细信息
-            "node_details": f"正在执行: {current_node_display}" if current_node else "准备中...",
-            
-            # 迭代信息（如果有多轮迭代）
-            "iteration_info": f"第 {agent_state.get('iteration_number', 1)} 轮迭代" if agent_state.get("iteration_number", 1) > 1 else ""
-        }
-        
-        # 更新job.meta
-        if not hasattr(job, 'meta') or job.meta is None:
-            job.meta = {}
-        
-        job.meta["agent_state"] = progress_info
-        job.save_meta()
-        
-        return True
-        
+        return get_progress_publisher(job_id).publish(agent_state, force=force)
     except Exception as e:
         print(f"Failed to update job progress: {e}")
         return False
 
+def close_job_progress(job_id: str) -> None:
+    """任务结束时写入暂存的进度更新并释放发布器"""
+    with _publishers_lock:
+        publisher = _publishers.pop(job_id, None)
+    if publisher is not None:
+        publisher.flush()
+
 def get_job_agent_state(job_id: str) -> Optional[Dict[str, Any]]:
     """
     获取任务的AgentState信息
@@ -125,12 +70,7 @@ def get_job_agent_state(job_id: str) -> Optional[Dict[str, Any]]:
         AgentState信息字典，如果不存在则返回None
     """
     try:
-        job = Job.fetch(job_id, connection=redis_conn)
-        
-        if job is None or not hasattr(job, 'meta') or job.meta is None:
-            return None
-            
-        return job.meta.get("agent_state")
+        return read_progress(redis_conn, job_id)
         
     except Exception as e:
         print(f"Failed to get job agent state: {e}")
@@ -194,6 +134,35 @@ def get_job_detailed_status(job_id: str) -> Optional[Dict[str, Any]]:
             "error": f"Failed to fetch job status: {str(e)}"
         }
 
+def resume_job(job_id: str) -> Optional[Job]:
+    """
+    将失败或已失去worker的任务重新入队
+
+    任务保持原有ID重新入队，worker 执行时会发现该 job_id 的 LangGraph 检查点，
+    并从最后完成的节点继续执行，而不是从头开始。
+    
+    Args:
+        job_id: 任务ID
+        
+    Returns:
+        重新入队的任务；任务不可恢复（未失败或不存在）时返回None
+    """
+    try:
+        job = Job.fetch(job_id, connection=redis_conn)
+    except Exception:
+        return None
+    
+    # worker 崩溃后遗留的执行中任务，心跳过期后会被移入失败队列
+    if job.is_started:
+        task_queue.started_job_registry.cleanup()
+        job.refresh()
+    
+    if not job.is_failed:
+        return None
+    
+    job.requeue()
+    return job
+
 def get_queue_info() -> Dict[str, Any]:
     """
     获取队列的整体信息
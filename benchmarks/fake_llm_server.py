@@ -0,0 +1,351 @@
+"""
+本地 OpenAI 兼容 LLM 替身服务（压测用）
+
+实现 chat completions 接口（OpenAI 路径 /v1/chat/completions 和 Azure 路径
+/openai/deployments/{deployment}/chat/completions），按请求返回符合 schema 的结果：
+
+- tools / tool_choice（function_calling）：按函数名（SimpleTaskList、SimpleSchedule 等）返回 tool_calls
+- response_format=json_schema：按 schema 名称返回 JSON 内容
+- response_format=json_object 或普通文本：按 prompt 内容判断节点（任务提取返回任务 JSON，洞察生成返回文本）
+
+依赖、调度、分配、风险结果引用 prompt 中出现的任务ID（task-N）和团队成员姓名，
+能通过 model_adapter 的转换。延迟、token 数和错误率可配置，不需要网络和 API Key。
+
+用法：
+    python benchmarks/fake_llm_server.py --port 8001 --latency lognormal:1.5,0.6 --tokens-per-second 80 --error-rate 0.02
+    # 然后在 .env 中设置 OPENAI_API_BASE=http://127.0.0.1:8001/v1（MODEL_PROVIDER=OpenAI）
+
+延迟分布格式：fixed:秒 | uniform:最小,最大 | lognormal:中位数,sigma | exp:均值
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import re
+import sys
+import time
+import uuid
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+ERROR_KINDS = ("429", "500", "503", "timeout")
+
+TASK_NAMES = [
+    ("需求分析", "梳理业务需求并形成需求规格说明"),
+    ("架构设计", "设计系统整体架构和模块划分"),
+    ("数据库设计", "设计数据模型和表结构"),
+    ("后端接口开发", "实现核心业务接口"),
+    ("前端页面开发", "实现主要页面和交互"),
+    ("集成测试", "联调前后端并进行集成测试"),
+    ("性能优化", "定位瓶颈并进行性能优化"),
+    ("部署上线", "部署到生产环境并完成上线检查"),
+]
+
+
+def parse_latency(spec: str) -> Callable[[random.Random], float]:
+    """解析延迟分布，返回采样函数（秒）"""
+    kind, _, raw = spec.partition(":")
+    values = [float(value) for value in raw.split(",") if value]
+    if kind == "fixed" and len(values) == 1:
+        return lambda rng: values[0]
+    if kind == "uniform" and len(values) == 2:
+        return lambda rng: rng.uniform(values[0], values[1])
+    if kind == "lognormal" and len(values) == 2:
+        median, sigma = values
+        return lambda rng: rng.lognormvariate(math.log(median), sigma)
+    if kind == "exp" and len(values) == 1:
+        return lambda rng: rng.expovariate(1 / values[0])
+    raise ValueError(f"Invalid latency distribution: {spec}")
+
+
+@dataclass
+class FakeLLMConfig:
+    latency: str = "lognormal:1.0,0.5"  # 首 token 延迟分布
+    tokens_per_second: float = 0.0  # 输出速度，0 表示输出不额外耗时
+    completion_tokens: int = 0  # 至少报告的输出 token 数（同时计入输出耗时）
+    tasks: int = 8  # 任务提取返回的任务数
+    error_rate: float = 0.0
+    errors: Tuple[str, ...] = ("429", "500", "503")
+    timeout_seconds: float = 120.0  # 注入 timeout 错误时挂起的时间
+    seed: Optional[int] = None
+
+
+@dataclass
+class FakeLLMStats:
+    requests: int = 0
+    by_kind: Counter = field(default_factory=Counter)
+    errors: Counter = field(default_factory=Counter)
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+
+
+def _text(messages: List[Dict[str, Any]]) -> str:
+    parts = []
+    for message in messages:
+        content = message.get("content")
+        if isinstance(content, list):
+            content = " ".join(part.get("text", "") for part in content if isinstance(part, dict))
+        parts.append(content or "")
+    return "\n".join(parts)
+
+
+def _task_ids(prompt: str, default: int) -> List[str]:
+    ids = list(dict.fromkeys(re.findall(r"task-\d+", prompt)))
+    return ids or [f"task-{index}" for index in range(1, default + 1)]
+
+
+def _member_names(prompt: str) -> List[str]:
+    names = re.findall(r"""name=['"]([^'"]+)['"]|['"]name['"]:\s*['"]([^'"]+)['"]""", prompt)
+    members = list(dict.fromkeys(first or second for first, second in names))
+    return members or ["成员A", "成员B"]
+
+
+def build_payload(kind: str, prompt: str, rng: random.Random, task_count: int) -> Dict[str, Any]:
+    """按输出类型（schema 名称）构造符合 schema 的结果"""
+    if kind == "SimpleTaskList":
+        return {"tasks": [
+            {
+                "id": f"task-{index + 1}",
+                "task_name": TASK_NAMES[index % len(TASK_NAMES)][0] + ("" if index < len(TASK_NAMES) else f" {index + 1}"),
+                "task_description": TASK_NAMES[index % len(TASK_NAMES)][1],
+                "estimated_day": rng.randint(1, 8),
+            }
+            for index in range(task_count)
+        ]}
+
+    ids = _task_ids(prompt, task_count)
+    if kind == "SimpleDependencyList":
+        return {"dependencies": [{"source": source, "target": target} for source, target in zip(ids, ids[1:])]}
+    if kind == "SimpleSchedule":
+        schedule, start = [], date.today()
+        for task_id in ids:
+            days = rng.randint(1, 5)
+            end = start + timedelta(days=days)
+            schedule.append({
+                "task_id": task_id,
+                "start_date": start.isoformat(),
+                "end_date": end.isoformat(),
+                "gantt_chart_format": f"{task_id}: {start.isoformat()}, {days}d",
+            })
+            start = end
+        return {"schedule": schedule}
+    if kind == "SimpleTaskAllocationList":
+        members = _member_names(prompt)
+        return {"task_allocations": [
+            {"task_id": task_id, "team_member_name": members[index % len(members)]} for index, task_id in enumerate(ids)
+        ]}
+    if kind == "SimpleRiskList":
+        return {"risks": [{"risk_name": f"{task_id} 延期风险", "score": str(rng.randint(1, 9))} for task_id in ids]}
+    raise KeyError(kind)
+
+
+def _synthesize(schema: Dict[str, Any], defs: Dict[str, Any]) -> Any:
+    """未知 schema：按 JSON Schema 生成最小的合法值"""
+    if "$ref" in schema:
+        return _synthesize(defs[schema["$ref"].rsplit("/", 1)[-1]], defs)
+    if "anyOf" in schema:
+        return _synthesize(schema["anyOf"][0], defs)
+    kind = schema.get("type")
+    if kind == "object" or "properties" in schema:
+        return {name: _synthesize(prop, defs) for name, prop in schema.get("properties", {}).items()}
+    if kind == "array":
+        return [_synthesize(schema.get("items", {}), defs)]
+    return {"integer": 1, "number": 1.0, "boolean": True, "null": None}.get(kind, "x")
+
+
+def _guess_kind(prompt: str) -> str:
+    """没有 schema 名称时根据 prompt 判断节点"""
+    if '"tasks"' in prompt or "任务名称" in prompt:
+        return "SimpleTaskList"
+    for keyword, kind in (("依赖", "SimpleDependencyList"), ("风险", "SimpleRiskList"),
+                          ("分配", "SimpleTaskAllocationList"), ("调度", "SimpleSchedule")):
+        if keyword in prompt[:200]:
+            return kind
+    return "text"
+
+
+class FakeLLM:
+    """请求处理：判断输出类型、构造结果、模拟延迟和错误"""
+
+    def __init__(self, config: FakeLLMConfig):
+        self.config = config
+        self.sample_latency = parse_latency(config.latency)
+        self.rng = random.Random(config.seed)
+        self.stats = FakeLLMStats()
+
+    def _output(self, body: Dict[str, Any], prompt: str) -> Tuple[str, Dict[str, Any]]:
+        """返回 (输出类型, message)"""
+        tools = body.get("tools") or []
+        if tools:
+            function = tools[0]["function"]
+            name = function["name"]
+            try:
+                arguments = build_payload(name, prompt, self.rng, self.config.tasks)
+            except KeyError:
+                arguments = _synthesize(function.get("parameters", {}), function.get("parameters", {}).get("$defs", {}))
+            return name, {
+                "role": "assistant",
+                "content": None,
+                "tool_calls": [{
+                    "id": f"call_{uuid.uuid4().hex[:24]}",
+                    "type": "function",
+                    "function": {"name": name, "arguments": json.dumps(arguments, ensure_ascii=False)},
+                }],
+            }
+
+        response_format = body.get("response_format") or {}
+        if response_format.get("type") == "json_schema":
+            spec = response_format["json_schema"]
+            name = spec.get("name", "")
+            try:
+                content = build_payload(name, prompt, self.rng, self.config.tasks)
+            except KeyError:
+                content = _synthesize(spec.get("schema", {}), spec.get("schema", {}).get("$defs", {}))
+            return name, {"role": "assistant", "content": json.dumps(content, ensure_ascii=False)}
+
+        kind = _guess_kind(prompt)
+        if kind == "text":
+            content = "1. 关键路径上的任务可以适当并行以缩短工期。\n2. 均衡团队成员的工作负载，避免单人承担过多高风险任务。"
+        else:
+            content = json.dumps(build_payload(kind, prompt, self.rng, self.config.tasks), ensure_ascii=False)
+        return kind, {"role": "assistant", "content": content}
+
+    def _error(self) -> Optional[str]:
+        if self.config.error_rate and self.rng.random() < self.config.error_rate:
+            return self.rng.choice(self.config.errors)
+        return None
+
+    async def complete(self, body: Dict[str, Any]) -> JSONResponse:
+        started = time.monotonic()
+        self.stats.requests += 1
+        error = self._error()
+        if error is not None:
+            self.stats.errors[error] += 1
+            await asyncio.sleep(self.config.timeout_seconds if error == "timeout" else self.sample_latency(self.rng) / 4)
+            status = 504 if error == "timeout" else int(error)
+            headers = {"retry-after": "1"} if status == 429 else None
+            return JSONResponse(
+                {"error": {"message": f"Injected {error} error", "type": "server_error", "code": error}},
+                status_code=status,
+                headers=headers,
+            )
+
+        prompt = _text(body.get("messages", []))
+        kind, message = self._output(body, prompt)
+        produced = message["content"] or message["tool_calls"][0]["function"]["arguments"]
+        prompt_tokens = max(1, len(prompt) // 3)
+        completion_tokens = max(self.config.completion_tokens, len(produced) // 3)
+
+        delay = self.sample_latency(self.rng)
+        if self.config.tokens_per_second > 0:
+            delay += completion_tokens / self.config.tokens_per_second
+        await asyncio.sleep(max(0.0, delay - (time.monotonic() - started)))
+
+        self.stats.by_kind[kind] += 1
+        self.stats.prompt_tokens += prompt_tokens
+        self.stats.completion_tokens += completion_tokens
+        return JSONResponse({
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "fake-llm"),
+            "choices": [{
+                "index": 0,
+                "message": message,
+                "finish_reason": "tool_calls" if "tool_calls" in message else "stop",
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        })
+
+
+def create_app(config: FakeLLMConfig) -> FastAPI:
+    fake = FakeLLM(config)
+    app = FastAPI(title="Fake OpenAI-compatible LLM")
+    app.state.fake = fake
+
+    @app.post("/v1/chat/completions")
+    @app.post("/chat/completions")
+    async def chat_completions(request: Request):
+        return await fake.complete(await request.json())
+
+    @app.post("/openai/deployments/{deployment}/chat/completions")
+    async def azure_chat_completions(deployment: str, request: Request):
+        body = await request.json()
+        body.setdefault("model", deployment)
+        return await fake.complete(body)
+
+    @app.get("/v1/models")
+    async def models():
+        return {"object": "list", "data": [{"id": "fake-llm", "object": "model", "owned_by": "local"}]}
+
+    # 连接预热（LLMClientRegistry.warm_up 对 base_url 发起 HEAD 请求）
+    @app.api_route("/v1", methods=["GET", "HEAD"])
+    @app.api_route("/", methods=["GET", "HEAD"])
+    async def root():
+        return {"status": "ok"}
+
+    @app.get("/stats")
+    async def stats():
+        return {
+            "requests": fake.stats.requests,
+            "by_kind": dict(fake.stats.by_kind),
+            "errors": dict(fake.stats.errors),
+            "prompt_tokens": fake.stats.prompt_tokens,
+            "completion_tokens": fake.stats.completion_tokens,
+        }
+
+    return app
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Local OpenAI-compatible stand-in LLM server for load tests")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--latency", default=FakeLLMConfig.latency,
+                        help="Time to first token: fixed:S | uniform:MIN,MAX | lognormal:MEDIAN,SIGMA | exp:MEAN")
+    parser.add_argument("--tokens-per-second", type=float, default=0.0, help="Output speed; 0 disables generation time")
+    parser.add_argument("--completion-tokens", type=int, default=0, help="Minimum completion tokens reported per call")
+    parser.add_argument("--tasks", type=int, default=FakeLLMConfig.tasks, help="Tasks returned by task generation")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with an error")
+    parser.add_argument("--errors", default="429,500,503", help=f"Comma-separated error kinds from {ERROR_KINDS}")
+    parser.add_argument("--timeout-seconds", type=float, default=FakeLLMConfig.timeout_seconds,
+                        help="How long an injected 'timeout' error hangs before answering 504")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    errors = tuple(kind for kind in args.errors.split(",") if kind)
+    unknown = set(errors) - set(ERROR_KINDS)
+    if unknown:
+        parser.error(f"unknown error kinds: {sorted(unknown)}")
+    parse_latency(args.latency)
+
+    config = FakeLLMConfig(
+        latency=args.latency,
+        tokens_per_second=args.tokens_per_second,
+        completion_tokens=args.completion_tokens,
+        tasks=args.tasks,
+        error_rate=args.error_rate,
+        errors=errors,
+        timeout_seconds=args.timeout_seconds,
+        seed=args.seed,
+    )
+    print(f"Fake LLM listening on http://{args.host}:{args.port}/v1 ({config})")
+    uvicorn.run(create_app(config), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,432 @@
+"""
+计划 API 端到端压测
+
+并发提交 N 个 POST /v1/plans（随机生成的项目描述和团队 CSV），每个任务挂一个 SSE 监听
+（/v1/plans/{job_id}/stream），直到收到 complete 事件，统计：
+
+- 提交延迟（POST 往返时间）
+- 排队等待（提交完成 → SSE 第一次报告 started）
+- 各节点耗时（node_progress 中的开始/结束时间）
+- 端到端耗时 p50/p95/p99（提交开始 → complete 事件）
+- 每个任务的 Redis 命令数（INFO stats / commandstats 前后差值）
+- worker 进程 CPU 时间和峰值 RSS（包括 RQ fork 出的子进程）
+
+结果写成 JSON 报告，--compare 与之前的报告对比各项指标的变化。
+
+用法（需要运行中的 API、worker 和 Redis；可配合 benchmarks/fake_llm_server.py 离线测试）：
+    python benchmarks/load_test.py --jobs 50 --concurrency 10 --output reports/load.json
+    python benchmarks/load_test.py --jobs 50 --compare reports/load.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+from redis import Redis
+
+from app.core.config import settings
+from app.services.eta import percentile
+
+try:
+    import psutil
+except ImportError:  # 可选依赖：没有 psutil 时在 Linux 上读取 /proc
+    psutil = None
+
+DOMAINS = [
+    ("在线教育平台", "课程管理、直播授课、作业批改和学习数据分析"),
+    ("电商小程序", "商品展示、购物车、订单支付和售后服务"),
+    ("智能客服系统", "多轮对话、知识库检索、工单流转和满意度统计"),
+    ("物流调度平台", "运单管理、路线规划、司机派单和实时轨迹追踪"),
+    ("医院预约系统", "科室排班、在线挂号、报告查询和消息提醒"),
+    ("企业报销系统", "发票识别、审批流、预算控制和财务对账"),
+]
+
+ROLES = [
+    ("后端工程师", "Python、FastAPI 和数据库设计"),
+    ("前端工程师", "React、Vue 和移动端适配"),
+    ("产品经理", "需求分析、原型设计和项目推进"),
+    ("测试工程师", "自动化测试和性能测试"),
+    ("UI设计师", "Figma 和设计规范"),
+    ("运维工程师", "Kubernetes、监控告警和CI/CD"),
+]
+
+NODES = ["task_generation", "analyze_dependencies", "schedule_tasks", "allocate_team", "assess_risk", "generate_insights"]
+
+
+def synthetic_description(rng: random.Random) -> str:
+    name, features = rng.choice(DOMAINS)
+    weeks = rng.randint(4, 16)
+    return f"我们计划在{weeks}周内交付一个{name}，主要功能包括{features}。需要支持{rng.randint(1, 50)}万用户，并预留后续扩展能力。"
+
+
+def synthetic_team_csv(rng: random.Random, size: int) -> str:
+    lines = ["name,profile"]
+    for index in range(size):
+        role, skills = ROLES[index % len(ROLES)]
+        lines.append(f'成员{index + 1},"{role}, {rng.randint(1, 10)}年经验, 熟悉{skills}"')
+    return "\n".join(lines) + "\n"
+
+
+@dataclass
+class JobResult:
+    index: int
+    job_id: Optional[str] = None
+    status: str = "pending"  # finished | failed | timeout | submit_error | stream_error
+    submit_seconds: Optional[float] = None
+    queue_wait_seconds: Optional[float] = None
+    end_to_end_seconds: Optional[float] = None
+    events: int = 0
+    node_seconds: Dict[str, float] = field(default_factory=dict)
+    error: Optional[str] = None
+
+
+async def _read_sse(response: httpx.Response):
+    """逐条解析SSE事件，返回 (event, data)"""
+    event, data = "message", []
+    async for line in response.aiter_lines():
+        if line == "":
+            if data:
+                yield event, json.loads("\n".join(data))
+            event, data = "message", []
+        elif line.startswith("event:"):
+            event = line[6:].strip()
+        elif line.startswith("data:"):
+            data.append(line[5:].strip())
+
+
+async def run_job(client: httpx.AsyncClient, index: int, args, rng: random.Random, gate: asyncio.Semaphore) -> JobResult:
+    result = JobResult(index=index)
+    files = {"team_file": ("team.csv", synthetic_team_csv(rng, args.team_size).encode("utf-8"), "text/csv")}
+    form = {"project_description": synthetic_description(rng)}
+    if args.scheduler:
+        form["scheduler"] = args.scheduler
+    if args.allocator:
+        form["allocator"] = args.allocator
+
+    async with gate:
+        started = time.monotonic()
+        try:
+            response = await client.post("/v1/plans", data=form, files=files)
+            response.raise_for_status()
+        except httpx.HTTPError as e:
+            result.status, result.error = "submit_error", str(e)
+            return result
+        submitted = time.monotonic()
+        result.submit_seconds = submitted - started
+        result.job_id = response.json()["job_id"]
+
+    node_progress: Dict[str, Any] = {}
+
+    async def watch() -> None:
+        nonlocal node_progress
+        async with client.stream("GET", f"/v1/plans/{result.job_id}/stream", timeout=None) as stream:
+            async for event, data in _read_sse(stream):
+                result.events += 1
+                node_progress = data.get("node_progress") or node_progress
+                if result.queue_wait_seconds is None and data.get("status") in ("started", "finished"):
+                    result.queue_wait_seconds = time.monotonic() - submitted
+                if event == "complete":
+                    result.status = data.get("status", "finished")
+                    return
+                if event == "error":
+                    result.status, result.error = "stream_error", data.get("error")
+                    return
+        result.status = "stream_error"
+
+    try:
+        await asyncio.wait_for(watch(), args.timeout)
+    except asyncio.TimeoutError:
+        result.status = "timeout"
+    except httpx.HTTPError as e:
+        result.status, result.error = "stream_error", str(e)
+
+    result.end_to_end_seconds = time.monotonic() - started
+    for node, progress in node_progress.items():
+        if progress.get("start_time") and progress.get("end_time"):
+            result.node_seconds[node] = progress["end_time"] - progress["start_time"]
+    return result
+
+
+def summarize(values: List[float]) -> Dict[str, Optional[float]]:
+    if not values:
+        return {"count": 0}
+    return {
+        "count": len(values),
+        "mean": round(sum(values) / len(values), 4),
+        "p50": round(percentile(values, 50), 4),
+        "p95": round(percentile(values, 95), 4),
+        "p99": round(percentile(values, 99), 4),
+        "max": round(max(values), 4),
+    }
+
+
+class RedisCounter:
+    """压测前后 Redis 服务端执行的命令数"""
+
+    def __init__(self, connection: Redis):
+        self.connection = connection
+
+    def snapshot(self) -> Dict[str, int]:
+        calls = {name: stats["calls"] for name, stats in self.connection.info("commandstats").items()}
+        calls["total"] = self.connection.info("stats")["total_commands_processed"]
+        return calls
+
+    @staticmethod
+    def delta(before: Dict[str, int], after: Dict[str, int], jobs: int) -> Dict[str, Any]:
+        diff = {name: after[name] - before.get(name, 0) for name in after if after[name] != before.get(name, 0)}
+        total = diff.pop("total", 0)
+        top = sorted(diff.items(), key=lambda item: item[1], reverse=True)[:10]
+        return {
+            "commands": total,
+            "commands_per_job": round(total / jobs, 1) if jobs else None,
+            "top_commands_per_job": {name.replace("cmdstat_", ""): round(calls / jobs, 1) for name, calls in top} if jobs else {},
+        }
+
+
+def _proc_sample(pid: int) -> Optional[Dict[str, float]]:
+    """读取进程（含已回收子进程）的 CPU 时间和 RSS"""
+    if psutil is not None:
+        try:
+            process = psutil.Process(pid)
+            times = process.cpu_times()
+            return {
+                "cpu": times.user + times.system + times.children_user + times.children_system,
+                "rss": process.memory_info().rss,
+                "children": [child.pid for child in process.children()],
+            }
+        except psutil.Error:
+            return None
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        with open(f"/proc/{pid}/status") as f:
+            rss_kb = next(int(line.split()[1]) for line in f if line.startswith("VmRSS:"))
+        with open(f"/proc/{pid}/task/{pid}/children") as f:
+            children = [int(child) for child in f.read().split()]
+    except (OSError, StopIteration):
+        return None
+    ticks = os.sysconf("SC_CLK_TCK")
+    # utime, stime, cutime, cstime 位于 stat 的第 14-17 个字段
+    return {"cpu": sum(int(value) for value in fields[11:15]) / ticks, "rss": rss_kb * 1024, "children": children}
+
+
+def find_worker_pids() -> List[int]:
+    """查找命令行中包含 worker.py 的进程"""
+    pids = []
+    if psutil is not None:
+        for process in psutil.process_iter(["pid", "cmdline"]):
+            if any(part.endswith("worker.py") for part in process.info["cmdline"] or []):
+                pids.append(process.info["pid"])
+        return pids
+    if not os.path.isdir("/proc"):
+        return pids
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/cmdline", "rb") as f:
+                parts = f.read().split(b"\0")
+        except OSError:
+            continue
+        if any(part.endswith(b"worker.py") for part in parts):
+            pids.append(int(entry))
+    return pids
+
+
+class WorkerSampler:
+    """后台线程按间隔采样 worker 进程（及其子进程）的 CPU 和 RSS"""
+
+    def __init__(self, pids: List[int], interval: float = 0.5):
+        self.pids = pids
+        self.interval = interval
+        self.start_cpu: Dict[int, float] = {}
+        self.last_cpu: Dict[int, float] = {}
+        self.child_cpu: Dict[int, float] = {}
+        self.peak_rss: Dict[int, int] = {}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _sample(self) -> None:
+        live_children: Dict[int, float] = {}
+        for pid in self.pids:
+            sample = _proc_sample(pid)
+            if sample is None:
+                continue
+            self.start_cpu.setdefault(pid, sample["cpu"])
+            self.last_cpu[pid] = sample["cpu"]
+            rss = sample["rss"]
+            for child in sample["children"]:
+                child_sample = _proc_sample(child)
+                if child_sample is not None:
+                    rss += child_sample["rss"]
+                    # 仍在运行的子进程（RQ 的工作进程）的 CPU 时间，退出后计入父进程的 children 时间
+                    live_children[child] = child_sample["cpu"]
+            self.peak_rss[pid] = max(self.peak_rss.get(pid, 0), rss)
+        self.child_cpu = live_children
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self._sample()
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self._sample()
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self._sample()
+
+    def report(self, jobs: int) -> Dict[str, Any]:
+        if not self.pids:
+            return {"error": "no worker processes found (pass --worker-pid)"}
+        if not self.start_cpu:
+            return {"error": "process stats unavailable on this platform (install psutil)"}
+        cpu = sum(self.last_cpu[pid] - self.start_cpu[pid] for pid in self.start_cpu) + sum(self.child_cpu.values())
+        return {
+            "pids": sorted(self.start_cpu),
+            "cpu_seconds": round(cpu, 3),
+            "cpu_seconds_per_job": round(cpu / jobs, 3) if jobs else None,
+            "peak_rss_mb": round(sum(self.peak_rss.values()) / 2 ** 20, 1),
+        }
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def build_report(args, results: List[JobResult], wall_seconds: float, redis_stats, worker_stats) -> Dict[str, Any]:
+    finished = [result for result in results if result.status == "finished"]
+    statuses: Dict[str, int] = {}
+    for result in results:
+        statuses[result.status] = statuses.get(result.status, 0) + 1
+    nodes = {
+        node: summarize([result.node_seconds[node] for result in finished if node in result.node_seconds])
+        for node in NODES
+    }
+    return {
+        "meta": {
+            "revision": git_revision(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "api": args.api,
+            "jobs": args.jobs,
+            "concurrency": args.concurrency,
+            "team_size": args.team_size,
+            "scheduler": args.scheduler,
+            "allocator": args.allocator,
+            "seed": args.seed,
+        },
+        "statuses": statuses,
+        "wall_seconds": round(wall_seconds, 3),
+        "throughput_jobs_per_minute": round(len(finished) / wall_seconds * 60, 2) if wall_seconds else None,
+        "submit_seconds": summarize([result.submit_seconds for result in results if result.submit_seconds is not None]),
+        "queue_wait_seconds": summarize([result.queue_wait_seconds for result in finished if result.queue_wait_seconds is not None]),
+        "end_to_end_seconds": summarize([result.end_to_end_seconds for result in finished]),
+        "node_seconds": {node: stats for node, stats in nodes.items() if stats["count"]},
+        "sse_events_per_job": summarize([float(result.events) for result in finished]),
+        "redis": redis_stats,
+        "workers": worker_stats,
+        "jobs": [asdict(result) for result in results] if args.include_jobs else None,
+    }
+
+
+def _flatten(report: Dict[str, Any], prefix: str = "") -> Dict[str, float]:
+    flat = {}
+    for key, value in report.items():
+        if key in ("meta", "jobs"):
+            continue
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(_flatten(value, f"{name}."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = value
+    return flat
+
+
+def compare(previous: Dict[str, Any], current: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    """两份报告中数值指标的变化（change 为相对变化百分比）"""
+    before, after = _flatten(previous), _flatten(current)
+    changes = {}
+    for name in sorted(set(before) & set(after)):
+        old, new = before[name], after[name]
+        changes[name] = {
+            "before": old,
+            "after": new,
+            "change_pct": round((new - old) / old * 100, 1) if old else None,
+        }
+    return changes
+
+
+async def run(args) -> Dict[str, Any]:
+    rng = random.Random(args.seed)
+    gate = asyncio.Semaphore(args.concurrency)
+    connection = Redis(host=settings.REDIS_HOST, port=settings.REDIS_PORT)
+    counter = RedisCounter(connection)
+    pids = args.worker_pid or find_worker_pids()
+
+    limits = httpx.Limits(max_connections=args.jobs + args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.api, limits=limits, timeout=args.request_timeout) as client:
+        before = counter.snapshot()
+        with WorkerSampler(pids) as sampler:
+            started = time.monotonic()
+            results = await asyncio.gather(*(run_job(client, index, args, rng, gate) for index in range(args.jobs)))
+            wall_seconds = time.monotonic() - started
+        redis_stats = RedisCounter.delta(before, counter.snapshot(), args.jobs)
+
+    return build_report(args, list(results), wall_seconds, redis_stats, sampler.report(args.jobs))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end load benchmark for the plan API")
+    parser.add_argument("--api", default="http://127.0.0.1:8000", help="API 根地址")
+    parser.add_argument("--jobs", type=int, default=20, help="提交的计划数")
+    parser.add_argument("--concurrency", type=int, default=10, help="同时进行的提交请求数")
+    parser.add_argument("--team-size", type=int, default=5, help="每个团队 CSV 的成员数")
+    parser.add_argument("--scheduler", choices=["local", "llm", "hybrid"], default=None)
+    parser.add_argument("--allocator", choices=["local", "llm", "hybrid"], default=None)
+    parser.add_argument("--timeout", type=float, default=600.0, help="单个计划从提交到完成的最长等待时间（秒）")
+    parser.add_argument("--request-timeout", type=float, default=30.0, help="单个 HTTP 请求的超时时间（秒）")
+    parser.add_argument("--worker-pid", type=int, action="append", help="worker 进程号，默认查找命令行包含 worker.py 的进程")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--include-jobs", action="store_true", help="报告中包含每个计划的明细")
+    parser.add_argument("--output", help="报告输出路径（JSON），默认打印到标准输出")
+    parser.add_argument("--compare", help="与之前的报告对比")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            report["comparison"] = compare(json.load(f), report)
+
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+        print(f"Report written to {args.output}")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
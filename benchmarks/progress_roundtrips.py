@@ -0,0 +1,158 @@
+"""
+进度发布 Redis 往返次数基准测试
+
+模拟一个计划（max_iteration 轮，每轮 6 个节点）的进度更新序列，分别用
+旧实现（每次 Job.fetch + save_meta）和 ProgressPublisher 写入，统计：
+
+- 客户端网络往返次数（每次发送请求计一次，pipeline 计一次）
+- 服务端执行的命令数（INFO commandstats 前后差值）
+
+用法（需要可访问的 Redis，使用 .env 中的 REDIS_HOST/REDIS_PORT）：
+    python benchmarks/progress_roundtrips.py --iterations 3 --debounce 0.5
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from typing import Dict, Iterator
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from redis import Connection, ConnectionPool, Redis
+from rq.job import Job
+
+from app.core.config import settings
+from app.services.progress import ProgressPublisher, build_progress_info, event_log_key, progress_key
+
+NODES = [
+    ("task_generation", "智能任务提取"),
+    ("analyze_dependencies", "依赖关系分析"),
+    ("schedule_tasks", "智能任务调度"),
+    ("allocate_team", "团队智能分配"),
+    ("assess_risk", "风险评估分析"),
+    ("generate_insights", "洞察生成优化"),
+]
+
+# task_generation 节点内部额外发布的细节更新
+TASK_GENERATION_DETAILS = ["正在调用AI模型进行任务分解...", "正在解析AI生成的任务列表...", "任务提取完成"]
+
+
+class CountingConnection(Connection):
+    """统计发送到 Redis 的请求次数（pipeline 的一次发送计一次往返）"""
+    round_trips = 0
+
+    def send_packed_command(self, command, check_health=True):
+        CountingConnection.round_trips += 1
+        return super().send_packed_command(command, check_health)
+
+
+def plan_updates(iterations: int, node_seconds: float) -> Iterator[Dict]:
+    """按 create_tracked_node / task_generation_node 的调用顺序生成进度更新"""
+    state = {
+        "overall_status": "starting",
+        "total_start_time": time.time(),
+        "completed_nodes": [],
+        "node_progress": {},
+        "current_node": None,
+        "iteration_number": 1,
+    }
+    for iteration in range(1, iterations + 1):
+        state["iteration_number"] = iteration
+        for node_name, description in NODES:
+            if iteration > 1 and node_name == "task_generation":
+                continue
+            state["current_node"] = node_name
+            state["overall_status"] = "processing"
+            state["node_progress"][node_name] = {"status": "started", "description": description}
+            yield state
+            if node_name == "task_generation":
+                for details in TASK_GENERATION_DETAILS:
+                    state["node_progress"][node_name]["details"] = details
+                    yield state
+            time.sleep(node_seconds)
+            state["node_progress"][node_name]["status"] = "completed"
+            if node_name not in state["completed_nodes"]:
+                state["completed_nodes"].append(node_name)
+            yield state
+    state["overall_status"] = "completed"
+    state["current_node"] = "completed"
+    yield state
+
+
+def legacy_update(connection: Redis, job_id: str, state: Dict) -> None:
+    """旧实现：每次重新加载整个 job 并重写 meta"""
+    job = Job.fetch(job_id, connection=connection)
+    job.meta["agent_state"] = build_progress_info(state)
+    job.save_meta()
+
+
+def command_calls(connection: Redis) -> Dict[str, int]:
+    return {
+        name.replace("cmdstat_", ""): stats["calls"]
+        for name, stats in connection.info("commandstats").items()
+    }
+
+
+def measure(connection: Redis, publish, updates) -> Dict:
+    before = command_calls(connection)
+    CountingConnection.round_trips = 0
+    started = time.perf_counter()
+    count = 0
+    for state in updates:
+        publish(state)
+        count += 1
+    elapsed = time.perf_counter() - started
+    round_trips = CountingConnection.round_trips
+    after = command_calls(connection)
+    commands = {
+        name: after[name] - before.get(name, 0)
+        for name in after
+        if name != "info" and after[name] != before.get(name, 0)
+    }
+    return {
+        "updates": count,
+        "round_trips": round_trips,
+        "server_commands": sum(commands.values()),
+        "commands": commands,
+        "seconds": round(elapsed, 4),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare Redis round-trips per plan for progress updates")
+    parser.add_argument("--iterations", type=int, default=3, help="计划迭代轮数")
+    parser.add_argument("--debounce", type=float, default=settings.PROGRESS_DEBOUNCE_SECONDS, help="防抖窗口（秒）")
+    parser.add_argument("--node-seconds", type=float, default=0.0, help="模拟每个节点的执行时间")
+    args = parser.parse_args()
+
+    pool = ConnectionPool(host=settings.REDIS_HOST, port=settings.REDIS_PORT, connection_class=CountingConnection)
+    connection = Redis(connection_pool=pool)
+
+    job = Job.create(func=print, connection=connection)
+    job.save()
+    try:
+        before = measure(
+            connection,
+            lambda state: legacy_update(connection, job.id, state),
+            plan_updates(args.iterations, args.node_seconds),
+        )
+
+        publisher = ProgressPublisher(job.id, connection, debounce=args.debounce, ttl=60)
+
+        def publish(state):
+            final = state["overall_status"] == "completed"
+            publisher.publish(state, force=final)
+            if final:
+                publisher.flush()
+
+        after = measure(connection, publish, plan_updates(args.iterations, args.node_seconds))
+    finally:
+        job.delete()
+        connection.delete(progress_key(job.id), event_log_key(job.id))
+
+    print(json.dumps({"before": before, "after": after}, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""
+计划结果存储基准测试
+
+生成一个合成的最终 AgentState（N 个任务、M 个团队成员、K 轮迭代，结构与 run_agent 的返回值一致），
+比较两种保存方式：
+
+- RQ 原先的做法：pickle 完整状态作为任务返回值
+- PlanResultStore：规范化计划文档 + gzip 压缩
+
+统计每个计划的保存字节数、编码耗时，以及 API 读取一次完整结果的耗时（与 GET /v1/plans/{job_id}
+相同的路径：解码 + plan_results.project + 序列化为 JSON）；
+指定 --redis 时把两种数据写入 Redis，再用 MEMORY USAGE 对比实际内存占用。
+
+用法：
+    python benchmarks/result_store.py --tasks 200 --iterations 3
+    python benchmarks/result_store.py --tasks 500 --iterations 3 --redis
+"""
+import argparse
+import json
+import os
+import pickle
+import statistics
+import sys
+import time
+from datetime import date, timedelta
+from typing import Any, Callable, Dict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.schemas.plan import DependencyList, RiskList, Schedule, TaskAllocationList, TaskList
+from app.schemas.task import Dependency, Risk, Task, TaskSchedule
+from app.schemas.team import TaskAllocation, Team, TeamMember
+from app.services.plan_results import project
+from app.services.result_store import PlanResultStore
+
+
+def synthetic_state(task_count: int, iterations: int, member_count: int = 8) -> Dict[str, Any]:
+    """按 run_agent 返回的最终状态结构生成一个合成计划"""
+    members = [TeamMember(name=f"成员{i}", profile=f"后端/前端开发工程师，熟悉 Python、React 和云原生部署 {i}") for i in range(member_count)]
+    tasks = [
+        Task(task_name=f"任务 {i}：实现模块 {i} 的核心功能", task_description=f"完成模块 {i} 的设计、开发、单元测试和联调，并编写接口文档。" * 2, estimated_day=1 + i % 7)
+        for i in range(task_count)
+    ]
+    start = date(2024, 1, 1)
+    schedules, allocations, risks = [], [], []
+    for iteration in range(iterations):
+        schedules.append(Schedule(schedule=[
+            TaskSchedule(
+                task_id=task.id,
+                start_date=(start + timedelta(days=i + iteration)).isoformat(),
+                end_date=(start + timedelta(days=i + iteration + task.estimated_day)).isoformat(),
+                gantt_chart_format=f"{task.task_name}: {(start + timedelta(days=i)).isoformat()}, {task.estimated_day}d",
+            )
+            for i, task in enumerate(tasks)
+        ]))
+        allocations.append(TaskAllocationList(task_allocations=[
+            TaskAllocation(task=task, team_member=members[(i + iteration) % member_count]) for i, task in enumerate(tasks)
+        ]))
+        risks.append(RiskList(risks=[Risk(risk_name=f"{task.task_name} 延期风险", score=str(i % 10)) for i, task in enumerate(tasks)]))
+    return {
+        "project_description": "为中型企业构建一个项目管理 SaaS 平台，包含任务、排期、成员分配和风险评估。",
+        "team": Team(team_members=members),
+        "tasks": TaskList(tasks=tasks),
+        "dependencies": DependencyList(dependencies=[Dependency(source=a.id, target=b.id) for a, b in zip(tasks, tasks[1:])]),
+        "schedule": schedules[-1],
+        "task_allocations": allocations[-1],
+        "risks": risks[-1],
+        "iteration_number": iterations,
+        "max_iteration": iterations,
+        "insights": "建议将高风险任务提前并增加代码评审。" * 20,
+        "schedule_iteration": schedules,
+        "task_allocations_iteration": allocations,
+        "risks_iteration": risks,
+        "project_risk_score_iterations": [60 - 10 * i for i in range(iterations)],
+        "id_mapping": {f"task-{i + 1}": task.id for i, task in enumerate(tasks)},
+        "scheduler": "local",
+        "allocator": "local",
+        "job_id": "benchmark",
+        "current_node": "completed",
+        "overall_status": "completed",
+        "completed_nodes": ["task_generation", "analyze_dependencies", "schedule_tasks", "allocate_team", "assess_risk"] * iterations,
+        "node_progress": {
+            node: {"status": "completed", "start_time": 1.0, "end_time": 2.0, "description": "…", "details": "…" * 50}
+            for node in ["task_generation", "analyze_dependencies", "schedule_tasks", "allocate_team", "assess_risk", "generate_insights"]
+        },
+        "total_start_time": 1.0,
+        "total_end_time": 60.0,
+        "total_elapsed_time": 59.0,
+    }
+
+
+def timed(function: Callable[[], Any], repeat: int) -> float:
+    """多次执行取中位数（毫秒）"""
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        samples.append((time.perf_counter() - started) * 1000)
+    return round(statistics.median(samples), 3)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare RQ's pickled plan result with the normalized result store.")
+    parser.add_argument("--tasks", type=int, default=200)
+    parser.add_argument("--iterations", type=int, default=3)
+    parser.add_argument("--members", type=int, default=8)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--level", type=int, default=6, help="gzip compression level")
+    parser.add_argument("--redis", action="store_true", help="also write both payloads to Redis and compare MEMORY USAGE")
+    args = parser.parse_args()
+
+    state = synthetic_state(args.tasks, args.iterations, args.members)
+    store = PlanResultStore(connection=None, ttl=60, level=args.level)
+
+    pickled = pickle.dumps(state, protocol=pickle.HIGHEST_PROTOCOL)
+    document = store.encode(state)
+    report = {
+        "tasks": args.tasks,
+        "iterations": args.iterations,
+        "rq_pickle": {
+            "bytes": len(pickled),
+            "encode_ms": timed(lambda: pickle.dumps(state, protocol=pickle.HIGHEST_PROTOCOL), args.repeat),
+            "read_ms": timed(lambda: json.dumps(project(pickle.loads(pickled), None)), args.repeat),
+        },
+        "result_store": {
+            "bytes": len(document),
+            "encode_ms": timed(lambda: store.encode(state), args.repeat),
+            "read_ms": timed(lambda: json.dumps(project(store.decode(document), None)), args.repeat),
+        },
+    }
+    report["bytes_ratio"] = round(len(document) / len(pickled), 4)
+
+    if args.redis:
+        from redis import Redis
+        from app.core.config import settings
+
+        connection = Redis(host=settings.REDIS_HOST, port=settings.REDIS_PORT)
+        keys = {"rq_pickle": ("pma:benchmark:pickle", pickled), "result_store": ("pma:benchmark:document", document)}
+        for name, (key, payload) in keys.items():
+            connection.set(key, payload, ex=60)
+            report[name]["redis_memory_bytes"] = connection.memory_usage(key)
+        connection.delete(*(key for key, _ in keys.values()))
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
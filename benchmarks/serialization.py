@@ -0,0 +1,75 @@
+"""
+JSON 序列化基准测试
+
+用 result_store 基准中的合成计划（N 个任务、K 轮迭代）比较 API 响应的编码耗时：
+
+- 完整结果（Pydantic 对象，RQ 返回值的旧路径）：jsonable_encoder + 标准库 json（FastAPI 默认）
+  与 orjson（app.core.serialization.dumps）
+- 从结果存储读取的结果（已是 JSON 兼容类型）：Starlette JSONResponse 与 orjson
+- 一条 SSE 进度事件：json.dumps 与 sse_message
+- 已完成计划的响应字节缓存命中（PayloadCache.get）
+
+用法：
+    python benchmarks/serialization.py --tasks 500 --iterations 3
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.encoders import jsonable_encoder
+from starlette.responses import JSONResponse
+
+from app.core.serialization import ORJSONResponse, dumps, sse_message
+from app.services.plan_results import PayloadCache
+from app.services.result_store import PlanResultStore
+from result_store import synthetic_state, timed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare stdlib json and orjson encoding of plan results and SSE events.")
+    parser.add_argument("--tasks", type=int, default=500)
+    parser.add_argument("--iterations", type=int, default=3)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    state = synthetic_state(args.tasks, args.iterations)
+    store = PlanResultStore(connection=None, ttl=60)
+    stored = store.decode(store.encode(state))
+    event = {
+        "job_id": "benchmark", "status": "started", "current_node": "allocate_team", "progress": 62,
+        "node_progress": state["node_progress"], "completed_nodes": state["completed_nodes"],
+        "iteration_number": 1, "max_iteration": args.iterations, "task_count": args.tasks,
+        "timestamp": time.time(), "connection_duration": 12.5,
+    }
+    cache = PayloadCache(max_bytes=1 << 30, ttl=60)
+    cache.set(("plan", "benchmark", None), dumps(stored))
+
+    report = {
+        "tasks": args.tasks,
+        "iterations": args.iterations,
+        "full_state": {
+            "bytes": len(dumps(state)),
+            "stdlib_ms": timed(lambda: JSONResponse(jsonable_encoder(state)), args.repeat),
+            "orjson_ms": timed(lambda: ORJSONResponse(state), args.repeat),
+        },
+        "stored_result": {
+            "bytes": len(dumps(stored)),
+            "stdlib_ms": timed(lambda: JSONResponse(stored), args.repeat),
+            "orjson_ms": timed(lambda: ORJSONResponse(stored), args.repeat),
+            "cache_hit_ms": timed(lambda: cache.get(("plan", "benchmark", None)), args.repeat),
+        },
+        "sse_event": {
+            "bytes": len(sse_message("progress", event, "1-0")),
+            "stdlib_us": round(timed(lambda: f"id: 1-0\nevent: progress\ndata: {json.dumps(event)}\n\n".encode(), args.repeat * 50) * 1000, 2),
+            "orjson_us": round(timed(lambda: sse_message("progress", event, "1-0"), args.repeat * 50) * 1000, 2),
+        },
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -194,8 +194,36 @@ def render_intelligent_progress(phase_info, elapsed_time, job_id):
                 """, unsafe_allow_html=True)
 
 # --- 辅助函数 ---
-def plot_gantt_chart(results_data, iteration):
-    """为指定的迭代绘制甘特图。"""
+# 结果页用到的顶层字段，以及最后一轮的迭代子资源（资源名, 结果字段, 条目字段）
+RESULT_SUMMARY_FIELDS = "tasks,iteration_number,project_risk_score_iterations,insights"
+RESULT_ITERATION_RESOURCES = [
+    ("schedule", "schedule_iteration", "schedule"),
+    ("allocations", "task_allocations_iteration", "task_allocations"),
+    ("risks", "risks_iteration", "risks"),
+]
+
+def fetch_plan_result(job_id):
+    """
+    只获取结果页需要展示的部分：摘要字段 + 最后一轮的排期、分配和风险，
+    不下载包含每一轮完整副本的 AgentState。各 *_iteration 列表只包含最后一轮。
+    """
+    base_url = f"{API_URL}/v1/plans/{job_id}"
+    response = requests.get(base_url, params={"fields": RESULT_SUMMARY_FIELDS})
+    response.raise_for_status()
+    results = response.json()
+    
+    for resource, field, items_field in RESULT_ITERATION_RESOURCES:
+        response = requests.get(f"{base_url}/iterations/-1/{resource}")
+        if response.status_code == 404:
+            results[field] = []
+            continue
+        response.raise_for_status()
+        results[field] = [{items_field: response.json()[items_field]}]
+    return results
+
+def plot_gantt_chart(results_data, iteration, version=None):
+    """为指定的迭代绘制甘特图（version 为标题中显示的版本号，默认按下标计算）。"""
+    version = version or iteration + 1
     try:
         schedule_data = results_data['schedule_iteration'][iteration]['schedule']
         allocation_data = results_data['task_allocations_iteration'][iteration]['task_allocations']
@@ -226,7 +254,7 @@ def plot_gantt_chart(results_data, iteration):
             x_end="end", 
             y="任务名称", 
             color="负责人", 
-            title=f"项目排期甘特图 - 第 {iteration + 1} 版"
+            title=f"项目排期甘特图 - 第 {version} 版"
         )
         fig.update_layout(
             xaxis_title="时间线",
@@ -236,7 +264,7 @@ def plot_gantt_chart(results_data, iteration):
         )
         st.plotly_chart(fig, use_container_width=True)
     except (KeyError, IndexError, TypeError) as e:
-        st.error(f"无法为第 {iteration + 1} 版计划生成甘特图。错误: {e}")
+        st.error(f"无法为第 {version} 版计划生成甘特图。错误: {e}")
 
 # --- SSE实时进度组件 ---
 def create_sse_progress_component(job_id: str, api_url: str) -> str:
@@ -306,11 +334,13 @@ def create_sse_progress_component(job_id: str, api_url: str) -> str:
         const maxRetries = 3;
         let retryCount = 0;
         let hasReceivedData = false;
-        let connectionCheckInterval;
+        // 最后收到的事件流ID：手动重建连接时带上，服务端只补发错过的事件
+        let lastEventId = null;
         
         function createConnection() {{
             try {{
-                eventSource = new EventSource(`${{apiUrl}}/v1/plans/{job_id}/stream`);
+                const resumeQuery = lastEventId ? `?last_event_id=${{encodeURIComponent(lastEventId)}}` : '';
+                eventSource = new EventSource(`${{apiUrl}}/v1/plans/{job_id}/stream${{resumeQuery}}`);
                 let startTime = Date.now();
                 
                 eventSource.onopen = function(event) {{
@@ -319,11 +349,6 @@ def create_sse_progress_component(job_id: str, api_url: str) -> str:
                     retryCount = 0;  // 重置重试计数
                     connectionStatus.innerHTML = '✅ 实时连接已建立';
                     connectionStatus.style.color = '#28a745';
-                    
-                    // 清除连接检查定时器
-                    if (connectionCheckInterval) {{
-                        clearInterval(connectionCheckInterval);
-                    }}
                 }};
                 
                 eventSource.addEventListener('progress', function(event) {{
@@ -331,6 +356,9 @@ def create_sse_progress_component(job_id: str, api_url: str) -> str:
                         const data = JSON.parse(event.data);
                         console.log('Progress update received:', data);
                         hasReceivedData = true;
+                        if (event.lastEventId) {{
+                            lastEventId = event.lastEventId;
+                        }}
                         
                         updateProgressDisplay(data);
                         
@@ -426,6 +454,7 @@ def create_sse_progress_component(job_id: str, api_url: str) -> str:
                         }}, 1000 * retryCount);
                         
                     }} else if (hasReceivedData) {{
+                        // 浏览器会自动重连并携带 Last-Event-ID，服务端只补发错过的事件
                         connectionStatus.innerHTML = '⚠️ 连接不稳定，但仍在处理...';
                         connectionStatus.style.color = '#ffc107';
                     }} else {{
@@ -445,42 +474,6 @@ def create_sse_progress_component(job_id: str, api_url: str) -> str:
         // 启动连接
         createConnection();
         
-        // 设置连接监控 - 如果10秒内没有收到数据，检查任务状态
-        connectionCheckInterval = setInterval(() => {{
-            if (!hasReceivedData) {{
-                console.log('No data received, checking job status...');
-                fetch(`${{apiUrl}}/v1/plans/status/{job_id}`)
-                    .then(response => response.json())
-                    .then(data => {{
-                        console.log('Job status check:', data);
-                        if (data.status === 'finished') {{
-                            // 任务已完成但SSE没收到，直接显示完成状态
-                            progressDisplay.innerHTML = `
-                                <div style="text-align: center; padding: 30px;">
-                                    <div style="font-size: 24px; color: #28a745; margin-bottom: 15px;">
-                                        🎉 项目规划已完成！
-                                    </div>
-                                    <div style="font-size: 16px; color: #666; margin-bottom: 15px;">
-                                        任务ID: {job_id}
-                                    </div>
-                                    <button onclick="showTaskResult('{job_id}')" 
-                                            style="padding: 12px 24px; background: #28a745; color: white; border: none; border-radius: 8px; cursor: pointer; font-weight: bold; box-shadow: 0 2px 10px rgba(0,0,0,0.1);">
-                                        📋 查看详细结果
-                                    </button>
-                                </div>
-                            `;
-                            connectionStatus.innerHTML = '🎉 任务已完成！';
-                            connectionStatus.style.color = '#28a745';
-                            if (eventSource) eventSource.close();
-                            clearInterval(connectionCheckInterval);
-                        }}
-                    }})
-                    .catch(e => console.log('Status check failed:', e));
-            }} else {{
-                clearInterval(connectionCheckInterval);
-            }}
-        }}, 10000);
-         
         function updateProgressDisplay(data, isComplete = false) {{
             const progress = data.progress || 0;
             const isRealLangGraph = data.langgraph_flow || false;
@@ -780,9 +773,7 @@ if 'job_id' in st.session_state and st.session_state.job_id and st.session_state
                 if task_status == "finished":
                     # 任务完成，获取详细结果
                     try:
-                        result_response = requests.get(f"{API_URL}/v1/plans/{job_id}")
-                        result_response.raise_for_status()
-                        result_data = result_response.json()
+                        result_data = fetch_plan_result(job_id)
                         
                         st.session_state.task_completed = True
                         st.session_state.task_result = result_data
@@ -872,7 +863,7 @@ if st.session_state.get('task_completed', False) and st.session_state.get('task_
         st.header("📊 项目排期甘特图")
         num_iterations = results.get('iteration_number', 0)
         if num_iterations > 0:
-            plot_gantt_chart(results, num_iterations - 1) # 只显示最后一版
+            plot_gantt_chart(results, -1, version=num_iterations) # 只显示最后一版
         else:
             st.info("📊 未能生成甘特图信息。")
 
@@ -899,7 +890,16 @@ if st.session_state.get('task_completed', False) and st.session_state.get('task_
 
     with tab_raw:
         st.header("🔧 完整的Agent最终状态")
-        st.json(results)
+        # 完整状态包含每一轮的全部副本，只在需要时获取
+        if st.session_state.get('job_id') and st.button("📥 加载完整状态", key="load_full_state"):
+            try:
+                full_response = requests.get(f"{API_URL}/v1/plans/{st.session_state.job_id}")
+                full_response.raise_for_status()
+                st.json(full_response.json())
+            except requests.exceptions.RequestException as e:
+                st.error(f"❌ 获取完整状态失败: {e}")
+        else:
+            st.json(results)
 
 # 页脚
 st.markdown("---")
@@ -115,4 +115,33 @@ def test_agent_graph_full_run(mocker, mock_universal_llm):
     assert final_state["risks"].risks[0].risk_name == "Mock Risk"
 
     # Since we set max_iteration=1, the router should END, not generate insights for a second loop
-    assert final_state.get("insights") is None 
\ No newline at end of file
+    assert final_state.get("insights") is None 
+
+def test_job_tracking_keeps_the_job_error_when_saving_the_cassette_fails(mocker):
+    """A failed cassette save neither replaces the job's error nor skips closing its progress."""
+    from app.agent import graph
+
+    mocker.patch.object(graph, "run_agent", side_effect=ValueError("llm down"))
+    mocker.patch.object(graph.llm_cassettes, "save", side_effect=OSError("disk full"))
+    close = mocker.patch.object(graph, "close_job_progress")
+
+    with pytest.raises(ValueError, match="llm down"):
+        graph.run_agent_with_job_tracking({})
+
+    close.assert_called_once()
+
+
+def test_async_job_tracking_returns_result_and_closes_progress_when_saving_the_cassette_fails(mocker):
+    import asyncio
+    from unittest.mock import AsyncMock
+    from app.agent import graph
+
+    mocker.patch.object(graph, "arun_agent", AsyncMock(return_value={"ok": True}))
+    mocker.patch.object(graph.plan_result_store, "save", return_value=None)
+    mocker.patch.object(graph.llm_cassettes, "save", side_effect=OSError("disk full"))
+    close = mocker.patch.object(graph, "close_job_progress")
+
+    result = asyncio.run(graph.arun_agent_with_job_tracking({}, job_id="job-1"))
+
+    assert result == {"ok": True}
+    close.assert_called_once_with("job-1")
@@ -9,7 +9,7 @@ from app.agent.nodes.assess_risk import risk_assessment_node
 from app.agent.nodes.generate_insights import insight_generation_node
 from app.schemas.task import Task, TaskSchedule, Dependency, Risk
 from app.schemas.plan import TaskList, Schedule, TaskAllocationList, RiskList
-from app.schemas.team import TeamMember, TaskAllocation
+from app.schemas.team import TeamMember, TaskAllocation, Team
 import datetime
 
 @pytest.fixture
@@ -175,6 +175,36 @@ def test_task_allocation_node(mocker, mock_allocation_llm):
     assert result_state["task_allocations_iteration"][0] == result_state["task_allocations"] 
 
 
+def test_task_allocation_node_local_allocator(mocker, mock_allocation_llm):
+    """
+    With allocator=local the node allocates by skill matching without calling the LLM.
+    """
+    mocker.patch('app.agent.nodes.allocate_team.llm', mock_allocation_llm)
+
+    task_id = uuid.uuid4()
+    initial_state = {
+        "tasks": TaskList(tasks=[
+            Task(id=task_id, task_name="Python API", task_description="Build the Python service.", estimated_day=2)
+        ]),
+        "schedule": Schedule(schedule=[
+            TaskSchedule(task_id=task_id, start_date="2024-01-01", end_date="2024-01-02", gantt_chart_format="...")
+        ]),
+        "team": Team(team_members=[
+            TeamMember(name="Designer", profile="UI designer working with Figma."),
+            TeamMember(name="Test Developer", profile="Senior developer with 5 years of experience in Python."),
+        ]),
+        "id_mapping": {"task-1": task_id},
+        "task_allocations_iteration": [],
+        "allocator": "local",
+    }
+
+    result_state = task_allocation_node(initial_state)
+
+    mock_allocation_llm.with_structured_output.assert_not_called()
+    assert result_state["task_allocations"].task_allocations[0].team_member.name == "Test Developer"
+    assert result_state["task_allocations_iteration"] == [result_state["task_allocations"]]
+
+
 @pytest.fixture
 def mock_risk_llm():
     """Fixture to create a mock LLM that returns a predictable RiskList."""
@@ -264,4 +294,31 @@ def test_insight_generation_node(mocker, mock_insight_llm):
     # Assert
     mock_insight_llm.invoke.assert_called_once()
     assert "insights" in result_state
-    assert result_state["insights"] == "This is a mock insight." 
\ No newline at end of file
+    assert result_state["insights"] == "This is a mock insight." 
+
+def test_ainsight_generation_node(mocker, mock_insight_llm):
+    """
+    Tests the async insight_generation_node variant awaits `ainvoke`
+    and returns the same state update as the sync node.
+    """
+    # Arrange
+    from unittest.mock import AsyncMock
+    from app.agent.nodes.generate_insights import ainsight_generation_node
+
+    mock_insight_llm.ainvoke = AsyncMock(return_value=mock_insight_llm.invoke.return_value)
+    mocker.patch('app.agent.nodes.generate_insights.llm', mock_insight_llm)
+
+    initial_state = {
+        "task_allocations": TaskAllocationList(task_allocations=[]), # Dummy
+        "schedule": Schedule(schedule=[]), # Dummy
+        "risks": RiskList(risks=[]), # Dummy
+    }
+
+    # Act
+    import asyncio
+    result_state = asyncio.run(ainsight_generation_node(initial_state))
+
+    # Assert
+    mock_insight_llm.ainvoke.assert_awaited_once()
+    mock_insight_llm.invoke.assert_not_called()
+    assert result_state["insights"] == "This is a mock insight."
@@ -1,8 +1,14 @@
+import asyncio
+import json
+import time
+from contextlib import asynccontextmanager
+
 import pytest
 from fastapi.testclient import TestClient
-from unittest.mock import MagicMock
+from unittest.mock import AsyncMock, MagicMock
 
 from app.api.main import app
+from app.services.plan_results import PayloadCache
 
 # Create a single TestClient instance for all tests in this module
 client = TestClient(app)
@@ -21,6 +27,20 @@ def mock_task_queue():
     mock_queue.enqueue.return_value = mock_job
     return mock_queue
 
+@pytest.fixture
+def mock_job_reader(mocker):
+    """Fixture to mock the async job reader used by the plan router."""
+    reader = MagicMock()
+    reader.fetch = AsyncMock(return_value=None)
+    reader.agent_state = AsyncMock(return_value=None)
+    reader.events = AsyncMock(return_value=[])
+    reader.started_count = AsyncMock(return_value=0)
+    mocker.patch('app.api.routers.plan.job_reader', reader)
+    mocker.patch('app.api.routers.plan.api_eta_model.arefresh', AsyncMock())
+    mocker.patch('app.api.routers.plan.plan_result_store.aload', AsyncMock(return_value=None))
+    mocker.patch('app.api.routers.plan.result_payload_cache', PayloadCache(max_bytes=1 << 20, ttl=60))
+    return reader
+
 def test_create_plan_endpoint(mocker, mock_task_queue):
     """
     Tests the POST /v1/plans endpoint to ensure it correctly
@@ -78,7 +98,7 @@ def test_create_plan_endpoint(mocker, mock_task_queue):
 )
 def test_get_plan_result_endpoint(
     mocker,
-    mock_task_queue,
+    mock_job_reader,
     job_status,
     mock_job_properties,
     expected_status_code,
@@ -91,15 +111,12 @@ def test_get_plan_result_endpoint(
     job_id = "test_job_123"
 
     if job_status == "not_found":
-        mock_task_queue.fetch_job.return_value = None
+        mock_job_reader.fetch.return_value = None
     else:
         mock_job = MagicMock(**mock_job_properties)
         # The mock job must also have an 'id' attribute to match the real object
         mock_job.id = job_id
-        mock_task_queue.fetch_job.return_value = mock_job
-    
-    # Patch the `task_queue` object *where it is used*, inside the `plan` router module.
-    mocker.patch('app.api.routers.plan.task_queue', mock_task_queue)
+        mock_job_reader.fetch.return_value = mock_job
 
     # Act
     response = client.get(f"/v1/plans/{job_id}")
@@ -114,4 +131,265 @@ def test_get_plan_result_endpoint(
         if job_status == "finished":
             assert response_data["result"] == mock_job_properties["result"]
     else:
-        assert expected_response_status in response_data["detail"] 
\ No newline at end of file
+        assert expected_response_status in response_data["detail"] 
+
+@pytest.mark.parametrize("resumable, expected_status_code", [(True, 200), (False, 409)])
+def test_resume_plan_endpoint(mocker, mock_job_reader, resumable, expected_status_code):
+    """
+    Tests the POST /v1/plans/{job_id}/resume endpoint re-queues failed jobs
+    and rejects jobs that cannot be resumed.
+    """
+    # Arrange
+    job_id = "test_job_123"
+    mock_job = MagicMock()
+    mock_job.id = job_id
+    mock_job.get_status.return_value = "finished"
+    mock_job_reader.fetch.return_value = mock_job
+    mock_resume = mocker.patch('app.api.routers.plan.resume_job', return_value=mock_job if resumable else None)
+
+    # Act
+    response = client.post(f"/v1/plans/{job_id}/resume")
+
+    # Assert
+    assert response.status_code == expected_status_code
+    mock_resume.assert_called_once_with(job_id)
+    if resumable:
+        assert response.json() == {"job_id": job_id, "status": "queued"}
+
+
+@pytest.fixture
+def mock_progress_hub(mocker):
+    """A progress hub that never delivers live events (history comes from the event log)."""
+    @asynccontextmanager
+    async def watch(job_id):
+        yield asyncio.Queue()
+
+    hub = MagicMock()
+    hub.watch = watch
+    mocker.patch('app.api.routers.plan.progress_hub', hub)
+    return hub
+
+
+def test_stream_replays_events_after_last_event_id(mocker, mock_job_reader, mock_progress_hub):
+    """
+    Tests that GET /v1/plans/{job_id}/stream with Last-Event-ID only sends
+    the events the client missed, tagged with their stream ids.
+    """
+    # Arrange
+    job_id = "test_job_123"
+    mock_job = MagicMock(is_queued=False, is_started=True, is_finished=False, is_failed=False)
+    mock_job.id = job_id
+    mock_job_reader.fetch.return_value = mock_job
+    mock_job_reader.events.return_value = [
+        ("1-0", {"type": "progress", "data": {"current_node": "task_generation", "progress": 8}}),
+        ("2-0", {"type": "progress", "data": {"current_node": "schedule_tasks", "progress": 41}}),
+        ("3-0", {"type": "terminal", "status": "finished"}),
+    ]
+
+    # Act
+    response = client.get(f"/v1/plans/{job_id}/stream", headers={"Last-Event-ID": "1-0"})
+
+    # Assert
+    messages = [message for message in response.text.split("\n\n") if message]
+    assert [message.split("\n")[0] for message in messages] == ["id: 2-0", "id: 3-0"]
+    assert "event: complete" in messages[-1]
+    final = json.loads(messages[-1].split("data: ", 1)[1])
+    assert final["status"] == "finished"
+    assert final["current_node"] == "schedule_tasks"
+
+
+def test_stream_resyncs_after_the_hub_dropped_events(mocker, mock_job_reader):
+    """
+    Tests that when the progress hub signals an overflow, the stream rebuilds
+    its state from the progress snapshot and the event log instead of keeping
+    the stale state of the dropped deltas.
+    """
+    from app.services.progress_hub import RESYNC_EVENT
+
+    @asynccontextmanager
+    async def watch(job_id):
+        queue = asyncio.Queue()
+        queue.put_nowait(RESYNC_EVENT)
+        yield queue
+
+    mocker.patch('app.api.routers.plan.progress_hub', MagicMock(watch=watch))
+    mock_job = MagicMock(is_queued=False, is_started=True, is_finished=False, is_failed=False)
+    mock_job.id = "job-1"
+    mock_job_reader.fetch.return_value = mock_job
+    first = ("1-0", {"type": "progress", "data": {"current_node": "task_generation"}})
+    mock_job_reader.events.side_effect = [
+        [first],
+        [first,
+         ("2-0", {"type": "progress", "data": {"current_node": "assess_risk"}}),
+         ("3-0", {"type": "terminal", "status": "finished"})],
+    ]
+    mock_job_reader.agent_state.side_effect = [
+        {"current_node": "task_generation", "progress": 8},
+        {"current_node": "assess_risk", "progress": 90},
+    ]
+
+    response = client.get("/v1/plans/job-1/stream")
+
+    messages = [message for message in response.text.split("\n\n") if message]
+    assert [message.split("\n")[:2] for message in messages] == [
+        ["id: 1-0", "event: progress"], ["id: 3-0", "event: complete"],
+    ]
+    final = json.loads(messages[-1].split("data: ", 1)[1])
+    assert (final["status"], final["current_node"], final["progress"]) == ("finished", "assess_risk", 90)
+
+
+def test_status_and_stream_never_read_eta_statistics_synchronously(mocker, mock_job_reader):
+    """
+    Tests that stale ETA statistics are only refreshed through the async
+    connection (before every estimate), never with a blocking Redis call
+    on the event loop.
+    """
+    from app.api.routers.plan import api_eta_model
+
+    @asynccontextmanager
+    async def watch(job_id):
+        queue = asyncio.Queue()
+        queue.put_nowait({"id": "2-0", "type": "progress", "data": {"current_node": "assess_risk", "progress": 90}})
+        queue.put_nowait({"id": "3-0", "type": "terminal", "status": "finished"})
+        yield queue
+
+    mocker.patch('app.api.routers.plan.progress_hub', MagicMock(watch=watch))
+    sync_connection = MagicMock()
+    sync_connection.pipeline.side_effect = AssertionError("sync Redis used on the event loop")
+    mocker.patch.object(api_eta_model, "connection", sync_connection)
+    mocker.patch.object(api_eta_model, "_loaded_at", 0.0)
+    started_at = MagicMock()
+    started_at.timestamp.return_value = time.time() - 5
+    mock_job = MagicMock(is_queued=False, is_started=True, is_finished=False, is_failed=False, started_at=started_at)
+    mock_job.id = "job-1"
+    mock_job_reader.fetch.return_value = mock_job
+    progress = {"status": "started", "current_node": "assess_risk", "iteration_number": 0,
+                "node_progress": {"assess_risk": {"status": "started", "start_time": time.time()}}}
+    mock_job_reader.agent_state.return_value = progress
+
+    assert client.get("/v1/plans/status/job-1").status_code == 200
+    messages = [message for message in client.get("/v1/plans/job-1/stream").text.split("\n\n") if message]
+
+    assert [next(line for line in message.split("\n") if line.startswith("event: ")) for message in messages] == [
+        "event: progress", "event: progress", "event: complete",
+    ]
+    sync_connection.pipeline.assert_not_called()
+    # status, stream open and each of the two live events
+    assert api_eta_model.arefresh.await_count == 4
+
+
+def test_batch_status_resolves_many_jobs_in_one_request(mock_job_reader):
+    """
+    Tests that POST /v1/plans/status:batch returns the status of every known
+    job, reads progress only for started jobs and lists unknown ids.
+    """
+    # Arrange
+    queued = MagicMock(is_queued=True, is_started=False, is_finished=False, is_failed=False,
+                       created_at=None, started_at=None, ended_at=None)
+    queued.id = "job-queued"
+    queued.get_position.return_value = 2
+    finished = MagicMock(is_queued=False, is_started=False, is_finished=True, is_failed=False,
+                         created_at=None, started_at=None, ended_at=None)
+    finished.id = "job-finished"
+    mock_job_reader.fetch_many = AsyncMock(return_value={
+        "job-queued": queued, "job-finished": finished, "job-missing": None,
+    })
+    mock_job_reader.agent_states = AsyncMock(return_value={})
+    mock_job_reader.started_count.return_value = 4
+
+    # Act
+    response = client.post("/v1/plans/status:batch", json={
+        "job_ids": ["job-queued", "job-finished", "job-missing", "job-queued"],
+    })
+
+    # Assert
+    assert response.status_code == 200
+    mock_job_reader.fetch_many.assert_awaited_once_with(["job-queued", "job-finished", "job-missing"])
+    mock_job_reader.agent_states.assert_awaited_once()
+    assert mock_job_reader.agent_states.await_args.args[0] == []
+    body = response.json()
+    assert body["not_found"] == ["job-missing"]
+    assert body["jobs"]["job-queued"]["status"] == "queued"
+    assert body["jobs"]["job-queued"]["position"] == 2
+    assert "queue_wait_seconds" in body["jobs"]["job-queued"]
+    assert body["jobs"]["job-finished"]["progress"] == 100
+
+
+def test_batch_status_rejects_too_many_job_ids(mocker, mock_job_reader):
+    mocker.patch('app.api.routers.plan.settings.STATUS_BATCH_MAX_JOBS', 2)
+
+    response = client.post("/v1/plans/status:batch", json={"job_ids": ["a", "b", "c"]})
+
+    assert response.status_code == 400
+    mock_job_reader.fetch_many.assert_not_called()
+
+
+@pytest.fixture
+def finished_plan(mock_job_reader):
+    """A finished job whose result holds three tasks and one iteration."""
+    result = {
+        "tasks": {"tasks": [{"id": f"t{i}", "task_name": f"task {i}", "estimated_day": 1} for i in range(3)]},
+        "insights": "ship it",
+        "schedule_iteration": [{"schedule": [{"task_id": "t0", "start_date": "2024-01-01", "end_date": "2024-01-02"}]}],
+        "node_progress": {"assess_risk": {"status": "completed"}},
+    }
+    job = MagicMock(is_queued=False, is_started=False, is_finished=True, is_failed=False, result=result)
+    mock_job_reader.fetch.return_value = job
+    return result
+
+
+def test_get_plan_projects_requested_fields(finished_plan):
+    response = client.get("/v1/plans/job-1", params={"fields": "insights,tasks"})
+
+    assert response.status_code == 200
+    assert response.json() == {"insights": "ship it", "tasks": finished_plan["tasks"]}
+    assert client.get("/v1/plans/job-1", params={"fields": "nope"}).status_code == 400
+
+
+def test_get_plan_iteration_and_task_pages(finished_plan):
+    response = client.get("/v1/plans/job-1/iterations/-1/schedule")
+    assert response.status_code == 200
+    assert response.json()["schedule"][0]["task_id"] == "t0"
+    assert client.get("/v1/plans/job-1/iterations/3/schedule").status_code == 404
+    assert client.get("/v1/plans/job-1/iterations/0/gantt").status_code == 404
+
+    first = client.get("/v1/plans/job-1/tasks", params={"limit": 2}).json()
+    assert [task["id"] for task in first["tasks"]] == ["t0", "t1"]
+    assert first["total"] == 3
+    second = client.get("/v1/plans/job-1/tasks", params={"limit": 2, "cursor": first["next_cursor"]}).json()
+    assert [task["id"] for task in second["tasks"]] == ["t2"]
+    assert second["next_cursor"] is None
+
+
+def test_get_plan_prefers_the_result_store(mocker, mock_job_reader):
+    from app.services.result_store import StoredPlanResult
+
+    stored = StoredPlanResult(insights="from the store", tasks={"tasks": []})
+    mocker.patch('app.api.routers.plan.plan_result_store.aload', AsyncMock(return_value=stored))
+    mock_job_reader.fetch.return_value = MagicMock(is_finished=True, is_failed=False)
+
+    response = client.get("/v1/plans/job-1", params={"fields": "insights"})
+
+    assert response.status_code == 200
+    assert response.json() == {"insights": "from the store"}
+    mock_job_reader.fetch.assert_awaited_once_with("job-1")
+
+
+def test_get_plan_with_an_expired_document_returns_500(mock_job_reader):
+    reference = {"job_id": "job-1", "result_key": "pma:result:job-1", "size": 10}
+    mock_job_reader.fetch.return_value = MagicMock(is_queued=False, is_started=False, is_finished=True,
+                                                   is_failed=False, result=reference)
+
+    assert client.get("/v1/plans/job-1").status_code == 500
+
+
+def test_finished_plan_responses_are_served_from_the_payload_cache(finished_plan, mock_job_reader):
+    first = client.get("/v1/plans/job-1", params={"fields": "insights"})
+    reads = mock_job_reader.fetch.await_count
+    finished_plan["insights"] = "changed"
+    second = client.get("/v1/plans/job-1", params={"fields": "insights"})
+
+    assert first.content == second.content == b'{"insights":"ship it"}'
+    assert mock_job_reader.fetch.await_count == reads
+    assert client.get("/v1/plans/job-1", params={"fields": "tasks"}).status_code == 200
+    assert mock_job_reader.fetch.await_count > reads
@@ -0,0 +1,25 @@
+import uuid
+from datetime import date, datetime
+
+from app.core.serialization import ORJSONResponse, dumps, loads, sse_message
+from app.schemas.task import Task
+
+
+def test_dumps_handles_pydantic_uuid_and_datetime():
+    task = Task(task_name="任务", task_description="", estimated_day=2)
+    job_id = uuid.uuid4()
+
+    payload = dumps({"task": task, "job": job_id, "at": datetime(2024, 1, 2, 3, 4, 5), "day": date(2024, 1, 2),
+                     "tags": {"a"}, job_id: 1})
+
+    assert loads(payload) == {
+        "task": {"id": str(task.id), "task_name": "任务", "task_description": "", "estimated_day": 2},
+        "job": str(job_id), "at": "2024-01-02T03:04:05", "day": "2024-01-02", "tags": ["a"], str(job_id): 1,
+    }
+    assert "任务".encode() in payload
+
+
+def test_sse_message_and_response_render_utf8_bytes():
+    assert sse_message("progress", {"node": "排期"}, "1-0") == 'id: 1-0\nevent: progress\ndata: {"node":"排期"}\n\n'.encode()
+    assert sse_message("error", {"error": "x"}) == b'event: error\ndata: {"error":"x"}\n\n'
+    assert ORJSONResponse({"ok": True}).body == b'{"ok":true}'
@@ -0,0 +1,82 @@
+import pytest
+from fastapi.testclient import TestClient
+from langchain_openai import ChatOpenAI
+
+from app.schemas.simple import (
+    SimpleDependencyList,
+    SimpleRiskList,
+    SimpleSchedule,
+    SimpleTaskAllocationList,
+    SimpleTaskList,
+)
+from benchmarks.fake_llm_server import FakeLLMConfig, create_app, parse_latency
+
+
+@pytest.fixture
+def fake_server():
+    return TestClient(create_app(FakeLLMConfig(latency="fixed:0", tasks=3, seed=7)), base_url="http://fake-llm")
+
+
+@pytest.fixture
+def llm(fake_server):
+    """The real OpenAI chat model, talking to the fake server in-process."""
+    return ChatOpenAI(
+        model="fake-llm", api_key="test", base_url="http://fake-llm/v1",
+        http_client=fake_server, max_retries=0,
+    )
+
+
+@pytest.mark.parametrize("method", ["function_calling", "json_schema", "json_mode"])
+def test_structured_task_generation_parses_for_every_method(llm, method):
+    result = llm.with_structured_output(SimpleTaskList, method=method).invoke('返回 JSON，包含 "tasks" 列表')
+
+    assert [task.id for task in result.tasks] == ["task-1", "task-2", "task-3"]
+
+
+def test_node_outputs_reference_the_tasks_and_members_in_the_prompt(llm):
+    prompt = "任务: task-1, task-2, task-3。团队: [TeamMember(name='Alice'), TeamMember(name='Bob')]"
+
+    dependencies = llm.with_structured_output(SimpleDependencyList).invoke(prompt)
+    schedule = llm.with_structured_output(SimpleSchedule).invoke(prompt)
+    allocations = llm.with_structured_output(SimpleTaskAllocationList).invoke(prompt)
+    risks = llm.with_structured_output(SimpleRiskList).invoke(prompt)
+
+    assert [(d.source, d.target) for d in dependencies.dependencies] == [("task-1", "task-2"), ("task-2", "task-3")]
+    assert [item.task_id for item in schedule.schedule] == ["task-1", "task-2", "task-3"]
+    assert [a.team_member_name for a in allocations.task_allocations] == ["Alice", "Bob", "Alice"]
+    assert len(risks.risks) == 3
+
+
+def test_plain_text_and_stats(llm, fake_server):
+    assert llm.invoke("根据上一轮结果给出改进建议").content
+
+    stats = fake_server.get("/stats").json()
+    assert stats["requests"] == 1
+    assert stats["by_kind"] == {"text": 1}
+    assert stats["completion_tokens"] > 0
+
+
+def test_azure_route_uses_the_deployment_as_model(fake_server):
+    response = fake_server.post(
+        "/openai/deployments/gpt-test/chat/completions?api-version=2024-02-01",
+        json={"messages": [{"role": "user", "content": "hello"}]},
+    )
+
+    assert response.status_code == 200
+    assert response.json()["model"] == "gpt-test"
+
+
+def test_injected_errors_are_returned_with_their_status():
+    client = TestClient(create_app(FakeLLMConfig(latency="fixed:0", error_rate=1.0, errors=("429",), seed=1)))
+
+    response = client.post("/v1/chat/completions", json={"messages": [{"role": "user", "content": "hi"}]})
+
+    assert response.status_code == 429
+    assert response.headers["retry-after"] == "1"
+    assert client.get("/stats").json()["errors"] == {"429": 1}
+
+
+def test_parse_latency_rejects_unknown_distributions():
+    assert parse_latency("fixed:0.25")(None) == 0.25
+    with pytest.raises(ValueError):
+        parse_latency("normal:1,2")
@@ -0,0 +1,114 @@
+import json
+import os
+import sys
+import time
+import uuid
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+import httpx
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+from langchain_openai import ChatOpenAI
+
+from app.core.serialization import sse_message
+from app.schemas.simple import SimpleTaskList
+from benchmarks import load_test
+from benchmarks.fake_llm_server import FakeLLMConfig, create_app
+
+
+def plan_api(llm) -> FastAPI:
+    """Minimal stand-in for the plan API: each job runs task generation against the fake LLM."""
+    app = FastAPI()
+    jobs = {}
+
+    @app.post("/v1/plans")
+    async def create_plan(request: Request):
+        form = await request.form()
+        assert (await form["team_file"].read()).decode("utf-8").startswith("name,profile")
+        started = time.time()
+        plan = await llm.with_structured_output(SimpleTaskList).ainvoke(form["project_description"])
+        job_id = str(uuid.uuid4())
+        jobs[job_id] = {
+            "task_generation": {"start_time": started, "end_time": time.time()},
+            "tasks": len(plan.tasks),
+        }
+        return {"job_id": job_id}
+
+    @app.get("/v1/plans/{job_id}/stream")
+    async def stream(job_id: str):
+        job = jobs[job_id]
+
+        async def events():
+            yield sse_message("progress", {"status": "started", "node_progress": {}})
+            yield sse_message("progress", {"status": "started", "node_progress": {"task_generation": job["task_generation"]}})
+            yield sse_message("complete", {"status": "finished", "tasks": job["tasks"]})
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    return app
+
+
+@pytest.fixture
+def fake_llm():
+    app = create_app(FakeLLMConfig(latency="fixed:0", tasks=4, seed=3))
+    llm = ChatOpenAI(
+        model="fake-llm", api_key="test", base_url="http://fake-llm/v1", max_retries=0,
+        http_client=TestClient(app, base_url="http://fake-llm"),
+        http_async_client=httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://fake-llm"),
+    )
+    return app, llm
+
+
+@pytest.fixture
+def benchmark(mocker, fake_llm):
+    """Routes the benchmark's HTTP client to the stand-in API and fakes Redis INFO counters."""
+    _, llm = fake_llm
+    api = plan_api(llm)
+    # Only load_test sees the routed client; the OpenAI SDK still gets the real httpx.AsyncClient
+    routed = SimpleNamespace(**vars(httpx))
+    routed.AsyncClient = lambda **kwargs: httpx.AsyncClient(transport=httpx.ASGITransport(app=api), **kwargs)
+    mocker.patch.object(load_test, "httpx", routed)
+
+    processed = iter(range(100, 10_000, 40))
+    connection = MagicMock()
+    connection.info.side_effect = lambda section: (
+        {"total_commands_processed": next(processed)} if section == "stats"
+        else {"cmdstat_xadd": {"calls": 0}}
+    )
+    mocker.patch.object(load_test, "Redis", return_value=connection)
+
+
+def run_benchmark(mocker, *args):
+    mocker.patch.object(sys, "argv", ["load_test.py", "--worker-pid", str(os.getpid()), *args])
+    load_test.main()
+
+
+def test_one_job_against_the_fake_llm_produces_a_report(mocker, benchmark, fake_llm, tmp_path):
+    report_path = tmp_path / "reports" / "load.json"
+
+    run_benchmark(mocker, "--jobs", "1", "--concurrency", "1", "--include-jobs", "--output", str(report_path))
+
+    report = json.loads(report_path.read_text(encoding="utf-8"))
+    assert report["statuses"] == {"finished": 1}
+    assert report["end_to_end_seconds"]["count"] == 1
+    assert report["queue_wait_seconds"]["count"] == 1
+    assert report["node_seconds"]["task_generation"]["count"] == 1
+    assert report["sse_events_per_job"]["p50"] == 3
+    assert report["redis"]["commands_per_job"] == 40
+    assert report["jobs"][0]["status"] == "finished"
+    assert TestClient(fake_llm[0]).get("/stats").json()["by_kind"] == {"SimpleTaskList": 1}
+
+
+def test_compare_diffs_against_a_previous_report(mocker, benchmark, tmp_path):
+    previous = tmp_path / "previous.json"
+    run_benchmark(mocker, "--jobs", "1", "--output", str(previous))
+    current = tmp_path / "current.json"
+
+    run_benchmark(mocker, "--jobs", "1", "--compare", str(previous), "--output", str(current))
+
+    comparison = json.loads(current.read_text(encoding="utf-8"))["comparison"]
+    assert comparison["statuses.finished"] == {"before": 1, "after": 1, "change_pct": 0.0}
+    assert "end_to_end_seconds.p95" in comparison
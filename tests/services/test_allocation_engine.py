@@ -0,0 +1,105 @@
+import uuid
+
+import pytest
+
+from app.schemas.plan import TaskList, Schedule
+from app.schemas.task import Task, TaskSchedule
+from app.schemas.team import TeamMember
+from app.services.allocation_engine import SkillAllocator, _MemberCalendar, tokenize
+
+
+def _task(name, description, days=2):
+    return Task(id=uuid.uuid4(), task_name=name, task_description=description, estimated_day=days)
+
+
+def _slot(task, start, end):
+    return TaskSchedule(task_id=task.id, start_date=start, end_date=end, gantt_chart_format="")
+
+
+@pytest.fixture
+def team():
+    return [
+        TeamMember(name="Alice", profile="Backend engineer, Python, FastAPI, Redis, databases"),
+        TeamMember(name="Bob", profile="Frontend engineer, React, TypeScript, CSS, UI design"),
+    ]
+
+
+def test_tokenize_uses_bigrams_for_chinese():
+    """中文按字符二元组切分，英文按单词切分并去掉停用词"""
+    assert tokenize("前端开发 and React") == ["前端", "端开", "开发", "react"]
+
+
+def test_allocate_matches_skills(team):
+    """Tasks go to the member whose profile matches them best."""
+    api = _task("Build API", "Implement the FastAPI backend with Redis")
+    ui = _task("Build UI", "Create React components and CSS styles")
+    schedule = Schedule(schedule=[_slot(api, "2024-01-01", "2024-01-02"), _slot(ui, "2024-01-01", "2024-01-02")])
+
+    result = SkillAllocator().allocate(TaskList(tasks=[api, ui]), schedule, team)
+
+    assigned = {a.task.id: a.team_member.name for a in result.allocations.task_allocations}
+    assert assigned == {api.id: "Alice", ui.id: "Bob"}
+    assert result.ambiguous == []
+
+
+def test_allocate_respects_one_task_at_a_time(team):
+    """Overlapping tasks are never given to the same member."""
+    first = _task("API part 1", "Python FastAPI endpoints")
+    second = _task("API part 2", "Python FastAPI endpoints")
+    later = _task("API part 3", "Python FastAPI endpoints")
+    schedule = Schedule(schedule=[
+        _slot(first, "2024-01-01", "2024-01-03"),
+        _slot(second, "2024-01-03", "2024-01-05"),
+        _slot(later, "2024-01-04", "2024-01-06"),
+    ])
+
+    result = SkillAllocator().allocate(TaskList(tasks=[first, second, later]), schedule, team)
+
+    assigned = {a.task.id: a.team_member.name for a in result.allocations.task_allocations}
+    assert assigned[first.id] == "Alice"
+    assert assigned[second.id] == "Bob"
+    assert assigned[later.id] == "Alice"
+    assert second.id in result.ambiguous
+
+
+def test_forced_overlaps_keep_the_calendar_busy():
+    calendar = _MemberCalendar()
+    assert calendar.reserve(1, 10)
+    assert not calendar.reserve(5, 6)
+
+    assert not calendar.is_free(7, 8)
+    assert calendar.is_free(11, 12)
+
+
+def test_allocate_reports_double_bookings_when_the_whole_team_is_busy(team):
+    """Once everyone is busy, later overlapping tasks are still seen as conflicts."""
+    api = _task("API", "Python FastAPI endpoints")
+    ui = _task("UI", "React components and CSS")
+    forced = _task("API hotfix", "Python FastAPI endpoints")
+    later = _task("API docs", "Python FastAPI endpoints")
+    after = _task("API release", "Python FastAPI endpoints")
+    schedule = Schedule(schedule=[
+        _slot(api, "2024-01-01", "2024-01-10"),
+        _slot(ui, "2024-01-01", "2024-01-10"),
+        _slot(forced, "2024-01-05", "2024-01-06"),
+        _slot(later, "2024-01-07", "2024-01-08"),
+        _slot(after, "2024-01-11", "2024-01-12"),
+    ])
+
+    result = SkillAllocator().allocate(TaskList(tasks=[api, ui, forced, later, after]), schedule, team)
+
+    assert result.conflicts == [forced.id, later.id]
+    assert {forced.id, later.id} <= set(result.ambiguous)
+    assert after.id not in result.ambiguous
+
+
+def test_allocate_flags_unmatched_tasks_and_honours_preferences(team):
+    """Tasks without any skill signal are ambiguous; a free preferred member wins."""
+    task = _task("Write press release", "Marketing copy")
+
+    result = SkillAllocator().allocate(TaskList(tasks=[task]), None, team)
+    assert result.ambiguous == [task.id]
+
+    preferred = SkillAllocator().allocate(TaskList(tasks=[task]), None, team, preferred={task.id: "Bob"})
+    assert preferred.allocations.task_allocations[0].team_member.name == "Bob"
+    assert preferred.ambiguous == []
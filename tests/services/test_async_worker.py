@@ -0,0 +1,126 @@
+import asyncio
+import time
+from unittest.mock import AsyncMock
+
+import fakeredis
+import pytest
+from rq import Callback, Queue, Retry
+from rq.job import JobStatus
+
+from app.services.async_worker import ASYNC_JOB_HANDLERS, AsyncWorker
+from app.services.progress import read_events
+
+
+ACTIVE = {"now": 0, "peak": 0}
+CALLBACKS = []
+
+
+def slow_job(seconds):
+    """Placeholder enqueued for the async handler below."""
+
+
+async def async_slow_job(seconds, job_id=None):
+    ACTIVE["now"] += 1
+    ACTIVE["peak"] = max(ACTIVE["peak"], ACTIVE["now"])
+    try:
+        await asyncio.sleep(seconds)
+    finally:
+        ACTIVE["now"] -= 1
+    return seconds
+
+
+def ok_job(value):
+    return value * 2
+
+
+def failing_job():
+    raise ValueError("boom")
+
+
+def on_failure(job, connection, exc_type, exc_value, tb):
+    CALLBACKS.append((job.id, exc_type.__name__))
+
+
+@pytest.fixture
+def redis(mocker):
+    ACTIVE.update(now=0, peak=0)
+    CALLBACKS.clear()
+    mocker.patch("app.services.async_worker.llm_registry.awarm_up", AsyncMock())
+    mocker.patch.dict(ASYNC_JOB_HANDLERS, {f"{__name__}.slow_job": f"{__name__}.async_slow_job"})
+    return fakeredis.FakeRedis(server=fakeredis.FakeServer())
+
+
+def _work_until(worker, jobs, deadline=15):
+    """Runs the worker loop until every job reached a terminal status."""
+    async def scenario():
+        async def stop_when_done():
+            started = time.monotonic()
+            while time.monotonic() - started < deadline:
+                statuses = [job.get_status(refresh=True) for job in jobs]
+                if all(status in (JobStatus.FINISHED, JobStatus.FAILED) for status in statuses):
+                    break
+                await asyncio.sleep(0.05)
+            worker.request_stop_async()
+
+        await asyncio.gather(worker._work_loop(), stop_when_done())
+
+    asyncio.run(scenario())
+
+
+def test_concurrency_is_bounded_and_results_are_saved(redis):
+    queue = Queue(connection=redis)
+    jobs = [queue.enqueue(slow_job, 0.2) for _ in range(5)]
+    worker = AsyncWorker([queue], connection=redis, concurrency=2, poll_timeout=1)
+
+    _work_until(worker, jobs)
+
+    assert ACTIVE["peak"] == 2
+    assert all(job.get_status(refresh=True) == JobStatus.FINISHED for job in jobs)
+    assert [job.return_value() for job in jobs] == [0.2] * 5
+    assert queue.started_job_registry.count == 0
+    assert read_events(redis, jobs[0].id)[-1][1] == {"type": "terminal", "status": "finished"}
+
+
+def test_failures_run_callbacks_retries_and_dependents(redis):
+    queue = Queue(connection=redis)
+    failing = queue.enqueue(failing_job, retry=Retry(max=1), on_failure=Callback(on_failure))
+    parent = queue.enqueue(ok_job, 21)
+    child = queue.enqueue(ok_job, 1, depends_on=parent)
+    worker = AsyncWorker([queue], connection=redis, concurrency=3, poll_timeout=1)
+
+    _work_until(worker, [failing, parent, child])
+
+    failing.refresh()
+    assert failing.get_status() == JobStatus.FAILED
+    assert failing.retries_left == 0
+    assert CALLBACKS == [(failing.id, "ValueError"), (failing.id, "ValueError")]
+    assert "ValueError: boom" in failing.latest_result().exc_string
+    assert failing.id in queue.failed_job_registry
+    terminal = [event for _, event in read_events(redis, failing.id) if event["type"] == "terminal"]
+    assert terminal == [{"type": "terminal", "status": "failed"}]
+    assert (parent.return_value(), child.return_value()) == (42, 2)
+
+
+def test_timed_out_jobs_fail_like_in_the_fork_worker(redis):
+    queue = Queue(connection=redis)
+    job = queue.enqueue(slow_job, 10, job_timeout=1)
+    worker = AsyncWorker([queue], connection=redis, concurrency=1, poll_timeout=1)
+
+    _work_until(worker, [job])
+
+    assert job.get_status(refresh=True) == JobStatus.FAILED
+    assert "JobTimeoutException" in job.latest_result().exc_string
+    assert ACTIVE["now"] == 0
+
+
+def test_a_failure_to_save_the_result_marks_the_job_failed(redis, mocker):
+    queue = Queue(connection=redis)
+    job = queue.enqueue(ok_job, 1)
+    worker = AsyncWorker([queue], connection=redis, concurrency=1, poll_timeout=1)
+    mocker.patch.object(worker, "handle_job_success", side_effect=ConnectionError("redis blip"))
+
+    _work_until(worker, [job])
+
+    assert job.get_status(refresh=True) == JobStatus.FAILED
+    assert "redis blip" in job.latest_result().exc_string
+    assert queue.started_job_registry.count == 0
@@ -0,0 +1,138 @@
+import asyncio
+import threading
+import time
+
+import httpx
+import pytest
+from unittest.mock import MagicMock
+
+from app.services.call_policy import CallPolicy, LLMCallPolicy, build_policies
+
+
+def make_policy(**kwargs):
+    options = {"deadline": 5, "attempt_timeout": 1, "max_retries": 2, "backoff": 0.01, "backoff_max": 0.01}
+    options.update(kwargs)
+    return LLMCallPolicy(MagicMock(), CallPolicy(**options))
+
+
+def _outcomes(policy, node_name="risk_assessor"):
+    pipe = policy.connection.pipeline.return_value.__enter__.return_value
+    return {call.args[1].split(":")[1]: call.args[2] for call in pipe.hincrby.call_args_list if call.args[1].startswith(node_name)}
+
+
+def test_build_policies_merges_overrides_and_rejects_unknown_fields():
+    default, overrides = build_policies({"deadline": 30}, {"risk_assessor": {"attempt_timeout": 5}})
+
+    assert default.deadline == 30
+    assert overrides["risk_assessor"].deadline == 30
+    assert overrides["risk_assessor"].attempt_timeout == 5
+    with pytest.raises(ValueError):
+        build_policies({}, {"risk_assessor": {"timeout": 5}})
+    with pytest.raises(ValueError):
+        build_policies({"hedge_quantile": 120}, {})
+
+
+def test_run_retries_retryable_errors_then_succeeds():
+    policy = make_policy()
+    call = MagicMock(side_effect=[TimeoutError(), TimeoutError(), "result"])
+    prepare = MagicMock()
+
+    assert policy.run("risk_assessor", call, prepare) == "result"
+    assert call.call_count == 3
+    assert prepare.call_count == 3
+    assert _outcomes(policy) == {"timeouts": 2, "retries": 2, "success": 1}
+
+
+def test_run_does_not_retry_non_retryable_errors():
+    policy = make_policy()
+    call = MagicMock(side_effect=KeyError("bad request"))
+
+    with pytest.raises(KeyError):
+        policy.run("risk_assessor", call)
+    assert call.call_count == 1
+    assert _outcomes(policy) == {"failures": 1}
+
+
+def test_run_passes_the_attempt_timeout_to_each_call_in_the_calling_thread():
+    policy = make_policy(attempt_timeout=0.5, max_retries=1)
+    calls = []
+
+    def call(timeout):
+        calls.append((timeout, threading.get_ident()))
+        if len(calls) == 1:
+            raise httpx.ReadTimeout("no response")
+        return "result"
+
+    assert policy.run("risk_assessor", call) == "result"
+    assert [timeout for timeout, _ in calls] == [0.5, 0.5]
+    assert {thread for _, thread in calls} == {threading.get_ident()}
+    assert _outcomes(policy) == {"timeouts": 1, "retries": 1, "success": 1}
+
+
+def test_sync_calls_are_not_hedged(mocker):
+    policy = make_policy(hedge_quantile=90, hedge_min_samples=1)
+    mocker.patch.object(policy, "hedge_delay", return_value=0.01)
+    call = MagicMock(side_effect=lambda timeout: time.sleep(0.1) or "slow")
+
+    assert policy.run("risk_assessor", call) == "slow"
+    assert call.call_count == 1
+    assert _outcomes(policy) == {"success": 1}
+
+
+def test_gateway_enforces_the_attempt_timeout_in_the_http_transport():
+    from langchain_openai import ChatOpenAI
+
+    from app.services.llm_gateway import LLMGateway
+
+    timeouts = []
+
+    def handler(request):
+        timeouts.append(request.extensions["timeout"]["read"])
+        if len(timeouts) == 1:
+            raise httpx.ReadTimeout("slow endpoint", request=request)
+        return httpx.Response(200, json={
+            "id": "1", "object": "chat.completion", "created": 0, "model": "gpt-4o-mini",
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": "ok"}, "finish_reason": "stop"}],
+        })
+
+    llm = ChatOpenAI(model="gpt-4o-mini", api_key="test", max_retries=0,
+                     http_client=httpx.Client(transport=httpx.MockTransport(handler)))
+    policy = LLMCallPolicy(MagicMock(), CallPolicy(deadline=30, attempt_timeout=7, max_retries=1, backoff=0.01, backoff_max=0.01))
+    gateway = LLMGateway(MagicMock(), MagicMock(), policy=policy)
+
+    assert gateway._call("insight_generator", llm, "prompt", None).content == "ok"
+    assert timeouts == [7, 7]
+    assert _outcomes(policy, "insight_generator") == {"timeouts": 1, "retries": 1, "success": 1}
+
+
+def test_async_hedge_cancels_the_losing_request(mocker):
+    policy = make_policy(hedge_quantile=90, hedge_min_samples=1)
+    mocker.patch.object(policy, "hedge_delay", return_value=0.05)
+    cancelled = []
+    delays = iter([1.0, 0.0])
+
+    async def call():
+        try:
+            await asyncio.sleep(next(delays))
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+        return "fast"
+
+    async def run():
+        result = await policy.arun("risk_assessor", call)
+        await asyncio.sleep(0)
+        return result
+
+    assert asyncio.run(run()) == "fast"
+    assert cancelled == [True]
+
+
+def test_hedge_delay_needs_enough_latency_samples():
+    policy = make_policy(hedge_quantile=50, hedge_min_samples=3)
+    policy.connection.lrange.return_value = [b"1.0", b"2.0"]
+    assert policy.hedge_delay("risk_assessor", policy.default) is None
+
+    policy._latencies.clear()
+    policy.connection.lrange.return_value = [b"1.0", b"2.0", b"3.0"]
+    assert policy.hedge_delay("risk_assessor", policy.default) == 2.0
@@ -0,0 +1,137 @@
+import asyncio
+
+import pytest
+from langchain_core.messages import AIMessage
+from pydantic import BaseModel
+from unittest.mock import MagicMock
+
+from app.services.cassette import CassetteMissError, LLMCassettes, Tape
+from app.services.llm_cache import LLMResponseCache
+from app.services.llm_gateway import LLMGateway
+from app.services.node_cache import NodeResultCache
+from app.services.single_flight import SingleFlight
+
+
+class Answer(BaseModel):
+    value: int
+
+
+def make_llm(answers):
+    llm = MagicMock()
+    llm.model_name = "gpt-4o-mini"
+    llm.temperature = 0.1
+    llm.invoke.side_effect = [AIMessage(content=answer) for answer in answers]
+    llm.with_structured_output.return_value.invoke.side_effect = [Answer(value=len(answer)) for answer in answers]
+    return llm
+
+
+def make_gateway(cassettes):
+    registry = MagicMock()
+    registry.structured.side_effect = lambda llm, schema, method=None: llm.with_structured_output(schema)
+    cache = LLMResponseCache(MagicMock(), ttl=60, max_entries=10, enabled=False)
+    return LLMGateway(registry, cache, cassettes=cassettes)
+
+
+def test_recorded_job_replays_without_calling_the_model(tmp_path):
+    recorder = LLMCassettes("record", directory=str(tmp_path))
+    gateway = make_gateway(recorder)
+    llm = make_llm(["first", "second"])
+
+    token = recorder.begin("job-1")
+    assert gateway.invoke("insight_generator", llm, "prompt").content == "first"
+    assert gateway.invoke("risk_assessor", llm, "prompt", Answer) == Answer(value=5)
+    recorder.save(recorder.end(token))
+    assert recorder.current() is None
+
+    player = LLMCassettes("replay", replay_file=str(tmp_path / "job-1.jsonl.gz"), latency_scale=0)
+    gateway = make_gateway(player)
+    silent = make_llm([])
+
+    token = player.begin("job-2")
+    assert gateway.invoke("risk_assessor", silent, "prompt", Answer) == Answer(value=5)
+    assert gateway.invoke("insight_generator", silent, "prompt").content == "first"
+    with pytest.raises(CassetteMissError):
+        gateway.invoke("insight_generator", silent, "prompt")
+    player.end(token)
+    silent.invoke.assert_not_called()
+
+
+def test_caches_are_bypassed_while_recording_and_replaying(tmp_path, mocker):
+    """Node and response cache hits are neither recorded nor served instead of the cassette."""
+    llm_cache = LLMResponseCache(MagicMock(), ttl=60, max_entries=10, l1_size=10, l1_ttl=60)
+    llm_cache.connection.get.return_value = None
+    node_cache = NodeResultCache(MagicMock(), ttl=60, max_entries=10)
+    node_cache.connection.get.return_value = b'{"value": 99}'
+    llm = make_llm(["fresh"])
+    llm_cache.set(llm_cache.request_key(llm, "insights"), AIMessage(content="cached"))
+
+    def run(cassettes, model):
+        registry = MagicMock()
+        registry.structured.side_effect = lambda llm, schema, method=None: llm.with_structured_output(schema)
+        gateway = LLMGateway(registry, llm_cache, flight=SingleFlight(), cassettes=cassettes)
+        mocker.patch("app.services.node_cache.llm_gateway", gateway)
+        token = cassettes.begin("job-1")
+        try:
+            return (
+                node_cache.invoke("risk_assessor", {"tasks": []}, model, Answer, "risks"),
+                gateway.invoke("insight_generator", model, "insights").content,
+            )
+        finally:
+            cassettes.save(cassettes.end(token))
+
+    recorder = LLMCassettes("record", directory=str(tmp_path))
+    assert run(recorder, llm) == (Answer(value=5), "fresh")
+    node_cache.connection.get.assert_not_called()
+
+    tape = Tape.load(str(tmp_path / "job-1.jsonl.gz"))
+    assert [entry["node"] for entry in tape.entries] == ["risk_assessor", "insight_generator"]
+
+    player = LLMCassettes("replay", replay_file=str(tmp_path / "job-1.jsonl.gz"), latency_scale=0)
+    llm_cache.set(llm_cache.request_key(llm, "insights"), AIMessage(content="cached"))
+    assert run(player, make_llm([])) == (Answer(value=5), "fresh")
+    node_cache.connection.get.assert_not_called()
+
+
+def test_replay_matches_by_request_hash_then_by_call_order():
+    entries = [
+        {"node": "task_scheduler", "seq": 0, "key": "aaa", "latency": 1.0, "response": "0"},
+        {"node": "task_scheduler", "seq": 1, "key": "bbb", "latency": 2.0, "response": "1"},
+    ]
+    tape = Tape("job", entries, replaying=True)
+
+    assert tape.take("task_scheduler", "pma:llm_cache:bbb")["response"] == "1"
+    # the second call's prompt changed, so it falls back to the node's call order
+    assert tape.take("task_scheduler", "pma:llm_cache:zzz")["response"] == "0"
+
+
+def test_replay_misses_only_once_the_nodes_entries_are_used_up():
+    entries = [
+        {"node": "task_scheduler", "seq": 0, "key": "aaa", "latency": 1.0, "response": "0"},
+        {"node": "risk_assessor", "seq": 0, "key": "ccc", "latency": 1.0, "response": "2"},
+    ]
+    tape = Tape("job", entries, replaying=True)
+
+    assert tape.take("task_scheduler", "pma:llm_cache:zzz")["response"] == "0"
+    with pytest.raises(CassetteMissError):
+        tape.take("task_scheduler", "pma:llm_cache:aaa")
+
+
+def test_areplay_waits_for_the_scaled_recorded_latency(mocker):
+    sleeps = []
+
+    async def fake_sleep(seconds):
+        sleeps.append(seconds)
+
+    mocker.patch("app.services.cassette.asyncio.sleep", fake_sleep)
+    player = LLMCassettes("replay", replay_file="unused", latency_scale=0.5)
+    tape = Tape("job", [{"node": "risk_assessor", "seq": 0, "key": None, "latency": 3.0, "response": '{"value": 1}'}], replaying=True)
+
+    assert asyncio.run(player.areplay(tape, "risk_assessor", None, Answer)) == Answer(value=1)
+    assert sleeps == [1.5]
+
+
+def test_invalid_modes_are_rejected():
+    with pytest.raises(ValueError):
+        LLMCassettes("playback")
+    with pytest.raises(ValueError):
+        LLMCassettes("replay")
@@ -0,0 +1,131 @@
+import operator
+from typing import Annotated, List
+
+import fakeredis
+import pytest
+from langgraph.checkpoint.base import empty_checkpoint
+from langgraph.graph import END, StateGraph
+from typing_extensions import TypedDict
+
+from app.schemas.task import Task
+from app.services.checkpoint import RedisCheckpointSaver
+
+
+@pytest.fixture
+def redis():
+    return fakeredis.FakeRedis(server=fakeredis.FakeServer())
+
+
+def _put(saver, thread_id, parent=None, ns="", **values):
+    checkpoint = empty_checkpoint()
+    checkpoint["channel_values"] = values
+    checkpoint["channel_versions"] = {name: saver.get_next_version(None, None) for name in values}
+    config = {"configurable": {"thread_id": thread_id, "checkpoint_ns": ns}}
+    if parent:
+        config["configurable"]["checkpoint_id"] = parent["configurable"]["checkpoint_id"]
+    return saver.put(config, checkpoint, {"source": "loop", "step": len(values)}, checkpoint["channel_versions"])
+
+
+def test_put_then_get_tuple_restores_values_and_parent(redis):
+    saver = RedisCheckpointSaver(redis, ttl=600)
+    task = Task(task_name="design", task_description="", estimated_day=2)
+
+    first = _put(saver, "job-1", tasks=[task])
+    second = _put(saver, "job-1", parent=first, tasks=[task], insights="ok")
+
+    latest = saver.get_tuple({"configurable": {"thread_id": "job-1"}})
+    assert latest.config == second
+    assert latest.parent_config == first
+    assert latest.checkpoint["channel_values"] == {"tasks": [task], "insights": "ok"}
+    assert saver.get_tuple(first).checkpoint["channel_values"] == {"tasks": [task]}
+    assert saver.get_tuple({"configurable": {"thread_id": "job-2"}}) is None
+
+
+def test_pending_writes_are_returned_in_order_and_written_once(redis):
+    saver = RedisCheckpointSaver(redis, ttl=600)
+    config = _put(saver, "job-1", step=1)
+
+    saver.put_writes(config, [("schedule", "a"), ("risks", "b")], task_id="task-2")
+    saver.put_writes(config, [("tasks", "c")], task_id="task-1")
+    saver.put_writes(config, [("tasks", "ignored")], task_id="task-1")
+
+    assert saver.get_tuple(config).pending_writes == [
+        ("task-1", "tasks", "c"), ("task-2", "schedule", "a"), ("task-2", "risks", "b"),
+    ]
+
+
+def test_list_returns_newest_first_and_honours_before_limit_and_filter(redis):
+    saver = RedisCheckpointSaver(redis, ttl=600)
+    configs = [_put(saver, "job-1", **{f"v{i}": i for i in range(n + 1)}) for n in range(3)]
+    thread = {"configurable": {"thread_id": "job-1"}}
+
+    listed = [item.config for item in saver.list(thread)]
+    assert listed == configs[::-1]
+    assert [item.config for item in saver.list(thread, before=configs[2])] == configs[1::-1]
+    assert [item.config for item in saver.list(thread, limit=1)] == [configs[2]]
+    assert [item.config for item in saver.list(thread, filter={"step": 2})] == [configs[1]]
+    assert list(saver.list(None)) == []
+
+
+def test_every_key_expires(redis):
+    saver = RedisCheckpointSaver(redis, ttl=600)
+    config = _put(saver, "job-1", tasks=[])
+    saver.put_writes(config, [("tasks", [])], task_id="task-1")
+
+    keys = redis.keys("pma:checkpoint:*")
+    assert len(keys) == 5
+    assert all(0 < redis.ttl(key) <= 600 for key in keys)
+
+
+def test_delete_thread_removes_only_that_thread_without_scanning(redis, mocker):
+    saver = RedisCheckpointSaver(redis, ttl=600)
+    for ns in ("", "subgraph"):
+        config = _put(saver, "job-1", ns=ns, tasks=[])
+        saver.put_writes(config, [("tasks", [])], task_id="task-1")
+    _put(saver, "job-10", tasks=[])
+    mocker.patch.object(redis, "scan_iter", side_effect=AssertionError("delete_thread must not scan"))
+
+    saver.delete_thread("job-1")
+
+    assert all(key.startswith(b"pma:checkpoint:job-10:") for key in redis.keys("*"))
+    assert not saver.has_pending_run("job-1")
+    assert saver.has_pending_run("job-10")
+
+
+class _State(TypedDict):
+    log: Annotated[List[str], operator.add]
+
+
+def test_failed_run_resumes_from_the_last_completed_node(redis):
+    saver = RedisCheckpointSaver(redis, ttl=600)
+    calls = {"plan": 0, "review": 0}
+
+    def plan(state):
+        calls["plan"] += 1
+        return {"log": ["plan"]}
+
+    def review(state):
+        calls["review"] += 1
+        if calls["review"] == 1:
+            raise ConnectionError("worker lost the LLM connection")
+        return {"log": ["review"]}
+
+    workflow = StateGraph(_State)
+    workflow.add_node("plan", plan)
+    workflow.add_node("review", review)
+    workflow.set_entry_point("plan")
+    workflow.add_edge("plan", "review")
+    workflow.add_edge("review", END)
+    graph = workflow.compile(checkpointer=saver)
+    config = {"configurable": {"thread_id": "job-1"}}
+
+    with pytest.raises(ConnectionError):
+        graph.invoke({"log": []}, config)
+    assert saver.has_pending_run("job-1")
+    assert graph.get_state(config).next == ("review",)
+
+    assert graph.invoke(None, config) == {"log": ["plan", "review"]}
+    assert calls == {"plan": 1, "review": 2}
+
+    saver.delete_thread("job-1")
+    assert redis.keys("pma:checkpoint:*") == []
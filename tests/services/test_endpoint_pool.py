@@ -0,0 +1,110 @@
+import pytest
+from unittest.mock import MagicMock
+
+from app.core.config import settings
+from app.services.endpoint_pool import Endpoint, EndpointPool, configured_endpoints
+
+
+def make_pool(*weights, **kwargs):
+    endpoints = [Endpoint(name=f"ep{index}", weight=weight) for index, weight in enumerate(weights)]
+    return EndpointPool(endpoints, connection=MagicMock(), **kwargs)
+
+
+def _serve(pool, name, latency, ok=True):
+    assert pool.choose() == name
+    pool.record(name, latency, ok)
+
+
+def test_choose_probes_new_endpoints_then_prefers_lowest_weighted_latency():
+    pool = make_pool(1.0, 1.0, 3.0)
+    _serve(pool, "ep0", 1.0)
+    _serve(pool, "ep1", 2.0)
+    _serve(pool, "ep2", 4.0)
+
+    # scores: ep0 1.0, ep1 2.0, ep2 4.0 / 3
+    assert pool.choose() == "ep0"
+    # the request in flight doubles ep0's score, so the heavier ep2 is next
+    assert pool.choose() == "ep2"
+
+
+def test_circuit_opens_after_consecutive_failures_and_allows_one_probe(mocker):
+    clock = mocker.patch("app.services.endpoint_pool.time.monotonic", return_value=100.0)
+    pool = make_pool(1.0, 1.0, failure_threshold=2, cooldown=30)
+    _serve(pool, "ep0", 0.1)
+    _serve(pool, "ep1", 0.5, ok=False)
+    # a failing endpoint loses ties, so the retry goes elsewhere
+    assert pool.choose() == "ep0"
+    pool.release("ep0")
+    pool.record("ep1", 0.5, ok=False)
+
+    assert pool.snapshot()["ep1"]["circuit"] == "open"
+    _serve(pool, "ep0", 0.1)
+
+    clock.return_value = 131.0
+    # half-open: exactly one probe goes to ep1 even though ep0 is healthy
+    assert pool.choose() == "ep1"
+    assert pool.choose() == "ep0"
+    pool.record("ep1", 0.2, ok=False)
+    assert pool.snapshot()["ep1"]["circuit"] == "open"
+
+
+def test_successful_probe_closes_the_circuit(mocker):
+    clock = mocker.patch("app.services.endpoint_pool.time.monotonic", return_value=0.0)
+    pool = make_pool(1.0, failure_threshold=1, cooldown=10)
+    _serve(pool, "ep0", 0.1, ok=False)
+
+    # every endpoint is ejected: the one that recovers first is still used
+    assert pool.choose() == "ep0"
+    pool.release("ep0")
+
+    clock.return_value = 11.0
+    _serve(pool, "ep0", 0.1)
+    assert pool.snapshot()["ep0"]["circuit"] == "closed"
+
+
+def test_stats_aggregate_worker_counters():
+    pool = make_pool(1.0, 1.0)
+    pool.connection.hgetall.return_value = {
+        b"ep0:calls": b"4", b"ep0:errors": b"1", b"ep0:latency_ms": b"900",
+        b"ep0:ewma_ms": b"310", b"ep0:circuit": b"closed",
+    }
+
+    assert pool.stats() == {
+        "ep0": {"calls": 4, "errors": 1, "ewma_ms": 310, "circuit": "closed", "error_rate": 0.25, "avg_latency_ms": 300.0},
+        "ep1": {"calls": 0, "errors": 0, "ewma_ms": 0, "circuit": "closed", "error_rate": 0.0, "avg_latency_ms": 0.0},
+    }
+
+
+def test_configured_endpoints_defaults_to_single_provider_endpoint():
+    config = settings.model_copy(update={"MODEL_PROVIDER": "Azure", "LLM_ENDPOINTS": []})
+    (endpoint,) = configured_endpoints(config)
+
+    assert endpoint.name == "Azure"
+    assert endpoint.model == settings.AZURE_OPENAI_DEPLOYMENT_NAME
+
+
+def test_configured_endpoints_validates_entries():
+    config = settings.model_copy(update={"LLM_ENDPOINTS": [{"name": "a", "weight": 2}, {"provider": "Azure"}]})
+    assert [endpoint.name for endpoint in configured_endpoints(config)] == ["a", "endpoint-1"]
+
+    for entries in ([{"name": "a", "region": "eu"}], [{"name": "a"}, {"name": "a"}], [{"provider": "Anthropic"}]):
+        with pytest.raises(ValueError):
+            configured_endpoints(settings.model_copy(update={"LLM_ENDPOINTS": entries}))
+
+
+def test_gateway_routes_each_attempt_and_records_endpoint_failures():
+    from app.services.call_policy import CallPolicy, LLMCallPolicy
+    from app.services.llm_gateway import LLMGateway
+
+    pool = make_pool(1.0, 1.0)
+    routed = {"ep0": MagicMock(), "ep1": MagicMock()}
+    routed["ep0"].invoke.side_effect = TimeoutError()
+    routed["ep1"].invoke.return_value = "answer"
+    registry = MagicMock()
+    registry.route.side_effect = lambda llm, endpoint: routed[endpoint]
+    policy = LLMCallPolicy(MagicMock(), CallPolicy(deadline=5, attempt_timeout=1, max_retries=1, backoff=0.01, backoff_max=0.01))
+    gateway = LLMGateway(registry, MagicMock(), policy=policy, pool=pool)
+
+    assert gateway._call("risk_assessor", MagicMock(), "prompt", None) == "answer"
+    assert pool.snapshot()["ep0"]["consecutive_failures"] == 1
+    assert pool.snapshot()["ep0"]["in_flight"] == pool.snapshot()["ep1"]["in_flight"] == 0
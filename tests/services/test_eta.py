@@ -0,0 +1,132 @@
+import asyncio
+
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+
+from app.services.eta import DEFAULT_NODE_SECONDS, FIRST_PASS, EtaModel, percentile, task_count_bucket
+
+
+def _model(history=None):
+    """An EtaModel whose pipelined LRANGE calls return `history[key]` (empty lists otherwise)."""
+    history = history or {}
+    connection = MagicMock()
+    pipe = connection.pipeline.return_value
+    keys = []
+    pipe.lrange.side_effect = lambda key, start, end: keys.append(key)
+    pipe.execute.side_effect = lambda: [history.get(key, []) for key in keys]
+    return EtaModel(connection, window=50, refresh_interval=60), connection
+
+
+def _info(current_node, completed, start_time=100.0, **overrides):
+    node_progress = {node: {"status": "completed", "start_time": 0, "end_time": 1} for node in completed}
+    if current_node not in completed:
+        node_progress[current_node] = {"status": "started", "start_time": start_time}
+    info = {
+        "current_node": current_node,
+        "completed_nodes": completed,
+        "node_progress": node_progress,
+        "overall_status": "processing",
+        "iteration_number": 0,
+        "max_iteration": 1,
+        "task_count": 8,
+    }
+    info.update(overrides)
+    return info
+
+
+@pytest.mark.parametrize("task_count, bucket", [(None, "all"), (3, "le10"), (10, "le10"), (11, "le25"), (500, "gt100")])
+def test_task_count_bucket(task_count, bucket):
+    assert task_count_bucket(task_count) == bucket
+
+
+def test_percentile_nearest_rank():
+    assert percentile([], 50) is None
+    assert percentile([5.0, 1.0, 3.0], 50) == 3.0
+    assert percentile([5.0, 1.0, 3.0, 4.0], 90) == 5.0
+
+
+def test_estimate_without_history_uses_defaults():
+    model, _ = _model()
+    estimate = model.estimate(_info("schedule_tasks", ["task_generation", "analyze_dependencies"]))
+
+    assert estimate["estimated_total_seconds"] == int(DEFAULT_NODE_SECONDS * len(FIRST_PASS))
+    assert estimate["progress"] == 50
+    assert model.queue_wait_seconds(position=0, capacity=4) == 18  # half of the 35 s default run, rounded up
+
+
+def test_estimate_weights_progress_by_node_duration():
+    # task generation dominates the run: finishing it should be most of the progress
+    model, _ = _model({
+        "pma:eta:node:task_generation:le10": [b"40", b"40"],
+        "pma:eta:node:analyze_dependencies:all": [b"2"],
+        "pma:eta:node:schedule_tasks:all": [b"2"],
+        "pma:eta:node:allocate_team:all": [b"4"],
+        "pma:eta:node:assess_risk:all": [b"2"],
+    })
+    estimate = model.estimate(_info("analyze_dependencies", ["task_generation"], start_time=100.0), now=101.0)
+
+    assert estimate["estimated_total_seconds"] == 50
+    assert estimate["progress"] == 82  # (40 + 1) / 50
+    assert estimate["eta_seconds"] == 9
+
+
+def test_estimate_caps_progress_and_handles_completed():
+    model, _ = _model({"pma:eta:node:assess_risk:all": [b"1"]})
+
+    running = model.estimate(_info("assess_risk", FIRST_PASS[:-1], start_time=0.0), now=1000.0)
+    assert running["progress"] <= 99
+    assert running["eta_seconds"] >= 0
+
+    done = model.estimate({"overall_status": "completed", "total_elapsed_time": 42})
+    assert done == {"progress": 100, "eta_seconds": 0, "estimated_total_seconds": 42}
+
+
+def test_statistics_are_cached_between_estimates():
+    model, connection = _model()
+    model.estimate(_info("task_generation", []))
+    model.estimate(_info("task_generation", []))
+
+    assert connection.pipeline.return_value.execute.call_count == 1
+
+
+def test_async_refresh_fills_the_cache_used_by_sync_estimates():
+    model, connection = _model()
+    async_connection = MagicMock()
+    keys = []
+    async_pipe = async_connection.pipeline.return_value
+    async_pipe.lrange.side_effect = lambda key, start, end: keys.append(key)
+    async_pipe.execute = AsyncMock(side_effect=lambda: [[b"40"] if key == "pma:eta:jobs" else [] for key in keys])
+
+    asyncio.run(model.arefresh(async_connection))
+    asyncio.run(model.arefresh(async_connection))
+
+    assert async_pipe.execute.await_count == 1
+    assert model.job_seconds() == 40.0
+    connection.pipeline.return_value.execute.assert_not_called()
+
+
+def test_estimates_without_sync_refresh_never_read_redis():
+    model, connection = _model({"pma:eta:jobs": [b"40"]})
+    model.sync_refresh = False
+
+    assert model.job_seconds() == DEFAULT_NODE_SECONDS * len(FIRST_PASS)
+    model.estimate(_info("schedule_tasks", ["task_generation"]), now=110.0)
+    connection.pipeline.assert_not_called()
+
+
+def test_record_trims_bucket_and_all_lists():
+    model, connection = _model()
+    model.record("schedule_tasks", 30, 1.23456)
+
+    pipe = connection.pipeline.return_value
+    pushed = {call.args[0] for call in pipe.lpush.call_args_list}
+    assert pushed == {"pma:eta:node:schedule_tasks:le50", "pma:eta:node:schedule_tasks:all"}
+    pipe.ltrim.assert_any_call("pma:eta:node:schedule_tasks:all", 0, 49)
+
+
+def test_redis_errors_fall_back_to_defaults():
+    model, connection = _model()
+    connection.pipeline.side_effect = ConnectionError("redis down")
+
+    model.record("schedule_tasks", 3, 1.0)
+    assert model.node_seconds("schedule_tasks") == DEFAULT_NODE_SECONDS
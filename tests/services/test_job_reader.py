@@ -0,0 +1,119 @@
+import asyncio
+from unittest.mock import AsyncMock, MagicMock
+
+from rq.results import Result
+
+from app.services.job_reader import AsyncJobReader
+
+
+def _connection(job_fields, result_entries=None, position=None):
+    """An async Redis connection whose pipeline returns the given job hash fields (and result stream)."""
+    pipe = MagicMock()
+    replies = [job_fields] if result_entries is None else [job_fields, result_entries]
+    pipe.execute = AsyncMock(return_value=replies)
+    connection = MagicMock()
+    connection.pipeline.return_value = pipe
+    connection.lpos = AsyncMock(return_value=position)
+    connection.xrevrange = AsyncMock(return_value=result_entries or [])
+    return connection, pipe
+
+
+def _result_entry(type, return_value=None, exc_string=None):
+    result = Result("job-1", type, connection=None, return_value=return_value, exc_string=exc_string)
+    payload = {key.encode(): str(value).encode() for key, value in result.serialize().items()}
+    return (b"1700000000000-0", payload)
+
+
+def test_fetch_reads_only_the_status_fields_and_queue_position():
+    connection, pipe = _connection([b"queued", b"default", b"2024-01-30T10:00:00.000000Z", None, None], position=3)
+
+    job = asyncio.run(AsyncJobReader(connection).fetch("job-1"))
+
+    pipe.hmget.assert_called_once_with("rq:job:job-1", ("status", "origin", "created_at", "started_at", "ended_at"))
+    pipe.xrevrange.assert_not_called()
+    connection.lpos.assert_awaited_once_with("rq:queue:default", "job-1")
+    assert job.is_queued and not job.is_started
+    assert job.get_position() == 3
+    assert job.created_at.isoformat() == "2024-01-30T10:00:00+00:00"
+    assert job.started_at is None
+
+
+def test_fetch_with_result_decodes_the_latest_return_value_in_one_round_trip():
+    entry = _result_entry(Result.Type.SUCCESSFUL, return_value={"tasks": [1, 2]})
+    connection, pipe = _connection(
+        [b"finished", b"default", b"2024-01-30T10:00:00.000000Z", b"2024-01-30T10:00:01.000000Z", b"2024-01-30T10:00:40.000000Z"],
+        result_entries=[entry],
+    )
+
+    job = asyncio.run(AsyncJobReader(connection).fetch("job-1", with_result=True))
+
+    pipe.xrevrange.assert_called_once_with("rq:results:job-1", "+", "-", count=1)
+    connection.xrevrange.assert_not_awaited()
+    assert job.is_finished
+    assert job.result == {"tasks": [1, 2]}
+    assert job.exc_info is None
+
+
+def test_failed_jobs_load_their_exception_info():
+    entry = _result_entry(Result.Type.FAILED, exc_string="Traceback...\nRuntimeError: boom")
+    connection, _ = _connection([b"failed", b"default", b"2024-01-30T10:00:00.000000Z", None, None])
+    connection.xrevrange = AsyncMock(return_value=[entry])
+
+    job = asyncio.run(AsyncJobReader(connection).fetch("job-1"))
+
+    assert job.is_failed
+    assert job.exc_info.endswith("RuntimeError: boom")
+    assert job.result is None
+
+
+def test_missing_jobs_return_none():
+    connection, _ = _connection([None, None, None, None, None])
+
+    assert asyncio.run(AsyncJobReader(connection).fetch("missing")) is None
+
+
+def test_agent_state_decodes_the_progress_hash_and_swallows_errors():
+    connection = MagicMock()
+    connection.hgetall = AsyncMock(return_value={b"current_node": b'"schedule_tasks"', b"progress": b"41"})
+    reader = AsyncJobReader(connection)
+
+    assert asyncio.run(reader.agent_state("job-1")) == {"current_node": "schedule_tasks", "progress": 41}
+    connection.hgetall.assert_awaited_once_with("pma:progress:job-1")
+
+    connection.hgetall = AsyncMock(side_effect=ConnectionError("down"))
+    assert asyncio.run(reader.agent_state("job-1")) is None
+
+
+def test_fetch_many_pipelines_job_hashes_and_queue_positions():
+    pipe = MagicMock()
+    pipe.execute = AsyncMock(side_effect=[
+        [
+            [b"queued", b"default", b"2024-01-30T10:00:00.000000Z", None, None],
+            [b"started", b"default", b"2024-01-30T10:00:00.000000Z", b"2024-01-30T10:00:01.000000Z", None],
+            [None, None, None, None, None],
+        ],
+        [5],
+    ])
+    connection = MagicMock()
+    connection.pipeline.return_value = pipe
+
+    jobs = asyncio.run(AsyncJobReader(connection).fetch_many(["a", "b", "c"]))
+
+    assert pipe.execute.await_count == 2
+    assert pipe.hmget.call_count == 3
+    pipe.lpos.assert_called_once_with("rq:queue:default", "a")
+    assert jobs["a"].get_position() == 5
+    assert jobs["b"].is_started and jobs["b"].started_at is not None
+    assert jobs["c"] is None
+
+
+def test_agent_states_reads_only_the_requested_progress_fields():
+    pipe = MagicMock()
+    pipe.execute = AsyncMock(return_value=[[b'"schedule_tasks"', b"1"], [None, None]])
+    connection = MagicMock()
+    connection.pipeline.return_value = pipe
+
+    states = asyncio.run(AsyncJobReader(connection).agent_states(["a", "b"], ("current_node", "iteration_number")))
+
+    pipe.hmget.assert_any_call("pma:progress:a", ("current_node", "iteration_number"))
+    assert states == {"a": {"current_node": "schedule_tasks", "iteration_number": 1}, "b": None}
@@ -0,0 +1,102 @@
+import asyncio
+
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage
+from pydantic import BaseModel
+from unittest.mock import AsyncMock, MagicMock
+
+from app.services.llm_cache import LLMResponseCache, normalize_messages
+from app.services.llm_gateway import LLMGateway
+
+
+class Answer(BaseModel):
+    value: int
+
+
+@pytest.fixture
+def cache():
+    """An LLM cache whose Redis connection is a mock that always misses."""
+    connection = MagicMock()
+    connection.get.return_value = None
+    return LLMResponseCache(connection, ttl=60, max_entries=10, l1_size=2, l1_ttl=60)
+
+
+def make_llm(model="gpt-4o-mini", temperature=0.1):
+    llm = MagicMock()
+    llm.model_name = model
+    llm.temperature = temperature
+    return llm
+
+
+def test_normalize_messages_ignores_whitespace_noise():
+    assert normalize_messages("  hello \r\nworld  \n") == normalize_messages([HumanMessage(content="hello\nworld")])
+
+
+def test_request_key_depends_on_model_temperature_schema_and_prompt(cache):
+    base = cache.request_key(make_llm(), "prompt")
+
+    assert base == cache.request_key(make_llm(), "prompt  ")
+    assert base != cache.request_key(make_llm(model="gpt-4o"), "prompt")
+    assert base != cache.request_key(make_llm(temperature=0.7), "prompt")
+    assert base != cache.request_key(make_llm(), "prompt", Answer)
+    assert base != cache.request_key(make_llm(), "other prompt")
+    assert cache.request_key(MagicMock(), "prompt") is None
+
+
+def test_l1_hit_skips_redis_and_evicts_least_recently_used(cache):
+    cache.set("k1", Answer(value=1), Answer)
+    cache.set("k2", Answer(value=2), Answer)
+    cache.connection.reset_mock()
+
+    assert cache.get("task_scheduler", "k1", Answer) == Answer(value=1)
+    cache.connection.get.assert_not_called()
+
+    cache.set("k3", Answer(value=3), Answer)  # evicts k2, the least recently used entry
+    assert cache.local.get("k2") is None
+    assert cache.local.get("k1") is not None
+
+
+def test_l2_hit_populates_l1_and_flushes_pending_l1_stats(cache):
+    cache.set("k1", AIMessage(content="cached"))
+    cache.get("insight_generator", "k1")  # L1 hit, counted in process
+    cache.connection.get.return_value = b'{"content": "from redis"}'
+
+    result = cache.get("insight_generator", "k2")
+
+    assert result.content == "from redis"
+    assert cache.local.get("k2") is not None
+    pipe = cache.connection.pipeline.return_value.__enter__.return_value
+    pipe.hincrby.assert_any_call(cache.stats_key, "insight_generator:l2_hits", 1)
+    pipe.hincrby.assert_any_call(cache.stats_key, "insight_generator:l1_hits", 1)
+
+
+def test_stats_reports_hit_ratio_per_node(cache):
+    cache.connection.hgetall.return_value = {b"task_generation:l1_hits": b"2", b"task_generation:l2_hits": b"1", b"task_generation:misses": b"1"}
+
+    assert cache.stats() == {"task_generation": {"l1_hits": 2, "l2_hits": 1, "misses": 1, "hit_ratio": 0.75}}
+
+
+def test_gateway_calls_model_once_for_repeated_prompts(cache):
+    gateway = LLMGateway(MagicMock(), cache)
+    llm = make_llm()
+    gateway.registry.structured.return_value.invoke.return_value = Answer(value=42)
+
+    first = gateway.invoke("task_scheduler", llm, "prompt", Answer)
+    second = gateway.invoke("task_scheduler", llm, "prompt", Answer)
+
+    assert first == second == Answer(value=42)
+    gateway.registry.structured.return_value.invoke.assert_called_once_with("prompt")
+
+
+def test_gateway_async_plain_messages_are_cached(cache):
+    gateway = LLMGateway(MagicMock(), cache)
+    llm = make_llm()
+    llm.ainvoke = AsyncMock(return_value=AIMessage(content="insights"))
+
+    async def run():
+        return [await gateway.ainvoke("insight_generator", llm, "prompt") for _ in range(2)]
+
+    results = asyncio.run(run())
+
+    assert [result.content for result in results] == ["insights", "insights"]
+    llm.ainvoke.assert_awaited_once()
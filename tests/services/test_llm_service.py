@@ -0,0 +1,64 @@
+import asyncio
+
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+
+from app.core.config import settings
+from app.services.endpoint_pool import Endpoint
+from app.services.llm_service import LLMClientRegistry
+
+
+@pytest.fixture
+def registry():
+    return LLMClientRegistry(settings.model_copy(update={"MODEL_PROVIDER": "OpenAI", "OPENAI_MODEL": "gpt-4o-mini"}))
+
+
+def test_get_reuses_models_and_shares_http_pool(registry):
+    default = registry.get()
+    creative = registry.get(temperature=0.7)
+
+    assert registry.get() is default
+    assert creative is not default
+    assert creative.temperature == 0.7
+    # every model of a provider goes through the same pooled clients
+    http_client, http_async_client = registry.http_clients("OpenAI")
+    assert default.root_client._client is http_client
+    assert creative.root_async_client._client is http_async_client
+
+
+def test_unsupported_provider_raises(registry):
+    with pytest.raises(ValueError):
+        registry.get(provider="Anthropic")
+
+
+def test_structured_output_runnable_is_built_once_per_schema(registry):
+    llm = MagicMock()
+    first = registry.structured(llm, "SchemaA")
+
+    assert registry.structured(llm, "SchemaA") is first
+    registry.structured(llm, "SchemaB")
+    assert llm.with_structured_output.call_count == 2
+
+
+def test_awarm_up_opens_concurrent_connections(registry):
+    _, http_async_client = registry.http_clients("OpenAI")
+    http_async_client.head = AsyncMock(side_effect=[MagicMock(), MagicMock(), OSError("unreachable")])
+
+    asyncio.run(registry.awarm_up(3))
+
+    assert http_async_client.head.await_count == 3
+    http_async_client.head.assert_awaited_with(settings.OPENAI_API_BASE)
+
+
+def test_route_returns_the_same_model_settings_on_another_endpoint():
+    registry = LLMClientRegistry(settings, endpoints=[
+        Endpoint(name="east", base_url="https://east.example/v1", api_key="k1", model="gpt-4o-mini"),
+        Endpoint(name="west", base_url="https://west.example/v1", api_key="k2", model="gpt-4o-mini"),
+    ])
+    east = registry.get(temperature=0.2)
+    west = registry.route(east, "west")
+
+    assert west is registry.get(temperature=0.2, endpoint="west")
+    assert west.temperature == 0.2
+    assert west.root_client._client is registry.http_clients("west")[0]
+    assert registry.route(MagicMock(), "west") is None
@@ -0,0 +1,96 @@
+import pytest
+from unittest.mock import MagicMock
+
+from app.services.node_cache import NodeResultCache
+
+
+@pytest.fixture
+def cache():
+    """A node cache whose Redis connection is a mock (keys are computed locally)."""
+    return NodeResultCache(MagicMock(), ttl=60, max_entries=10)
+
+
+def make_llm(model="gpt-4o-mini", temperature=0.1):
+    llm = MagicMock()
+    llm.model_name = model
+    llm.temperature = temperature
+    return llm
+
+
+def test_make_key_is_stable_across_input_ordering(cache):
+    """Semantically identical inputs must map to the same key."""
+    inputs_a = {"tasks": [{"id": "task-1", "estimated_day": 3}], "insights": "x"}
+    inputs_b = {"insights": "x", "tasks": [{"estimated_day": 3, "id": "task-1"}]}
+
+    assert cache.make_key("task_dependency", inputs_a, make_llm()) == cache.make_key("task_dependency", inputs_b, make_llm())
+
+
+def test_make_key_depends_on_node_model_and_temperature(cache):
+    """Node name, model and temperature are all part of the key."""
+    inputs = {"tasks": []}
+    base = cache.make_key("task_dependency", inputs, make_llm())
+
+    assert base != cache.make_key("task_scheduler", inputs, make_llm())
+    assert base != cache.make_key("task_dependency", inputs, make_llm(model="gpt-4o"))
+    assert base != cache.make_key("task_dependency", inputs, make_llm(temperature=0.7))
+
+
+def test_make_key_skips_unidentifiable_models(cache):
+    """Mocked or unknown models are never cached."""
+    assert cache.make_key("task_dependency", {"tasks": []}, MagicMock()) is None
+
+
+def test_invoke_falls_back_to_llm_when_redis_is_down(cache):
+    """Cache failures must not fail the node."""
+    cache.connection.get.side_effect = ConnectionError("redis down")
+    cache.connection.pipeline.side_effect = ConnectionError("redis down")
+    llm = make_llm()
+    llm.with_structured_output.return_value.invoke.return_value = "result"
+
+    assert cache.invoke("task_dependency", {"tasks": []}, llm, MagicMock(), "prompt") == "result"
+
+
+def _risk_state(description, members=("Alice", "Bob")):
+    from app.schemas.plan import Schedule, TaskAllocationList
+    from app.schemas.task import Task, TaskSchedule
+    from app.schemas.team import TaskAllocation, TeamMember
+
+    tasks = [Task(task_name=f"task {i}", task_description=description, estimated_day=2) for i in range(2)]
+    return {
+        "task_allocations": TaskAllocationList(task_allocations=[
+            TaskAllocation(task=task, team_member=TeamMember(name=name, profile="Developer"))
+            for task, name in zip(tasks, members)
+        ]),
+        "schedule": Schedule(schedule=[
+            TaskSchedule(task_id=task.id, start_date="2024-01-01", end_date="2024-01-03", gantt_chart_format="")
+            for task in tasks
+        ]),
+        "risks_iteration": [],
+        "id_mapping": {f"task-{i + 1}": task.id for i, task in enumerate(tasks)},
+    }
+
+
+def test_risk_cache_key_covers_the_full_prompt_but_not_uuids(cache):
+    """Plans differing only in task descriptions must not share a risk assessment."""
+    from app.agent.nodes.assess_risk import _prepare
+
+    llm = make_llm()
+    key = lambda state: cache.make_key("risk_assessor", _prepare(state)[1], llm)
+
+    assert key(_risk_state("Build the payment API")) != key(_risk_state("Migrate the legacy CRM"))
+    # the same plan generated again has new task UUIDs but the same key
+    assert key(_risk_state("Build the payment API")) == key(_risk_state("Build the payment API"))
+
+
+def test_cached_nodes_skip_the_gateway_response_cache(cache, mocker):
+    """A node-cached call is looked up and stored once, not again by the LLM response cache."""
+    gateway = mocker.patch("app.services.node_cache.llm_gateway")
+    gateway.tape.return_value = None
+    gateway.invoke.return_value = MagicMock()
+    cache.connection.get.return_value = None
+
+    cache.invoke("task_dependency", {"tasks": []}, make_llm(), MagicMock(), "prompt")
+    assert gateway.invoke.call_args.kwargs == {"cache": False}
+
+    cache.invoke("task_dependency", {"tasks": []}, MagicMock(), MagicMock(), "prompt")
+    assert gateway.invoke.call_args.kwargs == {"cache": True}
@@ -0,0 +1,57 @@
+import pytest
+from unittest.mock import MagicMock
+
+from app.core.config import settings
+from app.services.llm_service import LLMClientRegistry
+from app.services.node_models import NodeModelConfig, NodeModels, build_node_models
+
+
+def test_build_node_models_layers_defaults_and_overrides():
+    configs = build_node_models(
+        {"max_tokens": 2000},
+        {"risk_assessor": {"model": "gpt-4o-mini", "max_tokens": 800, "structured_output_method": "json_schema"}},
+    )
+
+    assert configs["risk_assessor"] == NodeModelConfig("gpt-4o-mini", None, 800, "json_schema")
+    # built-in default temperature for task generation survives the global default
+    assert configs["task_generation"] == NodeModelConfig(None, 0.1, 2000, None)
+    assert configs["task_scheduler"].max_tokens == 2000
+
+
+@pytest.mark.parametrize("overrides", [
+    {"risk_asessor": {"model": "gpt-4o-mini"}},
+    {"risk_assessor": {"top_p": 0.5}},
+    {"risk_assessor": {"temperature": 3}},
+    {"risk_assessor": {"max_tokens": 0}},
+    {"risk_assessor": {"structured_output_method": "xml"}},
+])
+def test_build_node_models_rejects_invalid_config(overrides):
+    with pytest.raises(ValueError):
+        build_node_models({}, overrides)
+
+
+def test_node_models_share_registry_instances_and_describe_effective_settings():
+    registry = LLMClientRegistry(settings.model_copy(update={"MODEL_PROVIDER": "OpenAI", "OPENAI_MODEL": "gpt-4o-mini"}))
+    models = NodeModels(registry, build_node_models({}, {
+        "task_generation": {"model": "gpt-4o"},
+        "risk_assessor": {"max_tokens": 500},
+    }))
+
+    assert models.llm("task_generation").model_name == "gpt-4o"
+    assert models.llm("risk_assessor").max_tokens == 500
+    assert models.llm("task_scheduler") is registry.get()
+    assert models.describe("task_generation") == {
+        "model": "gpt-4o", "temperature": 0.1, "max_tokens": None, "structured_output_method": None,
+    }
+
+
+def test_gateway_uses_the_node_structured_output_method():
+    from app.services.llm_gateway import LLMGateway
+
+    registry = MagicMock()
+    models = NodeModels(registry, build_node_models({}, {"risk_assessor": {"structured_output_method": "json_mode"}}))
+    gateway = LLMGateway(registry, MagicMock(), models=models)
+    llm = MagicMock()
+
+    gateway._call("risk_assessor", llm, "prompt", "Schema")
+    registry.structured.assert_called_once_with(llm, "Schema", "json_mode")
@@ -0,0 +1,88 @@
+import pytest
+
+from app.schemas.plan import RiskList, Schedule, TaskAllocationList, TaskList
+from app.schemas.task import Risk, Task, TaskSchedule
+from app.schemas.team import TaskAllocation, TeamMember
+from app.services.plan_results import PayloadCache, iteration_resource, paginate_tasks, parse_fields, project
+
+
+def _result(task_count=5, iterations=2):
+    tasks = [Task(task_name=f"task {i}", task_description="", estimated_day=i + 1) for i in range(task_count)]
+    alice = TeamMember(name="Alice", profile="Developer")
+    return {
+        "tasks": TaskList(tasks=tasks),
+        "insights": "ok",
+        "iteration_number": iterations,
+        "schedule_iteration": [
+            Schedule(schedule=[TaskSchedule(task_id=task.id, start_date="2024-01-01", end_date=f"2024-01-0{n + 2}",
+                                            gantt_chart_format="") for task in tasks])
+            for n in range(iterations)
+        ],
+        "task_allocations_iteration": [
+            TaskAllocationList(task_allocations=[TaskAllocation(task=task, team_member=alice) for task in tasks])
+            for _ in range(iterations)
+        ],
+        "risks_iteration": [RiskList(risks=[Risk(risk_name=f"risk {n}", score="5")]) for n in range(iterations)],
+        "project_risk_score_iterations": [40, 25],
+        "node_progress": {"task_generation": {"status": "completed"}},
+    }
+
+
+def test_projection_only_returns_the_requested_fields():
+    fields = parse_fields("insights, iteration_number,insights")
+
+    assert fields == ["insights", "iteration_number"]
+    assert project(_result(), fields) == {"insights": "ok", "iteration_number": 2}
+    assert parse_fields("") is None
+    with pytest.raises(ValueError):
+        parse_fields("tasks,secret")
+
+
+def test_iteration_resources_support_negative_indexes():
+    result = _result()
+
+    schedule = iteration_resource(result, -1, "schedule")
+    assert schedule["iteration"] == 1 and schedule["iterations"] == 2
+    assert schedule["schedule"][0]["end_date"] == "2024-01-03"
+
+    risks = iteration_resource(result, 0, "risks")
+    assert risks["risks"] == [{"risk_name": "risk 0", "score": "5"}]
+    assert risks["project_risk_score"] == 40
+
+    allocations = iteration_resource(result, 1, "allocations")
+    assert allocations["task_allocations"][0]["team_member"]["name"] == "Alice"
+
+    with pytest.raises(IndexError):
+        iteration_resource(result, 2, "schedule")
+
+
+def test_task_pages_follow_the_cursor_to_the_end():
+    result = _result(task_count=5)
+    names = []
+    cursor = None
+    while True:
+        tasks, cursor, total = paginate_tasks(result, cursor, limit=2)
+        names += [task["task_name"] for task in tasks]
+        if cursor is None:
+            break
+
+    assert total == 5
+    assert names == [f"task {i}" for i in range(5)]
+    with pytest.raises(ValueError):
+        paginate_tasks(result, "not-a-task", limit=2)
+
+
+def test_payload_cache_is_bounded_by_bytes_and_expires(mocker):
+    cache = PayloadCache(max_bytes=10, ttl=60)
+    cache.set("a", b"12345")
+    cache.set("b", b"12345")
+    cache.get("a")
+    cache.set("c", b"123")
+
+    assert cache.get("b") is None and cache.get("a") == b"12345"
+    assert cache.size == 8
+    cache.set("big", b"x" * 11)
+    assert cache.get("big") is None
+
+    mocker.patch("app.services.plan_results.time.monotonic", return_value=1e12)
+    assert cache.get("a") is None and cache.size == 3
@@ -0,0 +1,124 @@
+import json
+
+import pytest
+from unittest.mock import MagicMock
+
+from app.services.progress import (
+    ProgressPublisher, event_log_key, progress_channel, progress_key, read_events, read_progress, stream_id_key,
+)
+
+
+@pytest.fixture
+def connection():
+    return MagicMock()
+
+
+def _script(connection):
+    return connection.register_script.return_value
+
+
+def _writes(connection):
+    return _script(connection).call_count
+
+
+def _written(connection, call=-1):
+    """Hash fields passed to the append-event script (ARGV[5..] are field/value pairs)."""
+    args = _script(connection).call_args_list[call].kwargs["args"][4:]
+    return dict(zip(args[::2], args[1::2]))
+
+
+def _event(connection, call=-1):
+    return json.loads(_script(connection).call_args_list[call].kwargs["args"][3])
+
+
+def _state(**overrides):
+    state = {
+        "current_node": "task_generation",
+        "completed_nodes": [],
+        "node_progress": {"task_generation": {"details": "start"}},
+        "overall_status": "processing",
+        "total_start_time": 1700000000.0,
+    }
+    state.update(overrides)
+    return state
+
+
+def test_publish_writes_only_changed_fields_in_one_script_call(connection):
+    """The second write carries only the fields that changed since the first."""
+    publisher = ProgressPublisher("job-1", connection, debounce=0, maxlen=50)
+
+    publisher.publish(_state())
+    publisher.publish(_state(current_node="analyze_dependencies", completed_nodes=["task_generation"]))
+
+    assert _writes(connection) == 2
+    call = _script(connection).call_args
+    assert call.kwargs["keys"] == [progress_key("job-1"), event_log_key("job-1")]
+    assert call.kwargs["args"][:2] == [progress_channel("job-1"), 50]
+    changed = _written(connection)
+    assert json.loads(changed["current_node"]) == "analyze_dependencies"
+    assert "total_start_time" not in changed
+    assert "last_updated" in changed
+    # 变化的字段同时作为进度事件追加到事件流并发布
+    event = _event(connection)
+    assert event["type"] == "progress"
+    assert event["data"]["current_node"] == "analyze_dependencies"
+
+
+def test_publish_skips_unchanged_state(connection):
+    """Re-publishing the same state does not touch Redis."""
+    publisher = ProgressPublisher("job-1", connection, debounce=0)
+    state = _state()
+
+    publisher.publish(state)
+    publisher.publish(state)
+
+    assert _writes(connection) == 1
+
+
+def test_detail_updates_are_debounced_until_flush(connection):
+    """Detail-only updates inside the window are coalesced into one write."""
+    publisher = ProgressPublisher("job-1", connection, debounce=60)
+
+    publisher.publish(_state())
+    publisher.publish(_state(node_progress={"task_generation": {"details": "calling"}}))
+    publisher.publish(_state(node_progress={"task_generation": {"details": "parsing"}}))
+    assert _writes(connection) == 1
+
+    publisher.flush()
+    assert _writes(connection) == 2
+    assert json.loads(_written(connection)["node_progress"]) == {"task_generation": {"details": "parsing"}}
+
+
+def test_structural_updates_bypass_debounce(connection):
+    """Node transitions are written immediately together with pending details."""
+    publisher = ProgressPublisher("job-1", connection, debounce=60)
+
+    publisher.publish(_state())
+    publisher.publish(_state(node_progress={"task_generation": {"details": "parsing"}}))
+    publisher.publish(_state(completed_nodes=["task_generation"]))
+
+    assert _writes(connection) == 2
+    assert {"node_progress", "completed_nodes"} <= set(_written(connection))
+
+
+def test_read_progress_decodes_fields(connection):
+    connection.hgetall.return_value = {b"progress": b"50", b"current_node": b'"assess_risk"'}
+
+    assert read_progress(connection, "job-1") == {"progress": 50, "current_node": "assess_risk"}
+    connection.hgetall.return_value = {}
+    assert read_progress(connection, "job-1") is None
+
+
+def test_read_events_and_stream_id_ordering(connection):
+    connection.xrange.return_value = [
+        (b"1700000000000-0", {b"event": b'{"type": "progress", "data": {"progress": 10}}'}),
+        (b"1700000000000-1", {b"event": b'{"type": "terminal", "status": "finished"}'}),
+    ]
+
+    events = read_events(connection, "job-1")
+
+    connection.xrange.assert_called_once_with(event_log_key("job-1"))
+    assert [event_id for event_id, _ in events] == ["1700000000000-0", "1700000000000-1"]
+    assert events[1][1] == {"type": "terminal", "status": "finished"}
+    assert stream_id_key("1700000000000-1") > stream_id_key("1700000000000-0")
+    assert stream_id_key("1700000000001-0") > stream_id_key("1700000000000-9")
@@ -0,0 +1,71 @@
+import asyncio
+from unittest.mock import AsyncMock, MagicMock
+
+from app.services.progress import progress_channel
+from app.services.progress_hub import RESYNC_EVENT, ProgressHub
+
+
+def _hub():
+    """A hub whose pub/sub connection is mocked and never yields messages by itself."""
+    pubsub = MagicMock()
+    pubsub.subscribe = AsyncMock()
+    pubsub.unsubscribe = AsyncMock()
+
+    async def get_message(timeout):
+        await asyncio.sleep(0.01)
+        return None
+
+    pubsub.get_message = get_message
+    connection = MagicMock()
+    connection.pubsub.return_value = pubsub
+    return ProgressHub(lambda: connection), pubsub
+
+
+def test_watchers_of_a_job_share_one_subscription():
+    """Many watchers of the same job cause one SUBSCRIBE and receive every event."""
+    async def scenario():
+        hub, pubsub = _hub()
+        async with hub.watch("job-1") as first, hub.watch("job-1") as second:
+            assert hub.watcher_count("job-1") == 2
+            pubsub.subscribe.assert_awaited_once_with(progress_channel("job-1"))
+
+            hub._dispatch(progress_channel("job-1"), {"type": "progress", "data": {"progress": 50}})
+            assert first.get_nowait() == second.get_nowait() == {"type": "progress", "data": {"progress": 50}}
+
+        pubsub.unsubscribe.assert_awaited_once_with(progress_channel("job-1"))
+        assert hub.watcher_count() == 0
+
+    asyncio.run(scenario())
+
+
+def test_events_are_routed_to_their_job_only():
+    async def scenario():
+        hub, _ = _hub()
+        async with hub.watch("job-1") as job_1, hub.watch("job-2") as job_2:
+            hub._dispatch(progress_channel("job-2"), {"type": "terminal", "status": "finished"})
+
+            assert job_1.empty()
+            assert job_2.get_nowait()["status"] == "finished"
+
+    asyncio.run(scenario())
+
+
+def test_slow_watchers_are_asked_to_resync():
+    """A full watcher queue is replaced by a resync marker instead of silently losing a delta."""
+    async def scenario():
+        hub, _ = _hub()
+        hub.queue_size = 2
+        async with hub.watch("job-1") as events, hub.watch("job-1") as fast:
+            for progress in (10, 20, 30):
+                hub._dispatch(progress_channel("job-1"), {"type": "progress", "data": {"progress": progress}})
+                if progress < 30:
+                    fast.get_nowait()
+
+            assert events.get_nowait() == RESYNC_EVENT
+            assert events.empty()
+            assert fast.get_nowait()["data"]["progress"] == 30
+
+            hub._dispatch(progress_channel("job-1"), {"type": "terminal", "status": "finished"})
+            assert events.get_nowait()["status"] == "finished"
+
+    asyncio.run(scenario())
@@ -0,0 +1,72 @@
+import asyncio
+
+import pytest
+from unittest.mock import MagicMock
+
+from app.services.rate_limiter import TokenBucketRateLimiter
+
+
+@pytest.fixture
+def limiter():
+    return TokenBucketRateLimiter(MagicMock(), requests_per_minute=60, tokens_per_minute=1000, output_tokens=100)
+
+
+def _script(limiter):
+    return limiter.connection.register_script.return_value
+
+
+def test_estimate_tokens_counts_prompt_and_output_and_caps_at_bucket_size(limiter):
+    assert limiter.estimate_tokens("x" * 30) == 10 + 100
+    assert limiter.estimate_tokens("x" * 30, output_tokens=0) == 10
+    assert limiter.estimate_tokens("x" * 100000) == 1000
+
+
+def test_acquire_queues_until_tokens_are_available(mocker, limiter):
+    sleep = mocker.patch("app.services.rate_limiter.time.sleep")
+    _script(limiter).side_effect = [1500, 200, 0]
+
+    limiter.acquire("risk_assessor", 50)
+
+    assert _script(limiter).call_count == 3
+    assert sleep.call_count == 2
+    # the hint is capped by max_sleep and jittered upwards by at most 20 %
+    assert 1.5 <= sleep.call_args_list[0].args[0] <= 1.8
+    assert _script(limiter).call_args.kwargs["args"][:4] == [60, 1000, 50, "risk_assessor"]
+
+
+def test_aacquire_sleeps_without_blocking_the_loop(mocker, limiter):
+    sleeps = []
+
+    async def fake_sleep(seconds):
+        sleeps.append(seconds)
+
+    mocker.patch("app.services.rate_limiter.asyncio.sleep", fake_sleep)
+    _script(limiter).side_effect = [100, 0]
+
+    asyncio.run(limiter.aacquire("task_scheduler", 10))
+
+    assert len(sleeps) == 1
+
+
+def test_acquire_fails_open_when_redis_is_down(limiter):
+    limiter.connection.register_script.side_effect = ConnectionError("redis down")
+
+    assert limiter.acquire("task_scheduler", 10) < 1
+
+
+def test_disabled_limiter_never_touches_redis(limiter):
+    limiter.enabled = False
+    limiter.acquire("task_scheduler", 10)
+
+    limiter.connection.register_script.assert_not_called()
+
+
+def test_stats_reports_wait_per_node(limiter):
+    limiter.connection.hgetall.return_value = {
+        b"risk_assessor:calls": b"4", b"risk_assessor:throttled": b"2",
+        b"risk_assessor:wait_ms": b"1000", b"risk_assessor:max_wait_ms": b"700",
+    }
+
+    assert limiter.stats() == {"risk_assessor": {
+        "calls": 4, "throttled": 2, "wait_ms": 1000, "max_wait_ms": 700, "avg_wait_ms": 250.0,
+    }}
@@ -0,0 +1,107 @@
+import asyncio
+import pickle
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from fastapi.encoders import jsonable_encoder
+
+from app.schemas.plan import RiskList, Schedule, TaskAllocationList, TaskList
+from app.schemas.task import Risk, Task, TaskSchedule
+from app.schemas.team import TaskAllocation, Team, TeamMember
+from app.services.plan_results import project
+from app.services.result_store import PlanResultStore, StoredPlanResult, is_result_reference, normalize
+
+
+def _state(task_count=20, iterations=2):
+    members = [TeamMember(name="Alice", profile="Backend"), TeamMember(name="Bob", profile="Frontend")]
+    tasks = [Task(task_name=f"task {i}", task_description="description " * 10, estimated_day=i + 1) for i in range(task_count)]
+    schedules = [
+        Schedule(schedule=[TaskSchedule(task_id=task.id, start_date="2024-01-01", end_date="2024-01-02", gantt_chart_format="")
+                           for task in tasks])
+        for _ in range(iterations)
+    ]
+    allocations = [
+        TaskAllocationList(task_allocations=[TaskAllocation(task=task, team_member=members[(i + n) % 2]) for i, task in enumerate(tasks)])
+        for n in range(iterations)
+    ]
+    # an allocation whose member is not part of the team is kept inline
+    allocations[-1].task_allocations[0] = TaskAllocation(task=tasks[0], team_member=TeamMember(name="Carol", profile="QA"))
+    risks = [RiskList(risks=[Risk(risk_name=f"risk {n}", score="5")]) for n in range(iterations)]
+    return {
+        "project_description": "demo",
+        "team": Team(team_members=members),
+        "tasks": TaskList(tasks=tasks),
+        "schedule": schedules[-1],
+        "task_allocations": allocations[-1],
+        "risks": risks[-1],
+        "iteration_number": iterations,
+        "schedule_iteration": schedules,
+        "task_allocations_iteration": allocations,
+        "risks_iteration": risks,
+        "project_risk_score_iterations": [40, 20],
+        "id_mapping": {"task-1": tasks[0].id},
+        "job_id": "job-1",
+        "node_progress": {"assess_risk": {"status": "completed", "details": "x" * 500}},
+        "completed_nodes": ["task_generation"],
+        "total_start_time": 1.0,
+    }
+
+
+def test_round_trip_restores_the_result_without_transient_fields():
+    state = _state()
+    store = PlanResultStore(MagicMock(), ttl=60)
+
+    result = store.decode(store.encode(state))
+
+    expected = jsonable_encoder({key: value for key, value in state.items()
+                                 if key not in ("job_id", "node_progress", "completed_nodes", "total_start_time")})
+    assert result == expected
+    assert isinstance(result, StoredPlanResult)
+
+
+def test_document_stores_tasks_once_and_references_them_from_allocations():
+    document = normalize(_state())
+
+    allocations = document["iterations"][0]["task_allocations"]
+    assert allocations[0] == {"task_id": document["tasks"]["tasks"][0]["id"], "member": 0}
+    assert document["iterations"][1]["task_allocations"][0]["team_member"] == {"name": "Carol", "profile": "QA"}
+    assert "schedule" not in document and "node_progress" not in document
+
+
+def test_compressed_document_is_much_smaller_than_the_pickled_state():
+    state = _state(task_count=100, iterations=3)
+    store = PlanResultStore(MagicMock(), ttl=60)
+
+    assert len(store.encode(state)) < len(pickle.dumps(state)) / 3
+    plain = PlanResultStore(MagicMock(), ttl=60, compression="none")
+    assert store.decode(plain.encode(state)) == store.decode(store.encode(state))
+
+
+def test_save_writes_with_ttl_and_returns_a_reference():
+    connection = MagicMock()
+    store = PlanResultStore(connection, ttl=600)
+
+    reference = store.save("job-1", _state())
+
+    key, payload = connection.set.call_args.args
+    assert key == "pma:result:job-1"
+    assert connection.set.call_args.kwargs == {"ex": 600}
+    assert is_result_reference(reference) and reference["size"] == len(payload)
+    assert not is_result_reference(jsonable_encoder(_state()))
+
+    connection.get = AsyncMock(return_value=payload)
+    loaded = asyncio.run(store.aload(connection, "job-1"))
+    assert project(loaded, ["iteration_number", "project_risk_score_iterations"]) == {
+        "iteration_number": 2, "project_risk_score_iterations": [40, 20],
+    }
+
+
+def test_disabled_or_failing_store_falls_back_to_the_full_state():
+    assert PlanResultStore(MagicMock(), ttl=60, enabled=False).save("job-1", _state()) is None
+
+    connection = MagicMock()
+    connection.set.side_effect = ConnectionError("down")
+    assert PlanResultStore(connection, ttl=60).save("job-1", _state()) is None
+
+    with pytest.raises(ValueError):
+        PlanResultStore(MagicMock(), ttl=60, compression="zstd")
@@ -0,0 +1,80 @@
+import uuid
+from datetime import date
+
+import pytest
+
+from app.schemas.plan import TaskList, DependencyList, Schedule
+from app.schemas.task import Task, Dependency, TaskSchedule
+from app.services.scheduler_engine import CriticalPathScheduler
+
+START = date(2024, 1, 1)
+
+
+@pytest.fixture
+def project():
+    """
+    A -> B -> D and A -> C -> D, where B (5d) is longer than C (2d):
+    the critical path is A, B, D and C has 3 days of slack.
+    """
+    tasks = {
+        name: Task(id=uuid.uuid4(), task_name=name, task_description=name, estimated_day=days)
+        for name, days in [("A", 3), ("B", 5), ("C", 2), ("D", 1)]
+    }
+    dependencies = DependencyList(dependencies=[
+        Dependency(source=tasks["A"].id, target=tasks["B"].id),
+        Dependency(source=tasks["A"].id, target=tasks["C"].id),
+        Dependency(source=tasks["B"].id, target=tasks["D"].id),
+        Dependency(source=tasks["C"].id, target=tasks["D"].id),
+    ])
+    return tasks, TaskList(tasks=list(tasks.values())), dependencies
+
+
+def test_schedule_computes_critical_path_and_slack(project):
+    """Forward/backward passes yield the expected timings and critical path."""
+    tasks, task_list, dependencies = project
+
+    result = CriticalPathScheduler().schedule(task_list, dependencies, start_date=START)
+
+    assert result.project_duration == 9
+    assert result.critical_path == [tasks["A"].id, tasks["B"].id, tasks["D"].id]
+    assert result.timings[tasks["C"].id].slack == 3
+    assert result.timings[tasks["B"].id].is_critical
+
+    by_task = {item.task_id: item for item in result.schedule.schedule}
+    assert by_task[tasks["A"].id].start_date == "2024-01-01"
+    assert by_task[tasks["A"].id].end_date == "2024-01-03"
+    assert by_task[tasks["D"].id].start_date == "2024-01-09"
+    assert by_task[tasks["D"].id].gantt_chart_format == "D: 2024-01-09, 1d"
+
+
+def test_schedule_has_no_dependency_violations(project):
+    """The local schedule always satisfies the dependencies it was built from."""
+    _, task_list, dependencies = project
+
+    result = CriticalPathScheduler().schedule(task_list, dependencies, start_date=START)
+
+    assert CriticalPathScheduler.find_violations(result.schedule, task_list, dependencies) == []
+
+
+def test_schedule_breaks_dependency_cycles(project):
+    """Cyclic dependencies from the LLM do not prevent scheduling."""
+    tasks, task_list, dependencies = project
+    dependencies.dependencies.append(Dependency(source=tasks["D"].id, target=tasks["A"].id))
+
+    result = CriticalPathScheduler().schedule(task_list, dependencies, start_date=START)
+
+    assert len(result.schedule.schedule) == 4
+
+
+def test_find_violations_reports_overlaps_and_missing_tasks(project):
+    """A schedule starting a task before its dependency ends is rejected."""
+    tasks, task_list, dependencies = project
+    schedule = Schedule(schedule=[
+        TaskSchedule(task_id=tasks["A"].id, start_date="2024-01-01", end_date="2024-01-03", gantt_chart_format=""),
+        TaskSchedule(task_id=tasks["B"].id, start_date="2024-01-02", end_date="2024-01-06", gantt_chart_format=""),
+    ])
+
+    violations = CriticalPathScheduler.find_violations(schedule, task_list, dependencies)
+
+    assert any("starts before" in v for v in violations)
+    assert sum("is not scheduled" in v for v in violations) == 2
@@ -0,0 +1,107 @@
+import asyncio
+import threading
+import time
+
+import pytest
+from pydantic import BaseModel
+from unittest.mock import AsyncMock, MagicMock
+
+from app.services.llm_cache import LLMResponseCache
+from app.services.llm_gateway import LLMGateway
+from app.services.single_flight import RedisFlightLock, SingleFlight
+
+
+class Answer(BaseModel):
+    value: int
+
+
+def make_llm():
+    llm = MagicMock()
+    llm.model_name = "gpt-4o-mini"
+    llm.temperature = 0.1
+    return llm
+
+
+def disabled_cache():
+    return LLMResponseCache(MagicMock(), ttl=60, max_entries=10, enabled=False)
+
+
+def test_do_runs_concurrent_duplicates_once():
+    flight = SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def slow():
+        calls.append(1)
+        release.wait(2)
+        return "result"
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(flight.do("k", slow))) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.1)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert sorted(shared for _, shared in results) == [False, True, True, True, True]
+    assert {value for value, _ in results} == {"result"}
+    assert flight.in_flight() == 0
+
+
+def test_do_propagates_errors_to_every_waiter():
+    flight = SingleFlight()
+
+    with pytest.raises(ValueError):
+        flight.do("k", lambda: (_ for _ in ()).throw(ValueError("boom")))
+    assert flight.in_flight() == 0
+
+
+def test_gateway_coalesces_async_duplicates_and_copies_shared_results():
+    gateway = LLMGateway(MagicMock(), disabled_cache(), flight=SingleFlight())
+    structured = gateway.registry.structured.return_value
+
+    async def slow(prompt):
+        await asyncio.sleep(0.05)
+        return Answer(value=1)
+
+    structured.ainvoke = AsyncMock(side_effect=slow)
+    llm = make_llm()
+
+    async def run():
+        return await asyncio.gather(*(gateway.ainvoke("risk_assessor", llm, "prompt", Answer) for _ in range(4)))
+
+    results = asyncio.run(run())
+
+    assert structured.ainvoke.await_count == 1
+    assert all(result == Answer(value=1) for result in results)
+    assert len({id(result) for result in results}) == 4
+
+
+def test_gateway_does_not_coalesce_different_prompts():
+    gateway = LLMGateway(MagicMock(), disabled_cache(), flight=SingleFlight())
+    structured = gateway.registry.structured.return_value
+    structured.ainvoke = AsyncMock(return_value=Answer(value=1))
+    llm = make_llm()
+
+    async def run():
+        await asyncio.gather(gateway.ainvoke("risk_assessor", llm, "a", Answer), gateway.ainvoke("risk_assessor", llm, "b", Answer))
+
+    asyncio.run(run())
+    assert structured.ainvoke.await_count == 2
+
+
+def test_follower_worker_reads_leader_result_from_cache():
+    connection = MagicMock()
+    connection.set.return_value = None  # another worker holds the lock
+    connection.exists.return_value = 1
+    connection.get.side_effect = [None, None, Answer(value=7).model_dump_json().encode()]
+    cache = LLMResponseCache(connection, ttl=60, max_entries=10, l1_size=0)
+    gateway = LLMGateway(MagicMock(), cache, flight=SingleFlight(), flight_lock=RedisFlightLock(connection, ttl=5, poll_interval=0.01))
+
+    result = gateway.invoke("task_scheduler", make_llm(), "prompt", Answer)
+
+    assert result == Answer(value=7)
+    gateway.registry.structured.return_value.invoke.assert_not_called()
@@ -1,8 +1,37 @@
+import argparse
+
+from app.core.config import settings
 from app.services.task_queue import redis_conn
-from rq import Worker
+from app.services.rq_worker import ProgressWorker
+from app.services.llm_service import llm_registry
 
 if __name__ == '__main__':
-    # Create a worker that listens on the default queue
-    worker = Worker(['default'], connection=redis_conn)
-    print("RQ worker started. Listening for tasks...")
-    worker.work() 
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Start a worker for the plan generation queue.")
+    parser.add_argument(
+        "--mode",
+        choices=["rq", "async"],
+        default=settings.WORKER_MODE,
+        help="rq: forking RQ worker, one job per process; async: many jobs on one event loop",
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=settings.WORKER_CONCURRENCY,
+        help="Maximum concurrent jobs in async mode",
+    )
+    args = parser.parse_args()
+
+    if args.mode == "async":
+        from app.services.async_worker import AsyncWorker
+        worker = AsyncWorker(['default'], connection=redis_conn, concurrency=args.concurrency)
+        print(f"Async worker started (concurrency={args.concurrency}). Listening for tasks...")
+        worker.work_async()
+    else:
+        # Preload the graph and the shared LLM clients before forking so every job inherits them;
+        # connections are still opened per job because sockets must not be shared across forks
+        import app.agent.graph  # noqa: F401
+        llm_registry.warm_up()
+        # Create a worker that listens on the default queue
+        worker = ProgressWorker(['default'], connection=redis_conn)
+        print("RQ worker started. Listening for tasks...")
+        worker.work()